@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import hashlib
 import os
 import re
+import sys
 from pathlib import Path
 
 import dj_database_url
@@ -67,13 +69,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.middleware.gzip.GZipMiddleware',
-    'hw.brotli_middleware.BrotliMiddleware',
+    'hw.compression.CompressionMiddleware',  # brotli/gzip; no GZipMiddleware on top of it
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hw.permissions.AccessContextMiddleware',
     'hw.inertia_auth.InertiaAuthRedirectMiddleware',
     'inertia.middleware.InertiaMiddleware',
     'hw.inertia_share.InertiaShareMiddleware',
@@ -133,13 +135,27 @@ else:
     }
 
 
+# Two tiers (hw/cache.py): a per-process LRU in front of the database cache
+# table that every gunicorn/qcluster worker shares. Writes bump a generation
+# stamp in the shared tier so the other workers drop their L1.
 CACHES = {
     'default': {
+        'BACKEND': 'hw.cache.TieredCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': 300,
+        'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 30, 'GENERATION_CHECK': 1},
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'hw_cache_table',
         'TIMEOUT': 300,
-    }
+    },
 }
+if 'test' in sys.argv:
+    # Tiap tes di-rollback, L1 tidak: tanpa L1 isi cache (dan jumlah query)
+    # tidak bocor dari tes sebelumnya. hw/tests/test_tiered_cache.py
+    # menyalakannya sendiri.
+    CACHES['default']['OPTIONS']['L1_MAX_ENTRIES'] = 0
 
 WHITENOISE_IMMUTABLE_FILE_TEST = re.compile(r'.*\.[a-fA-F0-9]{8}\.[a-z]+$')
 
@@ -152,23 +168,68 @@ REMINDER_H1_H0_ENABLED = True
 # ORM broker: reuses the existing Postgres DB as the task queue, so no Redis
 # or extra service is needed. In production a separate `manage.py qcluster`
 # process must be running to actually process queued tasks (see bin/startup.sh).
-import sys
 Q_CLUSTER = {
     'name': 'hms',
     'workers': 2,
     'timeout': 30,
-    'retry': 60,
+    # Must stay above the longest per-task timeout (PDF renders pass their
+    # own, see PDF_JOB_TIMEOUT / PDF_BUNDLE_TIMEOUT in hw/views/pdf.py) or the
+    # ORM broker hands the same task to a second worker while the first is
+    # still on it.
+    'retry': 660,
+    # Bulk PDF exports lay out documents in a process pool inside the worker
+    # (hw/services/pdf_bundle.py); daemonic processes can't have children.
+    'daemonize_workers': False,
     'queue_limit': 50,
     'bulk': 10,
     'orm': 'default',
+    # Cluster stats are saved every guard cycle (0.5 s); keep them out of the
+    # tiered cache's L1 bookkeeping (hw/cache.py).
+    'cache': 'shared',
     # Sync mode runs tasks in-process: always during tests, and in local dev
     # (DEBUG=True) where no qcluster worker is running — otherwise WA sends
     # would queue forever and never actually go out.
     'sync': DEBUG or 'test' in sys.argv,
 }
 
+# ── Background PDF renders (hw/services/pdf_store.py) ──
+# Rendered PDFs are written here by the qcluster worker and served back to the
+# browser by /pdf/jobs/<key>/, so web and worker must see the same directory.
+# The same store doubles as the PDF cache. Artifacts unused for longer than
+# the TTL are evicted (lazily, and by prune_pdf_jobs); past MAX_BYTES the
+# least recently used ones go first.
+PDF_ARTIFACT_ROOT = get_env_variable('PDF_ARTIFACT_ROOT', str(BASE_DIR / 'pdf_artifacts'))
+PDF_ARTIFACT_TTL = int(get_env_variable('PDF_ARTIFACT_TTL', str(24 * 3600)))
+PDF_ARTIFACT_MAX_BYTES = int(get_env_variable('PDF_ARTIFACT_MAX_BYTES', str(512 * 1024 * 1024)))
+# Processes used to lay out the PDFs of one bulk export.
+PDF_RENDER_PROCESSES = int(get_env_variable('PDF_RENDER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+# Hit/miss counters are bumped on every PDF request: write them straight to
+# the shared tier, not through the tiered cache (hw/cache.py).
+PDF_STATS_CACHE = 'shared'
+if 'test' in sys.argv:
+    import tempfile
+    PDF_ARTIFACT_ROOT = tempfile.mkdtemp(prefix='hms-pdf-test-')
+    PDF_RENDER_PROCESSES = 1
+
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
+# ── Activity log (hw/services/audit.py) ──
+# log_activity() buffers rows per process; they are bulk-inserted when the
+# request finishes, when the buffer holds AUDIT_BUFFER_SIZE rows, every
+# AUDIT_FLUSH_INTERVAL seconds (0 = no timer thread) and at process exit.
+AUDIT_BUFFER_SIZE = int(get_env_variable('AUDIT_BUFFER_SIZE', '100'))
+AUDIT_FLUSH_INTERVAL = float(get_env_variable('AUDIT_FLUSH_INTERVAL', '5'))
+if 'test' in sys.argv:
+    # Tes membaca log tepat setelah aksinya, di transaksi yang sama.
+    AUDIT_BUFFER_SIZE = 1
+    AUDIT_FLUSH_INTERVAL = 0
+
+# ── Response compression (hw/compression.py) ──
+# Strong-ETag bodies up to this size (PDFs, static JSON) are compressed once
+# at the top setting and kept in the cache for COMPRESSION_CACHE_TTL seconds.
+COMPRESSION_CACHE_MAX_BYTES = int(get_env_variable('COMPRESSION_CACHE_MAX_BYTES', str(1024 * 1024)))
+COMPRESSION_CACHE_TTL = int(get_env_variable('COMPRESSION_CACHE_TTL', str(24 * 3600)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -240,12 +301,42 @@ DJANGO_VITE = {
     }
 }
 
+# Versi aset frontend: ASSET_VERSION dari deploy, atau digest manifest Vite.
+# Inertia membalas kunjungan dari bundle lama dengan 409 + full reload, dan
+# ETag halaman (hw/views/conditional.py) ikut berubah, jadi setelah deploy
+# GET halaman penuh tidak pernah dijawab 304 yang menunjuk ke bundle lama.
+def _asset_version(manifest_path):
+    try:
+        return hashlib.sha256(Path(manifest_path).read_bytes()).hexdigest()[:12]
+    except OSError:
+        return '1.0'  # dev server / belum di-build: default inertia-django
+
+
+INERTIA_VERSION = get_env_variable('ASSET_VERSION') or _asset_version(DJANGO_VITE['default']['manifest_path'])
+
 # AI
 GROQ_API_KEY   = get_env_variable('GROQ_API_KEY', '')
 GEMINI_API_KEY = get_env_variable('GEMINI_API_KEY', '')
 
 FONNTE_TOKEN        = get_env_variable('FONNTE_TOKEN', '')
 FONNTE_TEAM_TARGETS = get_list_env('FONNTE_TEAM_TARGETS', [])
+# Transport (hw/services/fonnte.py): pooled session, retries with
+# exponential backoff, and a breaker that pauses sending after repeated
+# failures instead of waiting out a timeout per target.
+FONNTE_API_URL            = get_env_variable('FONNTE_API_URL', 'https://api.fonnte.com/send')
+FONNTE_MAX_CONCURRENCY    = int(get_env_variable('FONNTE_MAX_CONCURRENCY', '8'))
+FONNTE_MAX_RETRIES        = int(get_env_variable('FONNTE_MAX_RETRIES', '3'))
+FONNTE_BACKOFF_SECONDS    = float(get_env_variable('FONNTE_BACKOFF_SECONDS', '0.5'))
+FONNTE_CONNECT_TIMEOUT    = float(get_env_variable('FONNTE_CONNECT_TIMEOUT', '5'))
+FONNTE_READ_TIMEOUT       = float(get_env_variable('FONNTE_READ_TIMEOUT', '10'))
+FONNTE_BREAKER_THRESHOLD  = int(get_env_variable('FONNTE_BREAKER_THRESHOLD', '5'))
+FONNTE_BREAKER_COOLDOWN   = float(get_env_variable('FONNTE_BREAKER_COOLDOWN', '60'))
+# Shared token buckets for the queued sends, as (messages per minute, burst):
+# one across all targets and one per target. A task over the limit is
+# rescheduled (django-q Schedule) instead of being logged as FAILED.
+FONNTE_RATE_LIMIT         = (int(get_env_variable('FONNTE_RATE_PER_MINUTE', '30')), 10)
+FONNTE_TARGET_RATE_LIMIT  = (int(get_env_variable('FONNTE_TARGET_RATE_PER_MINUTE', '6')), 3)
+FONNTE_MAX_RESCHEDULES    = 20
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
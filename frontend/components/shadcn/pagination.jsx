@@ -12,6 +12,11 @@ import { useI18n } from "../../utils/i18n.jsx";
 //
 // `count`/`start_index`/`end_index` come from the views' pagination dict; the
 // counter is skipped when a caller's payload predates them.
+//
+// Keyset-paginated lists (hw/pagination.py) also send `after` / `before`:
+// cursors at the last / first row on screen. `onPage` gets the one pointing
+// towards the target page as its second argument ({} when there is none) and
+// passes it on in the query, so the server seeks instead of using OFFSET.
 export default function Pagination({ pagination, onPage, unit = "results" }) {
   const { t } = useI18n();
   if (!pagination?.has_other_pages) return null;
@@ -19,8 +24,9 @@ export default function Pagination({ pagination, onPage, unit = "results" }) {
   const {
     number, range, has_previous, has_next,
     previous_page_number, next_page_number,
-    start_index, end_index, count,
+    start_index, end_index, count, after, before,
   } = pagination;
+  const go = (p) => onPage(p, p > number && after ? { after } : p < number && before ? { before } : {});
 
   return (
     <nav className="hms-pag" aria-label={t("Pagination")}>
@@ -33,7 +39,7 @@ export default function Pagination({ pagination, onPage, unit = "results" }) {
           type="button"
           className="hms-pag-step"
           disabled={!has_previous}
-          onClick={() => onPage(previous_page_number)}
+          onClick={() => go(previous_page_number)}
         >
           <span className="hms-pag-chev back"><Icon name="chevron" size={13} /></span>
           {t("Prev")}
@@ -45,7 +51,7 @@ export default function Pagination({ pagination, onPage, unit = "results" }) {
           ) : p === number ? (
             <span key={i} className="hms-pag-num is-active" aria-current="page">{p}</span>
           ) : (
-            <button key={i} type="button" className="hms-pag-num" onClick={() => onPage(p)}>
+            <button key={i} type="button" className="hms-pag-num" onClick={() => go(p)}>
               {p}
             </button>
           )
@@ -55,7 +61,7 @@ export default function Pagination({ pagination, onPage, unit = "results" }) {
           type="button"
           className="hms-pag-step"
           disabled={!has_next}
-          onClick={() => onPage(next_page_number)}
+          onClick={() => go(next_page_number)}
         >
           {t("Next")}
           <span className="hms-pag-chev fwd"><Icon name="chevron" size={13} /></span>
@@ -3,7 +3,7 @@ import { Dialog, DialogContent } from "./ui/dialog.jsx";
 import { Command, CommandGroup, CommandInput, CommandItem, CommandList } from "./ui/command.jsx";
 import { useI18n } from "../../utils/i18n.jsx";
 
-const TYPE_LABEL = { CL: "Conf. Letter", INV: "Invoice Hotel", SVC: "Invoice Services" };
+const TYPE_LABEL = { CL: "Conf. Letter", INV: "Invoice Hotel", SVC: "Invoice Services", CLIENT: "Client", HOTEL: "Hotel" };
 
 // shadcn/cmdk rebuild of ../shell/SearchOverlay.jsx — same open/onClose props.
 // Command owns arrow-key navigation, highlight, and Enter-to-select natively,
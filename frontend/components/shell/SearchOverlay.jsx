@@ -2,7 +2,7 @@ import { useEffect, useRef, useState } from "react";
 import { Icon } from "../icons.jsx";
 import { useI18n } from "../../utils/i18n.jsx";
 
-const TYPE_LABEL = { CL: "Conf. Letter", INV: "Invoice Hotel", SVC: "Invoice Services" };
+const TYPE_LABEL = { CL: "Conf. Letter", INV: "Invoice Hotel", SVC: "Invoice Services", CLIENT: "Client", HOTEL: "Hotel" };
 
 // Port of the #search-overlay markup + behaviour from _base.html.
 export default function SearchOverlay({ open, onClose }) {
@@ -0,0 +1,74 @@
+// Check-in range for the remittance Form/Edit reservation tables. The server
+// only sends a window of the idle-funds pool (the last 90 days by default,
+// see remittance_views._check_in_range); this bar re-reads other ranges from
+// /remittance/reservasi/ as JSON rather than through an Inertia visit, because
+// both pages also run inside the FormModal dialog, where a visit would close it.
+import { useState } from "react";
+import { Button } from "../shadcn/ui/button.jsx";
+import { Input } from "../shadcn/ui/input.jsx";
+import { fetchJson } from "../../utils/fetchJson.js";
+import { useI18n } from "../../utils/i18n.jsx";
+
+const fmt = (n) => Number(n || 0).toLocaleString("en-US", { maximumFractionDigits: 0 });
+
+// `initial` is the page's props ({ reservasi, date_from, date_to, outside_range });
+// `rem` is the remittance id on the Edit page (rows already on it are left out).
+export function useCheckInRange(initial, rem) {
+  const [slice, setSlice] = useState(initial);
+  const [loading, setLoading] = useState(false);
+
+  const load = async (from, to) => {
+    const params = new URLSearchParams({ from: from || "", to: to || "" });
+    if (rem) params.append("rem", rem);
+    setLoading(true);
+    try {
+      setSlice(await fetchJson(`/remittance/reservasi/?${params}`));
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return { ...slice, load, loading };
+}
+
+export default function CheckInRange({ range }) {
+  const { t } = useI18n();
+  const [from, setFrom] = useState(range.date_from || "");
+  const [to, setTo] = useState(range.date_to || "");
+  const outside = range.outside_range || { count: 0 };
+
+  const showAll = () => {
+    setFrom("");
+    setTo("");
+    range.load("", "");
+  };
+
+  return (
+    <div className="rem-range">
+      <div className="rem-range-fields">
+        <label>
+          <span>{t("Check-in")} {t("From")}</span>
+          <Input type="date" value={from} onChange={(e) => setFrom(e.target.value)} />
+        </label>
+        <label>
+          <span>{t("To")}</span>
+          <Input type="date" value={to} onChange={(e) => setTo(e.target.value)} />
+        </label>
+        <Button type="button" variant="outline" size="sm" disabled={range.loading} onClick={() => range.load(from, to)}>
+          {t("Apply")}
+        </Button>
+        {(range.date_from || range.date_to) && (
+          <Button type="button" variant="ghost" size="sm" disabled={range.loading} onClick={showAll}>
+            {t("All dates")}
+          </Button>
+        )}
+      </div>
+      {outside.count > 0 && (
+        <div className="rem-range-note">
+          {t("{n} reservations with idle funds ({amount} SAR) are outside this range.", { n: outside.count, amount: fmt(outside.mengendap) })}{" "}
+          <button type="button" className="rem-linkbtn" onClick={showAll}>{t("Show all")}</button>
+        </div>
+      )}
+    </div>
+  );
+}
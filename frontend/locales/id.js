@@ -24,6 +24,7 @@ export const id = {
   "{n} days ago": "{n} hari yang lalu",
   "{n} lines": "{n} baris",
   "{n} nights": "{n} malam",
+  "{n} reservations with idle funds ({amount} SAR) are outside this range.": "{n} reservasi dengan dana mengendap ({amount} SAR) di luar rentang ini.",
   "+ Add payment": "+ Tambah pembayaran",
   "+ Add room": "+ Tambah kamar",
   "+ Add service": "+ Tambah layanan",
@@ -69,6 +70,7 @@ export const id = {
   "All": "Semua",
   "All ★": "Semua ★",
   "All Cities": "Semua Kota",
+  "All dates": "Semua tanggal",
   "All idle payments are already covered": "Semua pembayaran idle sudah tercakup",
   "all invoices": "semua invoice",
   "all remittances": "semua remitansi",
@@ -410,6 +412,8 @@ export const id = {
   "Penalty": "Denda",
   "Pending": "Menunggu",
   "pending transfer": "Menunggu transfer",
+  "PDF per CL (zip)": "PDF per CL (zip)",
+  "PDF per invoice (zip)": "PDF per invoice (zip)",
   "Per Reservation": "Per Reservasi",
   "Person in charge name": "Nama penanggung jawab",
   "Phone": "Telepon",
@@ -523,6 +527,7 @@ export const id = {
   "Services": "Services",
   "Services invoice": "Invoice Services",
   "Settled": "Lunas",
+  "Show all": "Tampilkan semua",
   "Show Routes": "Tampilkan Rute",
   "Staff": "Staf",
   "Stars": "Bintang",
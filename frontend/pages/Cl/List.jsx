@@ -23,7 +23,7 @@ function statusBadge(s) {
 }
 
 // Django reads ?status=a&status=b (repeated), so build the query string by hand.
-function buildQuery({ q, status, date_from, date_to, sort, page }) {
+function buildQuery({ q, status, date_from, date_to, sort, page, after, before }) {
   const p = new URLSearchParams();
   if (q) p.append("q", q);
   (status || []).forEach((s) => p.append("status", s));
@@ -31,6 +31,8 @@ function buildQuery({ q, status, date_from, date_to, sort, page }) {
   if (date_to) p.append("date_to", date_to);
   if (sort) p.append("sort", sort);
   if (page) p.append("page", page);
+  if (after) p.append("after", after);
+  if (before) p.append("before", before);
   return "/cl/?" + p.toString();
 }
 
@@ -83,6 +85,7 @@ export default function List({ letters, total_count, q, status_list, date_from,
                 <a href={`/cl/export/csv/${exportQs}`}><Icon name="invoice" size={13} /> CSV</a>
                 <a href={`/cl/export/pdf/${exportQs}`} target="_blank" rel="noreferrer"><Icon name="cl" size={13} /> PDF</a>
                 <a href={`/cl/export/pdf-v2/${exportQs}`} target="_blank" rel="noreferrer"><Icon name="cl" size={13} /> PDF v2</a>
+                <a href={`/cl/export/zip/${exportQs}`} target="_blank" rel="noreferrer"><Icon name="cl" size={13} /> {t("PDF per CL (zip)")}</a>
               </div>
             )}
           </div>
@@ -226,7 +229,7 @@ export default function List({ letters, total_count, q, status_list, date_from,
               onRowClick={(cl) => router.visit(`/cl/${cl.id}/`)}
             />
 
-            <Pagination pagination={pagination} unit={t("documents")} onPage={(p) => go({ page: p })} />
+            <Pagination pagination={pagination} unit={t("documents")} onPage={(p, cursor) => go({ page: p, ...cursor })} />
           </>
         ) : (
           <div className="empty">
@@ -185,7 +185,7 @@ export default function List({ clients, total_count, q, status, pagination }) {
             rowKey={(c) => c.id}
             onRowClick={(c) => router.visit(`/clients/${c.id}/`)}
           />
-          <Pagination pagination={pagination} unit={t("clients")} onPage={(p) => visit({ q: query, status: status || "", page: p })} />
+          <Pagination pagination={pagination} unit={t("clients")} onPage={(p, cursor) => visit({ q: query, status: status || "", page: p, ...cursor })} />
           </>
         ) : (
           <div className="empty">
@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from "react";
-import { usePage } from "@inertiajs/react";
+import { router, usePage } from "@inertiajs/react";
 import { ResponsiveContainer, AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, PieChart, Pie, Cell } from "recharts";
 import { fetchJson } from "../../utils/fetchJson.js";
 import { useI18n } from "../../utils/i18n.jsx";
@@ -576,6 +576,10 @@ function Dashboard({ kpis, clTrend, clDaily, recentCls, paymentSnapshot, topHote
   );
 }
 
+// Chart props are left out of the first render (optional props on the
+// server) and fetched by a partial reload once the KPI cards are on screen.
+const CHART_PROPS = ["cl_trend", "cl_daily", "recent_cls", "top_hotels", "region_data"];
+
 export default function Home() {
   const { props } = usePage();
   const kpis = props.kpis || {};
@@ -589,6 +593,9 @@ export default function Home() {
   const inputRef = useRef(null);
   const msgRef = useRef(null);
 
+  useEffect(() => {
+    if (props.cl_trend === undefined) router.reload({ only: CHART_PROPS });
+  }, []);
   useEffect(() => {
     const onKey = (e) => { if (e.key === "Escape") setOpen(false); };
     document.addEventListener("keydown", onKey);
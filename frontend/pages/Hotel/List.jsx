@@ -29,13 +29,15 @@ function distBadge(d) {
   return "badge badge-red";
 }
 
-function buildQuery({ q, city, stars, area, page }) {
+function buildQuery({ q, city, stars, area, page, after, before }) {
   const p = new URLSearchParams();
   if (q) p.append("q", q);
   if (city) p.append("city", city);
   if (stars) p.append("stars", stars);
   if (area) p.append("area", area);
   if (page) p.append("page", page);
+  if (after) p.append("after", after);
+  if (before) p.append("before", before);
   return "/hotels/?" + p.toString();
 }
 
@@ -205,7 +207,7 @@ export default function List({ hotels, total_count, q, city_filter, stars_filter
               onRowClick={(h) => router.visit(`/hotels/${h.id}/`)}
             />
 
-            <Pagination pagination={pagination} unit={t("hotels")} onPage={(p) => go({ page: p })} />
+            <Pagination pagination={pagination} unit={t("hotels")} onPage={(p, cursor) => go({ page: p, ...cursor })} />
           </>
         ) : (
           <div className="empty">
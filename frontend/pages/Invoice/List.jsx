@@ -21,18 +21,24 @@ const STATUS_OPTS = [
   { val: "belum", label: "Unpaid", cls: "c-bel" },
 ];
 
-function buildQuery({ q, status, date_from, date_to, page }) {
+function buildQuery({ q, status, date_from, date_to, page, after, before }) {
   const p = new URLSearchParams();
   if (q) p.append("q", q);
   if (status) p.append("status", status);
   if (date_from) p.append("date_from", date_from);
   if (date_to) p.append("date_to", date_to);
   if (page) p.append("page", page);
+  if (after) p.append("after", after);
+  if (before) p.append("before", before);
   return "/invoice/?" + p.toString();
 }
 
-function visit(params) {
-  router.get(buildQuery(params), {}, { preserveState: true, preserveScroll: true, replace: true });
+// A page change keeps the filters, so it only asks for the list props; the
+// remittance stats above the table stay as they are.
+const PAGE_PROPS = ["invoices", "pagination"];
+
+function visit(params, only) {
+  router.get(buildQuery(params), {}, { preserveState: true, preserveScroll: true, replace: true, only });
 }
 
 export default function List({ invoices, total_count, q, status_filter, date_from, date_to, remit_stats, pagination }) {
@@ -82,6 +88,7 @@ export default function List({ invoices, total_count, q, status_filter, date_fro
               <div className="export-menu" style={{ display: "block" }}>
                 <a href={`/invoice/export/csv/${exportQs}`}><Icon name="invoice" size={13} /> CSV</a>
                 <a href={`/invoice/export/pdf/${exportQs}`} target="_blank" rel="noreferrer"><Icon name="cl" size={13} /> PDF</a>
+                <a href={`/invoice/export/zip/${exportQs}`} target="_blank" rel="noreferrer"><Icon name="cl" size={13} /> {t("PDF per invoice (zip)")}</a>
               </div>
             )}
           </div>
@@ -223,7 +230,7 @@ export default function List({ invoices, total_count, q, status_filter, date_fro
             <Pagination
               pagination={pagination}
               unit={t("invoices")}
-              onPage={(p) => visit({ page: p })}
+              onPage={(p, cursor) => visit({ q, status: status_filter, date_from, date_to, page: p, ...cursor }, PAGE_PROPS)}
             />
           </>
         ) : (
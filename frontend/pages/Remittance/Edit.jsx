@@ -8,13 +8,16 @@ import FormActions from "../../components/shadcn/form-actions.jsx";
 import PageBack from "../../components/shadcn/page-back.jsx";
 import { Input } from "../../components/shadcn/ui/input.jsx";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "../../components/shadcn/ui/select.jsx";
+import CheckInRange, { useCheckInRange } from "../../components/ui/CheckInRange.jsx";
 import { REM_TABLE_CSS, REM_FORM_CSS } from "./remittanceStyles.js";
 import { useI18n } from "../../utils/i18n.jsx";
 
 const fmt = (n) => Number(n || 0).toLocaleString("en-US", { maximumFractionDigits: 0 });
 
-export default function Edit({ rem, lines = [], reservasi = [] }) {
+export default function Edit({ rem, lines = [], reservasi: initialRows = [], date_from, date_to, outside_range }) {
   const { t } = useI18n();
+  const range = useCheckInRange({ reservasi: initialRows, date_from, date_to, outside_range }, rem.id);
+  const reservasi = range.reservasi;
   const [amounts, setAmounts] = useState(
     Object.fromEntries(lines.map((l) => [l.line_id, String(Math.round(l.amount_sar || 0))]))
   );
@@ -178,6 +181,7 @@ export default function Edit({ rem, lines = [], reservasi = [] }) {
           </FormSection>
 
           <FormSection label={t("Add Reservation")} sub={t("Idle payments not yet included in this transfer")}>
+            <CheckInRange range={range} />
             {reservasi.length > 0 ? (
               <div className="table-wrap" style={{ overflowX: "auto" }}>
                 <table className="rem-table">
@@ -9,14 +9,17 @@ import PageBack from "../../components/shadcn/page-back.jsx";
 import { Button } from "../../components/shadcn/ui/button.jsx";
 import { Input } from "../../components/shadcn/ui/input.jsx";
 import { FormModalContext } from "../../components/shadcn/form-modal.jsx";
+import CheckInRange, { useCheckInRange } from "../../components/ui/CheckInRange.jsx";
 import { REM_TABLE_CSS, REM_FORM_CSS } from "./remittanceStyles.js";
 import { useI18n } from "../../utils/i18n.jsx";
 
 const fmt = (n) => Number(n || 0).toLocaleString("en-US", { maximumFractionDigits: 0 });
 
-export default function Form({ reservasi = [], today, error }) {
+export default function Form({ reservasi: initialRows = [], date_from, date_to, outside_range, today, error }) {
   const { t } = useI18n();
   const modalCtx = useContext(FormModalContext);
+  const range = useCheckInRange({ reservasi: initialRows, date_from, date_to, outside_range });
+  const reservasi = range.reservasi;
   const [amounts, setAmounts] = useState({});
   const form = useForm({
     date: today || "",
@@ -97,6 +100,7 @@ export default function Form({ reservasi = [], today, error }) {
             label={t("Reservations")}
             action={hasRows && <Button type="button" variant="ghost" size="sm" onClick={isiSemua}>{t("Fill All")}</Button>}
           >
+            <CheckInRange range={range} />
             {hasRows ? (
               <>
                 <div className="table-wrap" style={{ overflowX: "auto" }}>
@@ -7,6 +7,7 @@ import Table from "../../components/shadcn/table.jsx";
 import RowActions from "../../components/shadcn/row-actions.jsx";
 import { useFormModal } from "../../components/shadcn/form-modal.jsx";
 import KpiCard from "../../components/shadcn/kpi-card.jsx";
+import Pagination from "../../components/shadcn/pagination.jsx";
 import { usePerms } from "../../utils/perms.js";
 import { useI18n } from "../../utils/i18n.jsx";
 
@@ -17,11 +18,15 @@ const STATUS_OPTS = [
   { val: "received", label: "Received", cls: "c-rec" },
 ];
 
-function visit(params) {
-  router.get("/remittance/", params, { preserveState: true, preserveScroll: true, replace: true });
+// A page change keeps the filters, so it only asks for the list props; the
+// stat cards and total stay as they are.
+const PAGE_PROPS = ["remittances", "pagination"];
+
+function visit(params, only) {
+  router.get("/remittance/", params, { preserveState: true, preserveScroll: true, replace: true, only });
 }
 
-export default function List({ remittances, stats, status_filter, q, total_count }) {
+export default function List({ remittances, stats, status_filter, q, total_count, pagination }) {
   const { t } = useI18n();
   const [query, setQuery] = useState(q || "");
   const [panelOpen, setPanelOpen] = useState(false);
@@ -115,6 +120,7 @@ export default function List({ remittances, stats, status_filter, q, total_count
 
       <div className="card">
         {remittances.length ? (
+          <>
           <Table
             columns={[
               { header: t("Remittance No"), className: "col-m-primary col-nowrap", render: (rem) => rem.remittance_number },
@@ -168,6 +174,8 @@ export default function List({ remittances, stats, status_filter, q, total_count
             rowKey={(rem) => rem.id}
             onRowClick={(rem) => router.visit(`/remittance/${rem.id}/`)}
           />
+          <Pagination pagination={pagination} unit={t("remittances")} onPage={(p) => visit({ q: query, status: status_filter || "", page: p }, PAGE_PROPS)} />
+          </>
         ) : (
           <div className="empty">
             <Icon name="invoice" size={36} strokeWidth={1.5} />
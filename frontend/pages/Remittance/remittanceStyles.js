@@ -62,6 +62,12 @@ export const REM_TABLE_CSS = `
 .rem-linkbtn.danger { color:var(--destructive); }
 .rem-linkbtn.danger:hover { opacity:.8; }
 
+/* rentang check-in di atas tabel reservasi (components/ui/CheckInRange.jsx) */
+.rem-range { margin-bottom:12px; }
+.rem-range-fields { display:flex; flex-wrap:wrap; align-items:flex-end; gap:8px; }
+.rem-range-fields label { display:flex; flex-direction:column; gap:4px; font-size:12px; color:var(--muted-foreground); }
+.rem-range-note { margin-top:8px; font-size:12px; color:var(--yellow); }
+
 /* peringatan saat mengedit transfer yang sudah ditandai Received */
 .rem-received-note {
   font-size:12.5px; line-height:1.6; color:var(--foreground);
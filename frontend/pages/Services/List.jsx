@@ -103,7 +103,7 @@ export default function List({ invoices, total_count, q, pagination }) {
               onRowClick={(inv) => router.visit(`/services/${inv.id}/`)}
             />
 
-            <Pagination pagination={pagination} unit={t("invoices")} onPage={(p) => visit({ q: query, page: p })} />
+            <Pagination pagination={pagination} unit={t("invoices")} onPage={(p, cursor) => visit({ q: query, page: p, ...cursor })} />
           </>
         ) : (
           <div className="empty">
@@ -21,8 +21,8 @@ admin.site.__class__ = SuperuserOnlyAdminSite
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display  = ('invoice_number', 'customer_name', 'company', 'invoice_type', 'issued_date', 'due_date')
-    list_filter   = ('company', 'invoice_type')
+    list_display  = ('invoice_number', 'customer_name', 'company', 'invoice_type', 'issued_date', 'due_date', 'balance_sar', 'payment_status')
+    list_filter   = ('company', 'invoice_type', 'payment_status')
     search_fields = ('invoice_number', 'customer_name')
     date_hierarchy = 'issued_date'
 
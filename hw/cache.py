@@ -0,0 +1,350 @@
+"""Two-tier cache backend: a small per-process LRU (L1) in front of a shared
+cache (L2, the DatabaseCache).
+
+    CACHES = {
+        'default': {'BACKEND': 'hw.cache.TieredCache', 'LOCATION': 'shared', ...},
+        'shared':  {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', ...},
+    }
+
+LOCATION names the L2 alias. L1_MAX_ENTRIES=0 turns the backend into a
+plain pass-through to L2. Reads are answered from L1 while the entry is
+younger than L1_TIMEOUT and its namespace stamp in L2 hasn't moved; misses
+go to L2 and are copied into L1.
+
+Invalidation is per namespace: the first two ':'-separated parts of the key
+('hw:dashboard', 'hw:listcount', 'django_q:hms'), or the whole key when it
+has no ':' (sessions, 'message_templates'). Every write (set/add/delete/
+incr/touch) goes to L2 and stores a fresh stamp for its namespace there
+(stamp_key). A worker re-reads the stamps of the namespaces it holds, in a
+single get_many, once per request (after `request_started`) and otherwise
+at most every GENERATION_CHECK seconds (qcluster tasks, management
+commands), and drops only the namespaces whose stamp has moved. So a
+session save or a list-count write leaves the cached role matrix alone.
+clear() moves the global GENERATION_KEY instead, which empties every L1.
+
+Stamps expire a little after any L1 entry could have: a missing stamp
+never matches one a worker has seen, so the worst case is a needless
+reload, and the table isn't left with a stamp per session forever.
+
+Keys written many times a second (django-q's cluster stats, the PDF store
+counters) belong on the L2 alias directly; through this backend each write
+costs an extra stamp write.
+
+`stats()` reports L1 hits, L2 hits, misses and L2 round-trips for this
+process; `manage.py bench_cache` compares round-trips per request against
+the plain L2 backend.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+GENERATION_KEY = 'tiered:generation'
+STAMP_PREFIX = 'tiered:ns:'
+
+_MISSING = object()
+
+
+def namespace(key):
+    """'hw:dashboard:v2:konoz:…' -> 'hw:dashboard'; a key without ':' is
+    its own namespace."""
+    return ':'.join(key.split(':', 2)[:2])
+
+
+def stamp_key(key):
+    """L2 key of the stamp guarding `key`'s namespace."""
+    return STAMP_PREFIX + namespace(key)
+
+
+class _Local:
+    """The L1 of one TieredCache, shared by every thread of the process
+    (django.core.cache.caches hands out one backend instance per thread)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # local key -> (value, expires_at, (namespace, version))
+        self.stamps = {}  # (namespace, version) -> stamp seen in L2
+        self.generation = None
+        self.checked_at = 0.0
+        self.counters = dict.fromkeys(('l1_hits', 'l2_hits', 'misses', 'l2_calls'), 0)
+
+    def drop(self, spaces):
+        """Forget the entries of `spaces` (caller holds the lock)."""
+        for key in [k for k, item in self.entries.items() if item[2] in spaces]:
+            del self.entries[key]
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+            self.stamps.clear()
+            self.generation = None
+            self.checked_at = 0.0
+            for name in self.counters:
+                self.counters[name] = 0
+
+
+_locals = {}
+_locals_lock = threading.Lock()
+
+
+def _local_for(name):
+    with _locals_lock:
+        return _locals.setdefault(name, _Local())
+
+
+@receiver(request_started)
+def _recheck_generation(sender, **kwargs):
+    for local in list(_locals.values()):
+        local.checked_at = 0.0
+
+
+def _by_version(spaces):
+    grouped = defaultdict(list)
+    for name, version in spaces:
+        grouped[version].append(name)
+    return grouped
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._local = _local_for(location)
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self.generation_check = float(options.get('GENERATION_CHECK', 1))
+        # Long enough that a stamp outlives every L1 entry filled before it
+        # was written (see the module docstring).
+        self.stamp_timeout = max(60, int(2 * (self.l1_timeout + self.generation_check)))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # ── L1 bookkeeping ──
+
+    def _count(self, name, n=1):
+        with self._local.lock:
+            self._local.counters[name] += n
+
+    def _validate(self):
+        """Drop the L1 namespaces another worker has written to since we
+        last looked (all of L1 after a clear())."""
+        local = self._local
+        now = time.monotonic()
+        if not self.l1_max_entries or now - local.checked_at < self.generation_check:
+            return
+        with local.lock:
+            held = {item[2] for item in local.entries.values()}
+        seen = {}
+        generation = None
+        grouped = _by_version(held)
+        if None not in grouped:
+            grouped[None] = []
+        for version, names in grouped.items():
+            wanted = [STAMP_PREFIX + name for name in names]
+            if version is None:
+                wanted.append(GENERATION_KEY)
+            self._count('l2_calls')
+            found = self.l2.get_many(wanted, version=version)
+            if version is None:
+                generation = found.get(GENERATION_KEY)
+            seen.update({(name, version): found.get(STAMP_PREFIX + name) for name in names})
+        with local.lock:
+            if generation != local.generation:
+                local.entries.clear()
+                local.generation = generation
+            else:
+                local.drop({space for space, stamp in seen.items() if stamp != local.stamps.get(space)})
+            local.stamps = seen
+            local.checked_at = now
+
+    def _bump(self, spaces):
+        # A fresh random stamp rather than incr(): DatabaseCache.incr is a
+        # read-then-write, so two workers could both land on the same number
+        # and miss each other's write.
+        if not self.l1_max_entries:
+            return
+        stamps = {space: uuid.uuid4().hex for space in set(spaces)}
+        for version, names in _by_version(stamps).items():
+            self._count('l2_calls')
+            self.l2.set_many(
+                {STAMP_PREFIX + name: stamps[(name, version)] for name in names},
+                self.stamp_timeout, version=version,
+            )
+        with self._local.lock:
+            self._local.drop(stamps.keys())
+            self._local.stamps.update(stamps)
+
+    def _fetch(self, keys, version):
+        """l2.get_many of `keys`, plus in the same round-trip the stamps of
+        any of their namespaces L1 hasn't seen yet. Returns the values found;
+        the stamps are recorded before any value reaches L1."""
+        spaces = {(namespace(key), version) for key in keys}
+        with self._local.lock:
+            unseen = [name for name, _ in spaces if (name, version) not in self._local.stamps]
+        if not self.l1_max_entries:
+            unseen = []
+        self._count('l2_calls')
+        found = self.l2.get_many(list(keys) + [STAMP_PREFIX + name for name in unseen], version=version)
+        if unseen:
+            with self._local.lock:
+                for name in unseen:
+                    self._local.stamps.setdefault((name, version), found.get(STAMP_PREFIX + name))
+        return {key: found[key] for key in keys if key in found}
+
+    def _l1_get(self, key):
+        local = self._local
+        with local.lock:
+            item = local.entries.get(key)
+            if item is None:
+                return _MISSING
+            value, expires_at, _ = item
+            if expires_at <= time.monotonic():
+                del local.entries[key]
+                return _MISSING
+            local.entries.move_to_end(key)
+            local.counters['l1_hits'] += 1
+            return value
+
+    def _l1_set(self, key, value, timeout, version):
+        if not self.l1_max_entries:
+            return
+        ttl = self.l1_timeout
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            ttl = min(ttl, timeout - time.time())
+        if ttl <= 0:
+            return
+        space = (namespace(key), version)
+        local = self._local
+        with local.lock:
+            if space not in local.stamps:
+                return
+            local_key = self.make_key(key, version=version)
+            local.entries[local_key] = (value, time.monotonic() + ttl, space)
+            local.entries.move_to_end(local_key)
+            while len(local.entries) > self.l1_max_entries:
+                local.entries.popitem(last=False)
+
+    # ── cache API ──
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._validate()
+        value = self._l1_get(local_key)
+        if value is not _MISSING:
+            return value
+        found = self._fetch([key], version)
+        if key not in found:
+            self._count('misses')
+            return default
+        self._count('l2_hits')
+        self._l1_set(key, found[key], DEFAULT_TIMEOUT, version)
+        return found[key]
+
+    def get_many(self, keys, version=None):
+        self._validate()
+        found, wanted = {}, []
+        for key in keys:
+            value = self._l1_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                wanted.append(key)
+            else:
+                found[key] = value
+        if wanted:
+            fetched = self._fetch(wanted, version)
+            self._count('l2_hits', len(fetched))
+            self._count('misses', len(wanted) - len(fetched))
+            for key, value in fetched.items():
+                self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        self._count('l2_calls')
+        self.l2.set(key, value, timeout, version=version)
+        self._bump([(namespace(key), version)])
+        self._l1_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._count('l2_calls')
+        failed = self.l2.set_many(data, timeout, version=version)
+        self._bump([(namespace(key), version) for key in data])
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        self._count('l2_calls')
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._bump([(namespace(key), version)])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._count('l2_calls')
+        touched = self.l2.touch(key, timeout, version=version)
+        if touched:
+            self._bump([(namespace(key), version)])
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        self._count('l2_calls')
+        value = self.l2.incr(key, delta, version=version)
+        self._bump([(namespace(key), version)])
+        return value
+
+    def delete(self, key, version=None):
+        self.make_and_validate_key(key, version=version)
+        self._count('l2_calls')
+        deleted = self.l2.delete(key, version=version)
+        self._bump([(namespace(key), version)])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return
+        self._count('l2_calls')
+        self.l2.delete_many(keys, version=version)
+        self._bump([(namespace(key), version) for key in keys])
+
+    def clear(self):
+        self._count('l2_calls')
+        self.l2.clear()
+        if not self.l1_max_entries:
+            return
+        generation = uuid.uuid4().hex
+        self._count('l2_calls')
+        self.l2.set(GENERATION_KEY, generation, None)
+        with self._local.lock:
+            self._local.entries.clear()
+            self._local.stamps.clear()
+            self._local.generation = generation
+            self._local.checked_at = time.monotonic()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    # ── metrics ──
+
+    def stats(self):
+        with self._local.lock:
+            return {**self._local.counters, 'l1_entries': len(self._local.entries)}
+
+    def reset_local(self):
+        """Empty this process's L1 and zero its counters."""
+        self._local.reset()
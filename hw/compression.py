@@ -0,0 +1,195 @@
+"""Response compression: brotli when the client accepts it, gzip otherwise.
+
+Replaces the old BrotliMiddleware, which ran brotli at quality 11 on every
+text body (about a second of CPU for a 450 KB Inertia payload) and left
+streaming responses to GZipMiddleware.
+
+- The quality is picked per content type (LEVELS). Bodies built per request
+  get a fast setting: brotli 4 costs about the same CPU as gzip 6 and still
+  comes out smaller.
+- Streaming responses (CSV export, FileResponse) are compressed chunk by
+  chunk. Each chunk is flushed, so the client keeps receiving bytes while
+  the export runs.
+- A body with a strong ETag is the same bytes every time. PDFs from the
+  content-addressed store are one example. Such a body is compressed once at
+  the top setting (CACHED_LEVELS) and cached under its ETag and encoding. A
+  repeat download then skips both the compressor and the file read. Bodies
+  over COMPRESSION_CACHE_MAX_BYTES (uncompressed) are compressed per request
+  like any other.
+
+This is the only compressing middleware; GZipMiddleware is not installed.
+It leaves alone any response that already has a Content-Encoding and any
+content type outside LEVELS, so a file that is compressed already (the
+`?gzip=1` CSV export, served as application/gzip) goes out as is, not
+gzipped a second time. `manage.py bench_compression` prints CPU per
+response size for each setting.
+"""
+import hashlib
+import re
+import zlib
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+MIN_SIZE = 500
+
+# content type -> (brotli quality, gzip level) for bodies compressed per request.
+LEVELS = {
+    'text/html': (5, 6),
+    'text/css': (5, 6),
+    'text/javascript': (5, 6),
+    'application/javascript': (5, 6),
+    'image/svg+xml': (5, 6),
+    'application/json': (4, 5),
+    'text/csv': (4, 5),
+    'text/plain': (4, 5),
+    'application/pdf': (4, 5),
+}
+CACHED_LEVELS = (11, 9)
+
+_BR_RE = re.compile(r'\bbr\b')
+_GZIP_RE = re.compile(r'\bgzip\b')
+
+
+class _Brotli:
+    def __init__(self, quality, text):
+        mode = brotli.MODE_TEXT if text else brotli.MODE_GENERIC
+        self._c = brotli.Compressor(mode=mode, quality=quality)
+
+    def compress(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip header
+
+    def compress(self, data):
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._c.flush()
+
+
+def compressor(encoding, content_type, cached=False):
+    br_quality, gzip_level = CACHED_LEVELS if cached else LEVELS[content_type]
+    if encoding == 'br':
+        return _Brotli(br_quality, content_type != 'application/pdf')
+    return _Gzip(gzip_level)
+
+
+def compress(encoding, content_type, data, cached=False):
+    c = compressor(encoding, content_type, cached)
+    return c.compress(data) + c.finish()
+
+
+def _negotiate(request):
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if _BR_RE.search(accept):
+        return 'br'
+    if _GZIP_RE.search(accept):
+        return 'gzip'
+    return None
+
+
+def _stream(chunks, c):
+    for chunk in chunks:
+        data = c.compress(chunk)
+        if data:
+            yield data
+    yield c.finish()
+
+
+async def _astream(chunks, c):
+    async for chunk in chunks:
+        data = c.compress(chunk)
+        if data:
+            yield data
+    yield c.finish()
+
+
+def _cache_key(encoding, etag):
+    return f'hw:compressed:{encoding}:' + hashlib.sha256(etag.encode()).hexdigest()
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in LEVELS or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = _negotiate(request)
+        if encoding is None or request.method == 'HEAD':
+            return response
+
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return response
+
+        etag = response.get('ETag', '')
+        is_async = getattr(response, 'is_async', False)
+        if response.status_code == 200 and etag.startswith('"') and not is_async:
+            body = self._cached_body(response, encoding, content_type, etag)
+            if body is not None:
+                self._set_body(response, body, encoding)
+                return response
+
+        if response.streaming:
+            c = compressor(encoding, content_type)
+            if is_async:
+                response.streaming_content = _astream(response.streaming_content, c)
+            else:
+                response.streaming_content = _stream(response.streaming_content, c)
+            del response.headers['Content-Length']
+            self._mark(response, encoding)
+            return response
+
+        body = compress(encoding, content_type, response.content)
+        if len(body) < len(response.content):
+            self._set_body(response, body, encoding)
+        return response
+
+    def _cached_body(self, response, encoding, content_type, etag):
+        """Compressed body for a strong-ETag response, from the cache or
+        compressed now and stored. None when the body is too big to keep."""
+        if response.streaming:
+            length = int(response.get('Content-Length') or 0)
+        else:
+            length = len(response.content)
+        if not length or length > settings.COMPRESSION_CACHE_MAX_BYTES:
+            return None
+        key = _cache_key(encoding, etag)
+        body = cache.get(key)
+        if body is not None:
+            return body  # a FileResponse's file is closed unread with the response
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        body = compress(encoding, content_type, content, cached=True)
+        cache.set(key, body, settings.COMPRESSION_CACHE_TTL)
+        return body
+
+    def _set_body(self, response, body, encoding):
+        if response.streaming:
+            response.streaming_content = [body]
+        else:
+            response.content = body
+        response['Content-Length'] = str(len(body))
+        self._mark(response, encoding)
+
+    def _mark(self, response, encoding):
+        response['Content-Encoding'] = encoding
+        # The encoded body is a different representation; keep the validator
+        # usable for conditional requests but no longer byte-exact.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
@@ -4,6 +4,7 @@ from django.core.cache import cache
 from django.urls import reverse
 
 from .models import ConfirmationLetter, Invoice
+from .views.helpers import get_active_company
 
 
 def _cl_notifs(kind, field, today, threshold, active_company, limit):
@@ -31,21 +32,19 @@ def _cl_notifs(kind, field, today, threshold, active_company, limit):
 
 
 def _invoice_notifs(today, threshold, active_company, limit):
-    qs = Invoice.objects.filter(due_date__lte=threshold, due_date__gte=today)
+    qs = Invoice.objects.filter(due_date__lte=threshold, due_date__gte=today, balance_sar__gt=0)
     if active_company:
         qs = qs.filter(company=active_company)
 
     notifs = []
-    for inv in qs.prefetch_related('reservations', 'payments').order_by("due_date")[:limit]:
-        if inv.remaining_sar <= 0:
-            continue
+    for inv in qs.order_by("due_date")[:limit]:
         days = (inv.due_date - today).days
         notifs.append({
             "type": "invoice_due",
             "ref": inv.invoice_number,
             "days": days,
             "title": inv.customer_name,
-            "remaining": round(inv.remaining_sar),
+            "remaining": inv.balance_sar,
             "url": reverse("invoice_detail", args=[inv.pk]),
         })
     return notifs
@@ -54,7 +53,7 @@ def _invoice_notifs(today, threshold, active_company, limit):
 def due_soon(request):
     if not request.user.is_authenticated:
         return {}
-    active_company = request.session.get("active_company")
+    active_company = get_active_company(request)
     cache_key = f'due_soon_u{request.user.id}_{active_company}'
     cached = cache.get(cache_key)
     if cached is not None:
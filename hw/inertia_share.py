@@ -4,13 +4,20 @@ Django context processors don't run for Inertia JSON responses, so the data the
 shell needs on every page (the authenticated user + the due-soon notifications)
 is shared here instead. Must run after InertiaMiddleware (which sets up the
 share storage) and after AuthenticationMiddleware (which sets request.user).
+
+Every prop is shared as a callable: inertia-django only resolves the props a
+response actually sends, so a redirecting form post resolves none of them and
+a partial reload (`router.reload({ only: [...] })`) only the ones it asked for.
 """
+import hashlib
+import json
+
 from django.contrib.messages import get_messages
 from inertia import share
 
 from .context_processors import due_soon
-from .permissions import allowed_companies, get_role, perms_payload, role_label
-from .views.helpers import get_active_company
+from .permissions import access_for
+from .views.helpers import get_active_company, lazy
 
 
 def _flash(request):
@@ -37,6 +44,39 @@ def _language(user):
     return getattr(profile, "language", "en") or "en"
 
 
+def _auth(user):
+    access = access_for(user)
+    return {
+        "user": {
+            "username": user.username,
+            "is_superuser": user.is_superuser,
+            "is_staff": user.is_staff,
+            "avatar": _avatar_url(user),
+            # RBAC props. `perms` is {module: [actions]} and drives
+            # every gate in the React shell; it mirrors the server
+            # matrix but never replaces it as the enforcement point.
+            "role": access.role,
+            "role_label": access.role_label,
+            "perms": access.perms,
+            "companies": access.companies,
+        }
+    }
+
+
+def shared_version(request):
+    """Digest of the shared props except flash, for conditional GET on
+    Inertia pages (views/conditional.py): a 304 must not hide a change to
+    the user's role, language or due-soon bell."""
+    user = request.user
+    shared = {
+        "auth": _auth(user),
+        "active_company": get_active_company(request),
+        "locale": _language(user),
+        **due_soon(request),
+    }
+    return hashlib.sha256(json.dumps(shared, sort_keys=True, default=str).encode()).hexdigest()
+
+
 class InertiaShareMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -44,26 +84,15 @@ class InertiaShareMiddleware:
     def __call__(self, request):
         user = getattr(request, "user", None)
         if user is not None and user.is_authenticated:
+            # count dan notifs berasal dari satu query/cache lookup yang sama.
+            notifs = lazy(lambda: due_soon(request))
             share(
                 request,
-                auth={
-                    "user": {
-                        "username": user.username,
-                        "is_superuser": user.is_superuser,
-                        "is_staff": user.is_staff,
-                        "avatar": _avatar_url(user),
-                        # RBAC props. `perms` is {module: [actions]} and drives
-                        # every gate in the React shell; it mirrors the server
-                        # matrix but never replaces it as the enforcement point.
-                        "role": get_role(user),
-                        "role_label": role_label(user),
-                        "perms": perms_payload(user),
-                        "companies": allowed_companies(user),
-                    }
-                },
-                active_company=get_active_company(request),
-                locale=_language(user),
+                auth=lambda: _auth(user),
+                active_company=lambda: get_active_company(request),
+                locale=lambda: _language(user),
                 flash=lambda: _flash(request),
-                **due_soon(request),
+                due_soon_count=lambda: notifs()["due_soon_count"],
+                due_soon_notifs=lambda: notifs()["due_soon_notifs"],
             )
         return self.get_response(request)
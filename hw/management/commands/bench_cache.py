@@ -0,0 +1,84 @@
+import time
+from copy import deepcopy
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_q.conf import Conf
+
+BENCH_USERNAME = '__bench_cache__'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Count cache round-trips per warm Inertia request on a few pages, with the '
+        'shared database cache alone and with the tiered cache in front of it. '
+        'Runs as a throwaway superuser inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', default='/,/invoice/,/cl/,/clients/', help='Comma-separated paths')
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests per page')
+        parser.add_argument(
+            '--heartbeat', nargs='?', const=Conf.CACHE, default=None, metavar='ALIAS',
+            help='Save a qcluster stat before every request, as the guard loop does every '
+                 '0.5 s, on ALIAS (default: the Q_CLUSTER cache alias)',
+        )
+
+    def handle(self, *args, **options):
+        pages = [p.strip() for p in options['pages'].split(',') if p.strip()]
+        runs = max(1, options['requests'])
+        tiered = deepcopy(settings.CACHES)
+        tiered['default']['OPTIONS'] = {**tiered['default'].get('OPTIONS', {}), 'L1_MAX_ENTRIES': 1000}
+        plain = deepcopy(tiered)
+        plain['default']['OPTIONS']['L1_MAX_ENTRIES'] = 0
+        table = settings.CACHES[tiered['default']['LOCATION']]['LOCATION']
+        heartbeat = options['heartbeat']
+        if heartbeat:
+            self.stdout.write(f'qcluster heartbeat on the {heartbeat!r} cache alias')
+
+        rows = []
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*']):
+                user = User.objects.create_superuser(BENCH_USERNAME, password=None)
+                for label, caches_setting in (('database', plain), ('tiered', tiered)):
+                    with override_settings(CACHES=caches_setting):
+                        cache.reset_local()
+                        client = Client()
+                        client.force_login(user)
+                        for page in pages:
+                            rows.append((label, page, *self._measure(client, page, runs, table, heartbeat)))
+                        stats = cache.stats()
+                        cache.reset_local()
+                    self.stdout.write(f'{label}: {stats}')
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'cache':<9}  {'page':<14}  {'cache trips/req':>15}  {'ms/req':>7}")
+        for label, page, trips, ms in rows:
+            self.stdout.write(f'{label:<9}  {page:<14}  {trips:>15.1f}  {ms:>7.1f}')
+        self.stdout.write(self.style.SUCCESS('Done (bench user rolled back).'))
+
+    def _measure(self, client, page, runs, table, heartbeat):
+        for _ in range(3):  # active company, then fill the per-company keys
+            client.get(page, HTTP_X_INERTIA='true')
+        trips, elapsed = 0, 0.0
+        for _ in range(runs):
+            if heartbeat:
+                # What Stat.save() -> broker.set_stat() writes; not timed.
+                caches[heartbeat].set(f'{Conf.Q_STAT}:bench', 'stat', 3)
+            t0 = time.perf_counter()
+            with CaptureQueriesContext(connection) as ctx:
+                client.get(page, HTTP_X_INERTIA='true')
+            elapsed += time.perf_counter() - t0
+            trips += sum(1 for q in ctx.captured_queries if table in q['sql'])
+        return trips / runs, elapsed * 1000 / runs
@@ -0,0 +1,57 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from hw.compression import CACHED_LEVELS, LEVELS, compress
+
+
+def _json_payload(size):
+    """An Inertia-shaped invoice list, grown until it reaches `size` bytes."""
+    rng = random.Random(size)
+    rows, body = [], b''
+    while len(body) < size:
+        rows.extend({
+            'id': len(rows) + i,
+            'invoice_number': f'INV-{len(rows) + i:05d}',
+            'customer_name': rng.choice(['Budi', 'Siti', 'Ahmad', 'Fatimah']) + ' Travel',
+            'due_date': f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026',
+            'total_sar': rng.randint(1000, 90000),
+            'status': rng.choice(['lunas', 'belum', 'partial']),
+        } for i in range(50))
+        body = json.dumps({'component': 'Invoice/List', 'props': {'invoices': rows}}).encode()
+    return body[:size]
+
+
+class Command(BaseCommand):
+    help = (
+        'CPU time and ratio of brotli and gzip per response size, at the per-request '
+        'levels CompressionMiddleware uses for JSON and at the cached (top) levels.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='2000,20000,200000,1000000', help='Comma-separated body sizes in bytes')
+        parser.add_argument('--budget', type=float, default=0.5, help='CPU seconds to spend per measurement')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        content_type = 'application/json'
+        br, gz = LEVELS[content_type]
+        settings = [
+            ('br', br, False), ('gzip', gz, False),
+            ('br', CACHED_LEVELS[0], True), ('gzip', CACHED_LEVELS[1], True),
+        ]
+        self.stdout.write(f"{'size':>9}  {'encoding':<8}  {'level':>5}  {'cpu ms':>9}  {'ratio':>6}")
+        for size in sizes:
+            body = _json_payload(size)
+            for encoding, level, cached in settings:
+                runs, spent = 0, 0.0
+                while spent < options['budget'] or not runs:
+                    t0 = time.process_time()
+                    out = compress(encoding, content_type, body, cached=cached)
+                    spent += time.process_time() - t0
+                    runs += 1
+                ms = spent * 1000 / runs
+                self.stdout.write(f'{size:>9}  {encoding:<8}  {level:>5}  {ms:>9.2f}  {len(out) / len(body):>6.3f}')
+        self.stdout.write(self.style.SUCCESS('Done.'))
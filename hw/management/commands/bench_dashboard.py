@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hw.models import ConfirmationLetter, Invoice, Payment
+from hw.services.dashboard import build_dashboard, get_dashboard, invalidate_dashboard
+
+BENCH_COMPANY = 'bench'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the uncached home dashboard build against synthetic CL volumes '
+        '(default 1k/10k/100k). Runs inside a transaction that is rolled back, '
+        'under a company code no real record uses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated CL counts')
+        parser.add_argument('--runs', type=int, default=5, help='Builds per size; the best time is reported')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options['sizes'].split(',') if s.strip())
+        runs = max(1, options['runs'])
+        rows = []
+        try:
+            with transaction.atomic():
+                created = 0
+                for size in sizes:
+                    self._seed(created, size)
+                    created = size
+                    rows.append((size, *self._measure(runs)))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'CLs':>10}  {'queries':>7}  {'cold best ms':>12}  {'cold median ms':>14}  {'cached ms':>9}")
+        for size, queries, best, median, cached in rows:
+            self.stdout.write(f'{size:>10}  {queries:>7}  {best:>12.1f}  {median:>14.1f}  {cached:>9.2f}')
+        self.stdout.write(self.style.SUCCESS('Done (synthetic rows rolled back).'))
+
+    def _seed(self, start, end):
+        rng = random.Random(start)
+        today = date.today()
+        hotels = [f'Hotel {i}' for i in range(40)]
+        statuses = ['DEFINITE', 'DEFINITE', 'DEFINITE', 'TENTATIVE', 'CANCELLED']
+        batch = []
+        for n in range(start, end):
+            check_in = today + timedelta(days=rng.randint(-300, 60))
+            batch.append(ConfirmationLetter(
+                company=BENCH_COMPANY,
+                confirmation_number=f'BENCH-{n:07d}',
+                guest_name=f'Guest {n}',
+                hotel_name=rng.choice(hotels),
+                reservation_status=rng.choice(statuses),
+                check_in=check_in,
+                check_out=check_in + timedelta(days=rng.randint(1, 7)),
+            ))
+        created = ConfirmationLetter.objects.bulk_create(batch, batch_size=2000)
+        # auto_now_add stamps every row with "now"; spread them over ~5 years
+        # of history instead so the 12-month trend window sees a realistic
+        # slice rather than the whole table.
+        for cl in created:
+            cl.created_at = timezone.now() - timedelta(days=rng.randint(0, 5 * 365))
+        ConfirmationLetter.objects.bulk_update(created, ['created_at'], batch_size=2000)
+
+        # Roughly one invoice per ten CLs, half of them with a payment.
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                company=BENCH_COMPANY, invoice_type='hotel',
+                invoice_number=f'BENCH-INV-{n:07d}', customer_name=f'Guest {n}',
+                due_date=today + timedelta(days=rng.randint(-60, 30)),
+                billed_sar=1000, paid_sar=500, balance_sar=500, payment_status='partial',
+            )
+            for n in range(start // 10, end // 10)
+        ], batch_size=2000)
+        Payment.objects.bulk_create([
+            Payment(invoice=inv, amount=500, currency='SAR', exchange_rate=1,
+                    payment_date=today - timedelta(days=rng.randint(0, 90)))
+            for inv in invoices[::2]
+        ], batch_size=2000)
+
+    def _measure(self, runs):
+        today = date.today()
+        timings = []
+        queries = 0
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                build_dashboard(BENCH_COMPANY, today)
+                timings.append((time.perf_counter() - t0) * 1000)
+            queries = len(ctx)
+        timings.sort()
+
+        # What a page view actually pays once the per-company entry is warm.
+        invalidate_dashboard(BENCH_COMPANY)
+        get_dashboard(BENCH_COMPANY, today)
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            get_dashboard(BENCH_COMPANY, today)
+        cached = (time.perf_counter() - t0) * 1000 / runs
+        invalidate_dashboard(BENCH_COMPANY)
+        return queries, timings[0], timings[len(timings) // 2], cached
@@ -0,0 +1,84 @@
+import statistics
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from weasyprint import HTML
+
+from hw.services import pdf_assets
+from hw.views.pdf import _write_pdf
+
+TEMPLATES = {'konoz': 'hw/cl/cl_pdf_konoz.html', 'ijabah': 'hw/cl/cl_pdf_ijabah.html'}
+
+
+def _context(company, logo):
+    rooms = [
+        {'type': t, 'meals': 'BB', 'quantity': q, 'price': 450.0, 'subtotal': 450.0 * q * 3}
+        for t, q in (('Double', 2), ('Triple', 1), ('Quad', 3))
+    ]
+    return {
+        'company': company,
+        'hotel_name': 'Hilton Suites Makkah',
+        'guest_name': 'Bench Guest',
+        'guest_phone': '+62 812 0000 0000',
+        'num_guests': 12,
+        'check_in': datetime(2026, 3, 10),
+        'check_out': datetime(2026, 3, 13),
+        'num_nights': 3,
+        'confirmation_number': 'BENCH-0001',
+        'reservation_status': 'DEFINITE',
+        'note': '',
+        'rooms': rooms,
+        'total_rooms': sum(r['quantity'] for r in rooms),
+        'total_price': sum(r['subtotal'] for r in rooms),
+        'logo_rel_path': logo,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Time one CL PDF render end to end, as it was before the PDF asset '
+        'registry (logo re-encoded, inline <style> re-parsed, fresh font '
+        'configuration per document) and with it. Nothing touches the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Renders per mode')
+        parser.add_argument('--company', default='konoz', choices=sorted(TEMPLATES))
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        company = options['company']
+        template = TEMPLATES[company]
+
+        def before():
+            html = render_to_string(template, _context(company, pdf_assets.encode_logo(company)))
+            return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
+
+        def after():
+            html = render_to_string(template, _context(company, pdf_assets.logo_data_uri(company)))
+            return _write_pdf(html)
+
+        pdf_assets.reset()
+        t0 = time.perf_counter()
+        after()  # registry dimuat sekali per proses; ongkos ini dilaporkan terpisah
+        warmup = (time.perf_counter() - t0) * 1000
+
+        rows = [('before', self._measure(before, runs)), ('registry', self._measure(after, runs))]
+
+        self.stdout.write(f"{'mode':>10}  {'best ms':>8}  {'median ms':>9}")
+        for mode, (best, median) in rows:
+            self.stdout.write(f'{mode:>10}  {best:>8.1f}  {median:>9.1f}')
+        saved = rows[0][1][1] - rows[1][1][1]
+        self.stdout.write(f'Registry warm-up (first render in a process): {warmup:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Per-PDF overhead saved (median): {saved:.1f} ms'))
+
+    def _measure(self, render, runs):
+        timings = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - t0) * 1000)
+        return min(timings), statistics.median(timings)
@@ -0,0 +1,152 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from hw.models import ConfirmationLetter, Invoice
+from hw.services import search
+
+BENCH_COMPANY = 'bench'
+
+FIRST = ['Ahmad', 'Siti', 'Budi', 'Dewi', 'Rizky', 'Nur', 'Hasan', 'Fatimah', 'Agus', 'Aisyah',
+         'Yusuf', 'Rahma', 'Imam', 'Putri', 'Fajar', 'Laila', 'Hendra', 'Zahra', 'Arif', 'Salma']
+LAST = ['Santoso', 'Wijaya', 'Hidayat', 'Saputra', 'Kusuma', 'Pratama', 'Nugroho', 'Lestari',
+        'Rahman', 'Syahputra', 'Halim', 'Firdaus', 'Maulana', 'Hakim', 'Ramadhan', 'Utami']
+AGENCY = ['Amanah', 'Barokah', 'Al Hijrah', 'Safar', 'Mabrur', 'Nurul Iman', 'Ar Rahman', 'Madinah']
+HOTELS = ['Hilton Suites Makkah', 'Swissotel Al Maqam', 'Pullman Zamzam', 'Movenpick Hajar',
+          'Anjum Makkah', 'Dar Al Eiman Royal', 'Elaf Kinda', 'Al Safwah Royale Orchid',
+          'Millennium Al Aqeeq', 'Dar Al Taqwa', 'Frontel Al Harithia', 'Shaza Madinah']
+
+
+
+def _queries(count):
+    """(label, query): nomor persis, nama yang jarang, hotel yang cocok ke
+    ribuan baris, dan query dua huruf yang memang tidak bisa memakai indeks."""
+    n = count * 2 // 3
+    return [
+        ('exact number', f'BENCH-{n:07d}'),
+        ('number tail', f'{n:07d}'[-4:]),
+        ('rare guest', 'fatimah halim'),
+        ('common hotel', 'hilton'),
+        ('no match', 'zzqx'),
+        ('2 chars', 'ah'),
+    ]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_global_search(company, q):
+    """The header search as it was: icontains ORs, no index usable."""
+    cls = ConfirmationLetter.objects.filter(company=company).filter(
+        Q(confirmation_number__icontains=q) | Q(guest_name__icontains=q) | Q(hotel_name__icontains=q)
+    )
+    invoices = Invoice.objects.filter(company=company).filter(
+        Q(invoice_number__icontains=q) | Q(customer_name__icontains=q)
+    )
+    return (
+        list(cls[:8])
+        + list(invoices.filter(invoice_type='hotel')[:8])
+        + list(invoices.filter(invoice_type='visa')[:8])
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the header search and the CL list search box, legacy icontains '
+        'vs the trigram index, against synthetic CLs (default 100k). Runs '
+        'inside a transaction that is rolled back, under a company code no '
+        'real record uses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cls', type=int, default=100000, help='Synthetic CL count')
+        parser.add_argument('--runs', type=int, default=5, help='Runs per query; best and median are reported')
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        rows = []
+        try:
+            with transaction.atomic():
+                t0 = time.perf_counter()
+                self._seed(options['cls'])
+                seeded = time.perf_counter() - t0
+                for label, q in _queries(options['cls']):
+                    rows.append((label, q, *self._measure(q, runs)))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        backend = 'token table' if search.uses_token_table() else 'pg_trgm'
+        self.stdout.write(f"Seeded {options['cls']} CLs + index in {seeded:.1f}s; backend: {backend}")
+        self.stdout.write(
+            f"{'query':>14}  {'hits':>5}  {'legacy ms':>9}  {'search ms':>9}  {'list legacy ms':>14}  {'list ms':>7}"
+        )
+        for label, _, hits, legacy, ranked, list_legacy, list_new in rows:
+            self.stdout.write(
+                f'{label:>14}  {hits:>5}  {legacy:>9.1f}  {ranked:>9.1f}  {list_legacy:>14.1f}  {list_new:>7.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS('Done (synthetic rows rolled back). Times are medians.'))
+
+    def _seed(self, count):
+        rng = random.Random(count)
+        today = date.today()
+        batch = []
+        for n in range(count):
+            check_in = today + timedelta(days=rng.randint(-300, 60))
+            if rng.random() < 0.5:
+                guest = f'{rng.choice(FIRST)} {rng.choice(LAST)}'
+            else:
+                guest = f'PT {rng.choice(AGENCY)} {rng.choice(LAST)} Tour'
+            batch.append(ConfirmationLetter(
+                company=BENCH_COMPANY,
+                confirmation_number=f'BENCH-{n:07d}',
+                guest_name=guest,
+                hotel_name=rng.choice(HOTELS),
+                reservation_status='DEFINITE',
+                check_in=check_in,
+                check_out=check_in + timedelta(days=rng.randint(1, 7)),
+            ))
+        created = ConfirmationLetter.objects.bulk_create(batch, batch_size=2000)
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                company=BENCH_COMPANY, invoice_type='hotel' if n % 4 else 'visa',
+                invoice_number=f'BENCH-INV-{n:07d}', customer_name=batch[n * 10].guest_name,
+            )
+            for n in range(count // 10)
+        ], batch_size=2000)
+        # bulk_create melewati signal; indeks diisi seperti oleh refresh() biasa.
+        search.refresh('ConfirmationLetter', [cl.pk for cl in created])
+        search.refresh('Invoice', [inv.pk for inv in invoices])
+
+    def _time(self, fn, runs):
+        timings = []
+        result = None
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+        return result, statistics.median(timings)
+
+    def _measure(self, q, runs):
+        hits, ranked = self._time(lambda: search.search(BENCH_COMPANY, q, kinds=['CL', 'INV', 'SVC']), runs)
+        _, legacy = self._time(lambda: _legacy_global_search(BENCH_COMPANY, q), runs)
+
+        base = ConfirmationLetter.objects.filter(company=BENCH_COMPANY).order_by('-check_in')
+
+        def list_legacy():
+            qs = base.filter(Q(guest_name__icontains=q) | Q(hotel_name__icontains=q) | Q(confirmation_number__icontains=q))
+            return qs.count(), list(qs[:15])
+
+        def list_new():
+            qs = base.filter(search.match_q('CL', BENCH_COMPANY, q))
+            return qs.count(), list(qs[:15])
+
+        _, list_old_ms = self._time(list_legacy, runs)
+        _, list_new_ms = self._time(list_new, runs)
+        return len(hits), legacy, ranked, list_old_ms, list_new_ms
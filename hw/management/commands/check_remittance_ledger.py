@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hw.models import RemittanceLedgerEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Diff the stored Konoz remittance ledger (RemittanceLedgerEntry) against '
+        'a from-scratch computation over payments, reservations, CLs and '
+        'remittance lines. With --fix, rebuild the table instead of failing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild the table when it disagrees')
+
+    def handle(self, *args, **options):
+        expected = RemittanceLedgerEntry.compute()
+        stored = {
+            e['linked_number']: e
+            for e in RemittanceLedgerEntry.objects.values('linked_number', *RemittanceLedgerEntry.COMPUTED_FIELDS)
+        }
+
+        problems = []
+        for number in sorted(expected.keys() - stored.keys()):
+            problems.append(f'{number!r}: missing from the ledger table')
+        for number in sorted(stored.keys() - expected.keys()):
+            problems.append(f'{number!r}: stale row, no longer backed by any record')
+        for number in sorted(expected.keys() & stored.keys()):
+            diffs = [
+                f'{field} {stored[number][field]!r} != {value!r}'
+                for field, value in expected[number].items()
+                if stored[number][field] != value
+            ]
+            if diffs:
+                problems.append(f'{number!r}: ' + ', '.join(diffs))
+
+        for line in problems:
+            self.stdout.write(line)
+
+        if not problems:
+            self.stdout.write(self.style.SUCCESS(f'Remittance ledger matches ({len(expected)} row(s)).'))
+        elif options['fix']:
+            count = RemittanceLedgerEntry.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt remittance ledger ({count} row(s), {len(problems)} fixed).'))
+        else:
+            raise CommandError(f'{len(problems)} remittance ledger row(s) disagree; rerun with --fix.')
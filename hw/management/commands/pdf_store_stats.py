@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hw.services import pdf_store
+
+
+class Command(BaseCommand):
+    help = 'Show PDF artifact store usage and cache hit/miss counters.'
+
+    def handle(self, *args, **options):
+        s = pdf_store.stats()
+        lookups = s['hits'] + s['misses']
+        ratio = f"{s['hits'] / lookups:.1%}" if lookups else 'n/a'
+        self.stdout.write(f"Root:    {settings.PDF_ARTIFACT_ROOT}")
+        self.stdout.write(f"Files:   {s['files']}")
+        self.stdout.write(f"Size:    {s['bytes'] / 1024 / 1024:.1f} MB of {settings.PDF_ARTIFACT_MAX_BYTES / 1024 / 1024:.0f} MB")
+        self.stdout.write(f"Hits:    {s['hits']}")
+        self.stdout.write(f"Misses:  {s['misses']}")
+        self.stdout.write(self.style.SUCCESS(f"Hit ratio: {ratio}"))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from hw.models import PdfJob
+from hw.services import pdf_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Evict rendered PDFs older than PDF_ARTIFACT_TTL from the artifact store '
+        'and delete the PdfJob rows that pointed at them.'
+    )
+
+    def handle(self, *args, **options):
+        evicted = pdf_store.evict_expired()
+        cutoff = timezone.now() - timedelta(seconds=settings.PDF_ARTIFACT_TTL)
+        deleted, _ = PdfJob.objects.filter(requested_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Evicted {evicted} artifact(s), deleted {deleted} PDF job(s).'))
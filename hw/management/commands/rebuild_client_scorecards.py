@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from hw.models import Client, ClientScorecard
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every ClientScorecard. Signals keep the money columns '
+        'current, but score/risk/dormancy depend on today\'s date, so run this '
+        'nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', default='', help='Limit to one company')
+
+    def handle(self, *args, **options):
+        qs = Client.objects.order_by('pk')
+        if options['company']:
+            qs = qs.filter(company=options['company'])
+        ids = list(qs.values_list('pk', flat=True))
+        for start in range(0, len(ids), 200):
+            ClientScorecard.refresh(ids[start:start + 200])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(ids)} client scorecard(s).'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hw.models import Invoice
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Invoice.billed_sar/paid_sar/balance_sar/payment_status from '
+        'reservations and payments. With --verify, only report invoices whose '
+        'stored columns disagree with the Python properties.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Check only, do not write')
+        parser.add_argument('--company', default='', help='Limit to one company')
+
+    def handle(self, *args, **options):
+        qs = Invoice.objects.prefetch_related('reservations', 'payments').order_by('pk')
+        if options['company']:
+            qs = qs.filter(company=options['company'])
+
+        mismatched = []
+        for inv in qs.iterator(chunk_size=500):
+            billed, paid = inv.total_sar, inv.total_paid_sar
+            remaining = billed - paid
+            expected = (billed, paid, remaining, Invoice.status_for(billed, remaining))
+            stored = (inv.billed_sar, inv.paid_sar, inv.balance_sar, inv.payment_status)
+            if stored == expected:
+                continue
+            mismatched.append(inv.invoice_number)
+            if options['verify']:
+                self.stdout.write(f'{inv.invoice_number}: stored {stored} != expected {expected}')
+            else:
+                Invoice.refresh_balance(inv.pk)
+
+        if options['verify']:
+            if mismatched:
+                raise CommandError(f'{len(mismatched)} invoice(s) have stale balance columns.')
+            self.stdout.write(self.style.SUCCESS('All invoice balances match.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(mismatched)} invoice balance(s).'))
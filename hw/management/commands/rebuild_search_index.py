@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from hw.services import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the SearchToken trigram table from scratch. Signals keep it '
+        'current; run this after bulk imports or raw SQL edits. No-op on '
+        'PostgreSQL, where the pg_trgm indexes need no maintenance.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.uses_token_table():
+            self.stdout.write('PostgreSQL: search uses the pg_trgm indexes, nothing to rebuild.')
+            return
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} document(s).'))
@@ -4,7 +4,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from hw.models import ConfirmationLetter, RecapLog
-from hw.services.fonnte import send_wa
+from hw.services.fonnte import send_all, send_wa
 from hw.services.recap import build_recap_message
 
 
@@ -24,14 +24,12 @@ class Command(BaseCommand):
             self.stdout.write('Tidak ada check-in hari ini.')
             return
         message = build_recap_message(cls, today)
-        for target in settings.FONNTE_TEAM_TARGETS:
+        targets = list(settings.FONNTE_TEAM_TARGETS)
+        results = send_all([(target, message) for target in targets], send=send_wa)
+        for target, result in zip(targets, results):
             target_type = 'GROUP' if len(target) < 10 or '-' in target else 'PHONE'
-            try:
-                result = send_wa(target, message)
-                status = 'SENT' if result.get('status') else 'FAILED'
-                error  = result.get('reason', '') if not result.get('status') else ''
-            except Exception as exc:
-                status, error = 'FAILED', str(exc)
+            status = 'SENT' if result.get('status') else 'FAILED'
+            error  = result.get('reason', '') if not result.get('status') else ''
             RecapLog.objects.create(
                 target_type=target_type, target=target,
                 cl_count=len(cls), message=message,
@@ -1,12 +1,14 @@
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 
 from hw.models import ConfirmationLetter, ReminderLog
-from hw.services.fonnte import send_wa
+from hw.services.fonnte import send_all, send_wa
 from hw.services.recap import (
-    build_grouped_reminder_message, resolve_reminder_targets, resolve_guest_target, group_guests,
+    build_grouped_reminder_message, reminder_template, resolve_reminder_targets, resolve_guest_target,
+    group_guests,
 )
 
 
@@ -18,8 +20,14 @@ class Command(BaseCommand):
             self.stdout.write('Reminder H-1/H-0 dinonaktifkan sementara (settings.REMINDER_H1_H0_ENABLED=False)')
             return
         today = date.today()
+        # Semua pesan dikumpulkan dulu lalu dikirim paralel (send_all);
+        # log ditulis setelahnya dari thread ini.
+        self._outbox = []
+        self._sent = {}
+        self._templates = {}
         self._send_reminders(today, 'H0_GUEST')
         self._send_reminders(today + timedelta(days=1), 'H1_GUEST')
+        self._flush()
 
     def _send_reminders(self, check_in_date, reminder_type):
         qs = (
@@ -29,6 +37,8 @@ class Command(BaseCommand):
             .select_related('client')
             .prefetch_related('rooms')
         )
+        self._sent[reminder_type] = self._load_sent(check_in_date, reminder_type)
+        self._templates[reminder_type] = reminder_template(reminder_type)
         by_client = {}
         no_client = []
         for cl in qs:
@@ -42,26 +52,36 @@ class Command(BaseCommand):
         for cls in group_guests(no_client).values():
             self._send_guest_group(cls, reminder_type)
 
+    def _load_sent(self, check_in_date, reminder_type):
+        """pk of every CL checking in on `check_in_date` that already got
+        `reminder_type` today, in one query (hw_reminderlog_sent_idx)."""
+        today = date.today()
+        start = timezone.make_aware(datetime.combine(today, time.min))
+        end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+        return set(ReminderLog.objects.filter(
+            cl__check_in=check_in_date, reminder_type=reminder_type,
+            status='SENT', sent_at__gte=start, sent_at__lt=end,
+        ).values_list('cl_id', flat=True))
+
     def _already_sent(self, cl, reminder_type):
-        return ReminderLog.objects.filter(
-            cl=cl, reminder_type=reminder_type,
-            status='SENT', sent_at__date=date.today(),
-        ).exists()
+        return cl.pk in self._sent[reminder_type]
 
     def _dispatch(self, pending, reminder_type, targets, message, label):
         for channel, phone in targets:
-            try:
-                result = send_wa(phone, message)
-                status = 'SENT' if result.get('status') else 'FAILED'
-                error  = result.get('reason', '') if not result.get('status') else ''
-            except Exception as exc:
-                status, error = 'FAILED', str(exc)
-            for cl in pending:
-                ReminderLog.objects.create(
-                    cl=cl, reminder_type=reminder_type,
-                    phone=phone, status=status, error=error,
-                )
+            self._outbox.append((pending, reminder_type, channel, phone, message, label))
+
+    def _flush(self):
+        results = send_all([(phone, message) for _, _, _, phone, message, _ in self._outbox], send=send_wa)
+        logs = []
+        for (pending, reminder_type, channel, phone, _, label), result in zip(self._outbox, results):
+            status = 'SENT' if result.get('status') else 'FAILED'
+            error  = result.get('reason', '') if not result.get('status') else ''
+            logs.extend(
+                ReminderLog(cl=cl, reminder_type=reminder_type, phone=phone, status=status, error=error)
+                for cl in pending
+            )
             self.stdout.write(f'  [{reminder_type}] {label} ({channel}) -> {status} ({len(pending)} booking)')
+        ReminderLog.objects.bulk_create(logs, batch_size=500)
 
     def _send_client_group(self, cls, reminder_type):
         client = cls[0].client
@@ -73,7 +93,9 @@ class Command(BaseCommand):
         if not targets:
             self.stdout.write(f'  SKIP {client.name}: no WA number configured')
             return
-        message = build_grouped_reminder_message(pending, reminder_type, recipient_name=client.name)
+        message = build_grouped_reminder_message(
+            pending, reminder_type, recipient_name=client.name, template=self._templates[reminder_type],
+        )
         self._dispatch(pending, reminder_type, targets, message, client.name)
 
     def _send_guest_group(self, cls, reminder_type):
@@ -89,5 +111,7 @@ class Command(BaseCommand):
             for cl in pending:
                 self.stdout.write(f'  SKIP {cl.confirmation_number}: no phone')
             return
-        message = build_grouped_reminder_message(pending, reminder_type, recipient_name=guest_name)
+        message = build_grouped_reminder_message(
+            pending, reminder_type, recipient_name=guest_name, template=self._templates[reminder_type],
+        )
         self._dispatch(pending, reminder_type, targets, message, guest_name)
@@ -1,25 +1,22 @@
-from django.contrib.auth.models import User
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 
-from hw.models import ActivityLog
+from hw.models import ActivityLogArchive
 
 
 class Command(BaseCommand):
-    help = 'Trim ActivityLog to the latest 50 entries per user.'
+    help = ('Trim ActivityLog to the latest 50 entries per user (and optionally drop entries '
+            'older than --days). Trimmed entries are moved to ActivityLogArchive.')
 
     def add_arguments(self, parser):
         parser.add_argument('--keep', type=int, default=50, help='Number of entries to keep per user')
+        parser.add_argument('--days', type=int, default=None, help='Also archive entries older than this many days')
 
     def handle(self, *args, **options):
-        keep = options['keep']
-        total_deleted = 0
-        for user in User.objects.all():
-            old_ids = list(
-                ActivityLog.objects.filter(user=user)
-                .order_by('-timestamp')
-                .values_list('id', flat=True)[keep:]
-            )
-            if old_ids:
-                deleted, _ = ActivityLog.objects.filter(id__in=old_ids).delete()
-                total_deleted += deleted
-        self.stdout.write(self.style.SUCCESS(f'Deleted {total_deleted} old log entries.'))
+        before = None
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+        moved = ActivityLogArchive.archive_stale(options['keep'], before)
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} old log entries.'))
@@ -0,0 +1,84 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_balances(apps, schema_editor):
+    """Fill the new balance columns for every existing invoice.
+
+    Mirrors Invoice.compute_balance()/status_for() against the historical
+    models, since the real classmethods aren't available here.
+    """
+    from hw.utils import convert_to_sar
+
+    Invoice = apps.get_model('hw', 'Invoice')
+    Reservation = apps.get_model('hw', 'Reservation')
+    Payment = apps.get_model('hw', 'Payment')
+
+    billed_by_invoice = dict(
+        Reservation.objects.values('invoice_id').annotate(t=Sum('total_sar')).values_list('invoice_id', 't')
+    )
+    paid_by_invoice = {}
+    for p in Payment.objects.values('invoice_id', 'amount', 'currency', 'exchange_rate').iterator():
+        paid_by_invoice[p['invoice_id']] = paid_by_invoice.get(p['invoice_id'], 0) + int(round(
+            convert_to_sar(p['amount'], p['currency'], float(p['exchange_rate']))
+        ))
+
+    for inv in Invoice.objects.only('pk').iterator():
+        billed = int(billed_by_invoice.get(inv.pk) or 0)
+        paid = paid_by_invoice.get(inv.pk, 0)
+        remaining = billed - paid
+        if remaining < 0:
+            status = 'overpaid'
+        elif remaining == 0:
+            status = 'paid'
+        elif remaining < billed:
+            status = 'partial'
+        else:
+            status = 'unpaid'
+        Invoice.objects.filter(pk=inv.pk).update(
+            billed_sar=billed, paid_sar=paid, balance_sar=remaining, payment_status=status,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0049_client_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='billed_sar',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_sar',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_sar',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='payment_status',
+            field=models.CharField(
+                choices=[('unpaid', 'Unpaid'), ('partial', 'Partial'), ('paid', 'Paid'), ('overpaid', 'Overpaid')],
+                default='paid', editable=False, max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'invoice_type', 'payment_status'], name='hw_invoice_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'balance_sar'], name='hw_invoice_company_bal_idx'),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
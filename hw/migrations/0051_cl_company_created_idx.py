@@ -0,0 +1,17 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0050_invoice_balance_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='confirmationletter',
+            index=models.Index(fields=['company', 'created_at'], name='hw_cl_company_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0051_cl_company_created_idx'),
+    ]
+
+    # No data step: rows are filled by `manage.py rebuild_client_scorecards`,
+    # and client_list/client_map_data build any missing card on first read.
+    operations = [
+        migrations.CreateModel(
+            name='ClientScorecard',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scorecard', serialize=False, to='hw.client')),
+                ('total_invoices', models.PositiveIntegerField(default=0)),
+                ('billed_sar', models.IntegerField(default=0)),
+                ('paid_sar', models.IntegerField(default=0)),
+                ('outstanding_sar', models.IntegerField(default=0)),
+                ('avg_days_to_pay', models.IntegerField(blank=True, null=True)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('earliest_due_date', models.DateField(blank=True, null=True)),
+                ('score', models.PositiveSmallIntegerField(db_index=True, default=0)),
+                ('risk_label', models.CharField(db_index=True, default='ok', max_length=10)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Client Scorecard',
+                'verbose_name_plural': 'Client Scorecards',
+            },
+        ),
+    ]
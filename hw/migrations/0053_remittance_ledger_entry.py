@@ -0,0 +1,130 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """Fill the ledger for every existing Konoz reservation.
+
+    Mirrors RemittanceLedgerEntry.compute() against the historical models,
+    since the real classmethods (and CL.total_price) aren't available here.
+    """
+    from hw.utils import convert_to_sar
+
+    Payment = apps.get_model('hw', 'Payment')
+    Reservation = apps.get_model('hw', 'Reservation')
+    ConfirmationLetter = apps.get_model('hw', 'ConfirmationLetter')
+    Room = apps.get_model('hw', 'Room')
+    RemittanceLine = apps.get_model('hw', 'RemittanceLine')
+    RemittanceLedgerEntry = apps.get_model('hw', 'RemittanceLedgerEntry')
+
+    pool = {}
+
+    def slot(number):
+        return pool.setdefault(number, {
+            'paid_sby': 0, 'direct': 0, 'remitted': 0, 'has_payment': False,
+            'invoice_id': None, 'reservation': None, 'cl': None,
+        })
+
+    for p in Payment.objects.filter(invoice__company='konoz').order_by('id').values(
+        'linked_number', 'method', 'amount', 'currency', 'exchange_rate', 'invoice_id',
+    ).iterator():
+        s = slot(p['linked_number'])
+        sar = int(round(convert_to_sar(float(p['amount']), p['currency'], float(p['exchange_rate']))))
+        method = (p['method'] or '').lower()
+        if method == 'direct':
+            s['direct'] += sar
+        elif method in ('cash', 'bank transfer', 'deposit'):
+            s['paid_sby'] += sar
+        s['has_payment'] = True
+        s['invoice_id'] = p['invoice_id']
+
+    for r in Reservation.objects.filter(invoice__company='konoz').order_by('pk').values(
+        'pk', 'reservation_number', 'invoice_id', 'check_in', 'check_out', 'total_sar',
+    ).iterator():
+        slot(r['reservation_number'])['reservation'] = r
+
+    room_totals = {}
+    for room in Room.objects.filter(cl__company='konoz').values(
+        'cl_id', 'price', 'quantity', 'cl__check_in', 'cl__check_out',
+    ).iterator():
+        ci, co = room['cl__check_in'], room['cl__check_out']
+        nights = ((co - ci).days if ci and co else 0) or 1
+        room_totals[room['cl_id']] = room_totals.get(room['cl_id'], 0) + room['price'] * room['quantity'] * nights
+
+    for c in ConfirmationLetter.objects.filter(company='konoz').order_by('pk').values(
+        'pk', 'confirmation_number', 'reservation_status', 'check_in', 'check_out',
+    ).iterator():
+        slot(c['confirmation_number'])['cl'] = c
+
+    for row in RemittanceLine.objects.filter(remittance__company='konoz').values(
+        'linked_number',
+    ).annotate(total=Sum('amount_sar')):
+        slot(row['linked_number'])['remitted'] = int(row['total'] or 0)
+
+    entries = []
+    for number, s in pool.items():
+        res = s['reservation'] or {}
+        cl = s['cl'] or {}
+        total_sar = int(res.get('total_sar') or room_totals.get(cl.get('pk'), 0) or 0)
+        credit = s['remitted'] + s['direct']
+        entries.append(RemittanceLedgerEntry(
+            linked_number=number,
+            invoice_id=s['invoice_id'] or res.get('invoice_id'),
+            reservation_id=res.get('pk'),
+            cl_id=cl.get('pk'),
+            has_payment=s['has_payment'],
+            status=(cl.get('reservation_status') or '').upper(),
+            check_in=res.get('check_in') or cl.get('check_in'),
+            check_out=res.get('check_out') or cl.get('check_out'),
+            total_sar=total_sar,
+            paid_sby=s['paid_sby'],
+            direct=s['direct'],
+            remitted=s['remitted'],
+            debit=s['paid_sby'] + s['direct'],
+            credit=credit,
+            mengendap=max(0, s['paid_sby'] - s['remitted']),
+            balance=total_sar - credit,
+        ))
+    RemittanceLedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0052_client_scorecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemittanceLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linked_number', models.CharField(max_length=100, unique=True)),
+                ('has_payment', models.BooleanField(default=False)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('check_in', models.DateField(blank=True, null=True)),
+                ('check_out', models.DateField(blank=True, null=True)),
+                ('total_sar', models.IntegerField(default=0)),
+                ('paid_sby', models.IntegerField(default=0)),
+                ('direct', models.IntegerField(default=0)),
+                ('remitted', models.IntegerField(default=0)),
+                ('debit', models.IntegerField(default=0)),
+                ('credit', models.IntegerField(default=0)),
+                ('mengendap', models.IntegerField(default=0)),
+                ('balance', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('cl', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hw.confirmationletter')),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hw.invoice')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hw.reservation')),
+            ],
+            options={
+                'verbose_name': 'Remittance Ledger Entry',
+                'verbose_name_plural': 'Remittance Ledger Entries',
+                'indexes': [models.Index(fields=['check_in', 'linked_number'], name='hw_remledger_checkin_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
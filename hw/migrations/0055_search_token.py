@@ -0,0 +1,76 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+# (tabel, kolom) yang dicari lewat icontains; lihat SOURCES di hw/services/search.py.
+TRIGRAM_COLUMNS = [
+    ('hw_confirmationletter', 'confirmation_number'),
+    ('hw_confirmationletter', 'guest_name'),
+    ('hw_confirmationletter', 'hotel_name'),
+    ('hw_invoice', 'invoice_number'),
+    ('hw_invoice', 'customer_name'),
+    ('hw_client', 'name'),
+    ('hw_client', 'brand'),
+    ('hw_client', 'city'),
+    ('hw_client', 'pic'),
+    ('hw_hotel', 'name'),
+    ('hw_hotel', 'area'),
+]
+
+
+def _index_name(table, column):
+    return f'{table}_{column}_trgm'[:63]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        # Ekspresi harus sama persis dengan hasil kompilasi icontains di
+        # PostgreSQL, UPPER("kolom"::text) LIKE UPPER(%s), supaya indeks dipakai.
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{_index_name(table, column)}" '
+            f'ON "{table}" USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{_index_name(table, column)}"')
+
+
+def backfill_tokens(apps, schema_editor):
+    from hw.services import search
+
+    search.rebuild(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0054_pdf_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('company', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('gram', models.CharField(max_length=3)),
+            ],
+            options={
+                'verbose_name': 'Search Token',
+                'verbose_name_plural': 'Search Tokens',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='hw_searchtoken_object_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'company', 'gram', 'object_id'), name='hw_searchtoken_posting_uniq')],
+            },
+        ),
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+        migrations.RunPython(backfill_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+# prefix -> (model, field nomor, filter tambahan); sama dengan _highest_number()
+# di masing-masing model.
+SEQUENCES = {
+    'CL':  ('ConfirmationLetter', 'confirmation_number', {}),
+    'INV': ('Invoice', 'invoice_number', {'invoice_type': 'hotel'}),
+    'SVC': ('Invoice', 'invoice_number', {'invoice_type': 'visa'}),
+    'RMT': ('Remittance', 'remittance_number', {}),
+    'PNL': ('CancellationPenalty', 'penalty_number', {}),
+}
+
+
+def seed_sequences(apps, schema_editor):
+    from hw.models.sequence import highest_number
+
+    DocumentSequence = apps.get_model('hw', 'DocumentSequence')
+    rows = []
+    for prefix, (model_name, field, filters) in SEQUENCES.items():
+        numbers = apps.get_model('hw', model_name).objects.filter(
+            **filters, **{f'{field}__startswith': f'{prefix}-'},
+        ).values_list(field, flat=True)
+        rows.append(DocumentSequence(company='', prefix=prefix, last_value=highest_number(numbers, prefix)))
+    DocumentSequence.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0055_search_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company', models.CharField(blank=True, max_length=20)),
+                ('prefix', models.CharField(max_length=10)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'constraints': [models.UniqueConstraint(fields=('company', 'prefix'), name='uniq_document_sequence')],
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0056_document_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SendRateBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=120, unique=True)),
+                ('tokens', models.FloatField()),
+                ('refilled_at', models.FloatField(help_text='time.time() of the last refill')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Send Rate Bucket',
+                'verbose_name_plural': 'Send Rate Buckets',
+            },
+        ),
+    ]
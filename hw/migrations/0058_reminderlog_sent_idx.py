@@ -0,0 +1,17 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0057_send_rate_bucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reminderlog',
+            index=models.Index(fields=['cl', 'reminder_type', 'status', 'sent_at'], name='hw_reminderlog_sent_idx'),
+        ),
+    ]
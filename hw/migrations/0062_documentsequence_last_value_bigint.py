@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hw', '0061_child_rows_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentsequence',
+            name='last_value',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
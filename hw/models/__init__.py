@@ -1,29 +1,35 @@
-from .choices import Company, HotelCity, InvoiceType
+from .choices import Company, HotelCity, InvoiceType, PaymentStatus
 from .user import CompanyAccess, Language, Role, UserProfile
 from .role import RoleDefinition
-from .activity import ActivityLog, log_activity
-from .client import Client
+from .activity import ActivityLog, ActivityLogArchive, log_activity
+from .client import Client, ClientScorecard
 from .confirmation import ConfirmationLetter, Room
 from .invoice import (
     Invoice, Reservation, ServiceItem, Payment,
     Attachment, _attachment_path,
-    Remittance, RemittanceLine,
+    Remittance, RemittanceLine, RemittanceLedgerEntry,
 )
 from .hotel import Hotel, HARAM_LAT, HARAM_LNG, NABAWI_LAT, NABAWI_LNG
 from .penalty import CancellationPenalty
-from .reminder import ReminderLog, RecapLog, WATarget, MessageTemplate
+from .reminder import ReminderLog, RecapLog, WATarget, MessageTemplate, SendRateBucket
 from .billing import BillingLog
+from .pdf import PdfJob
+from .search import SearchToken
+from .sequence import DocumentSequence
 
 __all__ = [
-    'Company', 'HotelCity', 'InvoiceType',
+    'Company', 'HotelCity', 'InvoiceType', 'PaymentStatus',
     'UserProfile', 'Role', 'CompanyAccess', 'Language', 'RoleDefinition',
-    'ActivityLog', 'log_activity',
-    'Client',
+    'ActivityLog', 'ActivityLogArchive', 'log_activity',
+    'Client', 'ClientScorecard',
     'ConfirmationLetter', 'Room',
     'Invoice', 'Reservation', 'ServiceItem', 'Payment', 'Attachment', '_attachment_path',
-    'Remittance', 'RemittanceLine',
+    'Remittance', 'RemittanceLine', 'RemittanceLedgerEntry',
     'Hotel', 'HARAM_LAT', 'HARAM_LNG', 'NABAWI_LAT', 'NABAWI_LNG',
     'CancellationPenalty',
-    'ReminderLog', 'RecapLog', 'WATarget', 'MessageTemplate',
+    'ReminderLog', 'RecapLog', 'WATarget', 'MessageTemplate', 'SendRateBucket',
     'BillingLog',
+    'PdfJob',
+    'SearchToken',
+    'DocumentSequence',
 ]
@@ -1,5 +1,26 @@
+import json
+import zlib
+from itertools import groupby
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+
+class ActivityLogQuerySet(models.QuerySet):
+    def stale(self, keep, before=None):
+        """Rows outside each user's `keep` newest entries, plus (when
+        `before` is given) every row older than `before`. One window-function
+        query for all users instead of one query per user."""
+        ranked = self.annotate(rank=Window(
+            RowNumber(), partition_by=F('user_id'), order_by=[F('timestamp').desc(), F('pk').desc()],
+        ))
+        condition = Q(rank__gt=keep)
+        if before is not None:
+            condition |= Q(timestamp__lt=before)
+        return ranked.filter(condition)
 
 
 class ActivityLog(models.Model):
@@ -22,10 +43,17 @@ class ActivityLog(models.Model):
     object_ref = models.CharField(max_length=200, blank=True)
     company    = models.CharField(max_length=20, blank=True)
     changes    = models.JSONField(default=list, blank=True)
-    timestamp  = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: rows are written later in bulk (hw/services/audit.py)
+    # and must keep the time of the action, not of the flush.
+    timestamp  = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ActivityLogQuerySet.as_manager()
 
     class Meta:
         ordering            = ['-timestamp']
+        # Profile page (latest N per user) and the retention window both
+        # walk a user's rows newest-first.
+        indexes             = [models.Index(fields=['user', '-timestamp'], name='hw_activitylog_user_ts_idx')]
         verbose_name        = 'Activity Log'
         verbose_name_plural = 'Activity Logs'
 
@@ -33,8 +61,79 @@ class ActivityLog(models.Model):
         return f"{self.user.username} {self.action} {self.object_ref}"
 
 
+class ActivityLogArchive(models.Model):
+    """Cold storage for trimmed ActivityLog rows: one zlib-compressed JSON
+    batch per user and month (per trim run). ActivityLog itself only holds
+    the hot rows, so the activity views never scan history."""
+    ARCHIVED_FIELDS = ('action', 'model_name', 'object_ref', 'company', 'changes')
+
+    user       = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_archives')
+    month      = models.DateField(help_text='First day of the month the entries belong to')
+    count      = models.PositiveIntegerField()
+    first_at   = models.DateTimeField()
+    last_at    = models.DateTimeField()
+    data       = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering            = ['user', 'month']
+        indexes             = [models.Index(fields=['user', 'month'], name='hw_activityarchive_month_idx')]
+        verbose_name        = 'Activity Log Archive'
+        verbose_name_plural = 'Activity Log Archives'
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} ({self.count})"
+
+    def entries(self):
+        return json.loads(zlib.decompress(self.data))
+
+    @classmethod
+    def archive_stale(cls, keep, before=None, batch_size=500):
+        """Move the ActivityLog rows selected by `stale(keep, before)` here
+        and delete them from the hot table. Returns the number of rows moved.
+
+        Only rows that existed when the run started are considered, so an
+        entry logged meanwhile can't shift the per-user ranking and get a
+        row deleted that was never archived.
+        """
+        with transaction.atomic():
+            last = ActivityLog.objects.order_by('-pk').values_list('pk', flat=True).first()
+            if last is None:
+                return 0
+            stale = ActivityLog.objects.filter(pk__lte=last).stale(keep, before)
+            rows = (
+                stale.order_by('user_id', 'timestamp', 'pk')
+                .values('user_id', 'timestamp', *cls.ARCHIVED_FIELDS)
+                .iterator(chunk_size=2000)
+            )
+
+            def bucket(row):
+                return row['user_id'], timezone.localtime(row['timestamp']).date().replace(day=1)
+
+            archives = []
+            for (user_id, month), group in groupby(rows, key=bucket):
+                group = list(group)
+                archives.append(cls(
+                    user_id=user_id, month=month, count=len(group),
+                    first_at=group[0]['timestamp'], last_at=group[-1]['timestamp'],
+                    data=zlib.compress(json.dumps([
+                        {**{f: row[f] for f in cls.ARCHIVED_FIELDS}, 'timestamp': row['timestamp'].isoformat()}
+                        for row in group
+                    ]).encode()),
+                ))
+            cls.objects.bulk_create(archives, batch_size=batch_size)
+            moved = sum(a.count for a in archives)
+            if moved:
+                ActivityLog.objects.filter(pk__in=stale.values('pk')).delete()
+            return moved
+
+
 def log_activity(user, action, model_name='', object_ref='', company='', changes=None):
-    ActivityLog.objects.create(
+    """Queue an ActivityLog row; it is written in bulk at the end of the
+    request (see hw/services/audit.py), not here."""
+    from ..services import audit  # services import the models package
+
+    audit.record(ActivityLog(
         user=user, action=action, model_name=model_name,
         object_ref=object_ref, company=company, changes=changes or [],
-    )
+    ))
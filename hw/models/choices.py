@@ -14,3 +14,10 @@ class InvoiceType(models.TextChoices):
 class HotelCity(models.TextChoices):
     MAKKAH  = 'makkah',  'Makkah'
     MADINAH = 'madinah', 'Madinah'
+
+
+class PaymentStatus(models.TextChoices):
+    UNPAID   = 'unpaid',   'Unpaid'
+    PARTIAL  = 'partial',  'Partial'
+    PAID     = 'paid',     'Paid'
+    OVERPAID = 'overpaid', 'Overpaid'
@@ -107,37 +107,133 @@ class Client(models.Model):
 
     @property
     def score(self):
-        s = 0
-        total = self.total_billed
-        if total >= 100000: s += 40
-        elif total >= 50000: s += 30
-        elif total >= 10000: s += 20
-        elif total > 0: s += 10
-        avg = self.avg_days_to_pay
-        if avg is not None:
-            if avg <= 7: s += 40
-            elif avg <= 14: s += 30
-            elif avg <= 30: s += 20
-            elif avg <= 60: s += 10
-        days = self.days_since_last_order
-        if days is not None:
-            if days <= 30: s += 20
-            elif days <= 60: s += 15
-            elif days <= 90: s += 5
-        return s
+        return client_score(self.total_billed, self.avg_days_to_pay, self.days_since_last_order)
 
     @property
     def risk_label(self):
         if self.outstanding > 0:
-            due_invs = sorted(
-                [i for i in self.resolved_invoices if i.due_date is not None],
-                key=lambda i: i.due_date,
+            due_dates = [i.due_date for i in self.resolved_invoices if i.due_date is not None]
+            earliest_due = min(due_dates) if due_dates else None
+        else:
+            earliest_due = None
+        return client_risk(self.outstanding, earliest_due, self.days_since_last_order, self.total_invoices)
+
+
+def client_score(total_billed, avg_days_to_pay, days_since_last_order):
+    """0-100: billing volume (40) + payment speed (40) + recency (20)."""
+    s = 0
+    total = total_billed
+    if total >= 100000: s += 40
+    elif total >= 50000: s += 30
+    elif total >= 10000: s += 20
+    elif total > 0: s += 10
+    avg = avg_days_to_pay
+    if avg is not None:
+        if avg <= 7: s += 40
+        elif avg <= 14: s += 30
+        elif avg <= 30: s += 20
+        elif avg <= 60: s += 10
+    days = days_since_last_order
+    if days is not None:
+        if days <= 30: s += 20
+        elif days <= 60: s += 15
+        elif days <= 90: s += 5
+    return s
+
+
+def client_risk(outstanding, earliest_due_date, days_since_last_order, total_invoices):
+    if outstanding > 0 and earliest_due_date is not None:
+        overdue = (date.today() - earliest_due_date).days
+        if overdue > 60: return 'high'
+        if overdue > 0:  return 'medium'
+    days = days_since_last_order
+    if days and days > 45 and total_invoices > 0:
+        return 'dormant'
+    return 'ok'
+
+
+class ClientScorecard(models.Model):
+    """Persisted copy of the Client scoring properties, one row per client.
+
+    Client list and map read this instead of the properties, which each
+    re-run resolved_invoices and walk every payment. Kept fresh by
+    refresh() from the invoice/payment/CL signals; score and risk also
+    drift with the calendar, so `rebuild_client_scorecards` is meant to run
+    nightly. Client detail still shows the live properties.
+    """
+    client            = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='scorecard')
+    total_invoices    = models.PositiveIntegerField(default=0)
+    billed_sar        = models.IntegerField(default=0)
+    paid_sar          = models.IntegerField(default=0)
+    outstanding_sar   = models.IntegerField(default=0)
+    avg_days_to_pay   = models.IntegerField(null=True, blank=True)
+    last_order_at     = models.DateTimeField(null=True, blank=True)
+    earliest_due_date = models.DateField(null=True, blank=True)
+    score             = models.PositiveSmallIntegerField(default=0, db_index=True)
+    risk_label        = models.CharField(max_length=10, default='ok', db_index=True)
+    refreshed_at      = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name        = 'Client Scorecard'
+        verbose_name_plural = 'Client Scorecards'
+
+    def __str__(self):
+        return f"{self.client_id} | {self.score} | {self.risk_label}"
+
+    @property
+    def days_since_last_order(self):
+        # Derived on read: unlike score/risk it's exact for free.
+        if not self.last_order_at:
+            return None
+        return (timezone.now() - self.last_order_at).days
+
+    def recompute(self):
+        """Fill every column from the client's invoices, using the stored
+        invoice balance columns rather than the per-invoice properties."""
+        from .invoice import Payment
+        invoices = list(
+            self.client.resolved_invoices.order_by().values(
+                'pk', 'billed_sar', 'paid_sar', 'balance_sar', 'issued_date', 'due_date', 'created_at',
             )
-            if due_invs:
-                overdue = (date.today() - due_invs[0].due_date).days
-                if overdue > 60: return 'high'
-                if overdue > 0:  return 'medium'
-        days = self.days_since_last_order
-        if days and days > 45 and self.total_invoices > 0:
-            return 'dormant'
-        return 'ok'
+        )
+        settled = [i for i in invoices if i['balance_sar'] <= 0 and i['issued_date']]
+        last_paid = dict(
+            Payment.objects.filter(invoice_id__in=[i['pk'] for i in settled], payment_date__isnull=False)
+            .values('invoice_id').annotate(last=models.Max('payment_date'))
+            .values_list('invoice_id', 'last')
+        ) if settled else {}
+        days = [(last_paid[i['pk']] - i['issued_date']).days for i in settled if i['pk'] in last_paid]
+
+        self.total_invoices = len(invoices) + self.client.cls.count()
+        self.billed_sar = sum(i['billed_sar'] for i in invoices)
+        self.paid_sar = sum(i['paid_sar'] for i in invoices)
+        self.outstanding_sar = sum(i['balance_sar'] for i in invoices if i['balance_sar'] > 0)
+        self.avg_days_to_pay = round(sum(days) / len(days)) if days else None
+        self.last_order_at = max((i['created_at'] for i in invoices), default=None)
+        due_dates = [i['due_date'] for i in invoices if i['due_date'] is not None]
+        self.earliest_due_date = min(due_dates) if due_dates else None
+        self.score = client_score(self.billed_sar, self.avg_days_to_pay, self.days_since_last_order)
+        self.risk_label = client_risk(
+            self.outstanding_sar, self.earliest_due_date, self.days_since_last_order, self.total_invoices,
+        )
+
+    @staticmethod
+    def client_ids_for_invoice(invoice_id):
+        """Clients whose scorecard includes this invoice — the reverse of
+        Client.resolved_invoices (direct FK or any attached CL)."""
+        from .confirmation import ConfirmationLetter
+        from .invoice import Invoice
+        if not invoice_id:
+            return set()
+        ids = set(ConfirmationLetter.objects.filter(invoice_id=invoice_id).values_list('client_id', flat=True))
+        ids.update(Invoice.objects.filter(pk=invoice_id).values_list('client_id', flat=True))
+        ids.discard(None)
+        return ids
+
+    @classmethod
+    def refresh(cls, client_ids):
+        """Recompute and save the scorecards of the given clients."""
+        for client in Client.objects.filter(pk__in={c for c in client_ids if c}):
+            card = cls(client=client)
+            card.recompute()
+            card.save()
@@ -1,12 +1,93 @@
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import Q
+from django.db.models.functions import Cast, Coalesce, Round
 from django.urls import reverse
 
 from .choices import Company
+from .sequence import DocumentSequence, highest_number
 from ..utils import convert_to_sar, round_half_up
 
 
+class DaysBetween(models.Func):
+    """Whole days from `start` to `end` (two DateFields), NULL if either is."""
+    output_field = models.IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date sudah berupa integer hari.
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(', **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+
+class ConfirmationLetterQuerySet(models.QuerySet):
+    def with_room_totals(self):
+        """Annotate the room figures of each CL in SQL, the same numbers as
+        the properties without loading rooms:
+
+        fin_rooms  = total_rooms
+        fin_nights = num_nights
+        fin_price  = total_price (Decimal; 0 when the CL has no rooms)
+        """
+        rooms = (
+            Room.objects.filter(cl=models.OuterRef('pk')).order_by().values('cl')
+            .annotate(
+                qty=models.Sum('quantity'),
+                # Room.subtotal = price * quantity * nights; nights sama untuk
+                # semua kamar satu CL, jadi dikalikan di luar subquery.
+                unit=models.Sum(
+                    models.F('price') * models.F('quantity'),
+                    output_field=models.DecimalField(max_digits=14, decimal_places=2),
+                ),
+            )
+        )
+        decimal = models.DecimalField(max_digits=16, decimal_places=2)
+        return self.annotate(
+            fin_rooms=Coalesce(models.Subquery(rooms.values('qty')), 0),
+            fin_nights=Coalesce(DaysBetween('check_out', 'check_in'), 0),
+            fin_price=models.ExpressionWrapper(
+                Coalesce(models.Subquery(rooms.values('unit'), output_field=decimal), models.Value(0), output_field=decimal)
+                * models.Case(models.When(fin_nights=0, then=models.Value(1)), default=models.F('fin_nights')),
+                output_field=decimal,
+            ),
+        )
+
+    def with_financials(self):
+        """with_room_totals() plus the payment side:
+
+        fin_paid      = paid_sar (payments on the CL, or on its number while
+                        not attached to any CL)
+        fin_remaining = remaining_sar
+        """
+        from .invoice import Payment, payment_sar_expression
+
+        paid = (
+            Payment.objects.filter(
+                Q(cl=models.OuterRef('pk'))
+                | Q(linked_number=models.OuterRef('confirmation_number'), cl__isnull=True)
+            )
+            .order_by()
+            # Func, bukan Sum(): tanpa GROUP BY, satu baris untuk semua payment yang cocok.
+            .annotate(t=models.Func(payment_sar_expression(), function='SUM', output_field=models.IntegerField()))
+            .values('t')
+        )
+        return self.with_room_totals().annotate(
+            fin_paid=Coalesce(models.Subquery(paid, output_field=models.IntegerField()), 0),
+        ).annotate(
+            fin_remaining=Cast(Round(models.F('fin_price')), models.IntegerField()) - models.F('fin_paid'),
+        )
+
+
 class ConfirmationLetter(models.Model):
     company             = models.CharField(max_length=20, choices=Company.choices, default=Company.KONOZ, db_index=True)
     client              = models.ForeignKey('Client', null=True, blank=True, on_delete=models.SET_NULL, related_name='cls')
@@ -28,6 +109,8 @@ class ConfirmationLetter(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ConfirmationLetterQuerySet.as_manager()
+
     class Meta:
         ordering            = ['-created_at']
         verbose_name        = 'Confirmation Letter'
@@ -41,6 +124,7 @@ class ConfirmationLetter(models.Model):
         indexes = [
             models.Index(fields=['company', 'check_in'], name='hw_cl_company_checkin_idx'),
             models.Index(fields=['company', 'reservation_status'], name='hw_cl_company_status_idx'),
+            models.Index(fields=['company', 'created_at'], name='hw_cl_company_created_idx'),
         ]
 
     def __str__(self):
@@ -83,21 +167,18 @@ class ConfirmationLetter(models.Model):
     def remaining_sar(self):
         return round_half_up(self.total_price or 0) - self.paid_sar
 
+    @classmethod
+    def _highest_number(cls):
+        numbers = cls.objects.filter(confirmation_number__startswith='CL-').values_list('confirmation_number', flat=True)
+        return highest_number(numbers, 'CL')
+
     @classmethod
     def generate_number(cls):
-        from django.db import transaction
-        with transaction.atomic():
-            nums = []
-            for num_str in cls.objects.select_for_update().filter(
-                confirmation_number__startswith='CL-',
-            ).values_list('confirmation_number', flat=True):
-                parts = num_str.split('-')
-                if len(parts) == 2:
-                    try:
-                        nums.append(int(parts[1]))
-                    except ValueError:
-                        pass
-            return f"CL-{(max(nums) + 1 if nums else 1):03d}"
+        return DocumentSequence.allocate('CL', cls._highest_number)
+
+    @classmethod
+    def suggest_number(cls):
+        return DocumentSequence.peek('CL', cls._highest_number)
 
 
 class Room(models.Model):
@@ -106,6 +187,7 @@ class Room(models.Model):
     meals     = models.CharField(max_length=100, blank=True)
     quantity  = models.PositiveIntegerField(default=1)
     price     = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name        = 'Room'
@@ -1,10 +1,43 @@
 from django.db import models
+from django.db.models.functions import Abs, Cast, Floor, Mod, Round
 from django.urls import reverse
 
-from .choices import Company, InvoiceType  # noqa: F401 — Company used in Remittance
+from .choices import Company, InvoiceType, PaymentStatus  # noqa: F401 — Company used in Remittance
+from .sequence import DocumentSequence, highest_number
 from ..utils import convert_to_sar
 
 
+def round_half_even(value):
+    """SQL twin of Python's round() for a float expression. SQL ROUND sends
+    ties away from zero (100.5 -> 101), round() sends them to the even
+    neighbour (100.5 -> 100, 101.5 -> 102)."""
+    floor = Cast(Floor(value), models.IntegerField())
+    return models.Case(
+        models.When(
+            models.lookups.Exact(value - Floor(value), models.Value(0.5)),
+            then=Cast(floor + Abs(Mod(floor, models.Value(2))), models.IntegerField()),
+        ),
+        default=Cast(Round(value), models.IntegerField()),
+        output_field=models.IntegerField(),
+    )
+
+
+def payment_sar_expression(prefix=''):
+    """SQL twin of `int(round(convert_to_sar(amount, currency, exchange_rate)))`
+    for one Payment row. `prefix` is the lookup path to the payment
+    (e.g. 'payments__') when used from another model."""
+    amount = Cast(f'{prefix}amount', models.FloatField())
+    rate = Cast(f'{prefix}exchange_rate', models.FloatField())
+    sar = models.Case(
+        models.When(**{f'{prefix}currency': 'SAR'}, then=amount),
+        models.When(**{f'{prefix}currency': 'IDR', f'{prefix}exchange_rate': 0}, then=models.Value(0.0)),
+        models.When(**{f'{prefix}currency': 'IDR'}, then=amount / rate),
+        default=amount * rate,
+        output_field=models.FloatField(),
+    )
+    return round_half_even(sar)
+
+
 class Invoice(models.Model):
     company        = models.CharField(max_length=20, choices=Company.choices, default=Company.KONOZ, db_index=True)
     client         = models.ForeignKey('Client', null=True, blank=True, on_delete=models.SET_NULL, related_name='invoices')
@@ -14,6 +47,15 @@ class Invoice(models.Model):
     issued_date    = models.DateField(null=True, blank=True)
     due_date       = models.DateField(null=True, blank=True, db_index=True)
     currency       = models.CharField(max_length=10, default='SAR')
+    # Denormalised balance, kept in step with reservations/payments by
+    # Invoice.refresh_balance() (see signals.py). Read these on list and
+    # dashboard paths; the total_sar/total_paid_sar/remaining_sar properties
+    # stay the source of truth and are what `rebuild_invoice_balances
+    # --verify` compares against.
+    billed_sar     = models.IntegerField(default=0, editable=False)
+    paid_sar       = models.IntegerField(default=0, editable=False)
+    balance_sar    = models.IntegerField(default=0, editable=False)
+    payment_status = models.CharField(max_length=10, choices=PaymentStatus.choices, default=PaymentStatus.PAID, editable=False)
     created_at     = models.DateTimeField(auto_now_add=True)
     updated_at     = models.DateTimeField(auto_now=True)
 
@@ -30,6 +72,8 @@ class Invoice(models.Model):
         indexes = [
             models.Index(fields=['company', 'invoice_type'], name='hw_invoice_company_type_idx'),
             models.Index(fields=['company', 'due_date'], name='hw_invoice_company_due_idx'),
+            models.Index(fields=['company', 'invoice_type', 'payment_status'], name='hw_invoice_company_status_idx'),
+            models.Index(fields=['company', 'balance_sar'], name='hw_invoice_company_bal_idx'),
         ]
 
     def __str__(self):
@@ -53,23 +97,75 @@ class Invoice(models.Model):
     def remaining_sar(self):
         return self.total_sar - self.total_paid_sar
 
+    @staticmethod
+    def status_for(billed, remaining):
+        """Same buckets the invoice list has always shown."""
+        if remaining < 0:
+            return PaymentStatus.OVERPAID
+        if remaining == 0:
+            return PaymentStatus.PAID
+        if remaining < billed:
+            return PaymentStatus.PARTIAL
+        return PaymentStatus.UNPAID
+
     @classmethod
-    def generate_number(cls, invoice_type):
+    def compute_balance(cls, invoice_id):
+        """(billed, paid) in SAR straight from the reservation/payment rows,
+        rounded per payment exactly like total_paid_sar."""
+        billed = Reservation.objects.filter(invoice_id=invoice_id).aggregate(
+            t=models.Sum('total_sar'),
+        )['t'] or 0
+        paid = sum(
+            int(round(convert_to_sar(p['amount'], p['currency'], float(p['exchange_rate']))))
+            for p in Payment.objects.filter(invoice_id=invoice_id).values('amount', 'currency', 'exchange_rate')
+        )
+        return int(billed), paid
+
+    @classmethod
+    def refresh_balance(cls, invoice_id):
+        """Recompute and store the balance columns for one invoice.
+
+        Runs inside the caller's transaction (signals fire inside the same
+        atomic block as the Reservation/Payment write), and takes a row lock
+        on the invoice first so two concurrent payment writes can't each
+        store a total that misses the other one."""
         from django.db import transaction
-        prefix = 'INV' if invoice_type == InvoiceType.HOTEL else 'SVC'
+        if not invoice_id:
+            return
         with transaction.atomic():
-            nums = []
-            for num_str in cls.objects.select_for_update().filter(
-                invoice_type=invoice_type,
-                invoice_number__startswith=f'{prefix}-',
-            ).values_list('invoice_number', flat=True):
-                parts = num_str.split('-')
-                if len(parts) == 2:
-                    try:
-                        nums.append(int(parts[1]))
-                    except ValueError:
-                        pass
-            return f"{prefix}-{(max(nums) + 1 if nums else 1):03d}"
+            if not cls.objects.select_for_update().filter(pk=invoice_id).exists():
+                return
+            billed, paid = cls.compute_balance(invoice_id)
+            remaining = billed - paid
+            # .update() rather than save(): skips Invoice's own signals and
+            # leaves updated_at alone — the Reservation/Payment write that got
+            # us here already moved the conditional-GET validators.
+            cls.objects.filter(pk=invoice_id).update(
+                billed_sar=billed,
+                paid_sar=paid,
+                balance_sar=remaining,
+                payment_status=cls.status_for(billed, remaining),
+            )
+
+    @staticmethod
+    def number_prefix(invoice_type):
+        return 'INV' if invoice_type == InvoiceType.HOTEL else 'SVC'
+
+    @classmethod
+    def _highest_number(cls, invoice_type):
+        prefix = cls.number_prefix(invoice_type)
+        numbers = cls.objects.filter(
+            invoice_type=invoice_type, invoice_number__startswith=f'{prefix}-',
+        ).values_list('invoice_number', flat=True)
+        return highest_number(numbers, prefix)
+
+    @classmethod
+    def generate_number(cls, invoice_type):
+        return DocumentSequence.allocate(cls.number_prefix(invoice_type), lambda: cls._highest_number(invoice_type))
+
+    @classmethod
+    def suggest_number(cls, invoice_type):
+        return DocumentSequence.peek(cls.number_prefix(invoice_type), lambda: cls._highest_number(invoice_type))
 
 
 class Reservation(models.Model):
@@ -79,6 +175,7 @@ class Reservation(models.Model):
     check_in           = models.DateField(null=True, blank=True)
     check_out          = models.DateField(null=True, blank=True)
     total_sar          = models.PositiveIntegerField(default=0)
+    updated_at         = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name        = 'Reservation'
@@ -94,6 +191,7 @@ class ServiceItem(models.Model):
     name           = models.CharField(max_length=200)
     qty            = models.PositiveIntegerField(default=1)
     price          = models.PositiveIntegerField(default=0)
+    updated_at     = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering            = ['service_number']
@@ -122,6 +220,7 @@ class Payment(models.Model):
     exchange_rate = models.DecimalField(max_digits=14, decimal_places=4, default=1)
     note          = models.TextField(blank=True)
     proof         = models.FileField(upload_to='payments/proof/', null=True, blank=True)
+    updated_at    = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering            = ['id']
@@ -149,6 +248,7 @@ class Remittance(models.Model):
     note              = models.TextField(blank=True)
     proof             = models.FileField(upload_to='remittance/proof/', null=True, blank=True)
     created_at        = models.DateTimeField(auto_now_add=True)
+    updated_at        = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering            = ['-date', '-created_at']
@@ -158,17 +258,14 @@ class Remittance(models.Model):
     def __str__(self):
         return f"{self.remittance_number} | {self.date} | {self.total_sar} SAR"
 
+    @classmethod
+    def _highest_number(cls):
+        numbers = cls.objects.filter(remittance_number__startswith='RMT-').values_list('remittance_number', flat=True)
+        return highest_number(numbers, 'RMT')
+
     @classmethod
     def generate_number(cls):
-        from django.db import transaction
-        with transaction.atomic():
-            nums = []
-            for obj in cls.objects.select_for_update().filter(remittance_number__startswith='RMT-'):
-                try:
-                    nums.append(int(obj.remittance_number.split('-')[-1]))
-                except (ValueError, IndexError):
-                    pass
-            return f"RMT-{(max(nums) + 1 if nums else 1):03d}"
+        return DocumentSequence.allocate('RMT', cls._highest_number)
 
     @property
     def total_sar(self):
@@ -180,6 +277,7 @@ class RemittanceLine(models.Model):
     invoice       = models.ForeignKey(Invoice, null=True, blank=True, on_delete=models.SET_NULL, related_name='remittance_lines')
     linked_number = models.CharField(max_length=100)
     amount_sar    = models.PositiveIntegerField(default=0)
+    updated_at    = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name        = 'Remittance Line'
@@ -189,6 +287,213 @@ class RemittanceLine(models.Model):
         return f"Res {self.linked_number} → {self.amount_sar} SAR"
 
 
+# Metode pembayaran yang uangnya singgah di kas Surabaya; 'direct' langsung
+# masuk ke Pusat. Metode lain tidak dihitung di sisi mana pun.
+SURABAYA_PAYMENT_METHODS = ('cash', 'bank transfer', 'deposit')
+DIRECT_PAYMENT_METHOD = 'direct'
+
+
+class RemittanceLedgerQuerySet(models.QuerySet):
+    def visible(self):
+        """Reservasi Cancelled hanya relevan kalau uangnya terlanjur bergerak."""
+        return self.exclude(status='CANCELLED', debit=0, credit=0)
+
+    def in_pool(self):
+        """Baris yang ditawarkan di form remittance: reservasi yang punya
+        Reservation atau sudah ada pembayaran (CL tanpa invoice, atau nomor
+        yang hanya muncul di remittance line, tidak ikut)."""
+        return self.filter(models.Q(reservation__isnull=False) | models.Q(has_payment=True))
+
+    def check_in_between(self, date_from=None, date_to=None):
+        """Rentang check-in; baris tanpa check-in selalu ikut, sama seperti
+        filter buku besar sebelumnya."""
+        qs = self
+        if date_from:
+            qs = qs.filter(models.Q(check_in__isnull=True) | models.Q(check_in__gte=date_from))
+        if date_to:
+            qs = qs.filter(models.Q(check_in__isnull=True) | models.Q(check_in__lte=date_to))
+        return qs
+
+    def by_check_in(self):
+        """Check-in terdekat lebih dulu, baris tanpa check-in paling bawah."""
+        return self.order_by(models.F('check_in').asc(nulls_last=True), 'linked_number')
+
+
+class RemittanceLedgerEntry(models.Model):
+    """Buku besar Surabaya <-> Pusat yang tersimpan, satu baris per reservasi Konoz.
+
+    Sebelumnya setiap form remittance dan PDF buku besar membangun ulang
+    seluruh pool (semua payment, reservasi, CL + rooms dan remittance line).
+    Sekarang refresh() menghitung ulang hanya nomor reservasi yang
+    tersentuh, dipanggil dari signal Payment, Reservation, RemittanceLine,
+    CL dan Room. `manage.py check_remittance_ledger` membandingkan isi tabel
+    dengan compute() dari nol.
+
+    Teks tampilan (hotel, nama tamu, nomor invoice) sengaja dibaca lewat FK,
+    bukan disalin, karena sinkron nama client memakai .update() tanpa signal.
+    """
+    linked_number = models.CharField(max_length=100, unique=True)
+    invoice       = models.ForeignKey(Invoice, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    reservation   = models.ForeignKey(Reservation, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    cl            = models.ForeignKey('ConfirmationLetter', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    has_payment   = models.BooleanField(default=False)
+    status        = models.CharField(max_length=50, blank=True)
+    check_in      = models.DateField(null=True, blank=True)
+    check_out     = models.DateField(null=True, blank=True)
+    total_sar     = models.IntegerField(default=0)
+    # Debit  = paid_sby + direct (semua uang client)
+    # Kredit = remitted + direct (uang yang sudah berada di Pusat)
+    paid_sby      = models.IntegerField(default=0)
+    direct        = models.IntegerField(default=0)
+    remitted      = models.IntegerField(default=0)
+    debit         = models.IntegerField(default=0)
+    credit        = models.IntegerField(default=0)
+    mengendap     = models.IntegerField(default=0)
+    balance       = models.IntegerField(default=0)
+    refreshed_at  = models.DateTimeField(auto_now=True)
+
+    objects = RemittanceLedgerQuerySet.as_manager()
+
+    COMPUTED_FIELDS = (
+        'invoice_id', 'reservation_id', 'cl_id', 'has_payment', 'status',
+        'check_in', 'check_out', 'total_sar', 'paid_sby', 'direct', 'remitted',
+        'debit', 'credit', 'mengendap', 'balance',
+    )
+
+    class Meta:
+        verbose_name        = 'Remittance Ledger Entry'
+        verbose_name_plural = 'Remittance Ledger Entries'
+        indexes = [
+            models.Index(fields=['check_in', 'linked_number'], name='hw_remledger_checkin_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ledger {self.linked_number} | D {self.debit} / K {self.credit}"
+
+    @classmethod
+    def compute(cls, linked_numbers=None):
+        """Hitung baris buku besar dari nol, {linked_number: {field: value}}.
+
+        Tanpa argumen: seluruh Konoz (dipakai checker dan rebuild). Aturan
+        pemilihan sama dengan rebuild penuh yang lama: pembayaran terakhir
+        menentukan invoice, reservasi terakhir menentukan detail hotel/tanggal.
+        """
+        from .confirmation import ConfirmationLetter
+
+        def scoped(qs, field):
+            return qs if linked_numbers is None else qs.filter(**{f'{field}__in': linked_numbers})
+
+        pool = {}
+
+        def slot(number):
+            return pool.setdefault(number, {
+                'paid_sby': 0, 'direct': 0, 'remitted': 0, 'has_payment': False,
+                'invoice_id': None, 'reservation': None, 'cl': None,
+            })
+
+        payments = scoped(Payment.objects.filter(invoice__company=Company.KONOZ), 'linked_number')
+        for p in payments.order_by('id').values(
+            'linked_number', 'method', 'amount', 'currency', 'exchange_rate', 'invoice_id',
+        ).iterator(chunk_size=2000):
+            s = slot(p['linked_number'])
+            sar = int(round(convert_to_sar(float(p['amount']), p['currency'], float(p['exchange_rate']))))
+            method = (p['method'] or '').lower()
+            if method == DIRECT_PAYMENT_METHOD:
+                s['direct'] += sar
+            elif method in SURABAYA_PAYMENT_METHODS:
+                s['paid_sby'] += sar
+            s['has_payment'] = True
+            s['invoice_id'] = p['invoice_id']
+
+        reservations = scoped(Reservation.objects.filter(invoice__company=Company.KONOZ), 'reservation_number')
+        for r in reservations.order_by('pk').values(
+            'pk', 'reservation_number', 'invoice_id', 'check_in', 'check_out', 'total_sar',
+        ).iterator(chunk_size=2000):
+            slot(r['reservation_number'])['reservation'] = r
+
+        cls_qs = scoped(ConfirmationLetter.objects.filter(company=Company.KONOZ), 'confirmation_number')
+        for c in cls_qs.order_by('pk').with_room_totals().iterator(chunk_size=2000):
+            slot(c.confirmation_number)['cl'] = c
+
+        lines = scoped(RemittanceLine.objects.filter(remittance__company=Company.KONOZ), 'linked_number')
+        for row in lines.values('linked_number').annotate(total=models.Sum('amount_sar')):
+            slot(row['linked_number'])['remitted'] = int(row['total'] or 0)
+
+        computed = {}
+        for number, s in pool.items():
+            res = s['reservation'] or {}
+            cl = s['cl']
+            total_sar = int(res.get('total_sar') or (cl.fin_price if cl else 0) or 0)
+            debit = s['paid_sby'] + s['direct']
+            credit = s['remitted'] + s['direct']
+            computed[number] = {
+                'invoice_id': s['invoice_id'] or res.get('invoice_id'),
+                'reservation_id': res.get('pk'),
+                'cl_id': cl.pk if cl else None,
+                'has_payment': s['has_payment'],
+                'status': (cl.reservation_status or '').upper() if cl else '',
+                'check_in': res.get('check_in') or (cl.check_in if cl else None),
+                'check_out': res.get('check_out') or (cl.check_out if cl else None),
+                'total_sar': total_sar,
+                'paid_sby': s['paid_sby'],
+                'direct': s['direct'],
+                'remitted': s['remitted'],
+                'debit': debit,
+                'credit': credit,
+                'mengendap': max(0, s['paid_sby'] - s['remitted']),
+                'balance': total_sar - credit,
+            }
+        return computed
+
+    @classmethod
+    def refresh(cls, linked_numbers):
+        """Hitung ulang dan simpan baris untuk nomor reservasi yang diberikan.
+
+        Nomor yang sudah tidak punya payment, reservasi, CL maupun remittance
+        line dihapus dari tabel.
+        """
+        numbers = {n for n in linked_numbers if n is not None}
+        if numbers:
+            cls._store(numbers, cls.compute(numbers))
+
+    @classmethod
+    def rebuild(cls):
+        """Bangun ulang seluruh tabel; dipakai `check_remittance_ledger --fix`."""
+        computed = cls.compute()
+        numbers = list(computed)
+        for start in range(0, len(numbers), 500):
+            chunk = numbers[start:start + 500]
+            cls._store(set(chunk), {n: computed[n] for n in chunk})
+        stale = list(set(cls.objects.values_list('linked_number', flat=True)) - computed.keys())
+        for start in range(0, len(stale), 500):
+            cls.objects.filter(linked_number__in=stale[start:start + 500]).delete()
+        return len(numbers)
+
+    @classmethod
+    def _store(cls, numbers, computed):
+        from django.utils import timezone
+
+        existing = cls.objects.in_bulk(numbers, field_name='linked_number')
+        now = timezone.now()
+        to_create, to_update = [], []
+        for number, values in computed.items():
+            entry = existing.get(number)
+            if entry is None:
+                to_create.append(cls(linked_number=number, refreshed_at=now, **values))
+                continue
+            for field, value in values.items():
+                setattr(entry, field, value)
+            entry.refreshed_at = now
+            to_update.append(entry)
+        if to_create:
+            cls.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            cls.objects.bulk_update(to_update, [*cls.COMPUTED_FIELDS, 'refreshed_at'], batch_size=500)
+        gone = numbers - computed.keys()
+        if gone:
+            cls.objects.filter(linked_number__in=gone).delete()
+
+
 def _attachment_path(instance, filename):
     if instance.invoice_id:
         return f"attachments/invoice/{instance.invoice_id}/{filename}"
@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class PdfJob(models.Model):
+    """One background PDF render, keyed by the sha256 of its HTML source.
+
+    The rendered bytes live in the filesystem artifact store
+    (hw/services/pdf_store.py); this row only tracks where the render is, so
+    the browser can poll /pdf/jobs/<key>/ until the file is ready.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE    = 'done'
+    STATUS_FAILED  = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    key          = models.CharField(max_length=64, unique=True)
+    filename     = models.CharField(max_length=255)
+    status       = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error        = models.TextField(blank=True)
+    requested_at = models.DateTimeField()
+    finished_at  = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering            = ['-requested_at']
+        verbose_name        = 'PDF Job'
+        verbose_name_plural = 'PDF Jobs'
+
+    def __str__(self):
+        return f"{self.filename} [{self.key[:12]}] | {self.status}"
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .sequence import DocumentSequence, highest_number
+
 
 class CancellationPenalty(models.Model):
     cl              = models.OneToOneField('ConfirmationLetter', on_delete=models.CASCADE, related_name='penalty')
@@ -32,18 +34,15 @@ class CancellationPenalty(models.Model):
     def penalty_amount_sar(self):
         return int(round(self.penalty_amount * float(self.exchange_rate)))
 
+    @classmethod
+    def _highest_number(cls):
+        numbers = cls.objects.filter(penalty_number__startswith='PNL-').values_list('penalty_number', flat=True)
+        return highest_number(numbers, 'PNL')
+
     @classmethod
     def generate_number(cls):
-        from django.db import transaction
-        with transaction.atomic():
-            nums = []
-            for num_str in cls.objects.select_for_update().filter(
-                penalty_number__startswith='PNL-',
-            ).values_list('penalty_number', flat=True):
-                parts = num_str.split('-')
-                if len(parts) == 2:
-                    try:
-                        nums.append(int(parts[1]))
-                    except ValueError:
-                        pass
-            return f"PNL-{(max(nums) + 1 if nums else 1):03d}"
+        return DocumentSequence.allocate('PNL', cls._highest_number)
+
+    @classmethod
+    def suggest_number(cls):
+        return DocumentSequence.peek('PNL', cls._highest_number)
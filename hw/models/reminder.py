@@ -1,4 +1,7 @@
-from django.db import models
+import time
+
+from django.db import models, transaction
+from django.db.models import F
 
 
 class ReminderLog(models.Model):
@@ -14,6 +17,11 @@ class ReminderLog(models.Model):
     class Meta:
         verbose_name        = 'Reminder Log'
         verbose_name_plural = 'Reminder Logs'
+        indexes = [
+            # "Sudah terkirim hari ini?" untuk satu hari check-in sekaligus
+            # (send_checkin_reminders._load_sent).
+            models.Index(fields=['cl', 'reminder_type', 'status', 'sent_at'], name='hw_reminderlog_sent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reminder_type} | {self.cl} | {self.status}"
@@ -80,3 +88,61 @@ class MessageTemplate(models.Model):
 
     def __str__(self):
         return self.get_template_type_display()
+
+
+class SendRateBucket(models.Model):
+    """Token bucket for outbound WhatsApp, shared by every qcluster worker.
+
+    One row per bucket key ('global', 'target:<number>'). A bucket holds up
+    to `burst` tokens and refills at `rate` tokens per second; sending costs
+    one token from each bucket that applies. Rows are updated with a
+    version check rather than a row lock, so it behaves the same on SQLite.
+    """
+    key         = models.CharField(max_length=120, unique=True)
+    tokens      = models.FloatField()
+    refilled_at = models.FloatField(help_text='time.time() of the last refill')
+    version     = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name        = 'Send Rate Bucket'
+        verbose_name_plural = 'Send Rate Buckets'
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+    @classmethod
+    def take(cls, limits):
+        """Take one token from every bucket in `limits` ({key: (rate, burst)}),
+        all or nothing. Returns 0 when taken, else the seconds until every
+        bucket has a token again."""
+        for _ in range(10):
+            now = time.time()
+            rows = cls.objects.in_bulk(list(limits), field_name='key')
+            missing = [key for key in limits if key not in rows]
+            if missing:
+                cls.objects.bulk_create(
+                    [cls(key=key, tokens=limits[key][1], refilled_at=now) for key in missing],
+                    ignore_conflicts=True,
+                )
+                continue
+            levels = {}
+            wait = 0.0
+            for key, (rate, burst) in limits.items():
+                row = rows[key]
+                levels[key] = min(burst, row.tokens + max(0.0, now - row.refilled_at) * rate)
+                if levels[key] < 1:
+                    wait = max(wait, (1 - levels[key]) / rate)
+            if wait:
+                return wait
+            with transaction.atomic():
+                taken = all(
+                    cls.objects.filter(pk=rows[key].pk, version=rows[key].version).update(
+                        tokens=levels[key] - 1, refilled_at=now, version=F('version') + 1,
+                    )
+                    for key in limits
+                )
+                if taken:
+                    return 0.0
+                # Worker lain mengambil token di antara baca dan tulis: ulangi.
+                transaction.set_rollback(True)
+        return 1 / min(rate for rate, _ in limits.values())
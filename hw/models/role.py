@@ -23,6 +23,7 @@ from django.db import models
 # Bumped in the key rather than deleted wholesale so a stale value from an old
 # deploy can never be read back as current.
 MATRIX_CACHE_KEY = 'hw:role_matrix:v1'
+LABELS_CACHE_KEY = 'hw:role_labels:v1'
 
 # The slug that is always full-access and never editable. Kept here (not in
 # permissions.py) so the model can answer `locked` without an import cycle.
@@ -30,7 +31,7 @@ ADMIN_SLUG = 'admin'
 
 
 def invalidate_matrix_cache():
-    cache.delete(MATRIX_CACHE_KEY)
+    cache.delete_many([MATRIX_CACHE_KEY, LABELS_CACHE_KEY])
 
 
 class RoleDefinitionQuerySet(models.QuerySet):
@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class SearchToken(models.Model):
+    """One trigram posting: document `object_id` of `kind` contains `gram`.
+
+    Fallback search index for databases without pg_trgm (SQLite in dev and
+    tests). Maintained by hw/services/search.py from the CL, invoice, client
+    and hotel signals; on PostgreSQL the table stays empty and the GIN
+    trigram indexes from migration 0055 serve the same lookups.
+    """
+    kind      = models.CharField(max_length=10)
+    company   = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    gram      = models.CharField(max_length=3)
+
+    class Meta:
+        verbose_name        = 'Search Token'
+        verbose_name_plural = 'Search Tokens'
+        constraints = [
+            # Urutan kolom = urutan lookup: satu gram di satu kind/company,
+            # object_id terurut supaya hasil terbaru bisa dibaca lebih dulu.
+            models.UniqueConstraint(fields=['kind', 'company', 'gram', 'object_id'], name='hw_searchtoken_posting_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='hw_searchtoken_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.gram!r}"
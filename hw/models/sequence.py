@@ -0,0 +1,86 @@
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+# Numbers the allocator could have handed out. A longer run of digits is a
+# code typed by hand (INV-20261018001), not a position in the sequence:
+# following it would push the counter there for good.
+MAX_DIGITS = 6
+NUMBER_RE = re.compile(rf'^([A-Z]+)-(\d{{1,{MAX_DIGITS}}})$')
+
+
+def highest_number(numbers, prefix):
+    """Largest N among "PREFIX-N" strings (N up to MAX_DIGITS digits);
+    anything else is ignored."""
+    found = [int(m[2]) for m in map(NUMBER_RE.match, numbers) if m and m[1] == prefix]
+    return max(found, default=0)
+
+
+class DocumentSequence(models.Model):
+    """Last document number handed out, one row per (company, prefix).
+
+    Replaces the old generate_number() scans, which locked and parsed every
+    existing number to find the max. allocate() is a single-row
+    UPDATE ... SET last_value = last_value + 1, atomic on every backend; the
+    row is seeded from the existing documents the first time a prefix is
+    used (migration 0056 seeds the current ones). peek() is what the "new"
+    forms show as a suggestion and takes no lock at all.
+
+    company '' is a sequence shared by all companies. CL, invoice,
+    remittance and penalty numbers use it: the forms reject a number that
+    exists in *any* company, so per-company counters would hand out
+    numbers the forms then refuse.
+    """
+    company    = models.CharField(max_length=20, blank=True)
+    prefix     = models.CharField(max_length=10)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name        = 'Document Sequence'
+        verbose_name_plural = 'Document Sequences'
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'prefix'], name='uniq_document_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.company or '*'} {self.prefix} @ {self.last_value}"
+
+    @staticmethod
+    def format(prefix, value):
+        return f"{prefix}-{value:03d}"
+
+    @classmethod
+    def allocate(cls, prefix, seed, company=''):
+        """Reserve and return the next number. `seed` returns the highest
+        number already in use and is only called when the row is missing."""
+        with transaction.atomic():
+            rows = cls.objects.filter(company=company, prefix=prefix)
+            if not rows.update(last_value=F('last_value') + 1):
+                cls._create(company, prefix, seed)
+                rows.update(last_value=F('last_value') + 1)
+            return cls.format(prefix, rows.values_list('last_value', flat=True).get())
+
+    @classmethod
+    def peek(cls, prefix, seed, company=''):
+        """The number allocate() would return next, without reserving it."""
+        last = cls.objects.filter(company=company, prefix=prefix).values_list('last_value', flat=True).first()
+        return cls.format(prefix, (seed() if last is None else last) + 1)
+
+    @classmethod
+    def observe(cls, number, company=''):
+        """Move the counter past a number typed into a form, so allocate()
+        never hands it out again. Numbers outside NUMBER_RE are left alone."""
+        match = NUMBER_RE.match(number or '')
+        if match:
+            cls.objects.filter(
+                company=company, prefix=match[1], last_value__lt=int(match[2]),
+            ).update(last_value=int(match[2]))
+
+    @classmethod
+    def _create(cls, company, prefix, seed):
+        try:
+            with transaction.atomic():
+                cls.objects.create(company=company, prefix=prefix, last_value=seed())
+        except IntegrityError:
+            pass  # allocator lain membuatnya lebih dulu; update berikutnya memakai baris itu
@@ -0,0 +1,287 @@
+"""Keyset (cursor) pagination for the list pages.
+
+Django's Paginator costs a COUNT(*) per request plus an OFFSET that makes
+the database read and throw away every row before the page, so page 200
+of a big company's CL list is 200 times the work of page 1.
+KeysetPaginator seeks instead. Every page hands out two cursors, the sort
+values of its first and last row (`before` / `after` in the pagination
+props). The next page is then `WHERE (sort columns) > cursor LIMIT n+1`,
+an index range scan whatever the page number. A cursor also serves the
+page pills a few pages either side of the one it came from (MAX_SKIP_PAGES),
+and the last page is read backwards from the end. OFFSET is kept only for
+a jump with no usable cursor, such as a bookmarked ?page=37. Such a jump
+to the estimated last page (or past it) counts again first, since the
+last page is sized from the total.
+
+The total behind "x to y of N" is approximate. The first COUNT is cached
+per queryset and reused until a write to that model bumps the model's
+generation (invalidate_counts, wired in signals.py). A page that reaches
+the end of the list corrects the cached total, and a list that fits on one
+page never counts at all.
+
+NULLs go last in either direction unless the ordering says otherwise
+(F('due_date').asc(nulls_first=True)). The paginator spells this out in
+the ORDER BY, because the seek conditions only hold if SQL sorts NULLs the
+same way they do, and SQLite and PostgreSQL disagree on the default.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import math
+import time
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+
+COUNT_CACHE_TTL = 300
+MAX_SKIP_PAGES = 4
+
+
+def _generation_key(model):
+    return f'hw:listcount:gen:{model._meta.label_lower}'
+
+
+def invalidate_counts(model):
+    """Drop every cached list total for `model` (any filter, any company)."""
+    # A fresh token rather than cache.incr(): the database backend's incr()
+    # re-stores the key with the default timeout, and a generation that
+    # expires and restarts could bring back totals cached under an old value.
+    cache.set(_generation_key(model), time.time_ns(), None)
+
+
+def _count_key(qs):
+    sql = hashlib.sha256(str(qs.query).encode()).hexdigest()
+    return f'hw:listcount:{qs.model._meta.label_lower}:{cache.get(_generation_key(qs.model), 0)}:{sql}'
+
+
+def _jsonable(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class _Column:
+    def __init__(self, model, spec):
+        if isinstance(spec, OrderBy):
+            self.name, self.desc = spec.expression.name, spec.descending
+            self.nulls_last = not spec.nulls_first
+        else:
+            self.name, self.desc = spec.lstrip('-'), spec.startswith('-')
+            self.nulls_last = True
+        self.field = model._meta.pk if self.name == 'pk' else model._meta.get_field(self.name)
+
+    def order(self, reverse=False):
+        desc, last = self.desc != reverse, self.nulls_last != reverse
+        expr = F(self.name)
+        if not self.field.null:
+            return expr.desc() if desc else expr.asc()
+        nulls = {'nulls_last': True} if last else {'nulls_first': True}
+        return expr.desc(**nulls) if desc else expr.asc(**nulls)
+
+    def beyond(self, value, reverse=False):
+        """Q for values strictly past `value` in this column's order
+        (reversed when `reverse`), or None when nothing is."""
+        desc, last = self.desc != reverse, self.nulls_last != reverse
+        if value is None:
+            return None if last else Q(**{f'{self.name}__isnull': False})
+        q = Q(**{f'{self.name}__lt' if desc else f'{self.name}__gt': value})
+        return q | Q(**{f'{self.name}__isnull': True}) if last and self.field.null else q
+
+    def equal(self, value):
+        return Q(**{f'{self.name}__isnull': True}) if value is None else Q(**{self.name: value})
+
+
+class Page:
+    """Quacks like django.core.paginator.Page for the views and
+    _page_range_display, plus the `after` / `before` cursors."""
+
+    def __init__(self, paginator, rows, number, has_previous, has_next):
+        paginator._min_pages = number + has_next
+        self.paginator = paginator
+        self.object_list = rows
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+    @property
+    def after(self):
+        return self.paginator.cursor(self.number, self.object_list[-1]) if self._has_next else None
+
+    @property
+    def before(self):
+        return self.paginator.cursor(self.number, self.object_list[0]) if self._has_previous else None
+
+
+class KeysetPaginator:
+    """Paginate `qs` by `ordering` (order_by() arguments: names, '-names' or
+    F(...).asc()/desc()). The primary key is appended as a tie-breaker, so
+    the order is total and a cursor names exactly one position."""
+
+    def __init__(self, qs, ordering, per_page):
+        self.per_page = per_page
+        self.columns = [_Column(qs.model, spec) for spec in ordering]
+        if not any(c.field.primary_key for c in self.columns):
+            self.columns.append(_Column(qs.model, '-pk' if self.columns and self.columns[-1].desc else 'pk'))
+        self.qs = qs.order_by(*self.order())
+        self._count = None
+        self._min_pages = 1
+
+    def order(self, reverse=False):
+        return [c.order(reverse) for c in self.columns]
+
+    # ── count ──
+
+    @property
+    def count(self):
+        if self._count is None:
+            key = _count_key(self.qs)
+            self._count = cache.get(key)
+            if self._count is None:
+                self._count = self.qs.count()
+                cache.set(key, self._count, COUNT_CACHE_TTL)
+        return self._count
+
+    def _exact_count(self, n):
+        """Record a total learned from reaching the end of the list."""
+        key = _count_key(self.qs)
+        if self._count is None:
+            self._count = cache.get(key)
+        if n != self._count:
+            cache.set(key, n, COUNT_CACHE_TTL)
+        self._count = n
+
+    @property
+    def num_pages(self):
+        # A stale total never hides the page on screen or the one after it.
+        return max(self._min_pages, math.ceil(self.count / self.per_page))
+
+    # ── cursors ──
+
+    def cursor(self, number, row):
+        values = [_jsonable(getattr(row, c.name)) for c in self.columns]
+        raw = json.dumps([number, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _decode(self, token):
+        """(anchor page, column values) from a cursor, or None if it is
+        malformed or was made for a different ordering."""
+        if not token:
+            return None
+        try:
+            anchor, values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            if not isinstance(anchor, int) or len(values) != len(self.columns):
+                return None
+            return anchor, [
+                None if v is None else c.field.to_python(v) for c, v in zip(self.columns, values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def _seek(self, values, reverse=False):
+        """Q for rows strictly past `values` in the paginator's order
+        (before them when `reverse`)."""
+        terms, equal = [], Q()
+        for column, value in zip(self.columns, values):
+            beyond = column.beyond(value, reverse)
+            if beyond is not None:
+                terms.append(equal & beyond)
+            equal &= column.equal(value)
+        return reduce(or_, terms) if terms else Q(pk__in=[])
+
+    # ── pages ──
+
+    def _forward(self, offset, values=None):
+        qs = self.qs if values is None else self.qs.filter(self._seek(values))
+        rows = list(qs[offset:offset + self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def _backward(self, offset, limit, values=None):
+        qs = self.qs.order_by(*self.order(reverse=True))
+        if values is not None:
+            qs = qs.filter(self._seek(values, reverse=True))
+        rows = list(qs[offset:offset + limit + 1])
+        return rows[:limit][::-1], len(rows) > limit
+
+    def get_page(self, params):
+        """Page for request.GET-style `params`: `page` (the number shown),
+        plus the `after` / `before` cursor of the page the link was on."""
+        try:
+            number = max(1, int(params.get('page') or 1))
+        except (TypeError, ValueError):
+            number = 1
+        after = self._decode(params.get('after'))
+        before = self._decode(params.get('before'))
+
+        if number == 1:
+            rows, has_next = self._forward(0)
+            if not has_next:
+                self._count = len(rows)  # nothing to cache: the next visit won't count either
+            return Page(self, rows, 1, False, has_next)
+        if after and 0 < number - after[0] <= MAX_SKIP_PAGES:
+            rows, has_next = self._forward((number - after[0] - 1) * self.per_page, after[1])
+            if rows and not has_next:
+                self._exact_count((number - 1) * self.per_page + len(rows))
+            if rows:
+                return Page(self, rows, number, True, has_next)
+        elif before and 0 < before[0] - number <= MAX_SKIP_PAGES:
+            rows, has_previous = self._backward((before[0] - number - 1) * self.per_page, self.per_page, before[1])
+            if rows:
+                return Page(self, rows, number, has_previous, True)
+
+        if number >= self.num_pages:
+            # The last page is sized from the total, so a cached one that
+            # missed a bulk insert would drop rows: count again first.
+            self._exact_count(self.qs.count())
+            number = min(number, self.num_pages)
+            if number == 1:
+                return self.get_page({})
+            if number == self.num_pages:
+                return self._last_page(number)
+        offset = (number - 1) * self.per_page
+        rows, has_next = self._forward(offset)
+        if not rows:
+            # The cached total ran past the end of the list.
+            self._exact_count(self.qs.count())
+            return self._last_page(self.num_pages)
+        if not has_next:
+            self._exact_count(offset + len(rows))
+        return Page(self, rows, number, True, has_next)
+
+    def _last_page(self, number):
+        """Page `number`, the last one, read backwards from the end; the
+        count must be exact."""
+        remainder = self.count - (number - 1) * self.per_page
+        rows, has_previous = self._backward(0, remainder)
+        return Page(self, rows, number, has_previous, False)
@@ -22,7 +22,7 @@ the same matrix is serialised into Inertia props by ``perms_payload()`` so the
 React shell can hide what the backend would refuse anyway. The frontend copy is
 a convenience, never the enforcement point.
 """
-from functools import wraps
+from functools import cached_property, wraps
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -32,7 +32,7 @@ from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
 
 from .models.choices import Company
-from .models.role import ADMIN_SLUG, MATRIX_CACHE_KEY, RoleDefinition
+from .models.role import ADMIN_SLUG, LABELS_CACHE_KEY, MATRIX_CACHE_KEY, RoleDefinition
 from .models.user import CompanyAccess, Role
 
 # Every guarded area of the app. Keep in sync with SIDEBAR_NAV keys in
@@ -150,8 +150,8 @@ def role_matrix():
 
     Cached because ``can()`` runs several times per request and the table is
     tiny; every write to RoleDefinition drops the key, so a permission change
-    takes effect on the next request across every worker (the cache backend is
-    the shared database table).
+    takes effect on the next request across every worker (the delete moves the
+    key's namespace stamp in the tiered cache, see hw/cache.py).
     """
     cached = cache.get(MATRIX_CACHE_KEY)
     if cached is None:
@@ -183,9 +183,10 @@ def role_definitions():
     return []
 
 
-def role_choices():
+def role_choices(rows=None):
     """[{value, label, description}] for every selectable role."""
-    rows = role_definitions()
+    if rows is None:
+        rows = role_definitions()
     if rows:
         return [{'value': r.slug, 'label': r.label, 'description': r.description}
                 for r in rows]
@@ -195,62 +196,134 @@ def role_choices():
 
 
 def role_labels():
-    """{slug: label} for every known role."""
-    return {c['value']: c['label'] for c in role_choices()}
+    """{slug: label} for every known role.
+
+    Cached like the matrix (and dropped with it): ``role_label()`` feeds the
+    shell on every Inertia page.
+    """
+    labels = cache.get(LABELS_CACHE_KEY)
+    if labels is None:
+        rows = role_definitions()
+        labels = {c['value']: c['label'] for c in role_choices(rows)}
+        if rows:
+            cache.set(LABELS_CACHE_KEY, labels, 300)
+    return labels
 
 
 def is_valid_role(slug):
     return slug in role_matrix()
 
 
+# ---------------------------------------------------------------------------
+# Per-request memo
+# ---------------------------------------------------------------------------
+
+class AccessContext:
+    """Everything the helpers below derive from one user, each computed at
+    most once.
+
+    ``AccessContextMiddleware`` binds one to ``request.user``, so the share
+    middleware, the view decorators and ``get_active_company()`` of a request
+    all read the matrix, the labels and the company list once. Any other user
+    object (tests, management commands) gets a fresh context per call and sees
+    changes immediately, as before.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._active = {}
+
+    @cached_property
+    def role(self):
+        user = self.user
+        if not user or not user.is_authenticated:
+            return None
+        if user.is_superuser:
+            return ADMIN_SLUG
+        profile = getattr(user, 'profile', None)
+        return getattr(profile, 'role', None) or Role.STAFF.value
+
+    @cached_property
+    def role_label(self):
+        if not self.role:
+            return 'Standard User'
+        return role_labels().get(self.role) or dict(Role.choices).get(self.role) or 'Standard User'
+
+    @cached_property
+    def permissions(self):
+        """{module: set(actions)} for this user's role."""
+        if self.role is None:
+            return {}
+        return role_matrix().get(self.role, {})
+
+    @cached_property
+    def perms(self):
+        return {module: sorted(actions) for module, actions in self.permissions.items() if actions}
+
+    @cached_property
+    def companies(self):
+        everything = [Company.KONOZ.value, Company.IJABAH.value]
+        user = self.user
+        if not user or not user.is_authenticated or user.is_superuser:
+            return everything
+        profile = getattr(user, 'profile', None)
+        access = getattr(profile, 'company_access', None) or CompanyAccess.ALL.value
+        if access == CompanyAccess.ALL.value:
+            return everything
+        return [access]
+
+    def can(self, module, action):
+        return action in self.permissions.get(module, ())
+
+    def active_company(self, stored):
+        """The session's company clamped to ``companies``. Keyed by the stored
+        value, so a view that switches company mid-request sees the new one."""
+        if stored not in self._active:
+            self._active[stored] = stored if stored and stored in self.companies else self.companies[0]
+        return self._active[stored]
+
+
+def access_for(user):
+    """The AccessContext bound to ``user`` for this request, or a fresh one."""
+    return getattr(user, '_access', None) or AccessContext(user)
+
+
+class AccessContextMiddleware:
+    """Bind an AccessContext to ``request.user``. Must run after
+    AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None:
+            user._access = AccessContext(user)
+        return self.get_response(request)
+
+
 def get_role(user):
     """Effective role string for a user. Superusers are always administrators."""
-    if not user or not user.is_authenticated:
-        return None
-    if user.is_superuser:
-        return ADMIN_SLUG
-    profile = getattr(user, 'profile', None)
-    return getattr(profile, 'role', None) or Role.STAFF.value
+    return access_for(user).role
 
 
 def role_label(user):
-    role = get_role(user)
-    if not role:
-        return 'Standard User'
-    return role_labels().get(role) or dict(Role.choices).get(role) or 'Standard User'
+    return access_for(user).role_label
 
 
 def can(user, module, action):
     """True when ``user`` may perform ``action`` on ``module``."""
-    role = get_role(user)
-    if role is None:
-        return False
-    return action in role_matrix().get(role, {}).get(module, ())
+    return access_for(user).can(module, action)
 
 
 def perms_payload(user):
     """Serialise the user's matrix for Inertia props: {module: [actions]}."""
-    role = get_role(user)
-    matrix = role_matrix().get(role, {})
-    return {
-        module: sorted(actions)
-        for module, actions in matrix.items()
-        if actions
-    }
+    return dict(access_for(user).perms)
 
 
 def allowed_companies(user):
     """Companies this user may switch the workspace to."""
-    everything = [Company.KONOZ.value, Company.IJABAH.value]
-    if not user or not user.is_authenticated:
-        return everything
-    if user.is_superuser:
-        return everything
-    profile = getattr(user, 'profile', None)
-    access = getattr(profile, 'company_access', None) or CompanyAccess.ALL.value
-    if access == CompanyAccess.ALL.value:
-        return everything
-    return [access]
+    return list(access_for(user).companies)
 
 
 def default_company(user):
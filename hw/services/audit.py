@@ -0,0 +1,123 @@
+"""Buffered ActivityLog writer.
+
+log_activity() only appends the (unsaved) entry to a per-process buffer;
+the rows are written with one bulk_create when
+
+  * the request finishes (`request_finished` is sent after the response
+    has gone out, so the user never waits for the audit insert),
+  * the buffer reaches AUDIT_BUFFER_SIZE entries (long management
+    commands / qcluster tasks),
+  * every AUDIT_FLUSH_INTERVAL seconds, from a background thread, for
+    whatever is left over outside a request,
+  * the process exits — gunicorn recycling a worker (--max-requests)
+    runs the atexit hook.
+
+If the insert fails the rows are handed to the `write_activity_log`
+django-q task instead of being dropped; if even enqueueing fails they go
+back into the buffer for the next flush.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, transaction
+from django.dispatch import receiver
+from django_q.tasks import async_task
+
+from ..models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ('user_id', 'action', 'model_name', 'object_ref', 'company', 'changes', 'timestamp')
+
+
+def serialize(entry):
+    return {name: getattr(entry, name) for name in _FIELDS}
+
+
+class AuditBuffer:
+    def __init__(self):
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= settings.AUDIT_BUFFER_SIZE
+        if full:
+            self.flush()
+        else:
+            self._ensure_timer()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of entries."""
+        with self._lock:
+            entries, self._pending = self._pending, []
+        if not entries:
+            return 0
+        try:
+            # Savepoint: kalau flush jatuh di dalam atomic() milik view,
+            # insert yang gagal tidak merusak transaksi view tersebut.
+            with transaction.atomic():
+                ActivityLog.objects.bulk_create(entries, batch_size=500)
+        except DatabaseError:
+            logger.warning("ActivityLog flush failed, handing %d rows to the queue", len(entries), exc_info=True)
+            try:
+                async_task('hw.tasks.write_activity_log', [serialize(e) for e in entries])
+            except Exception:
+                logger.exception("Could not queue ActivityLog rows, keeping them buffered")
+                with self._lock:
+                    self._pending[:0] = entries
+        return len(entries)
+
+    def _ensure_timer(self):
+        if self._thread is not None or settings.AUDIT_FLUSH_INTERVAL <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._wake.wait(settings.AUDIT_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("ActivityLog timer flush failed")
+            finally:
+                # Koneksi milik thread ini; jangan dibiarkan menggantung.
+                connections.close_all()
+
+    def _after_fork(self):
+        # Worker hasil fork tidak mewarisi thread timer, dan entry milik
+        # proses induk akan di-flush oleh induknya sendiri.
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.flush)
+os.register_at_fork(after_in_child=buffer._after_fork)
+
+
+def record(entry):
+    buffer.record(entry)
+
+
+def flush():
+    return buffer.flush()
+
+
+@receiver(request_finished)
+def _flush_after_request(sender, **kwargs):
+    buffer.flush()
@@ -0,0 +1,271 @@
+"""Dashboard KPIs for the home page.
+
+Everything the Home/Index page shows is computed here in a fixed handful of
+grouped queries, so the cost tracks the number of widgets rather than the
+number of CLs/invoices a company has accumulated. Both sections are cached
+per company per day and dropped by invalidate_dashboard() (wired to CL, invoice,
+payment, reservation, remittance and client writes in signals.py).
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from ..models import ConfirmationLetter, Invoice, Payment, Remittance
+from ..models.choices import Company
+from ..models.invoice import payment_sar_expression
+
+DASHBOARD_CACHE_TTL = 600
+
+# The page is built in two halves that are computed and cached separately:
+# the summary (KPI cards, payment donut, funnel) ships with the first render,
+# the charts are partial-reloaded by the page once it is on screen.
+SUMMARY_KEYS = ("kpis", "payment_snapshot", "top_hotels_total", "reservation_funnel")
+CHART_KEYS = ("cl_trend", "cl_daily", "recent_cls", "top_hotels", "region_data")
+SECTIONS = ("summary", "charts")
+
+
+def _cache_key(company, today, section):
+    return f'hw:dashboard:v2:{company}:{today.isoformat()}:{section}'
+
+
+def invalidate_dashboard(company=None):
+    """Drop today's cached dashboard for one company, or for all of them."""
+    today = date.today()
+    companies = [company] if company else list(Company.values)
+    cache.delete_many([_cache_key(c, today, s) for c in companies for s in SECTIONS])
+
+
+def get_dashboard(company, today=None, sections=SECTIONS):
+    """Cached dashboard payload for the given sections, merged into one dict.
+    All requested sections are read in a single cache round-trip."""
+    today = today or date.today()
+    keys = {section: _cache_key(company, today, section) for section in sections}
+    cached = cache.get_many(keys.values())
+    data = {}
+    for section, key in keys.items():
+        part = cached.get(key)
+        if part is None:
+            part = _BUILDERS[section](company, today)
+            cache.set(key, part, DASHBOARD_CACHE_TTL)
+        data.update(part)
+    return data
+
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _prev_month_start(d):
+    return (_month_start(d) - timedelta(days=1)).replace(day=1)
+
+
+def _pct(cur, prev):
+    if not prev:
+        return None
+    pct = round(((cur - prev) / prev) * 100)
+    return {"dir": "flat" if pct == 0 else ("up" if pct > 0 else "down"),
+            "pct": abs(pct), "cur": cur, "prev": prev}
+
+
+def _local_midnight(d):
+    """Aware datetime for the start of local day `d`. Filtering created_at on
+    ranges (instead of __date/__month lookups) keeps the comparison on the
+    raw indexed column rather than a per-row timezone conversion."""
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _cl_counts(cls, today):
+    """Every scalar CL count on the page in one pass."""
+    week_ahead = today + timedelta(days=7)
+    month_start = _month_start(today)
+    next_month_start = (month_start + timedelta(days=31)).replace(day=1)
+    return cls.aggregate(
+        total=Count('id'),
+        month=Count('id', filter=Q(
+            created_at__gte=_local_midnight(month_start),
+            created_at__lt=_local_midnight(next_month_start),
+        )),
+        prev_month=Count('id', filter=Q(
+            created_at__gte=_local_midnight(_prev_month_start(today)),
+            created_at__lt=_local_midnight(month_start),
+        )),
+        upcoming=Count('id', filter=Q(check_in__gte=today, check_in__lte=week_ahead)),
+        # Prior 7-day window (actual check-ins) — the reference for the
+        # "Check-ins Next 7 Days" MoM-style delta.
+        prev_checkins=Count('id', filter=Q(check_in__gte=today - timedelta(days=7), check_in__lt=today)),
+        confirmed=Count('id', filter=Q(reservation_status='DEFINITE')),
+        completed=Count('id', filter=Q(reservation_status='DEFINITE', check_out__lte=today)),
+    )
+
+
+def _cl_trends(cls, today):
+    """12-month and 30-day CL series from a single per-day GROUP BY.
+
+    The monthly series is the 12 full months ending last month; the daily
+    one runs up to today. Both are zero-filled so quiet spans still show a
+    labeled baseline instead of a gap."""
+    twelve_months_start = _prev_month_start(today)
+    for _ in range(11):
+        twelve_months_start = _prev_month_start(twelve_months_start)
+
+    counts_by_day = dict(
+        cls.filter(created_at__gte=_local_midnight(twelve_months_start))
+        .values('created_at__date')
+        .annotate(n=Count('id'))
+        .values_list('created_at__date', 'n')
+    )
+    counts_by_month = {}
+    for d, n in counts_by_day.items():
+        k = d.strftime('%Y-%m')
+        counts_by_month[k] = counts_by_month.get(k, 0) + n
+
+    cl_trend = []
+    cursor = twelve_months_start
+    for _ in range(12):
+        cl_trend.append({"label": cursor.strftime("%b"), "count": counts_by_month.get(cursor.strftime("%Y-%m"), 0)})
+        cursor = (cursor.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    thirty_days_start = today - timedelta(days=29)
+    cl_daily = []
+    for i in range(30):
+        d = thirty_days_start + timedelta(days=i)
+        cl_daily.append({"label": d.strftime("%b %d"), "count": counts_by_day.get(d, 0)})
+
+    return cl_trend, cl_daily
+
+
+def _invoice_balances(company, today):
+    hotel_invoices = Invoice.objects.filter(invoice_type="hotel", company=company)
+    balances = hotel_invoices.aggregate(
+        billed=Sum('billed_sar'),
+        paid=Sum('paid_sar'),
+        unpaid_count=Count('pk', filter=Q(balance_sar__gt=0)),
+        unpaid_total=Sum('balance_sar', filter=Q(balance_sar__gt=0)),
+    )
+
+    # Outstanding SAR as of the end of last month — bills issued before this
+    # month minus payments dated before this month. Powers the unpaid delta.
+    month_start = _month_start(today)
+    paid_before = (
+        Payment.objects.filter(invoice=OuterRef('pk'), payment_date__lt=month_start)
+        .values('invoice').annotate(t=Sum(payment_sar_expression())).values('t')
+    )
+    prev_unpaid = (
+        hotel_invoices.filter(created_at__lt=_local_midnight(month_start))
+        .annotate(_paid_before=Coalesce(Subquery(paid_before, output_field=IntegerField()), 0))
+        .aggregate(t=Sum(Greatest(F('billed_sar') - F('_paid_before'), Value(0))))
+    )['t'] or 0
+    return {
+        'billed': balances['billed'] or 0,
+        'paid': balances['paid'] or 0,
+        'unpaid_count': balances['unpaid_count'],
+        'unpaid_total': balances['unpaid_total'] or 0,
+        'prev_unpaid_total': prev_unpaid,
+    }
+
+
+def _remittance_counts(today):
+    """Konoz pending remittances: overall, dated this month and last month."""
+    month_start = _month_start(today)
+    next_month_start = (month_start + timedelta(days=31)).replace(day=1)
+    prev_month_start = _prev_month_start(today)
+    return Remittance.objects.filter(
+        company=Company.KONOZ, status=Remittance.STATUS_PENDING,
+    ).aggregate(
+        pending=Count('id'),
+        this_month=Count('id', filter=Q(date__gte=month_start, date__lt=next_month_start)),
+        prev_month=Count('id', filter=Q(date__gte=prev_month_start, date__lt=month_start)),
+    )
+
+
+def build_summary(company, today):
+    """Uncached KPI cards, payment snapshot and funnel. Remittance figures are
+    always included (Konoz only); the view hides them from users without
+    remittance access."""
+    cls = ConfirmationLetter.objects.filter(company=company)
+    counts = _cl_counts(cls, today)
+    inv = _invoice_balances(company, today)
+    rem = _remittance_counts(today) if company == Company.KONOZ else None
+    return {
+        "kpis": {
+            "cl_month": counts['month'],
+            "upcoming_checkins": counts['upcoming'],
+            "unpaid_invoices": inv['unpaid_count'],
+            "unpaid_total": inv['unpaid_total'],
+            "remittance_pending": rem['pending'] if rem else None,
+            "deltas": {
+                "cl_month": _pct(counts['month'], counts['prev_month']),
+                "checkins": _pct(counts['upcoming'], counts['prev_checkins']),
+                "unpaid": _pct(inv['unpaid_total'], inv['prev_unpaid_total']),
+                "remittance": _pct(rem['this_month'], rem['prev_month']) if rem else None,
+            },
+        },
+        "payment_snapshot": {
+            "billed": inv['billed'],
+            "collected": inv['paid'],
+            "outstanding": max(inv['billed'] - inv['paid'], 0),
+        },
+        "top_hotels_total": counts['total'],
+        # Each funnel stage is a strict subset of the previous one so the bars
+        # shrink monotonically: every CL → confirmed (DEFINITE) → completed.
+        "reservation_funnel": [
+            {"label": "total", "value": counts['total']},
+            {"label": "confirmed", "value": counts['confirmed']},
+            {"label": "completed", "value": counts['completed']},
+        ],
+    }
+
+
+def build_charts(company, today):
+    """Uncached trend series, recent CLs and the third-row widgets."""
+    cls = ConfirmationLetter.objects.filter(company=company)
+    cl_trend, cl_daily = _cl_trends(cls, today)
+
+    # Third-row widgets — Homlu "Top countries" becomes top hotels by total CL
+    # volume (all-time), "World map" becomes an Indonesia client-region heat
+    # map, and "Conversion funnel" becomes the reservation lifecycle. All are
+    # honest to current data: quiet panels simply show their empty state and
+    # light up as hotels/provinces/statuses get recorded.
+    top_hotels = [
+        {"hotel": row["hotel_name"], "count": row["n"]}
+        for row in cls.values("hotel_name").annotate(n=Count("id")).order_by("-n")[:5]
+    ]
+    region_data = [
+        {"province": row["client__province"], "count": row["n"]}
+        for row in (
+            cls.exclude(client__isnull=True)
+            .exclude(client__province="")
+            .values("client__province")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+        )
+    ]
+    recent_cls = [
+        {
+            "id": cl.id,
+            "confirmation_number": cl.confirmation_number,
+            "guest_name": cl.guest_name,
+            "hotel_name": cl.hotel_name,
+            "check_in": cl.check_in.isoformat() if cl.check_in else None,
+            "reservation_status": cl.reservation_status,
+        }
+        for cl in cls.order_by("-created_at")[:6]
+    ]
+    return {
+        "cl_trend": cl_trend,
+        "cl_daily": cl_daily,
+        "recent_cls": recent_cls,
+        "top_hotels": top_hotels,
+        "region_data": region_data,
+    }
+
+
+_BUILDERS = {"summary": build_summary, "charts": build_charts}
+
+
+def build_dashboard(company, today):
+    """Uncached payload for the whole page (both sections)."""
+    return {**build_summary(company, today), **build_charts(company, today)}
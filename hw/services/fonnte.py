@@ -1,38 +1,216 @@
+"""WhatsApp delivery through the Fonnte API.
+
+All sends share one pooled `requests.Session` (keep-alive, so no TLS
+handshake per message). A send is retried with exponential backoff when
+the request never reached Fonnte (connect error / connect timeout) or
+Fonnte answered 429/5xx. After FONNTE_BREAKER_THRESHOLD failed sends in a
+row the circuit opens and every send fails fast for
+FONNTE_BREAKER_COOLDOWN seconds, so a Fonnte outage costs a batch a few
+timeouts instead of one per target. `send_all` fans a batch out over
+FONNTE_MAX_CONCURRENCY threads.
+
+The queued sends in hw/tasks.py also ask rate_limit_wait() first: a token
+bucket in the database (SendRateBucket) shared by all qcluster workers,
+one global and one per target.
+
+FONNTE_API_URL is a setting so tests can point the client at a local fake
+server (hw/tests/fonnte_fake.py).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def send_wa(target: str, message: str) -> dict:
-    try:
-        resp = requests.post(
-            'https://api.fonnte.com/send',
-            headers={'Authorization': settings.FONNTE_TOKEN},
-            data={'target': target, 'message': message},
-            timeout=10,
-        )
+UNREACHABLE = 'Cannot connect to Fonnte API — check network connection'
+TIMED_OUT = 'Fonnte API request timed out'
+CIRCUIT_OPEN = 'Fonnte API unavailable, sending paused after repeated failures'
+THROTTLED = 'Fonnte API rate limit reached'
+
+
+class _Retryable(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker. Open: allow() is False until the
+    cooldown passes; then one trial send is let through (half-open) and its
+    outcome closes or re-opens the circuit."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class FonnteClient:
+    def __init__(self, url, token, pool_size=8, max_retries=3, backoff=0.5,
+                 connect_timeout=5, breaker=None):
+        self.url = url
+        self.token = token
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker or CircuitBreaker(threshold=5, cooldown=60)
+        self.session = requests.Session()
+        # Retry ditangani sendiri (lihat send): urllib3 tidak tahu mana yang
+        # aman diulang untuk POST.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, data, files=None, read_timeout=10):
+        if not self.breaker.allow():
+            return {'status': False, 'reason': CIRCUIT_OPEN}
+        result, ok = self._send_with_retries(data, files, read_timeout)
+        self.breaker.record(ok)
+        return result
+
+    def _send_with_retries(self, data, files, read_timeout):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                return self._post(data, files, read_timeout), True
+            except _Retryable as exc:
+                reason = exc.reason
+            except requests.exceptions.Timeout:
+                # Read timeout: Fonnte mungkin sudah mengantre pesannya, jadi
+                # tidak diulang (tamu bisa dapat pesan dobel).
+                return {'status': False, 'reason': TIMED_OUT}, False
+            except requests.exceptions.RequestException as exc:
+                return {'status': False, 'reason': str(exc)}, False
+        return {'status': False, 'reason': reason}, False
+
+    def _post(self, data, files, read_timeout):
+        try:
+            resp = self.session.post(
+                self.url,
+                headers={'Authorization': self.token},
+                data=data,
+                files=files,
+                timeout=(self.connect_timeout, read_timeout),
+            )
+        except (requests.exceptions.ConnectTimeout, requests.exceptions.ConnectionError) as exc:
+            # ConnectTimeout juga turunan ConnectionError: request belum
+            # sampai ke Fonnte, aman diulang.
+            raise _Retryable(TIMED_OUT if isinstance(exc, requests.exceptions.ConnectTimeout) else UNREACHABLE)
+        if resp.status_code == 429:
+            raise _Retryable(THROTTLED)
+        if resp.status_code in RETRY_STATUSES:
+            raise _Retryable(f'Fonnte API returned HTTP {resp.status_code}')
         return resp.json()
-    except requests.exceptions.ConnectionError:
-        return {'status': False, 'reason': 'Cannot connect to Fonnte API — check network connection'}
-    except requests.exceptions.Timeout:
-        return {'status': False, 'reason': 'Fonnte API request timed out'}
-    except requests.exceptions.RequestException as exc:
-        return {'status': False, 'reason': str(exc)}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FonnteClient(
+                url=settings.FONNTE_API_URL,
+                token=settings.FONNTE_TOKEN,
+                pool_size=settings.FONNTE_MAX_CONCURRENCY,
+                max_retries=settings.FONNTE_MAX_RETRIES,
+                backoff=settings.FONNTE_BACKOFF_SECONDS,
+                connect_timeout=settings.FONNTE_CONNECT_TIMEOUT,
+                breaker=CircuitBreaker(settings.FONNTE_BREAKER_THRESHOLD, settings.FONNTE_BREAKER_COOLDOWN),
+            )
+        return _client
+
+
+def reset_client():
+    """Drop the shared client (and its breaker state); the next send builds
+    a new one from the current settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
+
+
+@receiver(setting_changed)
+def _fonnte_setting_changed(setting, **kwargs):
+    if setting.startswith('FONNTE_'):
+        reset_client()
+
+
+def rate_limit_wait(target):
+    """Take a send slot for `target` from the shared buckets. 0 means go
+    ahead; otherwise the seconds to wait before trying again."""
+    from ..models import SendRateBucket
+
+    per_minute, burst = settings.FONNTE_RATE_LIMIT
+    target_per_minute, target_burst = settings.FONNTE_TARGET_RATE_LIMIT
+    return SendRateBucket.take({
+        'global': (per_minute / 60, burst),
+        f'target:{target}': (target_per_minute / 60, target_burst),
+    })
+
+
+def send_wa(target: str, message: str) -> dict:
+    return get_client().send({'target': target, 'message': message}, read_timeout=settings.FONNTE_READ_TIMEOUT)
 
 
 def send_wa_file(target: str, message: str, file_bytes: bytes, filename: str) -> dict:
     """Send one WA message with a document attachment (message becomes the caption)."""
-    try:
-        resp = requests.post(
-            'https://api.fonnte.com/send',
-            headers={'Authorization': settings.FONNTE_TOKEN},
-            data={'target': target, 'message': message},
-            files={'file': (filename, file_bytes, 'application/pdf')},
-            timeout=30,
-        )
-        return resp.json()
-    except requests.exceptions.ConnectionError:
-        return {'status': False, 'reason': 'Cannot connect to Fonnte API — check network connection'}
-    except requests.exceptions.Timeout:
-        return {'status': False, 'reason': 'Fonnte API request timed out'}
-    except requests.exceptions.RequestException as exc:
-        return {'status': False, 'reason': str(exc)}
+    return get_client().send(
+        {'target': target, 'message': message},
+        files={'file': (filename, file_bytes, 'application/pdf')},
+        read_timeout=max(30, settings.FONNTE_READ_TIMEOUT),
+    )
+
+
+def send_all(jobs, send=send_wa):
+    """Send every (target, message) in `jobs` over at most
+    FONNTE_MAX_CONCURRENCY threads; results come back in job order. An
+    exception from `send` becomes a failed result instead of aborting the
+    batch. Callers pass their own `send` so a patched send_wa is used."""
+    def one(job):
+        try:
+            return send(*job)
+        except Exception as exc:
+            return {'status': False, 'reason': str(exc)}
+
+    jobs = list(jobs)
+    if len(jobs) <= 1:
+        return [one(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=min(settings.FONNTE_MAX_CONCURRENCY, len(jobs))) as pool:
+        return list(pool.map(one, jobs))
@@ -0,0 +1,106 @@
+"""Per-process asset registry for the WeasyPrint renderer.
+
+Every PDF used to pay the same setup again: the company logo was read from
+disk and base64-encoded, WeasyPrint re-parsed that data URI and the
+template's <style> block, and a fresh FontConfiguration re-discovered the
+system fonts. None of that depends on the document, so it is done once here
+and reused:
+
+- logo_data_uri(): the encoded logo per company, computed once per process.
+- font_config(): one FontConfiguration, shared by every render.
+- split_stylesheets(): the <style> block of each hw/*/*_pdf*.html template is
+  parsed into a weasyprint.CSS once; when a rendered document carries one of
+  those exact blocks it is lifted out of the HTML and the parsed sheet is
+  passed to write_pdf() instead. Unknown blocks are left inline.
+- image_cache(): WeasyPrint's image cache, so the logo is decoded once.
+
+WeasyPrint objects aren't documented as thread-safe, so the parsed state is
+kept per thread; qcluster workers are single-threaded processes, which makes
+that once per process in practice.
+"""
+import base64
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from weasyprint import CSS
+from weasyprint.text.fonts import FontConfiguration
+
+_APP_DIR = Path(__file__).resolve().parent.parent
+_LOGO_DIR = _APP_DIR / 'static' / 'hw' / 'img'
+_PDF_TEMPLATES = 'hw/*/*_pdf*.html'
+_STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S)
+
+LOGO_FILES = {'ijabah': 'ijabahlogo.png'}
+DEFAULT_LOGO = 'LOGOKONOZ-02.png'
+
+_local = threading.local()
+
+
+def encode_logo(company):
+    """Read and base64-encode a company logo (uncached; see logo_data_uri)."""
+    data = (_LOGO_DIR / LOGO_FILES.get(company, DEFAULT_LOGO)).read_bytes()
+    return f"data:image/png;base64,{base64.b64encode(data).decode()}"
+
+
+@lru_cache(maxsize=None)
+def logo_data_uri(company):
+    return encode_logo(company)
+
+
+def _template_style_blocks():
+    blocks = set()
+    for path in sorted((_APP_DIR / 'templates').glob(_PDF_TEMPLATES)):
+        for body in _STYLE_RE.findall(path.read_text(encoding='utf-8')):
+            # Blok yang memakai sintaks template berubah per dokumen.
+            if '{{' not in body and '{%' not in body:
+                blocks.add(body)
+    return blocks
+
+
+def _state():
+    state = getattr(_local, 'state', None)
+    if state is None:
+        fonts = FontConfiguration()
+        base_url = str(settings.BASE_DIR)
+        state = _local.state = {
+            'font_config': fonts,
+            'image_cache': {},
+            'stylesheets': {
+                body: CSS(string=body, base_url=base_url, font_config=fonts)
+                for body in _template_style_blocks()
+            },
+        }
+    return state
+
+
+def font_config():
+    return _state()['font_config']
+
+
+def image_cache():
+    return _state()['image_cache']
+
+
+def split_stylesheets(html):
+    """Return (html, stylesheets): known template <style> blocks removed from
+    the HTML and handed back as pre-parsed CSS, in document order."""
+    parsed = _state()['stylesheets']
+    sheets = []
+
+    def lift(match):
+        sheet = parsed.get(match.group(1))
+        if sheet is None:
+            return match.group(0)
+        sheets.append(sheet)
+        return ''
+
+    return _STYLE_RE.sub(lift, html), sheets
+
+
+def reset():
+    """Drop everything cached (tests, or after editing templates in a shell)."""
+    logo_data_uri.cache_clear()
+    _local.__dict__.pop('state', None)
@@ -0,0 +1,112 @@
+"""Bulk PDF export: every CL or invoice matching a list filter, in one zip.
+
+The web request only resolves the filter to a list of ids and queues a
+PdfJob (see _pdf_bundle_response in hw/views/pdf.py). The qcluster worker
+then, in build_bundle():
+
+1. rebuilds each document's render context and looks its key up in the
+   artifact store, so PDFs already rendered (by a single download or an
+   earlier bundle) are reused as-is;
+2. lays out the missing ones in a process pool. WeasyPrint is pure Python
+   and CPU-bound, so threads would just queue up on the GIL;
+3. writes the zip straight from the stored files.
+
+The pool forks the worker process (Linux only), which is why qcluster workers
+must not be daemonic (Q_CLUSTER['daemonize_workers']).
+"""
+import json
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import PurePath
+
+from django.conf import settings
+from django.db import connections
+
+from . import pdf_store
+
+KINDS = ('cl', 'invoice')
+
+
+def manifest(kind, ids):
+    return json.dumps({'kind': kind, 'ids': list(ids)})
+
+
+def _documents(kind, ids):
+    """Yield (template, context, filename) per id, in the order given."""
+    from ..models import ConfirmationLetter, Invoice
+    from ..views.pdf import _cl_pdf_source, _invoice_pdf_source
+
+    if kind == 'cl':
+        qs = ConfirmationLetter.objects.prefetch_related('rooms')
+        source = _cl_pdf_source
+    else:
+        qs = Invoice.objects.prefetch_related('reservations', 'payments', 'confirmation_letters')
+        source = _invoice_pdf_source
+    by_pk = qs.in_bulk(ids)
+    for pk in ids:
+        if pk in by_pk:  # terhapus sejak diantrikan
+            yield source(by_pk[pk])
+
+
+def _layout(html):
+    from ..views.pdf import _write_pdf
+    return _write_pdf(html)
+
+
+def render_missing(pending, processes=None):
+    """Lay out {key: html} and store each PDF. Runs in a process pool when
+    there is more than one document and PDF_RENDER_PROCESSES allows it."""
+    processes = min(processes or settings.PDF_RENDER_PROCESSES, len(pending))
+    if processes <= 1:
+        for key, html in pending.items():
+            pdf_store.put(key, _layout(html))
+        return
+    # Koneksi DB jangan ikut diwariskan ke proses anak (Django docs: tutup
+    # sebelum fork); induk membuka ulang saat dibutuhkan.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=get_context('fork')) as pool:
+        for key, pdf in zip(pending, pool.map(_layout, pending.values())):
+            pdf_store.put(key, pdf)
+
+
+def _unique(name, seen):
+    stem, suffix = PurePath(name).stem, PurePath(name).suffix
+    candidate, n = name, 1
+    while candidate in seen:
+        n += 1
+        candidate = f'{stem}-{n}{suffix}'
+    seen.add(candidate)
+    return candidate
+
+
+def build_bundle(key):
+    """Render and zip the bundle queued under `key`. Returns the member count."""
+    from ..views.pdf import _pdf_key, _render_html
+
+    spec = json.loads(pdf_store.get_source(key, pdf_store.MANIFEST_SUFFIX) or 'null')
+    if not spec or spec.get('kind') not in KINDS:
+        raise ValueError('bundle manifest missing')
+
+    members, pending = [], {}
+    for template, context, filename in _documents(spec['kind'], spec['ids']):
+        member_key, html = _pdf_key(template, context)
+        hit = member_key in pending or pdf_store.artifact_path(member_key) is not None
+        pdf_store.record(hit=hit)
+        if not hit:
+            pending[member_key] = html or _render_html(template, context)
+        members.append((member_key, filename))
+    render_missing(pending)
+
+    seen = set()
+    with pdf_store.writing(key, pdf_store.ZIP_SUFFIX) as f:
+        # PDF sudah terkompresi; ZIP_STORED menghemat CPU tanpa rugi ukuran.
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED) as zf:
+            for member_key, filename in members:
+                path = pdf_store.artifact_path(member_key)
+                if path is None:
+                    raise RuntimeError(f'{filename} was evicted before it could be zipped')
+                zf.write(path, arcname=_unique(filename, seen))
+    pdf_store.drop_source(key, pdf_store.MANIFEST_SUFFIX)
+    pdf_store.evict_over_budget()
+    return len(members)
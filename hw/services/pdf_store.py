@@ -0,0 +1,261 @@
+"""Content-addressed filesystem store for rendered PDFs.
+
+Artifacts live under settings.PDF_ARTIFACT_ROOT, one file per key, sharded
+by the first two hex characters. A key is the sha256 of everything that
+goes into a document: the template (name + a fingerprint of its source) and
+the full render context (context_key). Any edit that changes what the PDF
+shows — a payment, a reservation, a renamed CL — changes the context and
+therefore the key, so entries never go stale and nothing has to be
+invalidated. Contexts that carry model instances can't be digested safely;
+those fall back to the sha256 of the rendered HTML (content_key).
+
+The directory must be shared by the web process and the qcluster worker:
+the web side drops the HTML source next to where the PDF will land, the
+worker renders it and writes the PDF back. Bulk exports (pdf_bundle) store a
+JSON manifest the same way and get a .zip artifact back.
+
+Writes go through a temp file + os.replace so a reader never sees a
+half-written PDF. Every hit touches the file's mtime, which makes eviction
+LRU: artifacts idle for longer than PDF_ARTIFACT_TTL seconds are treated as
+missing, and once the store grows past PDF_ARTIFACT_MAX_BYTES the least
+recently used files are dropped. Hits and misses are counted in the
+PDF_STATS_CACHE alias (see stats() and the pdf_store_stats command).
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.fields.files import FieldFile
+from django.template.loader import get_template
+
+PDF_SUFFIX = '.pdf'
+ZIP_SUFFIX = '.zip'
+SOURCE_SUFFIX = '.html'
+MANIFEST_SUFFIX = '.json'
+# Berkas hasil render (ikut anggaran ukuran / LRU) vs. input untuk worker.
+ARTIFACT_SUFFIXES = (PDF_SUFFIX, ZIP_SUFFIX)
+INPUT_SUFFIXES = (SOURCE_SUFFIX, MANIFEST_SUFFIX)
+
+# Setelah melewati batas, pangkas sampai fraksi ini supaya tidak setiap put
+# memicu eviction lagi.
+_TRIM_TO = 0.9
+
+_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+_COUNTER_KEYS = {'hits': 'hw:pdf_store:hits', 'misses': 'hw:pdf_store:misses'}
+
+
+def content_key(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, FieldFile):
+        return value.name or ''
+    # Model instance, queryset, dsb.: str() tidak mewakili semua field yang
+    # mungkin dibaca template, jadi jangan ditebak.
+    raise TypeError(f'{type(value).__name__} is not plain render data')
+
+
+@lru_cache(maxsize=64)
+def _source_digest(path, mtime_ns):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _template_fingerprint(template_name):
+    origin = get_template(template_name).origin.name
+    return _source_digest(origin, os.stat(origin).st_mtime_ns)
+
+
+def context_key(template_name, context, language=None):
+    """Key for a PDF from its render inputs, or None when the context holds
+    anything other than plain data (dicts, lists, strings, numbers, dates)."""
+    try:
+        payload = json.dumps(
+            [template_name, _template_fingerprint(template_name), language, context],
+            sort_keys=True, default=_plain, separators=(',', ':'),
+        )
+    except TypeError:
+        return None
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _root():
+    return Path(settings.PDF_ARTIFACT_ROOT)
+
+
+def _path(key, suffix):
+    # Key datang dari URL job; tolak apa pun selain hex sha256 supaya tidak
+    # bisa keluar dari direktori store.
+    if not _KEY_RE.match(key or ''):
+        raise ValueError(f'invalid artifact key: {key!r}')
+    return _root() / key[:2] / f'{key}{suffix}'
+
+
+def _expired(path, now=None):
+    try:
+        age = (now or time.time()) - path.stat().st_mtime
+    except FileNotFoundError:
+        return True
+    if age <= settings.PDF_ARTIFACT_TTL:
+        return False
+    path.unlink(missing_ok=True)
+    return True
+
+
+@contextmanager
+def writing(key, suffix=PDF_SUFFIX):
+    """Open a temp file that atomically becomes the `key` artifact once the
+    block exits cleanly; for artifacts written piecewise (zip bundles)."""
+    path = _path(key, suffix)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _write(key, suffix, data):
+    with writing(key, suffix) as f:
+        f.write(data)
+
+
+def artifact_path(key, suffix=PDF_SUFFIX):
+    """Path of a live artifact, or None when it's missing or expired.
+    A live artifact is touched so LRU eviction sees it as recently used."""
+    path = _path(key, suffix)
+    if _expired(path):
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def get(key):
+    path = artifact_path(key)
+    if path is None:
+        return None
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def put(key, pdf, suffix=PDF_SUFFIX):
+    _write(key, suffix, pdf)
+    evict_over_budget()
+
+
+def put_source(key, html, suffix=SOURCE_SUFFIX):
+    _write(key, suffix, html.encode('utf-8'))
+
+
+def get_source(key, suffix=SOURCE_SUFFIX):
+    try:
+        return _path(key, suffix).read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def drop_source(key, suffix=SOURCE_SUFFIX):
+    _path(key, suffix).unlink(missing_ok=True)
+
+
+def _artifacts():
+    root = _root()
+    if not root.exists():
+        return []
+    return [p for p in root.glob('*/*') if p.suffix in ARTIFACT_SUFFIXES]
+
+
+def evict_expired():
+    """Remove every artifact and leftover source past the TTL. Returns the count."""
+    root = _root()
+    if not root.exists():
+        return 0
+    now = time.time()
+    removed = 0
+    for path in root.glob('*/*'):
+        # .tmp-* = sisa tulisan yang terputus (worker mati di tengah jalan).
+        tracked = path.suffix in ARTIFACT_SUFFIXES + INPUT_SUFFIXES or path.name.startswith('.tmp-')
+        if tracked and _expired(path, now):
+            removed += 1
+    return removed
+
+
+def evict_over_budget():
+    """Drop least recently used artifacts while the store is over
+    PDF_ARTIFACT_MAX_BYTES. Returns the number of files removed."""
+    budget = settings.PDF_ARTIFACT_MAX_BYTES
+    entries = []
+    total = 0
+    for path in _artifacts():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    if total <= budget:
+        return 0
+    removed = 0
+    target = budget * _TRIM_TO
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _counters():
+    return caches[settings.PDF_STATS_CACHE]
+
+
+def record(hit):
+    key = _COUNTER_KEYS['hits' if hit else 'misses']
+    cache = _counters()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Baris counter terhapus di antara add dan incr (cache.clear()).
+        cache.set(key, 1, None)
+
+
+def stats():
+    counters = _counters().get_many(_COUNTER_KEYS.values())
+    files = _artifacts()
+    return {
+        'hits': counters.get(_COUNTER_KEYS['hits'], 0),
+        'misses': counters.get(_COUNTER_KEYS['misses'], 0),
+        'files': len(files),
+        'bytes': sum(p.stat().st_size for p in files if p.exists()),
+    }
+
+
+def clear():
+    """Empty the store and reset the counters."""
+    shutil.rmtree(_root(), ignore_errors=True)
+    _counters().delete_many(_COUNTER_KEYS.values())
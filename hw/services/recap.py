@@ -100,7 +100,16 @@ def group_guests(cls: list) -> dict:
     return groups
 
 
-def build_grouped_reminder_message(cls: list, reminder_type: str, recipient_name: str) -> str:
+def reminder_template(reminder_type: str) -> str:
+    """The grouped reminder template for H1_GUEST / H0_GUEST (DB row or default)."""
+    if reminder_type == 'H1_GUEST':
+        return _get_template_body('H1_GUEST', TEMPLATE_H1_CLIENT)
+    return _get_template_body('H0_GUEST', TEMPLATE_H0_CLIENT)
+
+
+def build_grouped_reminder_message(cls: list, reminder_type: str, recipient_name: str, template: str = None) -> str:
+    """`template`: pass reminder_template() when building many messages, to
+    read the template once instead of once per message."""
     by_hotel = defaultdict(list)
     for cl in cls:
         by_hotel[cl.hotel_name].append(cl)
@@ -121,8 +130,7 @@ def build_grouped_reminder_message(cls: list, reminder_type: str, recipient_name
         ci = cls[0].check_in
         kwargs['check_in_date'] = ci.strftime('%d %b %Y') if ci else '-'
         kwargs['hari_relatif'] = _hari_relatif(ci)
-        return _render(_get_template_body('H1_GUEST', TEMPLATE_H1_CLIENT), **kwargs)
-    return _render(_get_template_body('H0_GUEST', TEMPLATE_H0_CLIENT), **kwargs)
+    return _render(template if template is not None else reminder_template(reminder_type), **kwargs)
 
 
 def build_recap_message(cls: list, recap_date=None) -> str:
@@ -0,0 +1,276 @@
+"""Indexed substring search over CLs, invoices, clients and hotels.
+
+Every search box in the app matches "contains, case-insensitive" across a
+few text columns. A plain icontains can't use a b-tree index, so each
+keystroke in the header search used to scan three tables. Two backends
+make the same lookup indexed:
+
+* PostgreSQL: migration 0055 adds pg_trgm GIN indexes on exactly the
+  expressions Django's icontains compiles to (UPPER(col::text)), so the
+  planner answers the plain icontains filter from the index.
+* Anything else (SQLite): SearchToken keeps a posting per distinct
+  lowercase trigram of each document, refreshed from the model signals.
+  A document that contains the query contains every trigram of it, so the
+  postings narrow the rows and the original icontains filter confirms them.
+
+Queries shorter than a trigram, and on SQLite queries made only of very
+common trigrams (see _plan), still run the plain icontains scan.
+
+match_q() is the building block for the list views; search() is the ranked
+cross-type API behind the header search box.
+"""
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
+from django.urls import reverse
+
+Source = namedtuple('Source', 'model filters fields module')
+
+# Urutan field = bobot saat ranking: field pertama adalah nomor/nama utama.
+SOURCES = {
+    'CL':     Source('ConfirmationLetter', {}, ('confirmation_number', 'guest_name', 'hotel_name'), 'cl'),
+    'INV':    Source('Invoice', {'invoice_type': 'hotel'}, ('invoice_number', 'customer_name'), 'invoice'),
+    'SVC':    Source('Invoice', {'invoice_type': 'visa'}, ('invoice_number', 'customer_name'), 'services'),
+    'CLIENT': Source('Client', {}, ('name', 'brand', 'city', 'pic'), 'clients'),
+    'HOTEL':  Source('Hotel', {}, ('name', 'area'), 'hotels'),
+}
+
+GRAM = 3
+# Gram tambahan jarang menyaring lebih jauh tapi tiap gram = satu lookup
+# posting per kandidat; sisanya tetap dicek oleh icontains.
+MAX_QUERY_GRAMS = 4
+# Frekuensi gram dihitung paling jauh sampai sini: cukup untuk membedakan
+# gram langka dari gram umum tanpa membaca seluruh posting.
+FREQUENCY_CAP = 1000
+
+
+def uses_token_table():
+    return connection.vendor != 'postgresql'
+
+
+def trigrams(text):
+    text = (text or '').lower()
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def query_grams(q):
+    """Trigrams of `q` worth looking up: non-overlapping ones plus the last,
+    so a long query costs a handful of lookups instead of one per character
+    while still pinning down all of it."""
+    q = (q or '').lower()
+    if len(q) < GRAM:
+        return []
+    starts = list(range(0, len(q) - GRAM + 1, GRAM))
+    if starts[-1] != len(q) - GRAM:
+        starts.append(len(q) - GRAM)
+    return list(dict.fromkeys(q[i:i + GRAM] for i in starts))
+
+
+def _text_q(kind, q):
+    text = Q()
+    for field in SOURCES[kind].fields:
+        text |= Q(**{f'{field}__icontains': q})
+    return text
+
+
+def _plan(kind, company, grams):
+    """Which postings to intersect for `grams`, rarest first.
+
+    None: one of the grams has no posting at all, nothing can match.
+    []: every gram is common (FREQUENCY_CAP or more postings). Such a query
+    matches a large share of the table, where a plain scan is cheaper than
+    walking postings, so the caller falls back to icontains alone.
+
+    The first gram drives the lookup, so starting from a rare one ("321" in
+    a confirmation number rather than the "cl-" every row shares) keeps the
+    walk short. Frequencies are capped counts over the posting index, all
+    grams in one grouped query: each gram contributes at most FREQUENCY_CAP
+    postings through its own LIMITed subquery.
+    """
+    from ..models import SearchToken
+
+    capped = reduce(or_, (
+        Q(pk__in=SearchToken.objects.filter(kind=kind, company=company, gram=gram).values('pk')[:FREQUENCY_CAP])
+        for gram in grams
+    ))
+    counts = dict(
+        SearchToken.objects.filter(capped).values('gram').annotate(n=Count('pk')).values_list('gram', 'n')
+    )
+    if len(counts) < len(grams):
+        return None
+    grams = sorted(grams, key=counts.__getitem__)
+    if counts[grams[0]] >= FREQUENCY_CAP:
+        return []
+    return grams[:MAX_QUERY_GRAMS]
+
+
+def _postings(kind, company, grams):
+    from ..models import SearchToken
+
+    postings = SearchToken.objects.filter(kind=kind, company=company, gram=grams[0])
+    for gram in grams[1:]:
+        postings = postings.filter(Exists(SearchToken.objects.filter(
+            kind=kind, company=company, gram=gram, object_id=OuterRef('object_id'),
+        )))
+    return postings.values_list('object_id', flat=True)
+
+
+def match_q(kind, company, q):
+    """Q for rows of `kind` in `company` whose searched fields contain `q`.
+
+    Same result as OR-ing icontains over SOURCES[kind].fields; on the token
+    table backend it also restricts pk to the trigram postings so the
+    icontains only runs on rows that can match.
+    """
+    text = _text_q(kind, q)
+    grams = query_grams(q)
+    if not (grams and uses_token_table()):
+        return text
+    grams = _plan(kind, company, grams)
+    if grams is None:
+        return Q(pk__in=[])
+    if not grams:
+        return text
+    # Daftar id literal, bukan subquery: tanpa statistik SQLite memilih
+    # menyapu indeks urutan halaman (mis. check_in) dan baru mencocokkan
+    # subquery per baris. Jumlahnya dibatasi FREQUENCY_CAP lewat _plan.
+    return Q(pk__in=list(_postings(kind, company, grams))) & text
+
+
+# ── Token table maintenance ──────────────────────────────────────────────────
+
+def _queryset(kind, get_model):
+    source = SOURCES[kind]
+    return get_model('hw', source.model).objects.filter(**source.filters)
+
+
+def _tokens(token_model, kind, rows):
+    for pk, company, *values in rows:
+        grams = set().union(*(trigrams(v) for v in values))
+        for gram in grams:
+            yield token_model(kind=kind, company=company, object_id=pk, gram=gram)
+
+
+def refresh(model_name, ids, get_model=None):
+    """Rebuild the postings of the given rows of `model_name` (a key of the
+    hw app registry, e.g. 'Invoice'); rows that no longer exist or moved to
+    another kind lose their old postings."""
+    if not uses_token_table():
+        return
+    get_model = get_model or apps.get_model
+    ids = sorted({i for i in ids if i is not None})
+    kinds = [kind for kind, source in SOURCES.items() if source.model == model_name]
+    if not ids or not kinds:
+        return
+    SearchToken = get_model('hw', 'SearchToken')
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        SearchToken.objects.filter(kind__in=kinds, object_id__in=chunk).delete()
+        for kind in kinds:
+            rows = _queryset(kind, get_model).filter(pk__in=chunk).values_list(
+                'pk', 'company', *SOURCES[kind].fields,
+            )
+            SearchToken.objects.bulk_create(_tokens(SearchToken, kind, rows), batch_size=2000)
+
+
+def rebuild(get_model=None):
+    """Rebuild the whole token table; used by migration 0055 and
+    `rebuild_search_index`. Returns the number of documents indexed."""
+    if not uses_token_table():
+        return 0
+    get_model = get_model or apps.get_model
+    SearchToken = get_model('hw', 'SearchToken')
+    SearchToken.objects.all().delete()
+    indexed = 0
+    for kind, source in SOURCES.items():
+        rows = _queryset(kind, get_model).order_by('pk').values_list('pk', 'company', *source.fields)
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(row)
+            if len(batch) == 2000:
+                SearchToken.objects.bulk_create(_tokens(SearchToken, kind, batch), batch_size=2000)
+                indexed += len(batch)
+                batch = []
+        SearchToken.objects.bulk_create(_tokens(SearchToken, kind, batch), batch_size=2000)
+        indexed += len(batch)
+    return indexed
+
+
+# ── Ranked search ────────────────────────────────────────────────────────────
+
+def _rank_expression(kind, q):
+    """Higher is better: exact > prefix > word prefix > substring, and an
+    earlier (more identifying) field beats a later one at the same level.
+    Computed in SQL so rows are ranked before the per-kind limit applies."""
+    ranks = []
+    for position, field in enumerate(SOURCES[kind].fields):
+        ranks.append(Case(
+            When(**{f'{field}__iexact': q}, then=Value(40 - position)),
+            When(**{f'{field}__istartswith': q}, then=Value(30 - position)),
+            When(**{f'{field}__icontains': f' {q}'}, then=Value(20 - position)),
+            When(**{f'{field}__icontains': q}, then=Value(10 - position)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    return Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+
+
+def _balance_meta(inv):
+    return "Lunas" if inv.balance_sar == 0 else f"Sisa {inv.balance_sar:,} SAR"
+
+
+def _hit(kind, obj):
+    if kind == 'CL':
+        return {
+            "label": obj.confirmation_number,
+            "sub": obj.guest_name,
+            "meta": obj.hotel_name or "",
+            "url": reverse("cl_detail", args=[obj.pk]),
+        }
+    if kind in ('INV', 'SVC'):
+        return {
+            "label": obj.invoice_number,
+            "sub": obj.customer_name,
+            "meta": _balance_meta(obj),
+            "url": reverse("invoice_detail" if kind == 'INV' else "services_detail", args=[obj.pk]),
+        }
+    if kind == 'CLIENT':
+        return {
+            "label": obj.brand or obj.name,
+            "sub": obj.name if obj.brand else obj.pic,
+            "meta": obj.city,
+            "url": reverse("client_detail", args=[obj.pk]),
+        }
+    return {
+        "label": obj.name,
+        "sub": obj.area,
+        "meta": obj.get_city_display(),
+        "url": reverse("hotel_detail", args=[obj.pk]),
+    }
+
+
+def search(company, q, limit=8, kinds=None):
+    """Ranked hits across every kind, best match first.
+
+    Each hit is a dict with type, label, sub, meta and url. Each kind
+    contributes its `limit` best rows (newest first within a rank); `kinds`
+    restricts the search (e.g. to the modules the user may view).
+    """
+    q = (q or '').strip()
+    hits = []
+    for order, kind in enumerate(SOURCES):
+        if kinds is not None and kind not in kinds:
+            continue
+        rows = (
+            _queryset(kind, apps.get_model).filter(company=company).filter(match_q(kind, company, q))
+            .annotate(search_rank=_rank_expression(kind, q))
+        )
+        for obj in rows.order_by('-search_rank', '-pk')[:limit]:
+            hits.append((-obj.search_rank, order, -obj.pk, {"type": kind, **_hit(kind, obj)}))
+    hits.sort(key=lambda h: h[:3])
+    return [h[3] for h in hits]
@@ -1,9 +1,51 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
 from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_delete, post_save
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import ActivityLog, Client, Room, UserProfile, log_activity
+from .models import (
+    ActivityLog, CancellationPenalty, Client, ClientScorecard, ConfirmationLetter, DocumentSequence, Hotel,
+    Invoice, Payment, Remittance, RemittanceLedgerEntry, RemittanceLine, Reservation, Room, UserProfile,
+    log_activity,
+)
+from .pagination import invalidate_counts
+from .services import audit  # noqa: F401 — registers the request_finished flush
+from .services import search
+from .services.dashboard import invalidate_dashboard
+
+
+# Model yang receiver per-barisnya sedang ditahan oleh batched(); penulisnya
+# menjalankan resync sekali di akhir (cl_rooms_changed / payments_changed).
+_batched = ContextVar('hw_batched_models', default=frozenset())
+
+
+@contextmanager
+def batched(*models):
+    """Skip the per-row receivers below for `models` inside the block.
+
+    For form saves that replace a CL's rooms or an invoice's payments
+    wholesale: one bulk_create/delete instead of a reservation, balance,
+    ledger and dashboard resync per row. The caller must run the matching
+    resync once afterwards."""
+    token = _batched.set(_batched.get() | set(models))
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+def _per_row(handler):
+    @wraps(handler)
+    def inner(sender, **kwargs):
+        if sender not in _batched.get():
+            handler(sender, **kwargs)
+    return inner
 
 
 @receiver(post_save, sender=User)
@@ -19,18 +61,212 @@ def _record_login(sender, request, user, **kwargs):
 
 def _sync_reservation_total(cl):
     """Sync Reservation.total_sar with the current CL total_price."""
-    from .models import Reservation
     if cl.invoice_id:
-        Reservation.objects.filter(
+        updated = Reservation.objects.filter(
             invoice_id=cl.invoice_id,
             reservation_number=cl.confirmation_number,
-        ).update(total_sar=int(round(cl.total_price)))
+        ).update(total_sar=int(round(cl.total_price)), updated_at=Now())
+        # .update() bypasses the Reservation signals below, so the invoice
+        # balance has to be refreshed by hand here.
+        if updated:
+            Invoice.refresh_balance(cl.invoice_id)
+            ClientScorecard.refresh(ClientScorecard.client_ids_for_invoice(cl.invoice_id))
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@_per_row
+def _invoice_balance_changed(sender, instance, **kwargs):
+    Invoice.refresh_balance(instance.invoice_id)
+    ClientScorecard.refresh(ClientScorecard.client_ids_for_invoice(instance.invoice_id))
+
+
+@receiver(post_save, sender=Invoice)
+def _invoice_saved(sender, instance, **kwargs):
+    ClientScorecard.refresh(ClientScorecard.client_ids_for_invoice(instance.pk))
+
+
+@receiver(pre_delete, sender=Invoice)
+def _invoice_deleting(sender, instance, **kwargs):
+    # The CL links are nulled before post_delete, so collect the owners now.
+    instance._scorecard_client_ids = ClientScorecard.client_ids_for_invoice(instance.pk)
+
+
+@receiver(post_delete, sender=Invoice)
+def _invoice_deleted(sender, instance, **kwargs):
+    ClientScorecard.refresh(getattr(instance, '_scorecard_client_ids', ()))
+
+
+@receiver(pre_save, sender=ConfirmationLetter)
+def _cl_saving(sender, instance, **kwargs):
+    old = (
+        ConfirmationLetter.objects.filter(pk=instance.pk).values_list('client_id', 'confirmation_number').first()
+        if instance.pk else None
+    ) or (None, None)
+    instance._scorecard_old_client_id, instance._ledger_old_number = old
+
+
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_delete, sender=ConfirmationLetter)
+def _cl_scorecard_changed(sender, instance, **kwargs):
+    ClientScorecard.refresh({instance.client_id, getattr(instance, '_scorecard_old_client_id', None)})
+
+
+@receiver(post_save, sender=Client)
+def _client_created(sender, instance, created, **kwargs):
+    if created:
+        ClientScorecard.refresh([instance.pk])
+
+
+# Kolom kunci buku besar remittance per model: nomor reservasi yang barisnya
+# harus dihitung ulang kalau model ini berubah.
+_LEDGER_KEY = {
+    Payment: 'linked_number',
+    RemittanceLine: 'linked_number',
+    Reservation: 'reservation_number',
+    ConfirmationLetter: 'confirmation_number',
+}
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=RemittanceLine)
+@receiver(pre_save, sender=Reservation)
+@_per_row
+def _ledger_row_saving(sender, instance, **kwargs):
+    # nomor lama ikut dihitung ulang, supaya baris yang ditinggalkan tidak basi
+    instance._ledger_old_number = (
+        sender.objects.filter(pk=instance.pk).values_list(_LEDGER_KEY[sender], flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=RemittanceLine)
+@receiver(post_delete, sender=RemittanceLine)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_delete, sender=ConfirmationLetter)
+@_per_row
+def _ledger_row_changed(sender, instance, **kwargs):
+    RemittanceLedgerEntry.refresh({
+        getattr(instance, _LEDGER_KEY[sender]),
+        getattr(instance, '_ledger_old_number', None),
+    })
+
+
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_delete, sender=ConfirmationLetter)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Remittance)
+@receiver(post_delete, sender=Remittance)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@_per_row
+def _dashboard_data_changed(sender, instance, **kwargs):
+    # Payment/Reservation/Room carry no company of their own; dropping both
+    # companies' entries is cheaper than a lookup to find out which one.
+    invalidate_dashboard(getattr(instance, 'company', None))
+
+
+# Model yang total daftarnya (hw/pagination.py) ikut berubah. Status bayar
+# invoice bergantung pada payment/reservation, jadi filter status di daftar
+# invoice ikut basi saat keduanya berubah.
+_LIST_COUNT_MODEL = {
+    ConfirmationLetter: ConfirmationLetter,
+    Invoice: Invoice,
+    Payment: Invoice,
+    Reservation: Invoice,
+    Client: Client,
+    Hotel: Hotel,
+}
+
+
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_delete, sender=ConfirmationLetter)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+@_per_row
+def _list_counts_changed(sender, instance, **kwargs):
+    invalidate_counts(_LIST_COUNT_MODEL[sender])
 
 
 @receiver(post_save, sender=Room)
 @receiver(post_delete, sender=Room)
+@_per_row
 def _room_total_changed(sender, instance, **kwargs):
-    _sync_reservation_total(instance.cl)
+    _sync_cl_rooms(instance.cl)
+
+
+def _sync_cl_rooms(cl):
+    _sync_reservation_total(cl)
+    # total CL (dan Reservation.total_sar lewat .update() di atas) ikut
+    # menentukan total tagihan di buku besar remittance
+    RemittanceLedgerEntry.refresh([cl.confirmation_number])
+
+
+def cl_rooms_changed(cl):
+    """Once-per-save resync after a batched() Room write."""
+    _sync_cl_rooms(cl)
+    invalidate_dashboard(cl.company)
+
+
+def payments_changed(invoice, linked_numbers):
+    """Once-per-save resync after a batched() Payment write. `linked_numbers`
+    are the reservation numbers of the old and new rows (ledger keys)."""
+    Invoice.refresh_balance(invoice.pk)
+    ClientScorecard.refresh(ClientScorecard.client_ids_for_invoice(invoice.pk))
+    RemittanceLedgerEntry.refresh(linked_numbers)
+    invalidate_dashboard(invoice.company)
+    invalidate_counts(Invoice)
+
+
+# Field nomor dokumen per model; nomor yang diketik manual di form harus
+# menggeser DocumentSequence supaya allocate() tidak memberikannya lagi.
+_DOCUMENT_NUMBER = {
+    ConfirmationLetter: 'confirmation_number',
+    Invoice: 'invoice_number',
+    Remittance: 'remittance_number',
+    CancellationPenalty: 'penalty_number',
+}
+
+
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Remittance)
+@receiver(post_save, sender=CancellationPenalty)
+def _document_number_saved(sender, instance, **kwargs):
+    DocumentSequence.observe(getattr(instance, _DOCUMENT_NUMBER[sender]))
+
+
+@receiver(post_save, sender=ConfirmationLetter)
+@receiver(post_delete, sender=ConfirmationLetter)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def _search_document_changed(sender, instance, **kwargs):
+    search.refresh(sender.__name__, [instance.pk])
 
 
 @receiver(post_save, sender=Client)
@@ -42,7 +278,10 @@ def _sync_client_display_name(sender, instance, **kwargs):
     from .models import ConfirmationLetter, Invoice
     display_name = instance.brand or instance.name
 
-    ConfirmationLetter.objects.filter(client=instance).exclude(guest_name=display_name).update(guest_name=display_name)
+    renamed_cls = list(
+        ConfirmationLetter.objects.filter(client=instance).exclude(guest_name=display_name).values_list('pk', flat=True)
+    )
+    ConfirmationLetter.objects.filter(pk__in=renamed_cls).update(guest_name=display_name, updated_at=Now())
 
     linked_invoice_ids = set(
         ConfirmationLetter.objects.filter(client=instance, invoice__isnull=False)
@@ -54,8 +293,14 @@ def _sync_client_display_name(sender, instance, **kwargs):
         inv_id for inv_id in linked_invoice_ids
         if set(ConfirmationLetter.objects.filter(invoice_id=inv_id).values_list('client_id', flat=True)) == {instance.pk}
     ]
-    if unambiguous_ids:
-        Invoice.objects.filter(pk__in=unambiguous_ids).exclude(customer_name=display_name).update(customer_name=display_name)
     # Invoice.client itself is rarely populated (see helpers._billing_client),
     # but sync it too on the chance it is.
-    Invoice.objects.filter(client=instance).exclude(customer_name=display_name).update(customer_name=display_name)
+    renamed_invoices = list(
+        Invoice.objects.filter(Q(pk__in=unambiguous_ids) | Q(client=instance))
+        .exclude(customer_name=display_name).values_list('pk', flat=True)
+    )
+    Invoice.objects.filter(pk__in=renamed_invoices).update(customer_name=display_name, updated_at=Now())
+
+    # .update() di atas melewati signal, jadi indeks pencarian disegarkan di sini.
+    search.refresh('ConfirmationLetter', renamed_cls)
+    search.refresh('Invoice', renamed_invoices)
@@ -1,8 +1,47 @@
-from .models import BillingLog, RecapLog, ReminderLog
-from .services.fonnte import send_wa, send_wa_file
+import time
+from datetime import timedelta
 
+from django.conf import settings
+from django.utils import timezone
+from django_q.conf import Conf
+from django_q.models import Schedule
+from django_q.tasks import schedule
 
-def send_recap_task(target_type, target, label, message, cl_count):
+from .models import ActivityLog, BillingLog, RecapLog, ReminderLog
+from .services.fonnte import THROTTLED, rate_limit_wait, send_wa, send_wa_file
+
+# Jeda setelah Fonnte sendiri menjawab 429.
+THROTTLE_PAUSE = 30
+
+
+def _send_limited(task, args, target, send, attempt):
+    """Run `send()` once the shared rate limiter has a slot for `target`.
+
+    Returns the Fonnte result, or None when the send was pushed back: the
+    task is then scheduled again with the same `args` for when a slot frees
+    up (or after THROTTLE_PAUSE if Fonnte itself answered 429), instead of
+    being logged as FAILED. Gives up after FONNTE_MAX_RESCHEDULES tries.
+    """
+    wait = rate_limit_wait(target)
+    if not wait:
+        result = send()
+        if result.get('reason') != THROTTLED:
+            return result
+        wait = THROTTLE_PAUSE
+    if attempt >= settings.FONNTE_MAX_RESCHEDULES:
+        return {'status': False, 'reason': THROTTLED}
+    if Conf.SYNC:
+        # Tanpa qcluster (tes, DEBUG) tidak ada yang menjalankan Schedule.
+        time.sleep(wait)
+        return _send_limited(task, args, target, send, attempt + 1)
+    schedule(
+        f'hw.tasks.{task}', *args, attempt=attempt + 1,
+        schedule_type=Schedule.ONCE, next_run=timezone.now() + timedelta(seconds=wait),
+    )
+    return None
+
+
+def send_recap_task(target_type, target, label, message, cl_count, attempt=0):
     """Background task: send one recap WA message and log the result.
 
     Runs out-of-process via django-q2's qcluster worker (see Q_CLUSTER in
@@ -10,7 +49,12 @@ def send_recap_task(target_type, target, label, message, cl_count):
     thread for every target in the recap loop.
     """
     try:
-        result = send_wa(target, message)
+        result = _send_limited(
+            'send_recap_task', (target_type, target, label, message, cl_count), target,
+            lambda: send_wa(target, message), attempt,
+        )
+        if result is None:
+            return
         status = 'SENT' if result.get('status') else 'FAILED'
         error = result.get('reason', '') if not result.get('status') else ''
     except Exception as exc:
@@ -22,36 +66,48 @@ def send_recap_task(target_type, target, label, message, cl_count):
     )
 
 
-def send_reminder_group_task(cl_ids, reminder_type, phone, message):
+def send_reminder_group_task(cl_ids, reminder_type, phone, message, attempt=0):
     """Background task: send one grouped reminder WA message, log the result for every CL in the group."""
     try:
-        result = send_wa(phone, message)
+        result = _send_limited(
+            'send_reminder_group_task', (cl_ids, reminder_type, phone, message), phone,
+            lambda: send_wa(phone, message), attempt,
+        )
+        if result is None:
+            return
         status = 'SENT' if result.get('status') else 'FAILED'
         error = result.get('reason', '') if not result.get('status') else ''
     except Exception as exc:
         status, error = 'FAILED', str(exc)
-    for cl_id in cl_ids:
-        ReminderLog.objects.create(
-            cl_id=cl_id, reminder_type=reminder_type,
-            phone=phone, status=status, error=error,
-        )
+    ReminderLog.objects.bulk_create([
+        ReminderLog(cl_id=cl_id, reminder_type=reminder_type, phone=phone, status=status, error=error)
+        for cl_id in cl_ids
+    ])
+
+
+def _send_billing(invoice_id, target, message, with_pdf):
+    if not with_pdf:
+        return send_wa(target, message)
+    # Impor lokal: hw.views menarik banyak modul; worker hanya butuh
+    # renderer saat benar-benar mengirim PDF.
+    from .models import Invoice
+    from .views.pdf import _render_invoice_pdf, _render_services_pdf
+    invoice = Invoice.objects.get(pk=invoice_id)
+    render = _render_invoice_pdf if invoice.invoice_type == 'hotel' else _render_services_pdf
+    pdf_bytes = render(invoice).content
+    return send_wa_file(target, message, pdf_bytes, f"{invoice.invoice_number}.pdf")
 
 
-def send_billing_task(invoice_id, target, message, with_pdf=False):
+def send_billing_task(invoice_id, target, message, with_pdf=False, attempt=0):
     """Background task: send one billing WA message (optionally with the
     invoice PDF attached as a document + caption) and log the result."""
     try:
-        if with_pdf:
-            # Impor lokal: hw.views menarik banyak modul; worker hanya butuh
-            # renderer saat benar-benar mengirim PDF.
-            from .models import Invoice
-            from .views.pdf import _render_invoice_pdf, _render_services_pdf
-            invoice = Invoice.objects.get(pk=invoice_id)
-            render = _render_invoice_pdf if invoice.invoice_type == 'hotel' else _render_services_pdf
-            pdf_bytes = render(invoice).content
-            result = send_wa_file(target, message, pdf_bytes, f"{invoice.invoice_number}.pdf")
-        else:
-            result = send_wa(target, message)
+        result = _send_limited(
+            'send_billing_task', (invoice_id, target, message, with_pdf), target,
+            lambda: _send_billing(invoice_id, target, message, with_pdf), attempt,
+        )
+        if result is None:
+            return
         status = 'SENT' if result.get('status') else 'FAILED'
         error = result.get('reason', '') if not result.get('status') else ''
     except Exception as exc:
@@ -60,3 +116,53 @@ def send_billing_task(invoice_id, target, message, with_pdf=False):
         invoice_id=invoice_id, target=target,
         message=message, status=status, error=error,
     )
+
+
+def render_pdf_task(key):
+    """Background task: lay out one queued PDF job (see _pdf_job_response)
+    and store the result in the artifact store.
+
+    The HTML source was written next to the artifact by the web process, so
+    the worker needs no model data — only WeasyPrint.
+    """
+    from django.utils import timezone
+    from .models import PdfJob
+    from .services import pdf_store
+    from .views.pdf import _write_pdf
+
+    jobs = PdfJob.objects.filter(key=key)
+    if pdf_store.artifact_path(key) is None:
+        html = pdf_store.get_source(key)
+        if html is None:
+            jobs.update(status=PdfJob.STATUS_FAILED, error='HTML source missing', finished_at=timezone.now())
+            return
+        jobs.update(status=PdfJob.STATUS_RUNNING)
+        try:
+            pdf_store.put(key, _write_pdf(html))
+        except Exception as exc:
+            jobs.update(status=PdfJob.STATUS_FAILED, error=str(exc), finished_at=timezone.now())
+            return
+    pdf_store.drop_source(key)
+    jobs.update(status=PdfJob.STATUS_DONE, error='', finished_at=timezone.now())
+
+
+def render_pdf_bundle_task(key):
+    """Background task: build one bulk PDF export zip (see hw/services/pdf_bundle.py)."""
+    from django.utils import timezone
+    from .models import PdfJob
+    from .services.pdf_bundle import build_bundle
+
+    jobs = PdfJob.objects.filter(key=key)
+    jobs.update(status=PdfJob.STATUS_RUNNING)
+    try:
+        build_bundle(key)
+    except Exception as exc:
+        jobs.update(status=PdfJob.STATUS_FAILED, error=str(exc), finished_at=timezone.now())
+        return
+    jobs.update(status=PdfJob.STATUS_DONE, error='', finished_at=timezone.now())
+
+
+def write_activity_log(rows):
+    """Background task: fallback for hw/services/audit.py when the in-process
+    flush could not write the buffered ActivityLog rows itself."""
+    ActivityLog.objects.bulk_create([ActivityLog(**row) for row in rows], batch_size=500)
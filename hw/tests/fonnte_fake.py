@@ -0,0 +1,91 @@
+"""A local stand-in for the Fonnte API, for tests that exercise the real
+HTTP transport (hw/services/fonnte.py) instead of patching it out.
+
+    with FakeFonnte(script=[503, 200]) as fake:
+        client = FonnteClient(fake.url, 'token')
+        ...
+        fake.requests  # [{'headers': ..., 'form': {...}}, ...]
+
+`script` is consumed one entry per request; once it is exhausted every
+request gets `default`. An entry is an HTTP status (answered with Fonnte's
+usual JSON body), a dict (200 with that JSON body) or ('sleep', seconds)
+to hang before answering 200.
+"""
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+OK_BODY = {'status': True, 'detail': 'success! message in queue'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, supaya reuse koneksi terlihat
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        form = {}
+        if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        with fake.lock:
+            fake.requests.append({'headers': dict(self.headers), 'form': form, 'body': body})
+            step = fake.script.pop(0) if fake.script else fake.default
+        status, payload = 200, OK_BODY
+        if isinstance(step, tuple) and step[0] == 'sleep':
+            fake.release.wait(step[1])
+        elif isinstance(step, dict):
+            payload = step
+        elif isinstance(step, int):
+            status = step
+            payload = OK_BODY if step == 200 else {'status': False, 'reason': f'HTTP {step}'}
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except OSError:
+            pass  # client sudah menyerah (timeout)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeFonnte:
+    def __init__(self, script=(), default=200):
+        self.script = list(script)
+        self.default = default
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        # Di-set saat stop supaya handler yang sedang "hang" selesai cepat.
+        self.release = threading.Event()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.url = f'http://127.0.0.1:{self.server.server_port}/send'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def unreachable_url():
+    """A local URL nothing listens on (connection refused)."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/send'
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import RoleDefinition
+from hw.models.role import LABELS_CACHE_KEY, MATRIX_CACHE_KEY
+from hw.permissions import AccessContext, access_for, can, get_role, role_matrix
+from hw.views.helpers import get_active_company
+
+
+class AccessContextPageTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staffer', password='pw')
+        self.user.profile.role = 'staff'
+        self.user.profile.company_access = 'konoz'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+    def _warm_page(self, path):
+        for _ in range(2):
+            self.client.get(path, HTTP_X_INERTIA='true')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(path, HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 200)
+        return resp, [q['sql'] for q in ctx.captured_queries]
+
+    def test_typical_inertia_page_reads_roles_once(self):
+        resp, queries = self._warm_page('/clients/')
+        self.assertEqual(sum(MATRIX_CACHE_KEY in q for q in queries), 1)
+        self.assertEqual(sum(LABELS_CACHE_KEY in q for q in queries), 1)
+        self.assertFalse([q for q in queries if 'hw_roledefinition' in q])
+        self.assertEqual(sum('hw_userprofile' in q for q in queries), 1)
+        self.assertEqual(len(queries), 7)
+        user = resp.json()['props']['auth']['user']
+        self.assertEqual((user['role'], user['role_label']), ('staff', 'Staff'))
+        self.assertEqual(user['companies'], ['konoz'])
+        self.assertNotIn('delete', user['perms']['clients'])
+
+    def test_role_edit_drops_the_cached_labels(self):
+        self._warm_page('/clients/')
+        role = RoleDefinition.objects.get(slug='staff')
+        role.label = 'Operator'
+        role.save()
+        resp = self.client.get('/clients/', HTTP_X_INERTIA='true')
+        self.assertEqual(resp.json()['props']['auth']['user']['role_label'], 'Operator')
+
+
+class AccessContextTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer1')
+        self.user.profile.role = 'viewer'
+        self.user.profile.company_access = 'ijabah'
+        self.user.profile.save()
+
+    def test_bound_context_is_computed_once(self):
+        role_matrix()  # isi cache
+        self.user._access = AccessContext(self.user)
+        with self.assertNumQueries(1):  # satu baca matrix dari cache
+            for _ in range(5):
+                self.assertTrue(can(self.user, 'cl', 'view'))
+                self.assertFalse(can(self.user, 'cl', 'edit'))
+        self.assertIs(access_for(self.user), self.user._access)
+
+    def test_unbound_user_sees_changes_immediately(self):
+        self.assertEqual(get_role(self.user), 'viewer')
+        self.user.profile.role = 'manager'
+        self.assertEqual(get_role(self.user), 'manager')
+
+    def _request(self, company):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = {'active_company': company}
+        self.user._access = AccessContext(self.user)
+        return request
+
+    def test_active_company_is_clamped(self):
+        self.assertEqual(get_active_company(self._request('konoz')), 'ijabah')
+
+    def test_active_company_follows_a_switch_within_the_request(self):
+        self.user.profile.company_access = 'all'
+        request = self._request('konoz')
+        self.assertEqual(get_active_company(request), 'konoz')
+        request.session['active_company'] = 'ijabah'
+        self.assertEqual(get_active_company(request), 'ijabah')
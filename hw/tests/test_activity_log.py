@@ -0,0 +1,161 @@
+import threading
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hw.models import ActivityLog, ActivityLogArchive, log_activity
+from hw.services import audit
+from hw.services.audit import AuditBuffer
+
+
+@override_settings(AUDIT_BUFFER_SIZE=50, AUDIT_FLUSH_INTERVAL=0)
+class BufferedActivityLogTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('auditor', password='pw12345!')
+        self.addCleanup(audit.flush)
+
+    def test_logging_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            for n in range(10):
+                log_activity(self.user, ActivityLog.ACTION_EDIT, 'Hotel', f'H{n}', 'konoz')
+        self.assertFalse(ActivityLog.objects.exists())
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(audit.flush(), 10)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(ActivityLog.objects.count(), 10)
+
+    def test_flushed_when_the_request_finishes(self):
+        log_activity(self.user, ActivityLog.ACTION_PDF, 'Invoice', 'INV-1')
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(ActivityLog.objects.get().object_ref, 'INV-1')
+
+    def test_login_is_written_by_the_end_of_the_request(self):
+        self.client.post('/login/', {'username': 'auditor', 'password': 'pw12345!'})
+        self.assertTrue(ActivityLog.objects.filter(user=self.user, action=ActivityLog.ACTION_LOGIN).exists())
+        self.assertEqual(len(audit.buffer), 0)
+
+    @override_settings(AUDIT_BUFFER_SIZE=3)
+    def test_flushed_when_the_buffer_is_full(self):
+        for n in range(2):
+            log_activity(self.user, ActivityLog.ACTION_CREATE, 'Client', f'C{n}')
+        self.assertFalse(ActivityLog.objects.exists())
+        log_activity(self.user, ActivityLog.ACTION_CREATE, 'Client', 'C2')
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_keeps_the_time_of_the_action(self):
+        log_activity(self.user, ActivityLog.ACTION_DELETE, 'Hotel', 'Hilton')
+        acted_at = timezone.now()
+        with patch('django.utils.timezone.now', return_value=acted_at + timedelta(minutes=5)):
+            audit.flush()
+        self.assertLess(ActivityLog.objects.get().timestamp, acted_at + timedelta(seconds=1))
+
+    def test_failed_insert_falls_back_to_the_queue(self):
+        real_bulk_create = type(ActivityLog.objects).bulk_create
+        calls = []
+
+        def flaky(manager, objs, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 1:
+                raise DatabaseError('connection lost')
+            return real_bulk_create(manager, objs, **kwargs)
+
+        log_activity(self.user, ActivityLog.ACTION_EDIT, 'Hotel', 'Hilton', changes=[{'label': 'Nama'}])
+        with patch.object(type(ActivityLog.objects), 'bulk_create', autospec=True, side_effect=flaky), \
+                self.assertLogs('hw.services.audit', 'WARNING'):
+            audit.flush()
+        # Conf.SYNC: task write_activity_log langsung jalan di proses ini.
+        self.assertEqual(calls, [1, 1])
+        log = ActivityLog.objects.get()
+        self.assertEqual((log.user, log.changes), (self.user, [{'label': 'Nama'}]))
+
+    def test_rows_stay_buffered_when_the_queue_is_down_too(self):
+        log_activity(self.user, ActivityLog.ACTION_EDIT, 'Hotel', 'Hilton')
+        with patch.object(type(ActivityLog.objects), 'bulk_create', side_effect=DatabaseError), \
+                patch('hw.services.audit.async_task', side_effect=DatabaseError), \
+                self.assertLogs('hw.services.audit', 'WARNING'):
+            audit.flush()
+        self.assertEqual(len(audit.buffer), 1)
+        audit.flush()
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+
+class FlushTimerTest(SimpleTestCase):
+    @override_settings(AUDIT_BUFFER_SIZE=50, AUDIT_FLUSH_INTERVAL=0.05)
+    def test_timer_flushes_leftovers_outside_a_request(self):
+        flushed = threading.Event()
+        buffer = AuditBuffer()
+        with patch.object(buffer, 'flush', side_effect=flushed.set), \
+                patch('hw.services.audit.connections.close_all'):
+            buffer.record(ActivityLog(action=ActivityLog.ACTION_LOGIN))
+            self.assertTrue(flushed.wait(2))
+        buffer._wake.set()
+        buffer._thread.join(1)
+
+
+class TrimActivityLogsTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'trim{n}') for n in range(3)]
+        self.now = timezone.now()
+
+    def _log(self, user, days_ago, ref):
+        ActivityLog.objects.create(
+            user=user, action=ActivityLog.ACTION_EDIT, model_name='Hotel', object_ref=ref,
+            changes=[{'label': 'Nama', 'before': 'A', 'after': ref}],
+            timestamp=self.now - timedelta(days=days_ago),
+        )
+
+    def _trim(self, *args):
+        out = StringIO()
+        call_command('trim_activity_logs', *args, stdout=out)
+        return out.getvalue()
+
+    def test_keeps_the_newest_per_user_and_archives_the_rest(self):
+        for user in self.users:
+            for n in range(5):
+                self._log(user, days_ago=n * 20, ref=f'{user.username}-{n}')
+        self.assertIn('Archived 9', self._trim('--keep', '2'))
+
+        for user in self.users:
+            refs = list(ActivityLog.objects.filter(user=user).values_list('object_ref', flat=True))
+            self.assertEqual(refs, [f'{user.username}-0', f'{user.username}-1'])
+        archived = ActivityLogArchive.objects.filter(user=self.users[0])
+        self.assertEqual(sum(a.count for a in archived), 3)
+        entries = sorted((e for a in archived for e in a.entries()), key=lambda e: e['timestamp'])
+        self.assertEqual([e['object_ref'] for e in entries], ['trim0-4', 'trim0-3', 'trim0-2'])
+        self.assertEqual(entries[0]['changes'], [{'label': 'Nama', 'before': 'A', 'after': 'trim0-4'}])
+        for a in archived:
+            self.assertEqual(a.month, timezone.localtime(a.first_at).date().replace(day=1))
+
+    def test_age_based_retention(self):
+        self._log(self.users[0], days_ago=1, ref='fresh')
+        self._log(self.users[0], days_ago=100, ref='old')
+        self._trim('--keep', '50', '--days', '30')
+        self.assertEqual(list(ActivityLog.objects.values_list('object_ref', flat=True)), ['fresh'])
+        self.assertEqual(ActivityLogArchive.objects.get().entries()[0]['object_ref'], 'old')
+
+    def test_query_count_does_not_grow_with_users(self):
+        def run():
+            for user in User.objects.all():
+                for n in range(3):
+                    self._log(user, days_ago=n, ref=str(n))
+            with CaptureQueriesContext(connection) as ctx:
+                self._trim('--keep', '1')
+            return len(ctx.captured_queries)
+
+        few = run()
+        for n in range(3, 10):
+            User.objects.create_user(f'trim{n}')
+        self.assertEqual(run(), few)
+
+    def test_nothing_to_trim(self):
+        self._log(self.users[0], days_ago=0, ref='only')
+        self.assertIn('Archived 0', self._trim())
+        self.assertFalse(ActivityLogArchive.objects.exists())
@@ -4,9 +4,10 @@ from django.test import TestCase
 class SharedCacheBackendTest(TestCase):
     def test_cache_backend_is_shared_across_processes(self):
         from django.conf import settings
-        backend = settings.CACHES['default']['BACKEND']
+        default = settings.CACHES['default']
+        self.assertEqual(default['BACKEND'], 'hw.cache.TieredCache')
         self.assertEqual(
-            backend, 'django.core.cache.backends.db.DatabaseCache',
-            "message_templates/last_recap cache must use a cache shared "
-            "across gunicorn workers, not per-process LocMemCache."
+            settings.CACHES[default['LOCATION']]['BACKEND'], 'django.core.cache.backends.db.DatabaseCache',
+            "message_templates/last_recap cache must be backed by a cache shared "
+            "across gunicorn workers, not only a per-process LocMemCache."
         )
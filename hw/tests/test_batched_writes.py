@@ -0,0 +1,126 @@
+import json
+import shutil
+import tempfile
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import ConfirmationLetter, Invoice, Payment, RemittanceLedgerEntry, Reservation, Room
+from hw.signals import batched
+
+
+def _rooms(n, price=100):
+    return json.dumps([{"room_type": f"Type {i}", "meals": "BB", "quantity": 1, "price": price} for i in range(n)])
+
+
+class BatchedWriteTestBase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('batch_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-BATCH', customer_name='Budi',
+        )
+        self.cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-BATCH', guest_name='Budi', hotel_name='Hilton',
+            check_in=date(2026, 6, 1), check_out=date(2026, 6, 2), invoice=self.invoice,
+        )
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-BATCH', total_sar=0)
+
+
+class ClRoomEditTest(BatchedWriteTestBase):
+    def _edit(self, rooms):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(f'/cl/{self.cl.pk}/edit/', {
+                'confirmation_number': 'CL-BATCH', 'guest_name': 'Budi', 'hotel_name': 'Hilton',
+                'check_in': '2026-06-01', 'check_out': '2026-06-02', 'reservation_status': 'DEFINITE',
+                'rooms': rooms,
+            })
+        self.assertEqual(resp.status_code, 302)
+        return len(ctx)
+
+    def test_twenty_room_edit_query_count(self):
+        self._edit(_rooms(20, price=50))
+        queries = self._edit(_rooms(20))
+        # One room insert, one delete and one resync; row-by-row this was ~750.
+        self.assertLessEqual(queries, 60)
+        self.assertEqual(Room.objects.filter(cl=self.cl).count(), 20)
+        self.assertEqual(Reservation.objects.get(reservation_number='CL-BATCH').total_sar, 2000)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.billed_sar, 2000)
+        self.assertEqual(RemittanceLedgerEntry.objects.get(linked_number='CL-BATCH').total_sar, 2000)
+
+    def test_query_count_does_not_grow_with_rooms(self):
+        self._edit(_rooms(2))
+        small = self._edit(_rooms(2))
+        large = self._edit(_rooms(20))
+        self.assertEqual(small, large)
+
+    def test_new_cl_and_duplicate_write_rooms_in_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/cl/new/', {
+                'confirmation_number': 'CL-BATCH-NEW', 'guest_name': 'Siti', 'hotel_name': 'Hilton',
+                'check_in': '2026-06-01', 'check_out': '2026-06-03', 'reservation_status': 'DEFINITE',
+                'rooms': _rooms(5),
+            })
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "hw_room"')]
+        self.assertEqual(len(inserts), 1)
+        new = ConfirmationLetter.objects.get(confirmation_number='CL-BATCH-NEW')
+        self.assertEqual(new.total_price, 1000)
+
+        self.client.get(f'/cl/{new.pk}/duplicate/')
+        copy = ConfirmationLetter.objects.exclude(pk__in=[self.cl.pk, new.pk]).get()
+        self.assertEqual(copy.rooms.count(), 5)
+
+
+class InvoicePaymentEditTest(BatchedWriteTestBase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix='hms-batch-media-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=root)
+        media.enable()
+        self.addCleanup(media.disable)
+        Reservation.objects.filter(invoice=self.invoice).update(total_sar=1000)
+        Invoice.refresh_balance(self.invoice.pk)
+        Payment.objects.create(invoice=self.invoice, linked_number='OLD-REF', method='Cash', amount=100, currency='SAR')
+
+    def _edit(self, payments, **files):
+        return self.client.post(f'/invoice/{self.invoice.pk}/edit/', {
+            'invoice_number': 'INV-BATCH', 'customer_name': 'Budi',
+            'reservations': json.dumps([{'reservation_number': 'CL-BATCH', 'reservation_total': 1000}]),
+            'payments': json.dumps(payments),
+            **files,
+        })
+
+    def test_payments_are_replaced_and_balance_resynced(self):
+        rows = [
+            {'ref': 'CL-BATCH', 'date': '2026-06-01', 'method': 'Cash', 'amount': '300', 'currency': 'SAR', 'exchange': '1'},
+            {'ref': 'CL-BATCH', 'date': '2026-06-02', 'method': 'Cash', 'amount': '200', 'currency': 'SAR', 'exchange': '1',
+             'proof_keep': 'payments/proof/kept.pdf'},
+        ]
+        resp = self._edit(rows, payment_proof_0=SimpleUploadedFile('proof.pdf', b'%PDF-proof'))
+        self.assertEqual(resp.status_code, 302)
+        payments = list(Payment.objects.filter(invoice=self.invoice))
+        self.assertEqual([p.amount for p in payments], [300, 200])
+        self.assertTrue(all(p.cl_id == self.cl.pk for p in payments))
+        self.assertTrue(payments[0].proof.name.startswith('payments/proof/proof'))
+        self.assertEqual(payments[0].proof.read(), b'%PDF-proof')
+        self.assertEqual(payments[1].proof.name, 'payments/proof/kept.pdf')
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.paid_sar, self.invoice.balance_sar), (500, 500))
+        self.assertEqual(RemittanceLedgerEntry.objects.get(linked_number='CL-BATCH').debit, 500)
+        self.assertFalse(RemittanceLedgerEntry.objects.filter(linked_number='OLD-REF', debit__gt=0).exists())
+
+
+class BatchedContextTest(BatchedWriteTestBase):
+    def test_per_row_receivers_resume_after_the_block(self):
+        with batched(Room):
+            Room.objects.create(cl=self.cl, room_type='Deluxe', quantity=1, price=700)
+        self.assertEqual(Reservation.objects.get(reservation_number='CL-BATCH').total_sar, 0)
+        Room.objects.create(cl=self.cl, room_type='Suite', quantity=1, price=300)
+        self.assertEqual(Reservation.objects.get(reservation_number='CL-BATCH').total_sar, 1000)
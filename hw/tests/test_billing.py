@@ -1,7 +1,7 @@
 from datetime import date, timedelta
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch
 
 from hw.ai import generate_draft_message
@@ -400,8 +400,9 @@ class BillingMessageTemplateTest(TestCase):
         self.assertNotIn('Informasi Pembayaran', msg)
 
 
+@override_settings(FONNTE_BACKOFF_SECONDS=0)
 class SendWaFileTest(TestCase):
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_sends_multipart_with_caption(self, mock_post):
         from hw.services.fonnte import send_wa_file
         mock_post.return_value.json.return_value = {'status': True}
@@ -413,7 +414,7 @@ class SendWaFileTest(TestCase):
         self.assertEqual(call.kwargs['data']['message'], 'caption tagihan')
         self.assertEqual(call.kwargs['files']['file'], ('INV-001.pdf', b'%PDF-fake', 'application/pdf'))
 
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_connection_error_returns_clean_dict(self, mock_post):
         import requests as _req
         from hw.services.fonnte import send_wa_file
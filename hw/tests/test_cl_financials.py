@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import ConfirmationLetter, Invoice, Payment, RemittanceLedgerEntry, Room
+
+
+def _cl(number, check_in=date(2026, 3, 1), check_out=date(2026, 3, 4), rooms=((2, '100.25'),)):
+    cl = ConfirmationLetter.objects.create(
+        company='konoz', confirmation_number=number, guest_name='Budi', hotel_name='Hilton',
+        check_in=check_in, check_out=check_out,
+    )
+    for quantity, price in rooms:
+        Room.objects.create(cl=cl, room_type='Double', quantity=quantity, price=Decimal(price))
+    return cl
+
+
+class WithFinancialsTest(TestCase):
+    def test_matches_the_python_properties(self):
+        a = _cl('CL-F1', rooms=((2, '100.25'), (1, '50')))
+        b = _cl('CL-F2', check_in=None, check_out=None, rooms=((3, '10.5'),))
+        _cl('CL-F3', check_out=date(2026, 4, 2), rooms=())
+        inv = Invoice.objects.create(company='konoz', invoice_number='INV-F', customer_name='Budi')
+        Payment.objects.create(invoice=inv, cl=a, amount=300, currency='SAR')
+        Payment.objects.create(invoice=inv, linked_number='CL-F1', amount=1000000, currency='IDR', exchange_rate=4250)
+        Payment.objects.create(invoice=inv, linked_number='CL-F2', amount=10, currency='USD', exchange_rate=Decimal('3.75'))
+        # Sudah terpasang ke CL lain: tidak dihitung untuk nomor CL-F1.
+        Payment.objects.create(invoice=inv, cl=b, linked_number='CL-F1', amount=5, currency='SAR')
+
+        for cl in ConfirmationLetter.objects.filter(company='konoz').with_financials():
+            self.assertEqual(
+                (cl.fin_rooms, cl.fin_nights, cl.fin_price, cl.fin_paid, cl.fin_remaining),
+                (cl.total_rooms, cl.num_nights, cl.total_price, cl.paid_sar, cl.remaining_sar),
+                cl.confirmation_number,
+            )
+
+    def test_half_sar_payments_round_like_python(self):
+        cl = _cl('CL-F5', rooms=((1, '100'),))
+        inv = Invoice.objects.create(company='konoz', invoice_number='INV-F5', customer_name='Budi')
+        # 100.5 -> 100, 2.5 -> 2, 1.5 -> 2, 101.5 -> 102 (round() ke genap)
+        for amount, currency, rate in ((1_005_000, 'IDR', 10000), (1, 'USD', '2.5'),
+                                       (3, 'USD', '0.5'), (1_015_000, 'IDR', 10000)):
+            Payment.objects.create(invoice=inv, cl=cl, amount=amount, currency=currency, exchange_rate=Decimal(rate))
+
+        row = ConfirmationLetter.objects.with_financials().get(pk=cl.pk)
+        self.assertEqual(cl.paid_sar, 206)
+        self.assertEqual((row.fin_paid, row.fin_remaining), (cl.paid_sar, cl.remaining_sar))
+        inv.refresh_from_db()
+        self.assertEqual(inv.paid_sar, 206)
+
+
+class CLListExportQueriesTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix='hms-cl-fin-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        store = override_settings(PDF_ARTIFACT_ROOT=root)
+        store.enable()
+        self.addCleanup(store.disable)
+        patcher = patch('hw.views.pdf.HTML')
+        self.mock_html = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_html.return_value.write_pdf.return_value = b'%PDF-list'
+
+        self.user = User.objects.create_superuser('fin_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        self.invoice = Invoice.objects.create(company='konoz', invoice_number='INV-Q', customer_name='Budi')
+
+    def _add(self, start, end):
+        for n in range(start, end):
+            cl = _cl(f'CL-Q{n:02d}')
+            Payment.objects.create(invoice=self.invoice, cl=cl, amount=100, currency='SAR')
+
+    def _queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_pdfs_do_not_query_per_letter(self):
+        for url in ('/cl/export/pdf/', '/cl/export/pdf-v2/'):
+            self._add(0, 2)
+            small = self._queries(url)
+            self._add(2, 12)
+            self.assertEqual(self._queries(url), small, url)
+            ConfirmationLetter.objects.all().delete()
+
+    def test_list_pdf_shows_sql_totals(self):
+        self._add(0, 3)
+        self.client.get('/cl/export/pdf/')
+        html = self.mock_html.call_args.kwargs['string']
+        # 3 CL x 2 kamar x 100.25 x 3 malam = 1804.5 -> 1.805; sisa 3 x (602 - 100)
+        self.assertIn('1,805', html)
+        self.assertIn('1,506', html)
+
+
+class LedgerUsesRoomTotalsTest(TestCase):
+    def test_cl_price_feeds_the_ledger_without_rooms_prefetch(self):
+        _cl('CL-L1')
+        with CaptureQueriesContext(connection) as ctx:
+            computed = RemittanceLedgerEntry.compute(['CL-L1'])
+        self.assertEqual(computed['CL-L1']['total_sar'], 601)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT "hw_room"')])
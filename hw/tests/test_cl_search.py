@@ -92,7 +92,7 @@ class ClListMultiSearchTests(TestCase):
     def test_multi_query_export_csv_filters_correctly(self):
         resp = self.client.get("/cl/export/csv/", {"q": "HMS/241,HMS/142"})
         self.assertEqual(resp.status_code, 200)
-        content = resp.content.decode("utf-8-sig")
+        content = b"".join(resp.streaming_content).decode("utf-8-sig")
         self.assertIn("HMS/241", content)
         self.assertIn("HMS/142", content)
         self.assertNotIn("HMS/999", content)
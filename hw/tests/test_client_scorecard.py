@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import Client, ClientScorecard, ConfirmationLetter, Invoice, Payment, Reservation
+
+
+def _card(client):
+    return ClientScorecard.objects.get(client=client)
+
+
+class ClientScorecardSignalsTest(TestCase):
+    def setUp(self):
+        self.client_obj = Client.objects.create(company='konoz', name='PT Maju')
+        today = date.today()
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-SC-001',
+            customer_name='PT Maju', issued_date=today - timedelta(days=10),
+            due_date=today - timedelta(days=3),
+        )
+        self.cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-SC-001', guest_name='PT Maju',
+            client=self.client_obj, invoice=self.invoice,
+            check_in=today, check_out=today + timedelta(days=1),
+        )
+
+    def _assert_matches_properties(self):
+        c = Client.objects.get(pk=self.client_obj.pk)
+        card = _card(c)
+        self.assertEqual(card.total_invoices, c.total_invoices)
+        self.assertEqual(card.billed_sar, c.total_billed)
+        self.assertEqual(card.paid_sar, c.total_paid)
+        self.assertEqual(card.outstanding_sar, c.outstanding)
+        self.assertEqual(card.avg_days_to_pay, c.avg_days_to_pay)
+        self.assertEqual(card.days_since_last_order, c.days_since_last_order)
+        self.assertEqual(card.score, c.score)
+        self.assertEqual(card.risk_label, c.risk_label)
+
+    def test_card_exists_as_soon_as_client_does(self):
+        other = Client.objects.create(company='konoz', name='CV Baru')
+        self.assertEqual(_card(other).billed_sar, 0)
+
+    def test_reservation_makes_outstanding_and_overdue(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-SC-001', total_sar=5000)
+        card = _card(self.client_obj)
+        self.assertEqual(card.outstanding_sar, 5000)
+        self.assertEqual(card.risk_label, 'medium')
+        self._assert_matches_properties()
+
+    def test_full_payment_sets_avg_days_and_clears_outstanding(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-SC-001', total_sar=5000)
+        Payment.objects.create(invoice=self.invoice, amount=5000, currency='SAR', exchange_rate=1,
+                               payment_date=self.invoice.issued_date + timedelta(days=4))
+        card = _card(self.client_obj)
+        self.assertEqual(card.outstanding_sar, 0)
+        self.assertEqual(card.avg_days_to_pay, 4)
+        self._assert_matches_properties()
+
+    def test_moving_cl_to_another_client_refreshes_both(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-SC-001', total_sar=5000)
+        other = Client.objects.create(company='konoz', name='CV Lain')
+        self.cl.client = other
+        self.cl.save()
+        self.assertEqual(_card(self.client_obj).billed_sar, 0)
+        self.assertEqual(_card(other).billed_sar, 5000)
+
+    def test_deleting_invoice_refreshes_owner(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-SC-001', total_sar=5000)
+        self.invoice.delete()
+        self.assertEqual(_card(self.client_obj).billed_sar, 0)
+
+    def test_rebuild_command_repairs_stale_cards(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-SC-001', total_sar=5000)
+        ClientScorecard.objects.update(billed_sar=0, outstanding_sar=0, score=0, risk_label='ok')
+        out = StringIO()
+        call_command('rebuild_client_scorecards', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        self._assert_matches_properties()
+
+
+class ClientListFromScorecardTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('sc_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+
+    def _make_clients(self, start, end):
+        for n in range(start, end):
+            c = Client.objects.create(company='konoz', name=f'Client {n:03d}', lat=-7.2, lng=112.7)
+            inv = Invoice.objects.create(
+                company='konoz', invoice_type='hotel', invoice_number=f'INV-SCL-{n:03d}',
+                customer_name=c.name, client=c,
+            )
+            Reservation.objects.create(invoice=inv, reservation_number=f'R-{n}', total_sar=1000)
+
+    def test_client_list_query_count_is_flat(self):
+        self._make_clients(0, 2)
+        self.client.get('/clients/', HTTP_X_INERTIA='true')  # warm caches
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/clients/', HTTP_X_INERTIA='true')
+        self._make_clients(2, 12)
+        with CaptureQueriesContext(connection) as large:
+            resp = self.client.get('/clients/', HTTP_X_INERTIA='true')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(resp.json()['props']['clients']), 12)
+
+    def test_map_data_reads_scorecard(self):
+        self._make_clients(0, 3)
+        resp = self.client.get('/clients/map/data/')
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.json()['clients']
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(r['total_billed'] == 1000 and r['outstanding'] == 1000 for r in rows))
+
+    def test_missing_card_is_built_on_read(self):
+        self._make_clients(0, 1)
+        ClientScorecard.objects.all().delete()
+        resp = self.client.get('/clients/map/data/')
+        self.assertEqual(resp.json()['clients'][0]['total_billed'], 1000)
+        self.assertEqual(ClientScorecard.objects.count(), 1)
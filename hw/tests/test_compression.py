@@ -0,0 +1,95 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import brotli
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from hw import compression
+from hw.compression import CompressionMiddleware
+
+BODY = json.dumps({'props': {'rows': [{'id': i, 'name': f'Row {i}'} for i in range(200)]}}).encode()
+
+
+def run(response, accept='br, gzip', method='get'):
+    request = getattr(RequestFactory(), method)('/', HTTP_ACCEPT_ENCODING=accept)
+    return CompressionMiddleware(lambda r: response)(request)
+
+
+class CompressionTest(SimpleTestCase):
+    def test_brotli_preferred_at_the_fast_level(self):
+        with patch('hw.compression.compressor', wraps=compression.compressor) as spy:
+            resp = run(HttpResponse(BODY, content_type='application/json'))
+        self.assertEqual(resp['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(resp.content), BODY)
+        self.assertEqual(resp['Content-Length'], str(len(resp.content)))
+        self.assertIn('Accept-Encoding', resp['Vary'])
+        spy.assert_called_once_with('br', 'application/json', False)
+
+    def test_gzip_when_brotli_is_not_accepted(self):
+        resp = run(HttpResponse(BODY, content_type='text/html; charset=utf-8'), accept='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(resp.content), BODY)
+
+    def test_small_unknown_or_unaccepted_bodies_pass_through(self):
+        for response, accept in (
+            (HttpResponse(b'{"a": 1}', content_type='application/json'), 'br'),
+            (HttpResponse(BODY, content_type='image/png'), 'br'),
+            (HttpResponse(BODY, content_type='application/json'), 'identity'),
+        ):
+            resp = run(response, accept)
+            self.assertFalse(resp.has_header('Content-Encoding'))
+
+    def test_streaming_is_compressed_chunk_by_chunk(self):
+        chunks = [BODY[i:i + 1000] for i in range(0, len(BODY), 1000)]
+        response = StreamingHttpResponse(iter(chunks), content_type='text/csv')
+        response['Content-Length'] = str(len(BODY))
+        resp = run(response)
+        self.assertEqual(resp['Content-Encoding'], 'br')
+        self.assertFalse(resp.has_header('Content-Length'))
+        parts = list(resp.streaming_content)
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(brotli.decompress(b''.join(parts)), BODY)
+
+
+class CompressedBodyCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _pdf(self):
+        tmp = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+        tmp.write(b'%PDF-1.4 ' + BODY)
+        tmp.close()
+        self.addCleanup(Path(tmp.name).unlink)
+        response = FileResponse(open(tmp.name, 'rb'), content_type='application/pdf')
+        response['ETag'] = '"abc123"'
+        return response
+
+    def test_strong_etag_body_is_compressed_once(self):
+        with patch('hw.compression.compress', wraps=compression.compress) as spy:
+            first = run(self._pdf())
+            first_body = b''.join(first.streaming_content)
+            second = run(self._pdf())
+            second_body = b''.join(second.streaming_content)
+        spy.assert_called_once_with('br', 'application/pdf', b'%PDF-1.4 ' + BODY, cached=True)
+        self.assertEqual(first_body, second_body)
+        self.assertEqual(brotli.decompress(second_body), b'%PDF-1.4 ' + BODY)
+        self.assertEqual(second['ETag'], 'W/"abc123"')
+        self.assertEqual(second['Content-Length'], str(len(second_body)))
+
+    def test_encodings_are_cached_separately(self):
+        run(self._pdf())
+        resp = run(self._pdf(), accept='gzip')
+        self.assertEqual(gzip.decompress(b''.join(resp.streaming_content)), b'%PDF-1.4 ' + BODY)
+
+    @override_settings(COMPRESSION_CACHE_MAX_BYTES=100)
+    def test_large_bodies_are_not_cached(self):
+        with patch('hw.compression.compress', wraps=compression.compress) as spy:
+            resp = run(self._pdf())
+            self.assertEqual(brotli.decompress(b''.join(resp.streaming_content)), b'%PDF-1.4 ' + BODY)
+        spy.assert_not_called()
+        self.assertEqual(cache.get(compression._cache_key('br', '"abc123"')), None)
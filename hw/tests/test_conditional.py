@@ -0,0 +1,218 @@
+import shutil
+import tempfile
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import (
+    Client, ConfirmationLetter, Hotel, Invoice, Payment, Remittance, RemittanceLine, Reservation, Room,
+)
+from hw.views.conditional import rows_version
+
+
+class ConditionalTestBase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('etag_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-ETAG', customer_name='Budi Travel',
+        )
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1000)
+
+    def _get(self, path, etag=None, **headers):
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(path, **headers)
+
+    def assertFresh(self, path, **headers):
+        """First GET returns an ETag; repeating it with If-None-Match is a 304."""
+        resp = self._get(path, **headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['ETag'].startswith('W/"'))
+        self.assertIn('no-cache', resp['Cache-Control'])
+        self.assertIn('private', resp['Cache-Control'])
+        again = self._get(path, resp['ETag'], **headers)
+        self.assertEqual(again.status_code, 304)
+        return resp['ETag']
+
+
+class DetailPageTest(ConditionalTestBase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/invoice/{self.invoice.pk}/'
+
+    def test_not_modified_skips_the_view(self):
+        etag = self.assertFresh(self.url, HTTP_X_INERTIA='true')
+        with patch('hw.views.invoice_views._build_reservation_context') as build:
+            resp = self._get(self.url, etag, HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 304)
+        build.assert_not_called()
+
+    def test_child_rows_change_the_etag(self):
+        etag = self.assertFresh(self.url)
+        pay = Payment.objects.create(invoice=self.invoice, amount=400, currency='SAR', exchange_rate=1)
+        self.assertEqual(self._get(self.url, etag).status_code, 200)
+
+        etag = self.assertFresh(self.url)
+        pay.delete()
+        self.assertEqual(self._get(self.url, etag).status_code, 200)
+
+        etag = self.assertFresh(self.url)
+        res = Reservation.objects.get(invoice=self.invoice)
+        res.total_sar = 1200
+        res.save()
+        self.assertEqual(self._get(self.url, etag).status_code, 200)
+
+    def test_partial_reload_has_its_own_etag(self):
+        full = self.assertFresh(self.url, HTTP_X_INERTIA='true')
+        partial = self.assertFresh(
+            self.url, HTTP_X_INERTIA='true',
+            HTTP_X_INERTIA_PARTIAL_COMPONENT='Invoice/Detail', HTTP_X_INERTIA_PARTIAL_DATA='payments',
+        )
+        self.assertNotEqual(full, partial)
+
+    def test_pending_flash_message_is_always_rendered(self):
+        etag = self.assertFresh(self.url)
+        with patch('hw.views.conditional.get_messages', return_value=[Message(20, 'Saved')]):
+            resp = self._get(self.url, etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.has_header('ETag'))
+
+    def test_new_asset_version_resends_the_page(self):
+        etag = self.assertFresh(self.url)
+        with override_settings(INERTIA_VERSION='deploy-2'):
+            resp = self._get(self.url, etag)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(self._get(self.url, resp['ETag']).status_code, 304)
+
+    def test_missing_object_still_404s(self):
+        self.assertEqual(self._get('/invoice/999999/').status_code, 404)
+        self.assertEqual(self._get('/invoice/999999/', 'W/"x"').status_code, 404)
+
+    def test_cl_room_edit_changes_the_etag(self):
+        cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-ETAG', guest_name='Budi', hotel_name='Hilton',
+            check_in=date(2026, 1, 1), check_out=date(2026, 1, 3),
+        )
+        room = Room.objects.create(cl=cl, room_type='Double', quantity=1, price=100)
+        url = f'/cl/{cl.pk}/'
+        etag = self.assertFresh(url)
+        room.price = 150
+        room.save()
+        self.assertEqual(self._get(url, etag).status_code, 200)
+
+
+class DataEndpointTest(ConditionalTestBase):
+    def test_hotel_map_data(self):
+        Hotel.objects.create(company='konoz', name='Pullman Zamzam', area='Ajyad')
+        etag = self.assertFresh('/hotels/map/data/')
+        Hotel.objects.create(company='konoz', name='Shaza Madinah', city='madinah')
+        self.assertEqual(self._get('/hotels/map/data/', etag).status_code, 200)
+
+    def test_client_map_data(self):
+        client = Client.objects.create(company='konoz', name='Old Travel', lat=-6.2, lng=106.8)
+        etag = self.assertFresh('/clients/map/data/')
+        client.name = 'New Travel'
+        client.save()
+        self.assertEqual(self._get('/clients/map/data/', etag).status_code, 200)
+
+    def test_csv_export_etag_follows_the_filters(self):
+        etag = self.assertFresh('/invoice/export/csv/')
+        filtered = self.assertFresh('/invoice/export/csv/?q=Budi')
+        self.assertNotEqual(etag, filtered)
+        Payment.objects.create(invoice=self.invoice, amount=400, currency='SAR', exchange_rate=1)
+        self.assertEqual(self._get('/invoice/export/csv/', etag).status_code, 200)
+
+    def test_remittance_detail_follows_its_lines(self):
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 5), remittance_number='RMT-ETAG')
+        line = RemittanceLine.objects.create(remittance=rem, invoice=self.invoice, linked_number='R1', amount_sar=300)
+        url = f'/remittance/{rem.pk}/'
+        etag = self.assertFresh(url)
+        line.amount_sar = 350
+        line.save()
+        self.assertEqual(self._get(url, etag).status_code, 200)
+
+    def test_remittance_detail_follows_its_own_edits(self):
+        root = tempfile.mkdtemp(prefix='hms-rem-etag-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 5), remittance_number='RMT-ETAG2')
+        RemittanceLine.objects.create(remittance=rem, invoice=self.invoice, linked_number='R1', amount_sar=300)
+        url = f'/remittance/{rem.pk}/'
+        edits = [
+            (f'/remittance/{rem.pk}/mark-received/', {}),
+            (f'/remittance/{rem.pk}/upload-proof/', {'proof': SimpleUploadedFile('bukti.jpg', b'img')}),
+            (f'/remittance/{rem.pk}/edit/', {'date': '2026-01-05', 'status': 'received', 'note': 'Sudah masuk'}),
+        ]
+        with override_settings(MEDIA_ROOT=root):
+            for path, data in edits:
+                etag = self.assertFresh(url)
+                self.client.post(path, data)
+                self.assertEqual(self._get(url, etag).status_code, 200, path)
+
+    def test_remittance_detail_follows_payments_of_its_reservations(self):
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 5), remittance_number='RMT-ETAG3')
+        RemittanceLine.objects.create(remittance=rem, invoice=self.invoice, linked_number='R1', amount_sar=300)
+        url = f'/remittance/{rem.pk}/'
+        etag = self.assertFresh(url)
+        pay = Payment.objects.create(
+            invoice=self.invoice, linked_number='R1', payment_date=date(2026, 1, 2),
+            amount=300, currency='SAR', exchange_rate=1,
+        )
+        self.assertEqual(self._get(url, etag).status_code, 200)
+
+        etag = self.assertFresh(url)
+        pay.payment_date = date(2026, 1, 1)
+        pay.save()
+        self.assertEqual(self._get(url, etag).status_code, 200)
+
+    def test_post_is_never_conditional(self):
+        resp = self.client.post('/hotels/map/data/', HTTP_IF_NONE_MATCH='*')
+        self.assertNotEqual(resp.status_code, 304)
+
+
+class RowsVersionTest(ConditionalTestBase):
+    def test_single_query_for_all_sources(self):
+        with CaptureQueriesContext(connection) as ctx:
+            version = rows_version(
+                Invoice.objects.filter(pk=self.invoice.pk),
+                Reservation.objects.filter(invoice=self.invoice),
+                Payment.objects.filter(invoice=self.invoice),
+            )
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(version[0], 1)
+        self.assertEqual(version[2], 1)
+        self.assertEqual(version[4], 0)
+        self.assertIsNone(version[5])
+
+
+@patch('hw.views.pdf.HTML')
+class PdfConditionalTest(ConditionalTestBase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix='hms-pdf-etag-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        store = override_settings(PDF_ARTIFACT_ROOT=root)
+        store.enable()
+        self.addCleanup(store.disable)
+
+    def test_matching_digest_is_not_modified(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF-etag'
+        url = f'/invoice/{self.invoice.pk}/pdf/'
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        mock_html.reset_mock()
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        mock_html.assert_not_called()
+        job = self.client.get(f'/pdf/jobs/{etag.strip(chr(34))}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(job.status_code, 304)
@@ -0,0 +1,126 @@
+import gzip
+import tracemalloc
+import zlib
+from datetime import date
+
+import brotli
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import ConfirmationLetter, Invoice, Remittance, RemittanceLine, Room
+from hw.views.helpers import _stream_csv
+
+ROWS = 200_000
+# Batas puncak alokasi selama export; file CSV utuhnya sendiri ~10 MB.
+MEMORY_CEILING = 2 * 1024 * 1024
+
+
+def _synthetic_rows():
+    for n in range(ROWS):
+        yield [f'HMS/{n:06d}', 'konoz', f'Guest {n}', 'Hilton Makkah', '2026-01-01', '2026-01-04', 12500, 'DEFINITE', '']
+
+
+class StreamCsvMemoryTest(SimpleTestCase):
+    """Export 200k baris harus jalan dengan memori konstan, bukan sebesar file."""
+
+    def _consume(self, response):
+        tracemalloc.start()
+        try:
+            size = lines = 0
+            decompressor = zlib.decompressobj(31) if response['Content-Type'] == 'application/gzip' else None
+            for chunk in response.streaming_content:
+                if decompressor:
+                    chunk = decompressor.decompress(chunk)
+                size += len(chunk)
+                lines += chunk.count(b'\n')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return size, lines, peak
+
+    def test_plain_stream_stays_under_ceiling(self):
+        request = RequestFactory().get('/cl/export/csv/')
+        response = _stream_csv(request, 'cl.csv', ['No CL'], _synthetic_rows())
+        size, lines, peak = self._consume(response)
+        self.assertEqual(lines, ROWS + 1)
+        self.assertGreater(size, 5 * MEMORY_CEILING)
+        self.assertLess(peak, MEMORY_CEILING)
+
+    def test_gzip_stream_stays_under_ceiling(self):
+        request = RequestFactory().get('/cl/export/csv/', {'gzip': '1'})
+        response = _stream_csv(request, 'cl.csv', ['No CL'], _synthetic_rows())
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="cl.csv.gz"')
+        size, lines, peak = self._consume(response)
+        self.assertEqual(lines, ROWS + 1)
+        self.assertLess(peak, MEMORY_CEILING)
+
+
+class CsvExportViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('csv_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+
+    def _cls(self, start, end):
+        for n in range(start, end):
+            cl = ConfirmationLetter.objects.create(
+                company='konoz', confirmation_number=f'CSV-{n:03d}', guest_name='Budi', hotel_name='Hilton',
+                check_in=date(2026, 1, 1), check_out=date(2026, 1, 3),
+            )
+            Room.objects.create(cl=cl, room_type='Double', quantity=1, price=100)
+
+    def _export(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, params)
+            body = b''.join(resp.streaming_content)
+        return resp, body, len(ctx)
+
+    def test_cl_export_streams_with_flat_query_count(self):
+        self._cls(0, 2)
+        self._export('/cl/export/csv/')  # warm caches
+        _, _, small = self._export('/cl/export/csv/')
+        self._cls(2, 20)
+        resp, body, large = self._export('/cl/export/csv/')
+        self.assertTrue(resp.streaming)
+        self.assertEqual(small, large)
+        text = body.decode('utf-8-sig')
+        self.assertEqual(len(text.strip().splitlines()), 21)
+        self.assertIn('CSV-019,konoz,Budi,Hilton,2026-01-01,2026-01-03,200', text)
+
+    def test_gzip_download_matches_plain(self):
+        self._cls(0, 3)
+        _, plain, _ = self._export('/cl/export/csv/')
+        resp, packed, _ = self._export('/cl/export/csv/', gzip='1')
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(packed), plain)
+
+    def test_gzip_download_is_not_compressed_again(self):
+        self._cls(0, 3)
+        _, plain, _ = self._export('/cl/export/csv/')
+        for accept in ('gzip', 'br, gzip'):
+            resp = self.client.get('/cl/export/csv/', {'gzip': '1'}, HTTP_ACCEPT_ENCODING=accept)
+            self.assertEqual(resp['Content-Type'], 'application/gzip')
+            self.assertFalse(resp.has_header('Content-Encoding'), accept)
+            self.assertEqual(gzip.decompress(b''.join(resp.streaming_content)), plain)
+
+    def test_streaming_survives_brotli_accept_encoding(self):
+        self._cls(0, 1)
+        resp = self.client.get('/cl/export/csv/', HTTP_ACCEPT_ENCODING='br')
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp.get('Content-Encoding'), 'br')
+        self.assertIn(b'CSV-000', brotli.decompress(b''.join(resp.streaming_content)))
+
+    def test_remittance_export_uses_sql_totals(self):
+        inv = Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-CSV', customer_name='X')
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 5), remittance_number='RMT-CSV1', note='n1')
+        RemittanceLine.objects.create(remittance=rem, invoice=inv, linked_number='R1', amount_sar=300)
+        RemittanceLine.objects.create(remittance=rem, linked_number='R2', amount_sar=200)
+        Remittance.objects.create(company='konoz', date=date(2026, 1, 4), remittance_number='RMT-CSV2')
+        _, body, _ = self._export('/remittance/export/csv/')
+        lines = body.decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'Tanggal,Total SAR,Note,Res#,Invoice,Amount SAR')
+        self.assertEqual(lines[1], '05/01/2026,500,n1,R1,INV-CSV,300')
+        self.assertEqual(lines[2], ',,,R2,,200')
+        self.assertEqual(lines[3], '04/01/2026,0,,,,')
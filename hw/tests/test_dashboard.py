@@ -0,0 +1,128 @@
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch
+
+from hw.models import ConfirmationLetter, Invoice, Payment, Remittance, Reservation
+from hw.services.dashboard import build_dashboard, get_dashboard
+
+
+def _make_cl(n, **kw):
+    defaults = dict(
+        company='konoz', confirmation_number=f'CL-DB-{n:04d}', guest_name=f'Guest {n}',
+        hotel_name='Hilton', check_in=date.today(), check_out=date.today() + timedelta(days=2),
+    )
+    defaults.update(kw)
+    return ConfirmationLetter.objects.create(**defaults)
+
+
+class DashboardServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date.today()
+
+    def test_cl_counts_and_funnel(self):
+        _make_cl(1)
+        _make_cl(2, reservation_status='TENTATIVE', hotel_name='Marriott')
+        _make_cl(3, check_in=self.today - timedelta(days=5), check_out=self.today - timedelta(days=1))
+        data = build_dashboard('konoz', self.today)
+        self.assertEqual(data['kpis']['cl_month'], 3)
+        self.assertEqual(data['kpis']['upcoming_checkins'], 2)
+        self.assertEqual(data['top_hotels'][0], {'hotel': 'Hilton', 'count': 2})
+        self.assertEqual(data['top_hotels_total'], 3)
+        self.assertEqual(
+            [s['value'] for s in data['reservation_funnel']],
+            [3, 2, 1],
+        )
+        # the monthly trend ends with last month; today's CLs are only in the daily series
+        self.assertEqual(sum(m['count'] for m in data['cl_trend']), 0)
+        self.assertEqual(data['cl_daily'][-1]['count'], 3)
+        self.assertEqual(len(data['cl_trend']), 12)
+        self.assertEqual(len(data['cl_daily']), 30)
+
+    def test_monthly_trend_is_the_twelve_months_before_this_one(self):
+        created = [datetime(2025, 2, 28, 12), datetime(2025, 3, 1, 12), datetime(2026, 2, 27, 12), datetime(2026, 3, 2, 12)]
+        for n, at in enumerate(created):
+            cl = _make_cl(n)
+            ConfirmationLetter.objects.filter(pk=cl.pk).update(created_at=timezone.make_aware(at))
+        trend = build_dashboard('konoz', date(2026, 3, 15))['cl_trend']
+        self.assertEqual((trend[0]['label'], trend[-1]['label']), ('Mar', 'Feb'))
+        self.assertEqual([m['count'] for m in trend], [1] + [0] * 10 + [1])
+
+    def test_unpaid_and_previous_month_outstanding(self):
+        inv = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-DB-1', customer_name='X',
+        )
+        Invoice.objects.filter(pk=inv.pk).update(created_at=inv.created_at - timedelta(days=62))
+        Reservation.objects.create(invoice=inv, reservation_number='R1', total_sar=1000)
+        month_start = self.today.replace(day=1)
+        # 1,600,000 IDR at 4,000 -> 400 SAR, paid before this month
+        Payment.objects.create(invoice=inv, amount=1_600_000, currency='IDR', exchange_rate=4000,
+                               payment_date=month_start - timedelta(days=3))
+        Payment.objects.create(invoice=inv, amount=100, currency='SAR', exchange_rate=1,
+                               payment_date=self.today)
+        data = build_dashboard('konoz', self.today)
+        self.assertEqual(data['kpis']['unpaid_invoices'], 1)
+        self.assertEqual(data['kpis']['unpaid_total'], 500)
+        self.assertEqual(data['kpis']['deltas']['unpaid']['prev'], 600)
+        self.assertEqual(data['payment_snapshot'], {'billed': 1000, 'collected': 500, 'outstanding': 500})
+
+    def test_remittance_counts_only_for_konoz(self):
+        Remittance.objects.create(company='konoz', date=self.today, remittance_number='RMT-DB-1')
+        self.assertEqual(build_dashboard('konoz', self.today)['kpis']['remittance_pending'], 1)
+        self.assertIsNone(build_dashboard('ijabah', self.today)['kpis']['remittance_pending'])
+
+    def test_query_count_does_not_grow_with_cls(self):
+        _make_cl(1)
+        with self.assertNumQueries(8):
+            build_dashboard('konoz', self.today)
+        for n in range(2, 40):
+            _make_cl(n, hotel_name=f'Hotel {n % 7}')
+        with self.assertNumQueries(8):
+            build_dashboard('konoz', self.today)
+
+    def test_cached_until_a_cl_is_written(self):
+        _make_cl(1)
+        self.assertEqual(get_dashboard('konoz')['top_hotels_total'], 1)
+        with self.assertNumQueries(1):  # the cache read itself
+            get_dashboard('konoz')
+        _make_cl(2)
+        self.assertEqual(get_dashboard('konoz')['top_hotels_total'], 2)
+
+    def test_payment_write_invalidates(self):
+        inv = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-DB-2', customer_name='X',
+        )
+        Reservation.objects.create(invoice=inv, reservation_number='R1', total_sar=1000)
+        self.assertEqual(get_dashboard('konoz')['kpis']['unpaid_total'], 1000)
+        Payment.objects.create(invoice=inv, amount=1000, currency='SAR', exchange_rate=1)
+        self.assertEqual(get_dashboard('konoz')['kpis']['unpaid_total'], 0)
+
+
+class HomeViewDashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Remittance.objects.create(company='konoz', date=date.today(), remittance_number='RMT-DB-2')
+
+    def _kpis(self, user):
+        self.client.force_login(user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        resp = self.client.get('/', HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()['props']['kpis']
+
+    def test_remittance_visible_to_admin(self):
+        admin = User.objects.create_superuser('dash_admin', password='pw12345')
+        self.assertEqual(self._kpis(admin)['remittance_pending'], 1)
+
+    def test_remittance_hidden_without_permission_even_when_cached(self):
+        admin = User.objects.create_superuser('dash_admin', password='pw12345')
+        self._kpis(admin)  # warms the shared per-company entry
+        other = User.objects.create_user('dash_other', password='pw12345')
+        with patch('hw.views.can', return_value=False):
+            kpis = self._kpis(other)
+        self.assertIsNone(kpis['remittance_pending'])
+        self.assertIsNone(kpis['deltas']['remittance'])
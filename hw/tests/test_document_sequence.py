@@ -0,0 +1,113 @@
+import threading
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import CancellationPenalty, ConfirmationLetter, DocumentSequence, Invoice, Remittance
+
+
+def _cl(number, company='konoz'):
+    return ConfirmationLetter.objects.create(
+        company=company, confirmation_number=number, guest_name='Budi',
+        check_in=date(2026, 3, 1), check_out=date(2026, 3, 4),
+    )
+
+
+class DocumentSequenceTest(TestCase):
+    def test_first_use_seeds_from_existing_numbers(self):
+        DocumentSequence.objects.all().delete()
+        _cl('CL-007')
+        _cl('CL-012', company='ijabah')
+        _cl('CL-2026-99')  # bukan format PREFIX-N, diabaikan
+        self.assertEqual(ConfirmationLetter.generate_number(), 'CL-013')
+        self.assertEqual(ConfirmationLetter.generate_number(), 'CL-014')
+
+    def test_allocation_is_a_single_row_update(self):
+        ConfirmationLetter.generate_number()
+        with CaptureQueriesContext(connection) as ctx:
+            ConfirmationLetter.generate_number()
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('hw_confirmationletter', sql, 'allocation must not scan the documents')
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+
+    def test_peek_neither_reserves_nor_writes(self):
+        _cl('CL-004')
+        with CaptureQueriesContext(connection) as ctx:
+            first = ConfirmationLetter.suggest_number()
+            second = ConfirmationLetter.suggest_number()
+        self.assertEqual((first, second), ('CL-005', 'CL-005'))
+        self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+        self.assertEqual(ConfirmationLetter.generate_number(), 'CL-005')
+
+    def test_typed_numbers_move_the_counter(self):
+        self.assertEqual(Invoice.suggest_number('hotel'), 'INV-001')
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-040')
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-010')
+        self.assertEqual(Invoice.generate_number('hotel'), 'INV-041')
+        self.assertEqual(Invoice.generate_number('visa'), 'SVC-001')
+
+    def test_long_typed_codes_leave_the_counter_alone(self):
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-005')
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-20261018001')
+        self.assertEqual(Invoice.generate_number('hotel'), 'INV-006')
+        DocumentSequence.objects.all().delete()
+        self.assertEqual(Invoice.generate_number('hotel'), 'INV-006')  # seed ignores it too
+
+
+        cl = _cl('CL-001')
+        CancellationPenalty.objects.create(cl=cl, penalty_number='PNL-003', cancellation_date=date(2026, 3, 1))
+        Remittance.objects.create(remittance_number='RMT-009', date=date(2026, 3, 1))
+        self.assertEqual(CancellationPenalty.generate_number(), 'PNL-004')
+        self.assertEqual(Remittance.generate_number(), 'RMT-010')
+
+    def test_new_form_suggestion_does_not_reserve(self):
+        user = User.objects.create_superuser('seq_admin', password='pw12345')
+        self.client.force_login(user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        for _ in range(2):
+            resp = self.client.get('/cl/new/', HTTP_X_INERTIA='true', HTTP_X_INERTIA_VERSION='1.0')
+            self.assertEqual(resp.json()['props']['suggested_number'], 'CL-001')
+
+
+def _allocate_retrying():
+    # Test DB SQLite in-memory (shared cache) menolak tulis bersamaan dengan
+    # "table is locked" alih-alih menunggu seperti busy_timeout; ulangi saja.
+    # Percobaan yang gagal sudah di-rollback, jadi tidak boleh meninggalkan celah.
+    while True:
+        try:
+            return ConfirmationLetter.generate_number()
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+
+
+class ParallelAllocationTest(TransactionTestCase):
+    THREADS = 6
+    PER_THREAD = 15
+
+    def test_parallel_creators_get_distinct_gapless_numbers(self):
+        numbers, errors = [], []
+        start = threading.Barrier(self.THREADS)
+
+        def creator():
+            try:
+                start.wait()
+                for _ in range(self.PER_THREAD):
+                    numbers.append(_allocate_retrying())
+            except Exception as exc:  # pragma: no cover - dilaporkan di bawah
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=creator) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.PER_THREAD
+        self.assertEqual(sorted(numbers), [f'CL-{n:03d}' for n in range(1, total + 1)])
@@ -0,0 +1,141 @@
+import threading
+import time
+from datetime import date
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from hw.models import ConfirmationLetter, ReminderLog
+from hw.services import fonnte
+from hw.services.fonnte import CircuitBreaker, FonnteClient, send_all
+
+from .fonnte_fake import FakeFonnte, unreachable_url
+
+
+def _client(url, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return FonnteClient(url, 'token-x', **kwargs)
+
+
+class FonnteClientTest(SimpleTestCase):
+    def test_reuses_one_pooled_connection(self):
+        with FakeFonnte() as fake:
+            client = _client(fake.url)
+            results = [client.send({'target': f'6281{n}', 'message': 'hi'}) for n in range(5)]
+        self.assertTrue(all(r['status'] for r in results))
+        self.assertEqual(fake.connections, 1)
+        self.assertEqual(fake.requests[0]['headers']['Authorization'], 'token-x')
+        self.assertEqual(fake.requests[4]['form'], {'target': '62814', 'message': 'hi'})
+
+    def test_retries_5xx_with_backoff(self):
+        with FakeFonnte(script=[503, 502]) as fake:
+            result = _client(fake.url).send({'target': '628', 'message': 'hi'})
+        self.assertTrue(result['status'])
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        with FakeFonnte(default=500) as fake:
+            result = _client(fake.url, max_retries=2).send({'target': '628', 'message': 'hi'})
+        self.assertEqual(result, {'status': False, 'reason': 'Fonnte API returned HTTP 500'})
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_read_timeout_is_not_retried(self):
+        # Pesannya mungkin sudah diterima Fonnte: jangan kirim dua kali.
+        with FakeFonnte(default=('sleep', 2)) as fake:
+            result = _client(fake.url).send({'target': '628', 'message': 'hi'}, read_timeout=0.2)
+        self.assertEqual(result['reason'], fonnte.TIMED_OUT)
+        self.assertEqual(len(fake.requests), 1)
+
+    def test_unreachable_api_returns_clean_reason(self):
+        result = _client(unreachable_url(), max_retries=1).send({'target': '628', 'message': 'hi'})
+        self.assertEqual(result, {'status': False, 'reason': fonnte.UNREACHABLE})
+
+    def test_fonnte_level_failure_does_not_trip_the_breaker(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        with FakeFonnte(default={'status': False, 'reason': 'invalid target'}) as fake:
+            client = _client(fake.url, breaker=breaker)
+            client.send({'target': 'x', 'message': 'hi'})
+            result = client.send({'target': 'x', 'message': 'hi'})
+        self.assertEqual(result['reason'], 'invalid target')
+        self.assertFalse(breaker.is_open)
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def test_opens_after_threshold_and_half_opens_after_cooldown(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=0.1)
+        client = _client(unreachable_url(), max_retries=0, breaker=breaker)
+        for _ in range(2):
+            self.assertEqual(client.send({'target': '628', 'message': 'hi'})['reason'], fonnte.UNREACHABLE)
+        self.assertEqual(client.send({'target': '628', 'message': 'hi'})['reason'], fonnte.CIRCUIT_OPEN)
+
+        time.sleep(0.15)
+        with FakeFonnte() as fake:
+            client.url = fake.url
+            self.assertTrue(client.send({'target': '628', 'message': 'hi'})['status'])
+        self.assertFalse(breaker.is_open)
+
+    def test_only_one_trial_send_while_half_open(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(False)
+        self.assertTrue(breaker.is_open)
+
+
+class SendAllTest(SimpleTestCase):
+    @override_settings(FONNTE_MAX_CONCURRENCY=4)
+    def test_concurrent_and_in_order(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def send(target, message):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            if target == 'boom':
+                raise RuntimeError('exploded')
+            return {'status': True, 'target': target}
+
+        results = send_all([(t, 'm') for t in ['a', 'b', 'boom', 'c', 'd', 'e', 'f', 'g']], send=send)
+        self.assertEqual([r.get('target') for r in results], ['a', 'b', None, 'c', 'd', 'e', 'f', 'g'])
+        self.assertEqual(results[2], {'status': False, 'reason': 'exploded'})
+        self.assertEqual(peak[0], 4)
+
+
+def _guest_cl(n):
+    return ConfirmationLetter.objects.create(
+        company='konoz', confirmation_number=f'CL-WA{n:02d}', guest_name=f'Tamu {n}',
+        guest_phone=f'62812000{n:02d}', hotel_name='Hilton', check_in=date.today(),
+    )
+
+
+@override_settings(
+    REMINDER_H1_H0_ENABLED=True, FONNTE_MAX_RETRIES=1, FONNTE_BACKOFF_SECONDS=0.01,
+    FONNTE_BREAKER_THRESHOLD=3, FONNTE_MAX_CONCURRENCY=4,
+)
+class ReminderRunTransportTest(TestCase):
+    def test_reminders_go_through_the_pooled_client(self):
+        for n in range(6):
+            _guest_cl(n)
+        with FakeFonnte() as fake, override_settings(FONNTE_API_URL=fake.url):
+            call_command('send_checkin_reminders', stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(fake.requests), 6)
+        self.assertLessEqual(fake.connections, 4)
+        self.assertEqual(ReminderLog.objects.filter(status='SENT').count(), 6)
+
+    def test_hanging_api_costs_a_few_timeouts_not_one_per_target(self):
+        for n in range(20):
+            _guest_cl(n)
+        with FakeFonnte(default=('sleep', 5)) as fake, \
+                override_settings(FONNTE_API_URL=fake.url, FONNTE_READ_TIMEOUT=0.3):
+            started = time.monotonic()
+            call_command('send_checkin_reminders', stdout=open('/dev/null', 'w'))
+            elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 2)
+        self.assertLess(len(fake.requests), 8)
+        errors = list(ReminderLog.objects.values_list('error', flat=True))
+        self.assertEqual(len(errors), 20)
+        self.assertGreater(errors.count(fonnte.CIRCUIT_OPEN), 10)
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from hw.context_processors import due_soon
+from hw.models import Invoice
+from hw.services.dashboard import CHART_KEYS, SUMMARY_KEYS, get_dashboard
+
+
+class InertiaPropsTestBase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('props_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+
+    def _get(self, path, component=None, only=()):
+        headers = {'HTTP_X_INERTIA': 'true'}
+        if component:
+            headers['HTTP_X_INERTIA_PARTIAL_COMPONENT'] = component
+            headers['HTTP_X_INERTIA_PARTIAL_DATA'] = ','.join(only)
+        resp = self.client.get(path, **headers)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()['props']
+
+
+class SharedPropsTest(InertiaPropsTestBase):
+    def test_full_load_computes_due_soon_once(self):
+        with patch('hw.inertia_share.due_soon', wraps=due_soon) as spy:
+            props = self._get('/clients/')
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(props['due_soon_count'], 0)
+        self.assertEqual(props['auth']['user']['username'], 'props_admin')
+
+    def test_partial_reload_skips_unrequested_shared_props(self):
+        with patch('hw.inertia_share.due_soon') as spy, patch('hw.inertia_share._auth') as auth:
+            props = self._get('/clients/', 'Client/List', ['clients'])
+        spy.assert_not_called()
+        auth.assert_not_called()
+        self.assertNotIn('auth', props)
+
+    def test_redirecting_post_computes_nothing(self):
+        with patch('hw.inertia_share.due_soon') as spy, patch('hw.inertia_share._auth') as auth:
+            resp = self.client.post('/company/set/', {'company': 'ijabah'}, HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 302)
+        spy.assert_not_called()
+        auth.assert_not_called()
+
+
+class HomePropsTest(InertiaPropsTestBase):
+    def test_first_load_leaves_the_charts_out(self):
+        with patch('hw.views.get_dashboard', wraps=get_dashboard) as spy:
+            props = self._get('/')
+        self.assertTrue(set(SUMMARY_KEYS) <= set(props))
+        self.assertFalse(set(CHART_KEYS) & set(props))
+        self.assertEqual([c.kwargs['sections'] for c in spy.call_args_list], [('summary',)])
+
+    def test_partial_reload_builds_only_the_charts(self):
+        with patch('hw.views.get_dashboard', wraps=get_dashboard) as spy:
+            props = self._get('/', 'Home/Index', CHART_KEYS)
+        self.assertEqual(set(props), set(CHART_KEYS))
+        self.assertEqual(len(props['cl_trend']), 12)
+        self.assertEqual([c.kwargs['sections'] for c in spy.call_args_list], [('charts',)])
+
+
+class ListPropsTest(InertiaPropsTestBase):
+    def test_invoice_pagination_skips_the_stats(self):
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-P-1', customer_name='X')
+        with patch('hw.views.invoice_views._invoice_stats', return_value={}) as stats:
+            self._get('/invoice/')
+            self.assertEqual(stats.call_count, 1)
+            props = self._get('/invoice/?page=1', 'Invoice/List', ['invoices', 'pagination'])
+            self.assertEqual(stats.call_count, 1)
+        self.assertEqual(set(props), {'invoices', 'pagination'})
+        self.assertEqual(props['invoices'][0]['invoice_number'], 'INV-P-1')
+
+    def test_calendar_checkin_reload_skips_the_month_grid(self):
+        with patch('hw.views.calendar_views._month_grid') as grid:
+            props = self._get('/calendar/', 'Calendar/Index', ['upcoming_checkins'])
+        grid.assert_not_called()
+        self.assertEqual(list(props), ['upcoming_checkins'])
@@ -0,0 +1,171 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from hw.models import ConfirmationLetter, Invoice, Payment, PaymentStatus, Reservation, Room
+
+
+class InvoiceBalanceColumnsTest(TestCase):
+    """billed_sar/paid_sar/balance_sar/payment_status are kept in step with
+    reservations, payments and CL rooms by the signals in hw/signals.py."""
+
+    def setUp(self):
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel',
+            invoice_number='INV-BAL-001', customer_name='Test Customer',
+        )
+
+    def _stored(self):
+        self.invoice.refresh_from_db()
+        return (self.invoice.billed_sar, self.invoice.paid_sar,
+                self.invoice.balance_sar, self.invoice.payment_status)
+
+    def test_new_invoice_starts_settled_at_zero(self):
+        self.assertEqual(self._stored(), (0, 0, 0, PaymentStatus.PAID))
+
+    def test_reservation_sets_billed_and_unpaid(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1000)
+        self.assertEqual(self._stored(), (1000, 0, 1000, PaymentStatus.UNPAID))
+
+    def test_payments_convert_to_sar_and_move_status(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1000)
+        Payment.objects.create(invoice=self.invoice, amount=400, currency='SAR', exchange_rate=1)
+        self.assertEqual(self._stored(), (1000, 400, 600, PaymentStatus.PARTIAL))
+
+        # 2,400,000 IDR at 4,000 IDR/SAR -> 600 SAR
+        Payment.objects.create(invoice=self.invoice, amount=2_400_000, currency='IDR', exchange_rate=4000)
+        self.assertEqual(self._stored(), (1000, 1000, 0, PaymentStatus.PAID))
+
+        # 100 USD at 3.75 -> 375 SAR
+        Payment.objects.create(invoice=self.invoice, amount=100, currency='USD', exchange_rate='3.75')
+        self.assertEqual(self._stored(), (1000, 1375, -375, PaymentStatus.OVERPAID))
+
+    def test_deleting_payment_and_reservation_recomputes(self):
+        res = Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1000)
+        pay = Payment.objects.create(invoice=self.invoice, amount=1000, currency='SAR', exchange_rate=1)
+        pay.delete()
+        self.assertEqual(self._stored(), (1000, 0, 1000, PaymentStatus.UNPAID))
+        res.delete()
+        self.assertEqual(self._stored(), (0, 0, 0, PaymentStatus.PAID))
+
+    def test_room_change_flows_through_reservation_sync(self):
+        cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-BAL-001', guest_name='Budi',
+            check_in=date.today(), check_out=date.today() + timedelta(days=2),
+            invoice=self.invoice,
+        )
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-BAL-001', total_sar=0)
+        Room.objects.create(cl=cl, room_type='Deluxe', quantity=1, price=500)
+        self.assertEqual(self._stored(), (1000, 0, 1000, PaymentStatus.UNPAID))
+
+    def test_columns_match_properties(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1234)
+        Payment.objects.create(invoice=self.invoice, amount=1_000_000, currency='IDR', exchange_rate=4321)
+        inv = Invoice.objects.get(pk=self.invoice.pk)
+        self.assertEqual(inv.billed_sar, inv.total_sar)
+        self.assertEqual(inv.paid_sar, inv.total_paid_sar)
+        self.assertEqual(inv.balance_sar, inv.remaining_sar)
+
+
+class RebuildInvoiceBalancesCommandTest(TestCase):
+    def setUp(self):
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel',
+            invoice_number='INV-BAL-002', customer_name='Test Customer',
+        )
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=800)
+        Payment.objects.create(invoice=self.invoice, amount=300, currency='SAR', exchange_rate=1)
+
+    def _corrupt(self):
+        Invoice.objects.filter(pk=self.invoice.pk).update(
+            billed_sar=0, paid_sar=0, balance_sar=0, payment_status=PaymentStatus.PAID,
+        )
+
+    def test_verify_passes_when_in_sync(self):
+        out = StringIO()
+        call_command('rebuild_invoice_balances', '--verify', stdout=out)
+        self.assertIn('All invoice balances match', out.getvalue())
+
+    def test_verify_reports_drift_without_fixing(self):
+        self._corrupt()
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_invoice_balances', '--verify', stdout=out)
+        self.assertIn('INV-BAL-002', out.getvalue())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.billed_sar, 0)
+
+    def test_rebuild_repairs_drift(self):
+        self._corrupt()
+        call_command('rebuild_invoice_balances', stdout=StringIO())
+        self.invoice.refresh_from_db()
+        self.assertEqual(
+            (self.invoice.billed_sar, self.invoice.paid_sar, self.invoice.balance_sar, self.invoice.payment_status),
+            (800, 300, 500, PaymentStatus.PARTIAL),
+        )
+
+
+class InvoiceListStatusFilterTest(TestCase):
+    """`?status=` on the invoice list filters on the stored payment_status,
+    the same value each row shows."""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_superuser('boss', password='pw12345')
+        self.client.force_login(self.user)
+
+        def make(number, payments, billed=1000):
+            inv = Invoice.objects.create(
+                company='konoz', invoice_type='hotel',
+                invoice_number=number, customer_name='Cust',
+            )
+            Reservation.objects.create(invoice=inv, reservation_number=f'R-{number}', total_sar=billed)
+            for amount, currency, rate in payments:
+                Payment.objects.create(invoice=inv, amount=amount, currency=currency, exchange_rate=rate)
+            return inv
+
+        # 4,000,000 IDR at 4,000 -> 1000 SAR
+        self.paid_idr = make('INV-F-001', [(4_000_000, 'IDR', 4000)])
+        # 100 USD at 3.75 -> 375 SAR
+        self.partial_usd = make('INV-F-002', [(100, 'USD', '3.75')])
+        self.unpaid = make('INV-F-003', [])
+
+    def _numbers(self, status):
+        resp = self.client.get(f'/invoice/?status={status}', HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 200)
+        return sorted(i['invoice_number'] for i in resp.json()['props']['invoices'])
+
+    def test_lunas(self):
+        self.assertEqual(self._numbers('lunas'), ['INV-F-001'])
+
+    def test_partial(self):
+        self.assertEqual(self._numbers('partial'), ['INV-F-002'])
+
+    def test_belum(self):
+        self.assertEqual(self._numbers('belum'), ['INV-F-003'])
+
+    def test_half_sar_payment_is_filtered_like_its_row(self):
+        # 1,005,000 IDR at 10,000 -> 100.5 SAR, which round() takes to 100
+        inv = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-F-004', customer_name='Cust',
+        )
+        Reservation.objects.create(invoice=inv, reservation_number='R-INV-F-004', total_sar=101)
+        Payment.objects.create(invoice=inv, amount=1_005_000, currency='IDR', exchange_rate=10000)
+        resp = self.client.get('/invoice/?status=partial', HTTP_X_INERTIA='true')
+        row = next(i for i in resp.json()['props']['invoices'] if i['invoice_number'] == 'INV-F-004')
+        self.assertEqual((row['status'], row['remaining_sar']), (PaymentStatus.PARTIAL, 1))
+        self.assertNotIn('INV-F-004', self._numbers('lunas'))
+
+    def test_filtered_page_query_count_does_not_grow_with_invoices(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._numbers('partial')  # warm the role-matrix / due-soon caches
+        with CaptureQueriesContext(connection) as small:
+            self._numbers('partial')
+        for n in range(10):
+            Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number=f'INV-X-{n}', customer_name='X')
+        with CaptureQueriesContext(connection) as large:
+            self._numbers('partial')
+        self.assertEqual(len(small), len(large))
@@ -0,0 +1,174 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from hw.models import ConfirmationLetter, Invoice
+from hw.pagination import KeysetPaginator
+from hw.views.helpers import _page_range_display
+from hw.views.invoice_views import INVOICE_LIST_ORDER
+
+
+def _cl(n, check_in, guest):
+    return ConfirmationLetter.objects.create(
+        company='konoz', confirmation_number=f'CL-PG-{n:03d}', guest_name=guest, hotel_name='Hilton',
+        check_in=check_in,
+    )
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        start = date(2026, 3, 1)
+        # Ties on check_in and guest_name, plus undated CLs, so the pk
+        # tie-breaker and the NULL handling both matter.
+        for n in range(23):
+            _cl(n, None if n % 7 == 0 else start + timedelta(days=n // 3), f'Guest {n % 4}')
+        self.qs = ConfirmationLetter.objects.filter(company='konoz')
+
+    def _walk(self, ordering, per_page=5):
+        """All rows reached by following `after` cursors from page 1."""
+        seen, params = [], {}
+        while True:
+            page = KeysetPaginator(self.qs, ordering, per_page).get_page(params)
+            seen.extend(cl.pk for cl in page)
+            if not page.has_next():
+                return seen, page
+            params = {'page': page.next_page_number(), 'after': page.after}
+
+    def test_cursor_walk_matches_a_full_sort(self):
+        for ordering in (['check_in'], ['-check_in'], ['guest_name'], ['-created_at']):
+            expected = [cl.pk for cl in KeysetPaginator(self.qs, ordering, 5).qs]
+            seen, last = self._walk(ordering)
+            self.assertEqual(seen, expected, ordering)
+            self.assertEqual(last.number, 5)
+            self.assertEqual(last.end_index(), 23)
+
+    def test_nulls_go_last_in_both_directions(self):
+        for ordering in (['check_in'], ['-check_in']):
+            rows = list(KeysetPaginator(self.qs, ordering, 5).qs)
+            self.assertTrue(all(cl.check_in is None for cl in rows[-4:]), ordering)
+
+    def test_before_cursor_steps_back(self):
+        pag = KeysetPaginator(self.qs, ['check_in'], 5)
+        third = pag.get_page({'page': 3, 'after': pag.get_page({'page': 1}).after})
+        # page 3 from page 1's cursor skips one page's worth of rows
+        offset_page = KeysetPaginator(self.qs, ['check_in'], 5).get_page({'page': 3})
+        self.assertEqual([c.pk for c in third], [c.pk for c in offset_page])
+        second = KeysetPaginator(self.qs, ['check_in'], 5).get_page({'page': 2, 'before': third.before})
+        expected = [c.pk for c in KeysetPaginator(self.qs, ['check_in'], 5).qs][5:10]
+        self.assertEqual([c.pk for c in second], expected)
+        self.assertTrue(second.has_previous() and second.has_next())
+
+    def test_last_page_is_read_from_the_end(self):
+        expected = [c.pk for c in KeysetPaginator(self.qs, ['guest_name'], 5).qs][20:]
+        with CaptureQueriesContext(connection) as ctx:
+            page = KeysetPaginator(self.qs, ['guest_name'], 5).get_page({'page': 5})
+        self.assertEqual([c.pk for c in page], expected)
+        self.assertFalse(page.has_next())
+        self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+
+    def test_jump_to_last_page_with_a_stale_total(self):
+        # bulk_create and update() send no signals, so the cached total of 23
+        # survives them.
+        KeysetPaginator(self.qs, ['guest_name'], 10).count
+        ConfirmationLetter.objects.bulk_create(
+            ConfirmationLetter(company='konoz', confirmation_number=f'CL-PG-B{n}', guest_name=f'Guest {n}', hotel_name='Hilton')
+            for n in range(5)
+        )
+        expected = [c.pk for c in KeysetPaginator(self.qs, ['guest_name'], 10).qs]
+        page = KeysetPaginator(self.qs, ['guest_name'], 10).get_page({'page': 3})
+        self.assertEqual([c.pk for c in page], expected[20:])
+        self.assertEqual(page.paginator.count, 28)
+
+        self.qs.filter(pk__in=expected[:15]).update(company='other')
+        expected = expected[15:]
+        for number in (4, 3):
+            page = KeysetPaginator(self.qs, ['guest_name'], 5).get_page({'page': number})
+            self.assertEqual((page.number, [c.pk for c in page]), (3, expected[10:]), number)
+
+    def test_cursor_pages_do_not_use_offset(self):
+        first = KeysetPaginator(self.qs, ['-check_in'], 5).get_page({})
+        with CaptureQueriesContext(connection) as ctx:
+            KeysetPaginator(self.qs, ['-check_in'], 5).get_page({'page': 2, 'after': first.after})
+        self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+
+    def test_bad_or_foreign_cursor_falls_back_to_offset(self):
+        other = KeysetPaginator(self.qs, ['guest_name', 'check_in'], 5).get_page({}).after
+        expected = [c.pk for c in KeysetPaginator(self.qs, ['check_in'], 5).qs][5:10]
+        for cursor in ('not-a-cursor', other):
+            page = KeysetPaginator(self.qs, ['check_in'], 5).get_page({'page': 2, 'after': cursor})
+            self.assertEqual([c.pk for c in page], expected)
+
+    def test_nullable_ordering_with_explicit_nulls(self):
+        inv = Invoice.objects.filter(company='konoz')
+        for n in range(7):
+            Invoice.objects.create(
+                company='konoz', invoice_type='hotel', invoice_number=f'INV-PG-{n}', customer_name='X',
+                due_date=None if n % 3 == 0 else date(2026, 5, 1 + n % 2),
+            )
+        expected = [i.pk for i in inv.order_by(F('due_date').asc(nulls_last=True), '-created_at', '-pk')]
+        seen, params = [], {}
+        while True:
+            page = KeysetPaginator(inv, INVOICE_LIST_ORDER, 2).get_page(params)
+            seen.extend(i.pk for i in page)
+            if not page.has_next():
+                break
+            params = {'page': page.next_page_number(), 'after': page.after}
+        self.assertEqual(seen, expected)
+
+
+class ListCountCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('pager_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        for n in range(20):
+            _cl(n, date(2026, 3, 1), f'Guest {n}')
+
+    def _count_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(path, HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 200)
+        props = resp.json()['props']
+        counts = [q for q in ctx.captured_queries if 'COUNT(*)' in q['sql'] and 'hw_confirmationletter' in q['sql']]
+        return props, counts
+
+    def test_total_is_counted_once_until_a_write(self):
+        props, counts = self._count_queries('/cl/?sort=guest_name')
+        self.assertEqual(props['pagination']['count'], 20)
+        self.assertEqual(len(counts), 1)
+        props, counts = self._count_queries(f"/cl/?sort=guest_name&page=2&after={props['pagination']['after']}")
+        self.assertEqual(counts, [])
+        self.assertEqual(props['pagination']['start_index'], 16)
+        self.assertIsNotNone(props['pagination']['before'])
+
+        _cl(99, date(2026, 3, 2), 'Late')
+        props, counts = self._count_queries('/cl/?sort=guest_name')
+        self.assertEqual(props['pagination']['count'], 21)
+        self.assertEqual(len(counts), 1)
+
+    def test_single_page_list_is_never_counted(self):
+        props, counts = self._count_queries('/cl/?q=Guest+1')
+        self.assertLessEqual(props['pagination']['count'], 15)
+        self.assertFalse(props['pagination']['has_other_pages'])
+        self.assertEqual(counts, [])
+
+
+class PageRangeDisplayTest(TestCase):
+    def test_window_and_gaps(self):
+        class _P:
+            num_pages = 100_000
+
+        class _Page:
+            number = 50
+            paginator = _P
+
+        self.assertEqual(_page_range_display(_Page), [1, None, 48, 49, 50, 51, 52, None, 100_000])
+        _Page.number, _P.num_pages = 2, 5
+        self.assertEqual(_page_range_display(_Page), [1, 2, 3, 4, 5])
@@ -0,0 +1,58 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from hw.services import pdf_assets
+from hw.views.pdf import _logo_file_url, _write_pdf
+
+
+class PdfAssetRegistryTest(SimpleTestCase):
+    def setUp(self):
+        pdf_assets.reset()
+        self.addCleanup(pdf_assets.reset)
+
+    def test_logo_is_encoded_once_per_company(self):
+        with patch('hw.services.pdf_assets.encode_logo', wraps=pdf_assets.encode_logo) as encode:
+            first = _logo_file_url('konoz')
+            _logo_file_url('konoz')
+            _logo_file_url('ijabah')
+        self.assertEqual(encode.call_count, 2)
+        self.assertTrue(first.startswith('data:image/png;base64,'))
+        self.assertNotEqual(first, _logo_file_url('ijabah'))
+
+    def test_template_style_block_is_lifted_and_reused(self):
+        html = render_to_string('hw/services/services_list_pdf.html', {'invoices': []})
+        self.assertIn('<style', html)
+        stripped, sheets = pdf_assets.split_stylesheets(html)
+        self.assertNotIn('<style', stripped)
+        self.assertEqual(len(sheets), 1)
+        _, again = pdf_assets.split_stylesheets(html)
+        self.assertIs(again[0], sheets[0], 'stylesheet must be parsed once, not per document')
+
+    def test_unknown_style_block_stays_inline(self):
+        html = '<html><head><style>p { color: red }</style></head><body><p>x</p></body></html>'
+        stripped, sheets = pdf_assets.split_stylesheets(html)
+        self.assertEqual((stripped, sheets), (html, []))
+
+    @patch('hw.views.pdf.HTML')
+    def test_write_pdf_shares_fonts_and_image_cache(self, mock_html):
+        html = render_to_string('hw/services/services_list_pdf.html', {'invoices': []})
+        _write_pdf(html)
+        _write_pdf(html)
+        first, second = mock_html.return_value.write_pdf.call_args_list
+        self.assertIs(first.kwargs['font_config'], second.kwargs['font_config'])
+        self.assertIs(first.kwargs['cache'], second.kwargs['cache'])
+        self.assertEqual(len(first.kwargs['stylesheets']), 1)
+        self.assertNotIn('<style', mock_html.call_args.kwargs['string'])
+
+    @patch('hw.views.pdf.HTML')
+    @patch('hw.management.commands.bench_pdf_render.HTML')
+    def test_benchmark_command_reports_both_modes(self, *_):
+        out = StringIO()
+        call_command('bench_pdf_render', '--runs', '2', stdout=out)
+        self.assertIn('before', out.getvalue())
+        self.assertIn('registry', out.getvalue())
+        self.assertIn('Per-PDF overhead saved', out.getvalue())
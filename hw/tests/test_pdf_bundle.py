@@ -0,0 +1,127 @@
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from hw.models import ConfirmationLetter, Invoice, Payment, PdfJob, Reservation, Room
+from hw.services import pdf_bundle, pdf_store
+from hw.tasks import render_pdf_bundle_task
+
+
+def _temp_store(test):
+    root = tempfile.mkdtemp(prefix='hms-pdf-bundle-')
+    test.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    store = override_settings(PDF_ARTIFACT_ROOT=root)
+    store.enable()
+    test.addCleanup(store.disable)
+
+
+def _names(resp):
+    body = b''.join(resp.streaming_content)
+    return zipfile.ZipFile(io.BytesIO(body)).namelist()
+
+
+class BundleExportTest(TestCase):
+    def setUp(self):
+        _temp_store(self)
+        patcher = patch('hw.views.pdf.HTML')
+        self.mock_html = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_html.return_value.write_pdf.return_value = b'%PDF-member'
+
+        self.user = User.objects.create_superuser('zip_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+
+    def _cl(self, number, day, status='DEFINITE', company='konoz'):
+        cl = ConfirmationLetter.objects.create(
+            company=company, confirmation_number=number, guest_name='Budi', hotel_name='Hilton',
+            reservation_status=status, check_in=date(2026, 1, day), check_out=date(2026, 1, day + 2),
+        )
+        Room.objects.create(cl=cl, room_type='Double', quantity=1, price=100)
+        return cl
+
+    def test_cl_zip_follows_list_filters(self):
+        self._cl('CL-A', 1)
+        self._cl('CL-B', 5)
+        self._cl('CL-T', 3, status='TENTATIVE')
+        self._cl('CL-IJ', 4, company='ijabah')
+        resp = self.client.get('/cl/export/zip/', {'status': 'definite'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/zip')
+        self.assertIn('attachment; filename="confirmation_letters.zip"', resp['Content-Disposition'])
+        self.assertEqual(_names(resp), ['CL-B.pdf', 'CL-A.pdf'])
+
+    def test_already_rendered_pdfs_are_reused(self):
+        cl = self._cl('CL-A', 1)
+        self._cl('CL-B', 2)
+        self.client.get(f'/cl/{cl.pk}/pdf/')
+        self.assertEqual(self.mock_html.call_count, 1)
+        self.client.get('/cl/export/zip/')
+        self.assertEqual(self.mock_html.call_count, 2, 'only CL-B should be laid out for the bundle')
+
+    def test_invoice_zip_uses_invoice_list_status_filter(self):
+        paid = Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-Z1', customer_name='A')
+        Reservation.objects.create(invoice=paid, reservation_number='R1', total_sar=100)
+        Payment.objects.create(invoice=paid, linked_number='R1', amount=100, currency='SAR', exchange_rate=1, method='cash')
+        unpaid = Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-Z2', customer_name='B')
+        Reservation.objects.create(invoice=unpaid, reservation_number='R2', total_sar=100)
+        resp = self.client.get('/invoice/export/zip/', {'status': 'lunas'})
+        self.assertEqual(_names(resp), ['INV-Z1.pdf'])
+
+    def test_empty_selection_goes_back_to_the_list(self):
+        resp = self.client.get('/cl/export/zip/', {'q': 'nobody'})
+        self.assertRedirects(resp, '/cl/?q=nobody', fetch_redirect_response=False)
+        self.assertFalse(PdfJob.objects.exists())
+
+    def test_oversized_selection_is_refused(self):
+        for n in range(3):
+            self._cl(f'CL-{n}', n + 1)
+        with patch('hw.views.cl_views.PDF_BUNDLE_MAX_DOCS', 2), patch('hw.views.pdf.PDF_BUNDLE_MAX_DOCS', 2):
+            resp = self.client.get('/cl/export/zip/')
+        self.assertRedirects(resp, '/cl/?', fetch_redirect_response=False)
+        self.assertFalse(PdfJob.objects.exists())
+
+    @patch('hw.views.pdf.async_task')
+    def test_queued_bundle_is_served_from_job_page(self, mock_enqueue):
+        self._cl('CL-A', 1)
+        resp = self.client.get('/cl/export/zip/')
+        job = PdfJob.objects.get()
+        self.assertRedirects(resp, f'/pdf/jobs/{job.key}/', fetch_redirect_response=False)
+        self.assertEqual(mock_enqueue.call_args.args, ('hw.tasks.render_pdf_bundle_task', job.key))
+        self.assertEqual(self.client.get(f'/pdf/jobs/{job.key}/').status_code, 202)
+
+        render_pdf_bundle_task(job.key)
+        done = self.client.get(f'/pdf/jobs/{job.key}/')
+        self.assertEqual(done['Content-Type'], 'application/zip')
+        self.assertEqual(_names(done), ['CL-A.pdf'])
+        self.assertIsNone(pdf_store.get_source(job.key, pdf_store.MANIFEST_SUFFIX))
+
+    def test_missing_manifest_fails_the_job(self):
+        key = pdf_store.content_key('lost')
+        PdfJob.objects.create(key=key, filename='x.zip', requested_at='2026-01-01T00:00Z')
+        render_pdf_bundle_task(key)
+        self.assertEqual(PdfJob.objects.get(key=key).status, PdfJob.STATUS_FAILED)
+
+
+class BundleHelpersTest(SimpleTestCase):
+    def test_duplicate_member_names_are_made_unique(self):
+        seen = set()
+        names = [pdf_bundle._unique(n, seen) for n in ('CL-1.pdf', 'CL-1.pdf', 'CL-2.pdf', 'CL-1.pdf')]
+        self.assertEqual(names, ['CL-1.pdf', 'CL-1-2.pdf', 'CL-2.pdf', 'CL-1-3.pdf'])
+
+    @patch('hw.views.pdf.HTML')
+    def test_documents_are_laid_out_in_child_processes(self, mock_html):
+        _temp_store(self)
+        mock_html.return_value.write_pdf.return_value = b'%PDF-pool'
+        pending = {pdf_store.content_key(str(n)): f'<p>{n}</p>' for n in range(3)}
+        pdf_bundle.render_missing(pending, processes=2)
+        for key in pending:
+            self.assertEqual(pdf_store.get(key), b'%PDF-pool')
+        # Layout terjadi di proses anak, bukan di proses ini.
+        self.assertEqual(mock_html.call_count, 0)
@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from hw.models import ConfirmationLetter, Invoice, Payment, Reservation, Room, ServiceItem
+from hw.services import pdf_store
+from hw.views.pdf import (
+    _checkin_pdf_source, _invoice_pdf_source, _render_checkin_pdf, _render_invoice_pdf,
+    _render_services_pdf,
+)
+
+
+class PdfCacheTestBase(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix='hms-pdf-cache-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        store = override_settings(PDF_ARTIFACT_ROOT=root)
+        store.enable()
+        self.addCleanup(store.disable)
+        cache.clear()
+
+        patcher = patch('hw.views.pdf.HTML')
+        self.mock_html = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_html.return_value.write_pdf.return_value = b'%PDF-cached'
+
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-PC-001',
+            customer_name='Budi', issued_date=date(2026, 1, 1),
+        )
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R1', total_sar=1000)
+
+    def _invoice(self):
+        return Invoice.objects.get(pk=self.invoice.pk)
+
+
+class ContextKeyTest(PdfCacheTestBase):
+    """The cache key follows what the PDF shows, not invoice.updated_at."""
+
+    def test_payment_changes_key_without_touching_invoice(self):
+        before = self._invoice().updated_at
+        _render_invoice_pdf(self._invoice())
+        Payment.objects.create(
+            invoice=self.invoice, linked_number='R1', amount=400,
+            currency='SAR', exchange_rate=1, method='cash',
+        )
+        Invoice.objects.filter(pk=self.invoice.pk).update(updated_at=before)
+        resp = _render_invoice_pdf(self._invoice())
+        self.assertEqual(self.mock_html.call_count, 2, 'a new payment must not be served from the old PDF')
+        self.assertEqual(resp.content, b'%PDF-cached')
+
+    def test_reservation_edit_changes_key(self):
+        _render_invoice_pdf(self._invoice())
+        Reservation.objects.filter(reservation_number='R1').update(hotel='Swissotel')
+        _render_invoice_pdf(self._invoice())
+        _render_invoice_pdf(self._invoice())
+        self.assertEqual(self.mock_html.call_count, 2)
+
+    def test_template_edit_changes_key(self):
+        template, context, _ = _invoice_pdf_source(self._invoice())
+        key = pdf_store.context_key(template, context)
+        with patch('hw.services.pdf_store._template_fingerprint', return_value='edited'):
+            self.assertNotEqual(pdf_store.context_key(template, context), key)
+
+    def test_context_with_model_instances_has_no_context_key(self):
+        self.assertIsNone(pdf_store.context_key('hw/cl/cl_list_pdf.html', {'letters': [self.invoice]}))
+
+    def test_pdf_bytes_stay_out_of_the_database_cache(self):
+        _render_invoice_pdf(self._invoice())
+        self.assertFalse(any(isinstance(v, bytes) for v in cache.get_many([
+            f'pdf:invoice:{self.invoice.pk}:{self.invoice.updated_at.isoformat()}',
+        ]).values()))
+        self.assertEqual(pdf_store.stats()['files'], 1)
+
+
+class ServicesAndCheckinCacheTest(PdfCacheTestBase):
+    def test_services_pdf_is_cached(self):
+        inv = Invoice.objects.create(
+            company='konoz', invoice_type='services', invoice_number='SVC-PC-001', customer_name='Rina',
+        )
+        ServiceItem.objects.create(invoice=inv, service_number=1, name='Visa', qty=2, price=100)
+        _render_services_pdf(inv)
+        _render_services_pdf(inv)
+        self.assertEqual(self.mock_html.call_count, 1)
+
+    def test_checkin_pdf_is_cached_within_the_minute(self):
+        cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-PC', guest_name='Ali', hotel_name='Hilton',
+            check_in=date(2026, 1, 1), check_out=date(2026, 1, 3),
+        )
+        Room.objects.create(cl=cl, room_type='Double', quantity=1, price=100)
+        cls = list(ConfirmationLetter.objects.prefetch_related('rooms'))
+        _render_checkin_pdf(cls, 'Recap')
+        _render_checkin_pdf(cls, 'Recap')
+        self.assertEqual(self.mock_html.call_count, 1)
+        template, context = _checkin_pdf_source(cls, 'Recap')
+        self.assertEqual((context['now'].second, context['now'].microsecond), (0, 0))
+
+
+class LruEvictionTest(PdfCacheTestBase):
+    def _put(self, name, size, age):
+        key = pdf_store.content_key(name)
+        pdf_store.put(key, b'x' * size)
+        path = pdf_store._path(key, pdf_store.PDF_SUFFIX)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return key
+
+    def test_least_recently_used_goes_first(self):
+        with self.settings(PDF_ARTIFACT_MAX_BYTES=3500):
+            a = self._put('a', 1000, age=30)
+            b = self._put('b', 1000, age=20)
+            c = self._put('c', 1000, age=10)
+            pdf_store.get(a)  # a jadi yang paling baru dipakai
+            d = self._put('d', 1000, age=0)
+        self.assertIsNone(pdf_store.get(b))
+        for key in (a, c, d):
+            self.assertIsNotNone(pdf_store.get(key))
+        self.assertLessEqual(pdf_store.stats()['bytes'], 3500)
+
+    def test_under_budget_nothing_is_evicted(self):
+        with self.settings(PDF_ARTIFACT_MAX_BYTES=10_000):
+            keys = [self._put(n, 1000, age=0) for n in 'abc']
+        self.assertEqual(pdf_store.evict_over_budget(), 0)
+        self.assertTrue(all(pdf_store.get(k) for k in keys))
+
+
+class CountersTest(PdfCacheTestBase):
+    def test_hits_and_misses_are_counted(self):
+        _render_invoice_pdf(self._invoice())
+        _render_invoice_pdf(self._invoice())
+        _render_invoice_pdf(self._invoice())
+        s = pdf_store.stats()
+        self.assertEqual((s['hits'], s['misses']), (2, 1))
+
+        out = StringIO()
+        call_command('pdf_store_stats', stdout=out)
+        self.assertIn('Hit ratio: 66.7%', out.getvalue())
+
+    def test_clear_resets_counters_and_files(self):
+        _render_invoice_pdf(self._invoice())
+        pdf_store.clear()
+        self.assertEqual(pdf_store.stats(), {'hits': 0, 'misses': 0, 'files': 0, 'bytes': 0})
@@ -3,12 +3,14 @@ from unittest.mock import patch
 from django.core.cache import cache
 from django.test import TestCase
 from hw.models import Invoice, Reservation
+from hw.services import pdf_store
 from hw.views.pdf import _render_invoice_pdf
 
 
 class InvoicePdfCachingTest(TestCase):
     def setUp(self):
         cache.clear()
+        pdf_store.clear()
         self.invoice = Invoice.objects.create(
             company='konoz', invoice_type='hotel',
             invoice_number='INV-PDFCACHE-001', customer_name='Test Customer',
@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hw.models import ConfirmationLetter, PdfJob, Room
+from hw.services import pdf_store
+from hw.tasks import render_pdf_task
+from hw.views.pdf import _cl_pdf_source, _pdf_key
+
+
+class PdfJobTestBase(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix='hms-pdf-jobs-')
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        store = override_settings(PDF_ARTIFACT_ROOT=root)
+        store.enable()
+        self.addCleanup(store.disable)
+
+        self.user = User.objects.create_superuser('pdf_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        self.cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-PDFJOB', guest_name='Budi', hotel_name='Hilton',
+            check_in=date(2026, 1, 1), check_out=date(2026, 1, 3),
+        )
+        Room.objects.create(cl=self.cl, room_type='Double', quantity=1, price=100)
+        self.url = f'/cl/{self.cl.pk}/pdf/'
+        template, context, _ = _cl_pdf_source(self.cl)
+        self.key, _ = _pdf_key(template, context)
+
+
+@patch('hw.views.pdf.HTML')
+class SyncClusterTest(PdfJobTestBase):
+    """Tests run the cluster in sync mode: the job finishes inside async_task."""
+
+    def test_pdf_is_served_and_stored(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF-job'
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        self.assertIn('CL-PDFJOB.pdf', resp['Content-Disposition'])
+        self.assertEqual(b''.join(resp.streaming_content), b'%PDF-job')
+        self.assertEqual(resp['ETag'], f'"{self.key}"')
+        job = PdfJob.objects.get(key=self.key)
+        self.assertEqual(job.status, PdfJob.STATUS_DONE)
+        self.assertIsNone(pdf_store.get_source(self.key))
+
+    def test_same_content_is_not_laid_out_twice(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF-job'
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(mock_html.call_count, 1)
+
+    def test_changed_document_gets_a_new_key(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF-job'
+        self.client.get(self.url)
+        self.cl.guest_name = 'Rina'
+        self.cl.save()
+        self.client.get(self.url)
+        self.assertEqual(mock_html.call_count, 2)
+        self.assertEqual(PdfJob.objects.count(), 2)
+
+
+@patch('hw.views.pdf.async_task')
+class QueuedJobTest(PdfJobTestBase):
+    """With a real worker the request returns before the layout happens."""
+
+    def test_request_redirects_to_polling_page(self, mock_enqueue):
+        resp = self.client.get(self.url)
+        self.assertRedirects(resp, f'/pdf/jobs/{self.key}/', fetch_redirect_response=False)
+        mock_enqueue.assert_called_once()
+        self.assertEqual(mock_enqueue.call_args.args, ('hw.tasks.render_pdf_task', self.key))
+
+        pending = self.client.get(f'/pdf/jobs/{self.key}/')
+        self.assertEqual(pending.status_code, 202)
+        self.assertContains(pending, 'http-equiv="refresh"', status_code=202)
+
+        with patch('hw.views.pdf.HTML') as mock_html:
+            mock_html.return_value.write_pdf.return_value = b'%PDF-late'
+            render_pdf_task(self.key)
+        done = self.client.get(f'/pdf/jobs/{self.key}/')
+        self.assertEqual(done.status_code, 200)
+        self.assertIn('CL-PDFJOB.pdf', done['Content-Disposition'])
+        self.assertEqual(b''.join(done.streaming_content), b'%PDF-late')
+
+    def test_repeat_request_while_pending_does_not_requeue(self, mock_enqueue):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(mock_enqueue.call_count, 1)
+
+    def test_stale_pending_job_is_requeued(self, mock_enqueue):
+        self.client.get(self.url)
+        PdfJob.objects.filter(key=self.key).update(requested_at=timezone.now() - timedelta(hours=1))
+        self.client.get(self.url)
+        self.assertEqual(mock_enqueue.call_count, 2)
+
+    def test_failed_render_is_reported_then_retried(self, mock_enqueue):
+        self.client.get(self.url)
+        with patch('hw.views.pdf.HTML') as mock_html:
+            mock_html.return_value.write_pdf.side_effect = RuntimeError('layout exploded')
+            render_pdf_task(self.key)
+        job = PdfJob.objects.get(key=self.key)
+        self.assertEqual(job.status, PdfJob.STATUS_FAILED)
+        resp = self.client.get(f'/pdf/jobs/{self.key}/')
+        self.assertContains(resp, 'layout exploded', status_code=500)
+
+        self.client.get(self.url)
+        self.assertEqual(mock_enqueue.call_count, 2)
+
+    def test_unknown_or_malformed_key_is_404(self, mock_enqueue):
+        self.assertEqual(self.client.get(f'/pdf/jobs/{"0" * 64}/').status_code, 404)
+        self.assertEqual(self.client.get('/pdf/jobs/..%2F..%2Fsettings/').status_code, 404)
+
+    def test_polling_page_requires_login(self, mock_enqueue):
+        self.client.get(self.url)
+        self.client.logout()
+        resp = self.client.get(f'/pdf/jobs/{self.key}/')
+        self.assertEqual(resp.status_code, 302)
+
+
+class ArtifactTtlTest(PdfJobTestBase):
+    def _age(self, key, seconds):
+        path = pdf_store._path(key, pdf_store.PDF_SUFFIX)
+        old = time.time() - seconds
+        os.utime(path, (old, old))
+
+    def test_expired_artifact_is_gone_and_job_page_says_so(self):
+        pdf_store.put(self.key, b'%PDF-old')
+        PdfJob.objects.create(key=self.key, filename='CL-PDFJOB.pdf', status=PdfJob.STATUS_DONE,
+                              requested_at=timezone.now())
+        with self.settings(PDF_ARTIFACT_TTL=60):
+            self._age(self.key, 120)
+            self.assertIsNone(pdf_store.get(self.key))
+            self.assertEqual(self.client.get(f'/pdf/jobs/{self.key}/').status_code, 410)
+
+    def test_prune_command_evicts_artifacts_and_old_jobs(self):
+        pdf_store.put(self.key, b'%PDF-old')
+        fresh = pdf_store.content_key('fresh')
+        pdf_store.put(fresh, b'%PDF-new')
+        PdfJob.objects.create(key=self.key, filename='a.pdf', requested_at=timezone.now() - timedelta(days=2))
+        PdfJob.objects.create(key=fresh, filename='b.pdf', requested_at=timezone.now())
+        with self.settings(PDF_ARTIFACT_TTL=3600):
+            self._age(self.key, 7200)
+            out = StringIO()
+            call_command('prune_pdf_jobs', stdout=out)
+        self.assertIn('Evicted 1 artifact(s), deleted 1 PDF job(s).', out.getvalue())
+        self.assertEqual(pdf_store.get(fresh), b'%PDF-new')
+        self.assertEqual(list(PdfJob.objects.values_list('key', flat=True)), [fresh])
+
+    def test_rejects_non_hash_keys(self):
+        with self.assertRaises(ValueError):
+            pdf_store.get('../../etc/passwd')
@@ -21,18 +21,20 @@ class AiSummaryRemovedTest(TestCase):
 # ── Task 2: Settings ──────────────────────────────────────────────────────────
 
 class GzipMiddlewareTest(TestCase):
-    def test_gzip_middleware_is_configured(self):
+    def test_compression_middleware_is_configured(self):
         from django.conf import settings
-        self.assertIn('django.middleware.gzip.GZipMiddleware', settings.MIDDLEWARE)
+        self.assertIn('hw.compression.CompressionMiddleware', settings.MIDDLEWARE)
+        # GZipMiddleware on top would gzip the ?gzip=1 CSV download again.
+        self.assertNotIn('django.middleware.gzip.GZipMiddleware', settings.MIDDLEWARE)
 
-    def test_gzip_middleware_position(self):
+    def test_compression_middleware_position(self):
         from django.conf import settings
         mw = settings.MIDDLEWARE
-        gzip_idx = mw.index('django.middleware.gzip.GZipMiddleware')
+        compression_idx = mw.index('hw.compression.CompressionMiddleware')
         security_idx = mw.index('django.middleware.security.SecurityMiddleware')
         whitenoise_idx = mw.index('whitenoise.middleware.WhiteNoiseMiddleware')
-        self.assertGreater(gzip_idx, security_idx)
-        self.assertLess(gzip_idx, whitenoise_idx)
+        self.assertGreater(compression_idx, security_idx)
+        self.assertLess(compression_idx, whitenoise_idx)
 
 
 class SettingsTest(TestCase):
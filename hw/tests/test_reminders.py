@@ -42,8 +42,10 @@ class ReminderLogModelTest(TestCase):
         self.assertEqual(cl.pic_name, 'Budi')
 
 
+# Client baru per test (setting_changed), dan retry koneksi tanpa jeda.
+@override_settings(FONNTE_BACKOFF_SECONDS=0)
 class FonnteServiceTest(TestCase):
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_send_wa_success(self, mock_post):
         from hw.services.fonnte import send_wa
         mock_post.return_value.json.return_value = {'status': True}
@@ -53,14 +55,14 @@ class FonnteServiceTest(TestCase):
         self.assertEqual(call_kwargs.args[0], 'https://api.fonnte.com/send')
         self.assertEqual(call_kwargs.kwargs['data']['target'], '628123')
 
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_send_wa_failure_returns_dict(self, mock_post):
         from hw.services.fonnte import send_wa
         mock_post.return_value.json.return_value = {'status': False, 'reason': 'invalid token'}
         result = send_wa('628123', 'Hello')
         self.assertFalse(result['status'])
 
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_send_wa_connection_error_returns_clean_dict(self, mock_post):
         import requests as _req
         from hw.services.fonnte import send_wa
@@ -70,7 +72,7 @@ class FonnteServiceTest(TestCase):
         self.assertIn('Fonnte', result['reason'])
         self.assertNotIn('getaddrinfo', result['reason'])
 
-    @patch('hw.services.fonnte.requests.post')
+    @patch('hw.services.fonnte.requests.Session.post')
     def test_send_wa_timeout_returns_clean_dict(self, mock_post):
         import requests as _req
         from hw.services.fonnte import send_wa
@@ -839,6 +841,47 @@ class GroupedReminderCommandTest(TestCase):
         self.assertTrue(ReminderLog.objects.filter(cl=cl_blank, status='SENT').exists())
 
 
+@override_settings(REMINDER_H1_H0_ENABLED=True)
+class ReminderCommandQueriesTest(TestCase):
+    def _bookings(self, start, end):
+        from hw.models import Client, Room
+        for n in range(start, end):
+            client = Client.objects.create(company='konoz', name=f'PT Q{n}', wa=f'62800{n}', reminder_target='PIC')
+            for day, suffix in ((0, 'A'), (1, 'B')):
+                cl = _make_cl(client=client, check_in=date.today() + timedelta(days=day),
+                              confirmation_number=f'CL-Q{n}{suffix}')
+                Room.objects.create(cl=cl, room_type='Double', quantity=1, price=100)
+            _make_cl(guest_name=f'Tamu {n}', guest_phone=f'62899{n}', confirmation_number=f'CL-Q{n}G')
+
+    def _run_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('send_checkin_reminders', stdout=open('/dev/null', 'w'))
+        return len(ctx.captured_queries)
+
+    @patch('hw.management.commands.send_checkin_reminders.send_wa')
+    def test_query_count_does_not_grow_with_bookings(self, mock_send):
+        # FAILED supaya run berikutnya mengirim ulang semuanya.
+        mock_send.return_value = {'status': False, 'reason': 'x'}
+        self._bookings(0, 2)
+        small = self._run_queries()
+        self._bookings(2, 12)
+        self.assertEqual(self._run_queries(), small)
+        self.assertEqual(ReminderLog.objects.filter(cl__confirmation_number='CL-Q11A').count(), 1)
+
+    @patch('hw.management.commands.send_checkin_reminders.send_wa')
+    def test_sent_yesterday_does_not_count_as_sent(self, mock_send):
+        from django.utils import timezone
+        mock_send.return_value = {'status': True}
+        cl = _make_cl(confirmation_number='CL-Y1')
+        log = ReminderLog.objects.create(cl=cl, reminder_type='H0_GUEST', phone='628123456789', status='SENT')
+        ReminderLog.objects.filter(pk=log.pk).update(sent_at=timezone.now() - timedelta(days=1))
+        call_command('send_checkin_reminders', stdout=open('/dev/null', 'w'))
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertEqual(ReminderLog.objects.filter(cl=cl, status='SENT').count(), 2)
+
+
 class SendCheckInRecapCommandTest(TestCase):
     def setUp(self):
         self.cl1 = _make_cl(hotel_name='Hilton', confirmation_number='CL-R01')
@@ -0,0 +1,217 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from hw.models import (
+    ConfirmationLetter, Invoice, Payment, Remittance, RemittanceLedgerEntry, RemittanceLine,
+    Reservation, Room,
+)
+from hw.views.remittance_views import _build_ledger_rows, _sync_remittance_lines
+
+
+def _entry(number):
+    return RemittanceLedgerEntry.objects.get(linked_number=number)
+
+
+class LedgerSignalsTest(TestCase):
+    """Tabel buku besar ikut bergerak setiap kali payment, remittance line,
+    reservasi, CL atau room berubah."""
+
+    def setUp(self):
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel',
+            invoice_number='INV-LG-001', customer_name='Budi',
+        )
+        Reservation.objects.create(
+            invoice=self.invoice, reservation_number='R1', total_sar=10000,
+            hotel='Hilton', check_in=date(2026, 3, 10), check_out=date(2026, 3, 12),
+        )
+
+    def _pay(self, number, amount, method='cash'):
+        return Payment.objects.create(
+            invoice=self.invoice, linked_number=number, amount=amount,
+            currency='SAR', exchange_rate=1, method=method,
+        )
+
+    def _remit(self, number, amount):
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 10), remittance_number=f'RMT-LG-{amount}')
+        return RemittanceLine.objects.create(remittance=rem, invoice=self.invoice, linked_number=number, amount_sar=amount)
+
+    def _assert_consistent(self):
+        call_command('check_remittance_ledger', stdout=StringIO())
+
+    def test_reservation_creates_row(self):
+        e = _entry('R1')
+        self.assertEqual((e.total_sar, e.debit, e.credit, e.balance), (10000, 0, 0, 10000))
+        self.assertEqual(e.check_in, date(2026, 3, 10))
+        self._assert_consistent()
+
+    def test_payments_and_remittance_lines_update_row(self):
+        self._pay('R1', 600)
+        self._pay('R1', 400, 'direct')
+        line = self._remit('R1', 200)
+        e = _entry('R1')
+        self.assertEqual((e.paid_sby, e.direct, e.remitted), (600, 400, 200))
+        self.assertEqual((e.debit, e.credit, e.mengendap, e.balance), (1000, 600, 400, 9400))
+        line.delete()
+        self.assertEqual(_entry('R1').mengendap, 600)
+        self._assert_consistent()
+
+    def test_moving_payment_to_another_number_refreshes_both(self):
+        Reservation.objects.create(invoice=self.invoice, reservation_number='R2', total_sar=5000)
+        p = self._pay('R1', 600)
+        p.linked_number = 'R2'
+        p.save()
+        self.assertEqual(_entry('R1').paid_sby, 0)
+        self.assertEqual(_entry('R2').paid_sby, 600)
+
+    def test_row_without_any_source_is_removed(self):
+        p = self._pay('LOOSE', 300)
+        self.assertTrue(RemittanceLedgerEntry.objects.filter(linked_number='LOOSE').exists())
+        p.delete()
+        self.assertFalse(RemittanceLedgerEntry.objects.filter(linked_number='LOOSE').exists())
+
+    def test_cl_rooms_drive_total_for_cl_without_invoice(self):
+        cl = ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-LG', hotel_name='Swissotel', guest_name='Rina',
+            check_in=date(2026, 4, 1), check_out=date(2026, 4, 3),
+        )
+        Room.objects.create(cl=cl, room_type='Double', quantity=2, price=500)
+        self.assertEqual(_entry('CL-LG').total_sar, cl.total_price)
+        cl.reservation_status = 'cancelled'
+        cl.save()
+        self.assertEqual(_entry('CL-LG').status, 'CANCELLED')
+        self._assert_consistent()
+
+    def test_edit_form_amount_change_is_reflected(self):
+        line = self._remit('R1', 200)
+        _sync_remittance_lines(line.remittance, [{'line_id': line.pk, 'amount_sar': 700}])
+        self.assertEqual(_entry('R1').remitted, 700)
+
+    def test_deleting_invoice_leaves_no_dangling_links(self):
+        self._pay('R1', 600)
+        self._remit('R1', 200)
+        self.invoice.delete()
+        e = _entry('R1')  # remittance line masih ada, jadi baris tetap dilacak
+        self.assertEqual((e.invoice_id, e.reservation_id, e.paid_sby, e.remitted), (None, None, 0, 200))
+        self._assert_consistent()
+
+    def test_other_company_is_ignored(self):
+        other = Invoice.objects.create(
+            company='ijabah', invoice_type='hotel', invoice_number='INV-LG-IJ', customer_name='X',
+        )
+        Reservation.objects.create(invoice=other, reservation_number='IJ-1', total_sar=100)
+        self.assertFalse(RemittanceLedgerEntry.objects.filter(linked_number='IJ-1').exists())
+
+
+class LedgerCheckerTest(TestCase):
+    def setUp(self):
+        invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-LG-CHK', customer_name='Budi',
+        )
+        Reservation.objects.create(invoice=invoice, reservation_number='R1', total_sar=10000)
+        Payment.objects.create(invoice=invoice, linked_number='R1', amount=600, currency='SAR', exchange_rate=1, method='cash')
+
+    def test_drift_is_reported_and_fixed(self):
+        RemittanceLedgerEntry.objects.filter(linked_number='R1').update(paid_sby=0, debit=0)
+        RemittanceLedgerEntry.objects.create(linked_number='GHOST')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_remittance_ledger', stdout=out)
+        self.assertIn("'R1': paid_sby 0 != 600", out.getvalue())
+        self.assertIn("'GHOST': stale row", out.getvalue())
+
+        call_command('check_remittance_ledger', '--fix', stdout=StringIO())
+        self.assertEqual(_entry('R1').paid_sby, 600)
+        self.assertFalse(RemittanceLedgerEntry.objects.filter(linked_number='GHOST').exists())
+        out = StringIO()
+        call_command('check_remittance_ledger', stdout=out)
+        self.assertIn('matches', out.getvalue())
+
+
+class LedgerReadPathTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('rl_admin', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+        self.invoice = Invoice.objects.create(
+            company='konoz', invoice_type='hotel', invoice_number='INV-LG-READ', customer_name='Budi',
+        )
+
+    def _reservations(self, start, end):
+        for n in range(start, end):
+            Reservation.objects.create(
+                invoice=self.invoice, reservation_number=f'R{n:03d}', total_sar=1000,
+                check_in=date(2026, 1, 1) + timedelta(days=n),
+            )
+
+    def test_ledger_rows_query_count_is_flat(self):
+        self._reservations(0, 3)
+        with self.assertNumQueries(2):
+            _build_ledger_rows()
+        self._reservations(3, 30)
+        with self.assertNumQueries(2):
+            led = _build_ledger_rows()
+        self.assertEqual(len(led['rows']), 30)
+        self.assertEqual(led['total_tagihan'], 30000)
+
+    def test_form_reads_check_in_slice(self):
+        self._reservations(0, 10)
+        resp = self.client.get('/remittance/new/?from=2026-01-03&to=2026-01-05', HTTP_X_INERTIA='true')
+        numbers = [r['linked_number'] for r in resp.json()['props']['reservasi']]
+        self.assertEqual(numbers, ['R002', 'R003', 'R004'])
+
+    def test_form_defaults_to_recent_check_ins(self):
+        self._reservations(0, 3)
+        Reservation.objects.create(
+            invoice=self.invoice, reservation_number='R-NOW', total_sar=1000, check_in=date.today(),
+        )
+        Payment.objects.create(invoice=self.invoice, linked_number='R000', amount=400, currency='SAR', method='Cash')
+        props = self.client.get('/remittance/new/', HTTP_X_INERTIA='true').json()['props']
+        self.assertEqual([r['linked_number'] for r in props['reservasi']], ['R-NOW'])
+        self.assertEqual(props['date_from'], (date.today() - timedelta(days=90)).isoformat())
+        # Uang mengendap lama tidak hilang diam-diam.
+        self.assertEqual(props['outside_range'], {'count': 1, 'mengendap': 400})
+
+        everything = self.client.get('/remittance/new/?from=&to=', HTTP_X_INERTIA='true').json()['props']
+        self.assertEqual(len(everything['reservasi']), 4)
+        self.assertEqual(everything['outside_range']['count'], 0)
+
+    def test_rows_use_the_ledger_check_in(self):
+        # Reservasi tanpa tanggal: buku besar memakai check-in CL, untuk
+        # filter, urutan dan tampilan sekaligus.
+        self._reservations(0, 2)
+        Reservation.objects.create(invoice=self.invoice, reservation_number='CL-RL', total_sar=500)
+        ConfirmationLetter.objects.create(
+            company='konoz', confirmation_number='CL-RL', guest_name='Budi', hotel_name='Hilton',
+            check_in=date(2025, 12, 30), check_out=date(2026, 1, 2),
+        )
+        rows = self.client.get('/remittance/new/?from=2025-12-01&to=', HTTP_X_INERTIA='true').json()['props']['reservasi']
+        self.assertEqual([r['linked_number'] for r in rows], ['CL-RL', 'R000', 'R001'])
+        self.assertEqual((rows[0]['check_in'], rows[0]['check_out']), ('30/12/2025', '02/01/2026'))
+
+    def test_range_endpoint_for_form_and_edit(self):
+        self._reservations(0, 5)
+        Payment.objects.create(invoice=self.invoice, linked_number='R001', amount=300, currency='SAR', method='Cash')
+        Payment.objects.create(invoice=self.invoice, linked_number='R003', amount=300, currency='SAR', method='Cash')
+        data = self.client.get('/remittance/reservasi/?from=2026-01-02&to=2026-01-03').json()
+        self.assertEqual([r['linked_number'] for r in data['reservasi']], ['R001', 'R002'])
+        self.assertEqual(data['outside_range'], {'count': 1, 'mengendap': 300})
+
+        rem = Remittance.objects.create(company='konoz', date=date(2026, 1, 10), remittance_number='RMT-RNG')
+        RemittanceLine.objects.create(remittance=rem, invoice=self.invoice, linked_number='R001', amount_sar=100)
+        data = self.client.get(f'/remittance/reservasi/?from=&to=&rem={rem.pk}').json()
+        self.assertEqual([r['linked_number'] for r in data['reservasi']], ['R003'])
+        self.assertEqual(data['date_from'], '')
+
+    def test_remittance_list_is_paginated(self):
+        for n in range(20):
+            Remittance.objects.create(company='konoz', date=date(2026, 1, 1), remittance_number=f'RMT-P{n:02d}')
+        props = self.client.get('/remittance/', HTTP_X_INERTIA='true').json()['props']
+        self.assertEqual(len(props['remittances']), 15)
+        self.assertEqual(props['pagination']['num_pages'], 2)
+        self.assertEqual(props['total_count'], 20)
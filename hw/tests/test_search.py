@@ -0,0 +1,156 @@
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from hw.models import Client, ConfirmationLetter, Hotel, Invoice, RoleDefinition, SearchToken, UserProfile
+from hw.models.user import CompanyAccess
+from hw.services import search
+
+
+def _cl(number, guest='Budi Santoso', hotel='Hilton Makkah', company='konoz', **extra):
+    return ConfirmationLetter.objects.create(
+        company=company, confirmation_number=number, guest_name=guest, hotel_name=hotel,
+        check_in=date(2026, 3, 1), check_out=date(2026, 3, 4), **extra,
+    )
+
+
+class TrigramTest(SimpleTestCase):
+    def test_trigrams_are_lowercase_and_distinct(self):
+        self.assertEqual(search.trigrams('AbAbA'), {'aba', 'bab'})
+        self.assertEqual(search.trigrams('ab'), set())
+        self.assertEqual(search.query_grams('CL-01'), ['cl-', '-01'])
+        self.assertEqual(search.query_grams('Hilton Suites'), ['hil', 'ton', ' su', 'ite', 'tes'])
+
+
+class SearchTokenMaintenanceTest(TestCase):
+    def _grams(self, kind, obj):
+        return set(SearchToken.objects.filter(kind=kind, object_id=obj.pk).values_list('gram', flat=True))
+
+    def test_saving_and_deleting_keeps_postings_current(self):
+        cl = _cl('CL-100', guest='Ali', hotel='')
+        self.assertEqual(self._grams('CL', cl), {'cl-', 'l-1', '-10', '100', 'ali'})
+        cl.guest_name = 'Umar'
+        cl.save()
+        self.assertIn('uma', self._grams('CL', cl))
+        self.assertNotIn('ali', self._grams('CL', cl))
+        pk = cl.pk
+        cl.delete()
+        self.assertFalse(SearchToken.objects.filter(kind='CL', object_id=pk).exists())
+
+    def test_invoice_moves_kind_with_its_type(self):
+        inv = Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-1', customer_name='Ali')
+        self.assertTrue(self._grams('INV', inv))
+        inv.invoice_type = 'visa'
+        inv.save()
+        self.assertFalse(self._grams('INV', inv))
+        self.assertTrue(self._grams('SVC', inv))
+
+    def test_client_rename_through_update_is_reindexed(self):
+        client = Client.objects.create(company='konoz', name='Old Travel')
+        cl = _cl('CL-200', guest='Old Travel', client=client)
+        client.brand = 'Zamzam Tour'
+        client.save()
+        hits = ConfirmationLetter.objects.filter(search.match_q('CL', 'konoz', 'zamzam'))
+        self.assertEqual(list(hits), [cl])
+
+    def test_rebuild_command_reindexes_everything(self):
+        _cl('CL-300')
+        Hotel.objects.create(company='konoz', name='Pullman Zamzam', area='Ajyad')
+        SearchToken.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 2 document(s).', out.getvalue())
+        self.assertTrue(SearchToken.objects.filter(kind='HOTEL', gram='ajy').exists())
+
+
+class MatchQTest(TestCase):
+    def setUp(self):
+        _cl('KNZ-0012', guest='Ahmad Hidayat', hotel='Swissotel Al Maqam')
+        _cl('KNZ-0120', guest='PT Amanah Tour', hotel='Hilton Suites')
+        _cl('KNZ-1200', guest='Siti Aminah', hotel='Anjum Makkah')
+        _cl('KNZ-9999', guest='Ahmad Hidayat', company='ijabah')
+
+    def test_same_rows_as_plain_icontains(self):
+        fields = search.SOURCES['CL'].fields
+        for q in ('knz-0', '012', 'AHMAD', 'amanah tour', 'mah', 'ah', 'al maqam', 'zzz', 'hidayat x'):
+            expected = ConfirmationLetter.objects.filter(company='konoz').filter(
+                Q(**{f'{fields[0]}__icontains': q}) | Q(**{f'{fields[1]}__icontains': q}) | Q(**{f'{fields[2]}__icontains': q})
+            )
+            got = ConfirmationLetter.objects.filter(company='konoz').filter(search.match_q('CL', 'konoz', q))
+            self.assertQuerySetEqual(got.order_by('pk'), expected.order_by('pk'), msg=q)
+
+    def test_missing_gram_short_circuits(self):
+        with self.assertNumQueries(1):
+            q = search.match_q('CL', 'konoz', 'qqq')
+        self.assertFalse(ConfirmationLetter.objects.filter(q).exists())
+
+    def test_gram_frequencies_cost_one_query_whatever_the_length(self):
+        for q in ('ahm', 'swissotel al maqam'):
+            with self.assertNumQueries(2, msg=q):  # frekuensi + posting
+                search.match_q('CL', 'konoz', q)
+
+    @patch('hw.services.search.FREQUENCY_CAP', 2)
+    def test_common_grams_fall_back_to_a_scan(self):
+        # 'knz' ada di setiap CL: di atas batas, tidak ada posting yang dipakai.
+        self.assertEqual(search.match_q('CL', 'konoz', 'knz'), search._text_q('CL', 'knz'))
+        self.assertEqual(ConfirmationLetter.objects.filter(search.match_q('CL', 'konoz', 'knz-01')).count(), 1)
+
+
+class GlobalSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('searcher', password='pw12345')
+        self.client.force_login(self.user)
+        s = self.client.session; s['active_company'] = 'konoz'; s.save()
+
+    def _results(self, q):
+        return self.client.get('/search/', {'q': q}).json()['results']
+
+    def test_returns_every_kind_together(self):
+        _cl('MAD-001', guest='Madinah Group')
+        Invoice.objects.create(company='konoz', invoice_type='hotel', invoice_number='INV-MAD', customer_name='X')
+        Invoice.objects.create(company='konoz', invoice_type='visa', invoice_number='SVC-1', customer_name='Madani')
+        Client.objects.create(company='konoz', name='Al Madinah Travel', city='Surabaya')
+        Hotel.objects.create(company='konoz', name='Shaza Madinah', city='madinah')
+        Hotel.objects.create(company='ijabah', name='Madinah Hilton', city='madinah')
+        types = sorted(r['type'] for r in self._results('mad'))
+        self.assertEqual(types, ['CL', 'CLIENT', 'HOTEL', 'INV', 'SVC'])
+
+    def test_exact_number_ranks_first(self):
+        _cl('CL-77', guest='Tour CL-77 Group')
+        _cl('CL-770')
+        _cl('CL-77X')
+        # Yang persis sama menang walau paling lama; sisanya prefix, terbaru dulu.
+        results = self._results('CL-77')
+        self.assertEqual([r['label'] for r in results], ['CL-77', 'CL-77X', 'CL-770'])
+
+    def test_exact_match_survives_the_per_kind_limit(self):
+        _cl('CL-001')
+        for n in range(10):
+            _cl(f'CL-001{n}')
+        # Sepuluh prefix yang lebih baru tidak boleh mendorong keluar yang persis.
+        labels = [r['label'] for r in self._results('CL-001')]
+        self.assertEqual(labels[0], 'CL-001')
+        self.assertEqual(len(labels), 8)
+        self.assertEqual(labels[1:], [f'CL-001{n}' for n in range(9, 2, -1)])
+
+    def test_word_prefix_beats_a_newer_substring(self):
+        _cl('CL-500', guest='Rombongan Safar')
+        for n in range(8):
+            _cl(f'CL-50{n + 1}', guest=f'Musafar {n}')
+        self.assertEqual(self._results('safar')[0]['label'], 'CL-500')
+
+    def test_hides_kinds_the_role_cannot_view(self):
+        RoleDefinition.objects.create(slug='cl-only', label='CL only', permissions={'cl': ['view']})
+        user = User.objects.create_user('cl_only', password='pw12345')
+        UserProfile.objects.update_or_create(
+            user=user, defaults={'role': 'cl-only', 'company_access': CompanyAccess.ALL.value},
+        )
+        _cl('HIL-1')
+        Hotel.objects.create(company='konoz', name='Hilton Suites')
+        self.client.force_login(user)
+        self.assertEqual([r['type'] for r in self._results('hil')], ['CL'])
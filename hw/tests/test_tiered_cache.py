@@ -0,0 +1,169 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hw.cache import GENERATION_KEY, namespace, stamp_key
+
+
+def tiered(**options):
+    options = {'L1_MAX_ENTRIES': 100, 'L1_TIMEOUT': 30, 'GENERATION_CHECK': 60, **options}
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'hw.cache.TieredCache', 'LOCATION': 'shared', 'TIMEOUT': 300, 'OPTIONS': options},
+        'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'hw_cache_table'},
+    })
+
+
+def cache_queries(ctx):
+    return [q for q in ctx.captured_queries if 'hw_cache_table' in q['sql']]
+
+
+class TieredCacheTestBase(TestCase):
+    def setUp(self):
+        cache.reset_local()
+        self.addCleanup(cache.reset_local)
+
+
+@tiered()
+class TieredCacheTest(TieredCacheTestBase):
+    def test_repeated_reads_stay_in_process(self):
+        cache.set('k', {'a': 1})
+        cache.get('k')  # pemeriksaan stempel pertama
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(5):
+                self.assertEqual(cache.get('k'), {'a': 1})
+        self.assertEqual(cache_queries(ctx), [])
+        self.assertEqual(cache.stats()['l1_hits'], 6)
+
+    def test_miss_is_filled_from_the_shared_tier(self):
+        caches['shared'].set('k', 'from-l2')
+        self.assertEqual(cache.get('k'), 'from-l2')
+        self.assertEqual(cache.get('k'), 'from-l2')
+        self.assertEqual(cache.get('missing', 'dflt'), 'dflt')
+        stats = cache.stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (1, 1, 1))
+
+    def test_write_in_another_worker_is_seen_on_the_next_request(self):
+        cache.set('k', 'old')
+        cache.get('k')
+        # Worker lain: tulis ke L2 dan ganti stempel generasi.
+        caches['shared'].set('k', 'new')
+        caches['shared'].set(GENERATION_KEY, 'other-worker', None)
+        self.assertEqual(cache.get('k'), 'old')  # sampai stempel dicek lagi
+        request_started.send(sender=self.__class__)
+        self.assertEqual(cache.get('k'), 'new')
+
+    def test_write_to_the_same_namespace_in_another_worker(self):
+        cache.set_many({'hw:role_matrix:v1': 'old', 'hw:dashboard:v2:konoz': 'dash'})
+        caches['shared'].set('hw:role_matrix:v1', 'new')
+        caches['shared'].set(stamp_key('hw:role_matrix:v1'), 'other-worker')
+        request_started.send(sender=self.__class__)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(cache.get('hw:dashboard:v2:konoz'), 'dash')
+            self.assertEqual(cache.get('hw:role_matrix:v1'), 'new')
+        # Stempel semua namespace dalam satu query, lalu hanya role_matrix
+        # yang dibaca ulang dari L2.
+        self.assertEqual(len(cache_queries(ctx)), 2)
+
+    def test_unrelated_writes_keep_l1(self):
+        cache.set('hw:role_matrix:v1', 'matrix')
+        for n in range(5):
+            cache.set('django_q:hms:cluster', n)
+            cache.set(f'django.contrib.sessions.cached_db{n}', {'n': n})
+            request_started.send(sender=self.__class__)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(cache.get('hw:role_matrix:v1'), 'matrix')
+            self.assertEqual(len(cache_queries(ctx)), 1)
+        self.assertEqual(cache.stats()['l1_hits'], 5)
+
+    def test_namespaces(self):
+        self.assertEqual(namespace('hw:dashboard:v2:konoz:2026-01-01:charts'), 'hw:dashboard')
+        self.assertEqual(namespace('hw:role_matrix:v1'), 'hw:role_matrix')
+        self.assertEqual(namespace('message_templates'), 'message_templates')
+
+    @tiered(GENERATION_CHECK=0)
+    def test_outside_requests_the_stamp_is_rechecked_on_a_timer(self):
+        cache.set('k', 'old')
+        caches['shared'].set('k', 'new')
+        caches['shared'].set(GENERATION_KEY, 'other-worker', None)
+        self.assertEqual(cache.get('k'), 'new')
+
+    def test_delete_and_clear_reach_the_shared_tier(self):
+        cache.set_many({'a': 1, 'b': 2})
+        cache.delete('a')
+        self.assertIsNone(caches['shared'].get('a'))
+        self.assertEqual(cache.get_many(['a', 'b']), {'b': 2})
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(caches['shared'].get('b'))
+
+    def test_incr_goes_through(self):
+        cache.set('n', 1)
+        self.assertEqual(cache.incr('n'), 2)
+        self.assertEqual(cache.get('n'), 2)
+        self.assertEqual(caches['shared'].get('n'), 2)
+
+    @tiered(L1_MAX_ENTRIES=2)
+    def test_l1_is_a_bounded_lru(self):
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get('a')
+        caches['shared'].set('c', 3)
+        cache.get('c')  # mendorong keluar 'b', yang paling lama tidak dipakai
+        self.assertEqual(cache.stats()['l1_entries'], 2)
+        with CaptureQueriesContext(connection) as ctx:
+            cache.get('a')
+            cache.get('c')
+        self.assertEqual(cache_queries(ctx), [])
+        with CaptureQueriesContext(connection) as ctx:
+            cache.get('b')
+        self.assertEqual(len(cache_queries(ctx)), 1)
+
+    @tiered(L1_TIMEOUT=5)
+    def test_l1_entries_expire(self):
+        cache.set('k', 'old')
+        caches['shared'].set('k', 'new')
+        with patch('hw.cache.time.monotonic', return_value=10**9):
+            self.assertEqual(cache.get('k'), 'new')
+
+    def test_short_timeouts_are_not_kept_longer_in_l1(self):
+        cache.set('k', 'v', 0)
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(cache.stats()['l1_entries'], 0)
+
+
+class RoundTripsPerRequestTest(TieredCacheTestBase):
+    """Cache round-trips of a warm home-page request, plain DatabaseCache
+    against the tiered backend (`manage.py bench_cache` prints the same)."""
+
+    def _warm_request_cache_queries(self, before_each=lambda: None):
+        user = User.objects.create_superuser('cachebench', password='pw')
+        self.client.force_login(user)
+        # Request pertama memilih active company, yang kedua mengisi cache
+        # untuk company itu; sesudahnya tidak ada tulisan lagi.
+        for _ in range(3):
+            before_each()
+            self.client.get('/', HTTP_X_INERTIA='true')
+        before_each()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/', HTTP_X_INERTIA='true')
+        self.assertEqual(resp.status_code, 200)
+        return len(cache_queries(ctx))
+
+    def test_plain_database_cache(self):
+        self.assertGreaterEqual(self._warm_request_cache_queries(), 3)
+
+    @tiered()
+    def test_tiered_cache_costs_one_generation_check(self):
+        self.assertEqual(self._warm_request_cache_queries(), 1)
+
+    @tiered()
+    def test_qcluster_heartbeat_through_the_tiered_alias_keeps_l1(self):
+        # Stat.save() tiap 0.5 s. Q_CLUSTER sekarang memakai alias 'shared',
+        # tapi lewat alias tiered pun hanya namespace django_q yang kena.
+        def heartbeat():
+            cache.set('django_q:hms:cluster:bench', 'stat', 3)
+        self.assertEqual(self._warm_request_cache_queries(heartbeat), 1)
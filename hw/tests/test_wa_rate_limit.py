@@ -0,0 +1,126 @@
+import ast
+from unittest.mock import patch
+
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_q.conf import Conf
+from django_q.models import Schedule
+
+from hw.models import BillingLog, Invoice, RecapLog, SendRateBucket
+from hw.services.fonnte import THROTTLED
+from hw.tasks import THROTTLE_PAUSE, send_billing_task, send_recap_task
+
+
+class SendRateBucketTest(TestCase):
+    def setUp(self):
+        patcher = patch('hw.models.reminder.time.time', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        limits = {'global': (0.5, 2)}
+        self.assertEqual(SendRateBucket.take(limits), 0)
+        self.assertEqual(SendRateBucket.take(limits), 0)
+        self.assertAlmostEqual(SendRateBucket.take(limits), 2.0)
+        self.clock.return_value = 1001.0
+        self.assertAlmostEqual(SendRateBucket.take(limits), 1.0)
+        self.clock.return_value = 1002.0
+        self.assertEqual(SendRateBucket.take(limits), 0)
+
+    def test_all_or_nothing(self):
+        limits = {'global': (1, 5), 'target:628': (0.1, 1)}
+        self.assertEqual(SendRateBucket.take(limits), 0)
+        self.assertAlmostEqual(SendRateBucket.take(limits), 10.0)
+        # Target yang penuh tidak ikut menghabiskan token global.
+        self.assertAlmostEqual(SendRateBucket.objects.get(key='global').tokens, 4)
+        self.assertEqual(SendRateBucket.take({'global': (1, 5), 'target:629': (0.1, 1)}), 0)
+
+    def test_concurrent_writer_forces_a_reread(self):
+        limits = {'global': (1, 3)}
+        SendRateBucket.take(limits)
+        manager_cls = type(SendRateBucket.objects)
+        real_in_bulk = manager_cls.in_bulk
+        reads = []
+
+        def racing_read(manager, *args, **kwargs):
+            rows = real_in_bulk(manager, *args, **kwargs)
+            if not reads:
+                # Worker lain mengambil token di antara baca dan tulis kita.
+                SendRateBucket.objects.filter(key='global').update(tokens=1, version=F('version') + 1)
+            reads.append(rows)
+            return rows
+
+        with patch.object(manager_cls, 'in_bulk', autospec=True, side_effect=racing_read):
+            self.assertEqual(SendRateBucket.take(limits), 0)
+        self.assertEqual(len(reads), 2)
+        self.assertAlmostEqual(SendRateBucket.objects.get(key='global').tokens, 0)
+
+
+@override_settings(FONNTE_TARGET_RATE_LIMIT=(6, 1), FONNTE_RATE_LIMIT=(600, 100))
+@patch.object(Conf, 'SYNC', False)
+class RescheduleTest(TestCase):
+    def _schedules(self):
+        return list(Schedule.objects.filter(func='hw.tasks.send_recap_task'))
+
+    @patch('hw.tasks.send_wa')
+    def test_over_the_limit_is_rescheduled_not_failed(self, mock_send):
+        mock_send.return_value = {'status': True}
+        send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2)
+        send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2)
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertEqual(RecapLog.objects.get().status, 'SENT')
+        (sched,) = self._schedules()
+        self.assertEqual(ast.literal_eval(sched.args), ('PHONE', '628111', 'Tim', 'rekap', 2))
+        self.assertEqual(ast.literal_eval(sched.kwargs), {'attempt': 1})
+        self.assertEqual(sched.schedule_type, Schedule.ONCE)
+
+        # Target lain tidak ikut tertahan.
+        send_recap_task('PHONE', '628222', 'Tim 2', 'rekap', 2)
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch('hw.tasks.send_wa')
+    def test_provider_throttling_is_rescheduled(self, mock_send):
+        mock_send.return_value = {'status': False, 'reason': THROTTLED}
+        send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2)
+        self.assertFalse(RecapLog.objects.exists())
+        (sched,) = self._schedules()
+        self.assertAlmostEqual((sched.next_run - timezone.now()).total_seconds(), THROTTLE_PAUSE, delta=5)
+
+    @override_settings(FONNTE_MAX_RESCHEDULES=3)
+    @patch('hw.tasks.send_wa')
+    def test_gives_up_after_max_reschedules(self, mock_send):
+        mock_send.return_value = {'status': False, 'reason': THROTTLED}
+        send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2, attempt=3)
+        log = RecapLog.objects.get()
+        self.assertEqual((log.status, log.error), ('FAILED', THROTTLED))
+        self.assertFalse(self._schedules())
+
+    @patch('hw.tasks.send_wa')
+    def test_billing_renders_nothing_until_it_has_a_slot(self, mock_send):
+        mock_send.return_value = {'status': True}
+        inv = Invoice.objects.create(company='konoz', invoice_number='INV-RL', customer_name='Budi')
+        send_billing_task(inv.pk, '628333', 'tagihan')
+        with patch('hw.tasks._send_billing') as mock_billing:
+            send_billing_task(inv.pk, '628333', 'tagihan', True)
+        mock_billing.assert_not_called()
+        self.assertEqual(BillingLog.objects.count(), 1)
+        sched = Schedule.objects.get(func='hw.tasks.send_billing_task')
+        self.assertEqual(ast.literal_eval(sched.args), (inv.pk, '628333', 'tagihan', True))
+
+
+@override_settings(FONNTE_TARGET_RATE_LIMIT=(6, 1))
+class SyncModeTest(TestCase):
+    @patch('hw.tasks.time.sleep')
+    @patch('hw.tasks.send_wa')
+    def test_without_a_cluster_the_task_waits_inline(self, mock_send, mock_sleep):
+        clock = [1000.0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        mock_send.return_value = {'status': True}
+        with patch('hw.models.reminder.time.time', side_effect=lambda: clock[0]):
+            send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2)
+            send_recap_task('PHONE', '628111', 'Tim', 'rekap', 2)
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 10.0)
+        self.assertEqual(RecapLog.objects.filter(status='SENT').count(), 2)
+        self.assertFalse(Schedule.objects.exists())
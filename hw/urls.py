@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
@@ -11,6 +11,7 @@ urlpatterns = [
     path('cl/export/csv/', views.cl_export_csv, name='cl_export_csv'),
     path('cl/export/pdf/', views.cl_list_pdf, name='cl_list_pdf'),
     path('cl/export/pdf-v2/', views.cl_list_pdf_v2, name='cl_list_pdf_v2'),
+    path('cl/export/zip/', views.cl_export_zip, name='cl_export_zip'),
     path('cl/<int:pk>/', views.cl_detail, name='cl_detail'),
     path('cl/<int:pk>/edit/', views.cl_edit, name='cl_edit'),
 path('cl/<int:pk>/delete/', views.cl_delete, name='cl_delete'),
@@ -23,6 +24,7 @@ path('cl/<int:pk>/delete/', views.cl_delete, name='cl_delete'),
     path('invoice/new/', views.invoice_new, name='invoice_new'),
     path('invoice/export/csv/', views.invoice_export_csv, name='invoice_export_csv'),
     path('invoice/export/pdf/', views.invoice_list_pdf, name='invoice_list_pdf'),
+    path('invoice/export/zip/', views.invoice_export_zip, name='invoice_export_zip'),
     path('invoice/<int:pk>/', views.invoice_detail, name='invoice_detail'),
     path('invoice/<int:pk>/edit/', views.invoice_edit, name='invoice_edit'),
     path('invoice/<int:pk>/delete/', views.invoice_delete, name='invoice_delete'),
@@ -88,6 +90,7 @@ path('cl/<int:pk>/delete/', views.cl_delete, name='cl_delete'),
     path('remittance/', views.remittance_list, name='remittance_list'),
     path('remittance/new/', views.remittance_new, name='remittance_new'),
     path('remittance/recap/', views.remittance_recap, name='remittance_recap'),
+    path('remittance/reservasi/', views.remittance_reservasi, name='remittance_reservasi'),
     path('remittance/export/csv/', views.remittance_export_csv, name='remittance_export_csv'),
     path('remittance/export/pdf/', views.remittance_period_pdf, name='remittance_period_pdf'),
     path('remittance/export/ledger/', views.remittance_ledger_pdf, name='remittance_ledger_pdf'),
@@ -126,6 +129,9 @@ path('cl/<int:pk>/delete/', views.cl_delete, name='cl_delete'),
     path('penalty/<int:pk>/delete/', views.penalty_delete, name='penalty_delete'),
     path('penalty/<int:pk>/pdf/', views.penalty_pdf, name='penalty_pdf'),
 
+    # Background PDF renders (polled until the worker has stored the file)
+    re_path(r'^pdf/jobs/(?P<key>[0-9a-f]{64})/$', views.pdf_job, name='pdf_job'),
+
     # Dev / design system preview (superuser only)
     path('dev/style-guide/', views.style_guide, name='style_guide'),
 
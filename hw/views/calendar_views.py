@@ -13,8 +13,8 @@ from inertia import render as inertia_render
 from ..models import ConfirmationLetter, Invoice, RecapLog, WATarget, MessageTemplate
 from ..permissions import require_perm
 from ..i18n import tr, user_language
-from .helpers import get_active_company
-from .pdf import _render_checkin_pdf
+from .helpers import get_active_company, lazy
+from .pdf import _checkin_pdf_source, _pdf_job_response
 from ..services.recap import (
     build_recap_message,
     build_grouped_reminder_message, resolve_reminder_targets, resolve_guest_target, group_guests,
@@ -147,6 +147,36 @@ def calendar_view(request):
 
     active_company = get_active_company(request)
     days_in_month = calendar.monthrange(year, month)[1]
+    prev_month, prev_year = (month - 1, year) if month > 1 else (12, year - 1)
+    next_month, next_year = (month + 1, year) if month < 12 else (1, year + 1)
+    today_day = today.day if today.year == year and today.month == month else None
+
+    # Grid, upcoming list and recap are callables: the check-in panel's
+    # partial reload (only: ['upcoming_checkins']) skips the month grid.
+    grid = lazy(lambda: _month_grid(active_company, year, month, days_in_month, today_day))
+    props = {
+        "year": year,
+        "month": month,
+        "month_name": (_MONTH_NAMES_ID if user_language(request) == 'id' else _MONTH_NAMES_EN)[month],
+        "days_in_month": days_in_month,
+        "days": list(range(1, days_in_month + 1)),
+        "today_day": today_day,
+        "prev_year": prev_year,
+        "prev_month": prev_month,
+        "next_year": next_year,
+        "next_month": next_month,
+        "upcoming_checkins": lambda: _get_upcoming_checkins(active_company),
+        "last_recap": _get_last_recap,
+    }
+    for key in _GRID_KEYS:
+        props[key] = lambda key=key: grid()[key]
+    return inertia_render(request, "Calendar/Index", props=props)
+
+
+_GRID_KEYS = ("hotels", "total_reservations", "checkins_today", "checkouts_today", "tentative_count", "active_today")
+
+
+def _month_grid(active_company, year, month, days_in_month, today_day):
     month_start = date(year, month, 1)
     month_end = date(year, month, days_in_month)
 
@@ -157,7 +187,7 @@ def calendar_view(request):
         .filter(check_in__lte=month_end, check_out__gt=month_start)
         .exclude(check_in=None).exclude(check_out=None)
         .select_related('invoice')
-        .prefetch_related('invoice__payments', 'invoice__reservations')
+        .prefetch_related('rooms')
         .filter(company=active_company)
     )
 
@@ -170,7 +200,7 @@ def calendar_view(request):
 
         inv = cl.invoice
         inv_number = inv.invoice_number if inv else ''
-        inv_remaining = f"{inv.remaining_sar:,.0f} SAR" if inv else ''
+        inv_remaining = f"{inv.balance_sar:,.0f} SAR" if inv else ''
         inv_url = reverse('invoice_detail', args=[inv.pk]) if inv else ''
 
         hotel_map.setdefault(hotel, []).append({
@@ -193,38 +223,16 @@ def calendar_view(request):
     hotels = [{'name': k, 'reservations': sorted(v, key=lambda x: x['start'])}
               for k, v in sorted(hotel_map.items())]
 
-    prev_month, prev_year = (month - 1, year) if month > 1 else (12, year - 1)
-    next_month, next_year = (month + 1, year) if month < 12 else (1, year + 1)
-
-    today_day = today.day if today.year == year and today.month == month else None
-
     # Summary counts
     all_res = [r for h in hotels for r in h['reservations']]
-    checkins_today   = sum(1 for r in all_res if r['start'] == today_day) if today_day else 0
-    checkouts_today  = sum(1 for r in all_res if r['end'] == today_day) if today_day else 0
-    tentative_count  = sum(1 for r in all_res if r['color'] == 'yellow')
-    active_today     = sum(1 for r in all_res if today_day and r['start'] <= today_day <= r['end']) if today_day else 0
-
-    return inertia_render(request, "Calendar/Index", props={
-        "year": year,
-        "month": month,
-        "month_name": (_MONTH_NAMES_ID if user_language(request) == 'id' else _MONTH_NAMES_EN)[month],
-        "days_in_month": days_in_month,
-        "days": list(range(1, days_in_month + 1)),
-        "today_day": today_day,
+    return {
         "hotels": hotels,
-        "prev_year": prev_year,
-        "prev_month": prev_month,
-        "next_year": next_year,
-        "next_month": next_month,
-        "total_reservations": sum(len(h['reservations']) for h in hotels),
-        "checkins_today": checkins_today,
-        "checkouts_today": checkouts_today,
-        "tentative_count": tentative_count,
-        "active_today": active_today,
-        "upcoming_checkins": _get_upcoming_checkins(active_company),
-        "last_recap": _get_last_recap(),
-    })
+        "total_reservations": len(all_res),
+        "checkins_today": sum(1 for r in all_res if r['start'] == today_day) if today_day else 0,
+        "checkouts_today": sum(1 for r in all_res if r['end'] == today_day) if today_day else 0,
+        "tentative_count": sum(1 for r in all_res if r['color'] == 'yellow'),
+        "active_today": sum(1 for r in all_res if r['start'] <= today_day <= r['end']) if today_day else 0,
+    }
 
 
 @require_perm('calendar', 'edit')
@@ -243,7 +251,7 @@ def cl_estimasi_save(request, pk):
             cl.estimasi_tiba = None
     else:
         cl.estimasi_tiba = None
-    cl.save(update_fields=['estimasi_tiba', 'pic_name', 'pic_phone'])
+    cl.save(update_fields=['estimasi_tiba', 'pic_name', 'pic_phone', 'updated_at'])
     return JsonResponse({'ok': True})
 
 
@@ -441,5 +449,6 @@ def calendar_checkin_pdf(request):
         .filter(company=active_company)
     )
 
-    return _render_checkin_pdf(list(qs), title, active_company, filename,
-                               date_start=date_start, date_end=date_end)
+    template, context = _checkin_pdf_source(list(qs), title, active_company,
+                                            date_start=date_start, date_end=date_end)
+    return _pdf_job_response(request, template, context, filename, language='en')
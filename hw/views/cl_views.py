@@ -1,22 +1,28 @@
-import csv
 import json
 from datetime import date
 
 from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.paginator import Paginator
 from django.db.models import Count, Q
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django.views.decorators.http import require_POST
 
 from inertia import render as inertia_render
 
-from ..models import ActivityLog, Client, ConfirmationLetter, Hotel, Invoice, Reservation, Room, log_activity
+from ..models import (
+    ActivityLog, Attachment, CancellationPenalty, Client, ConfirmationLetter, Hotel, Invoice, Reservation, Room,
+    log_activity,
+)
+from .. import signals
+from ..pagination import KeysetPaginator
 from ..permissions import require_perm
 from ..i18n import tr
-from .helpers import _is_mobile, _page_range_display, _parse_date, _render_list_pdf, get_active_company
-from .pdf import _logo_file_url, _render_cl_pdf
+from ..services import search
+from .conditional import conditional, row_version, rows_version
+from .helpers import _is_mobile, _pagination, _parse_date, _render_list_pdf, _stream_csv, get_active_company
+from .pdf import PDF_BUNDLE_MAX_DOCS, _cl_pdf_source, _logo_file_url, _pdf_bundle_response, _pdf_job_response
 from ..utils import round_half_up
 
 
@@ -68,11 +74,7 @@ def cl_list(request):
         if tokens:
             combined = Q()
             for token in tokens:
-                combined |= (
-                    Q(guest_name__icontains=token) |
-                    Q(hotel_name__icontains=token) |
-                    Q(confirmation_number__icontains=token)
-                )
+                combined |= search.match_q('CL', active_company, token)
             qs = qs.filter(combined)
     if status_list:
         qs = qs.filter(reservation_status__in=status_list)
@@ -81,8 +83,6 @@ def cl_list(request):
     if date_to:
         qs = qs.filter(check_in__lte=date_to)
 
-    qs = qs.order_by(_sort_map.get(sort, '-check_in'))
-
     active_filters = len(status_list) + bool(date_from) + bool(date_to)
     _status_counts = {
         row['reservation_status']: row['n']
@@ -94,8 +94,8 @@ def cl_list(request):
         'tentative': _status_counts.get('TENTATIVE', 0),
         'cancelled': _status_counts.get('CANCELLED', 0),
     }
-    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, [_sort_map.get(sort, '-check_in')], 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET)
     letters = [{
         "id": cl.id,
         "confirmation_number": cl.confirmation_number,
@@ -121,19 +121,7 @@ def cl_list(request):
         "sort_labels": _sort_labels,
         "active_filters": active_filters,
         "counts": counts,
-        "pagination": {
-            "number": page_obj.number,
-            "num_pages": paginator.num_pages,
-            "has_previous": page_obj.has_previous(),
-            "has_next": page_obj.has_next(),
-            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
-            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
-            "has_other_pages": page_obj.has_other_pages(),
-            "range": _page_range_display(page_obj),
-            "start_index": page_obj.start_index(),
-            "end_index": page_obj.end_index(),
-            "count": paginator.count,
-        },
+        "pagination": _pagination(page_obj),
     })
 
 
@@ -181,7 +169,7 @@ def _cl_echo(data):
 
 @require_perm('cl', 'create')
 def cl_new(request):
-    suggested_number = ConfirmationLetter.generate_number()
+    suggested_number = ConfirmationLetter.suggest_number()
     active_company = get_active_company(request)
     default_company = active_company
     if request.method == "POST":
@@ -217,6 +205,7 @@ def cl_new(request):
             note=request.POST.get("note", ""),
         )
         _save_cl_rooms(cl, request)
+        signals.cl_rooms_changed(cl)
         log_activity(request.user, ActivityLog.ACTION_CREATE, 'CL', cl.confirmation_number, cl.company)
         messages.success(request, f"Confirmation Letter {cl.confirmation_number} created successfully.")
         return redirect("cl_detail", pk=cl.pk)
@@ -228,7 +217,20 @@ def cl_new(request):
     })
 
 
+def _cl_version(request, pk):
+    cl = ConfirmationLetter.objects.filter(pk=pk, company=get_active_company(request))
+    return row_version(
+        cl,
+        Room.objects.filter(cl__in=cl),
+        (Attachment.objects.filter(cl__in=cl), 'uploaded_at'),
+        CancellationPenalty.objects.filter(cl__in=cl),
+        Client.objects.filter(cls__in=cl),
+        Invoice.objects.filter(confirmation_letters__in=cl),
+    )
+
+
 @require_perm('cl', 'view')
+@conditional(_cl_version, page=True)
 def cl_detail(request, pk):
     cl = _get_cl(
         request, pk,
@@ -335,11 +337,11 @@ def cl_edit(request, pk):
         cl.note = request.POST.get("note", "")
         cl.save()
 
-        cl.rooms.all().delete()
-        _save_cl_rooms(cl, request)
-
-        if cl.invoice_id:
-            _sync_invoice_reservation_from_cl(cl)
+        _save_cl_rooms(cl, request, replace=True)
+        # Satu resync per simpan: reservation.save() di sini sudah membawa
+        # total kamar baru ke saldo invoice, buku besar dan dashboard.
+        if not (cl.invoice_id and _sync_invoice_reservation_from_cl(cl)):
+            signals.cl_rooms_changed(cl)
 
         _after = {
             'Hotel':     cl.hotel_name,
@@ -392,7 +394,7 @@ def cl_delete(request, pk):
 @require_perm('cl', 'export')
 def cl_pdf(request, pk):
     cl = _get_cl(request, pk)
-    return _render_cl_pdf(cl)
+    return _pdf_job_response(request, *_cl_pdf_source(cl))
 
 
 _SORT_MAP = {
@@ -413,11 +415,7 @@ def _filter_cl_qs(qs, request):
         if tokens:
             combined = Q()
             for token in tokens:
-                combined |= (
-                    Q(guest_name__icontains=token) |
-                    Q(hotel_name__icontains=token) |
-                    Q(confirmation_number__icontains=token)
-                )
+                combined |= search.match_q('CL', get_active_company(request), token)
             qs = qs.filter(combined)
     if status_list:
         qs = qs.filter(reservation_status__in=status_list)
@@ -428,17 +426,28 @@ def _filter_cl_qs(qs, request):
     return qs.order_by(_SORT_MAP.get(sort, '-check_in'))
 
 
+@require_perm('cl', 'export')
+def cl_export_zip(request):
+    """Every CL matching the list filters as individual PDFs in one zip."""
+    qs = _filter_cl_qs(ConfirmationLetter.objects.filter(company=get_active_company(request)), request)
+    ids = qs.values_list('pk', flat=True)[:PDF_BUNDLE_MAX_DOCS + 1]
+    back = f"{reverse('cl_list')}?{request.GET.urlencode()}"
+    return _pdf_bundle_response(request, 'cl', ids, 'confirmation_letters.zip', back)
+
+
 @require_perm('cl', 'export')
 def cl_list_pdf(request):
     active_company = get_active_company(request)
     qs = ConfirmationLetter.objects.filter(company=active_company)
-    qs = _filter_cl_qs(qs, request)
+    # Angka per CL dihitung di SQL (with_financials), bukan lewat property
+    # yang memicu query rooms/payment untuk setiap surat.
+    qs = _filter_cl_qs(qs, request).with_financials()
     letters = list(qs)
-    total_rooms  = sum(cl.total_rooms for cl in letters)
-    total_nights = sum(cl.num_nights for cl in letters)
-    total_sar    = sum(cl.total_price or 0 for cl in letters)
-    total_paid   = sum(cl.paid_sar for cl in letters)
-    total_remain = sum(cl.remaining_sar for cl in letters)
+    total_rooms  = sum(cl.fin_rooms for cl in letters)
+    total_nights = sum(cl.fin_nights for cl in letters)
+    total_sar    = sum(cl.fin_price for cl in letters)
+    total_paid   = sum(cl.fin_paid for cl in letters)
+    total_remain = sum(cl.fin_remaining for cl in letters)
     return _render_list_pdf(
         request, qs,
         template="hw/cl/cl_list_pdf.html",
@@ -459,7 +468,8 @@ def cl_list_pdf(request):
 def cl_list_pdf_v2(request):
     active_company = get_active_company(request)
     qs = ConfirmationLetter.objects.filter(company=active_company)
-    qs = _filter_cl_qs(qs, request).prefetch_related('rooms')
+    # rooms tetap di-prefetch untuk kolom tipe kamar; totalnya dari SQL.
+    qs = _filter_cl_qs(qs, request).with_room_totals().prefetch_related('rooms')
     letters = list(qs)
     for cl in letters:
         counts = {}
@@ -470,8 +480,8 @@ def cl_list_pdf_v2(request):
             f"{n} {t}" + (f" - {m}" if m else "")
             for (t, m), n in counts.items()
         )
-    total_rooms  = sum(cl.total_rooms for cl in letters)
-    total_sar    = sum(cl.total_price or 0 for cl in letters)
+    total_rooms  = sum(cl.fin_rooms for cl in letters)
+    total_sar    = sum(cl.fin_price for cl in letters)
     return _render_list_pdf(
         request, qs,
         template="hw/cl/cl_list_pdf_v2.html",
@@ -485,23 +495,33 @@ def cl_list_pdf_v2(request):
     )
 
 
+def _cl_export_qs(request):
+    return _filter_cl_qs(ConfirmationLetter.objects.filter(company=get_active_company(request)), request)
+
+
+def _cl_export_version(request):
+    qs = _cl_export_qs(request)
+    return rows_version(qs, Room.objects.filter(cl__in=qs))
+
+
 @require_perm('cl', 'export')
+@conditional(_cl_export_version)
 def cl_export_csv(request):
-    active_company = get_active_company(request)
-    qs = ConfirmationLetter.objects.filter(company=active_company)
-    qs = _filter_cl_qs(qs, request)
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="confirmation_letters.csv"'
-    response.write('﻿')
-    writer = csv.writer(response)
-    writer.writerow(['No CL', 'Company', 'Guest', 'Hotel', 'Check-in', 'Check-out', 'Total SAR', 'Status', 'Note'])
-    for cl in qs:
-        writer.writerow([
+    qs = _cl_export_qs(request).with_room_totals()
+    # total dari SQL: satu query per chunk, memori tetap konstan
+    rows = (
+        [
             cl.confirmation_number, cl.company, cl.guest_name, cl.hotel_name,
             cl.check_in or '', cl.check_out or '',
-            cl.total_price or 0, cl.reservation_status, cl.note or '',
-        ])
-    return response
+            cl.fin_price or 0, cl.reservation_status, cl.note or '',
+        ]
+        for cl in qs.iterator(chunk_size=500)
+    )
+    return _stream_csv(
+        request, 'confirmation_letters.csv',
+        ['No CL', 'Company', 'Guest', 'Hotel', 'Check-in', 'Check-out', 'Total SAR', 'Status', 'Note'],
+        rows,
+    )
 
 
 @require_perm('cl', 'create')
@@ -519,14 +539,12 @@ def cl_duplicate(request, pk):
         reservation_status=original.reservation_status,
         note=original.note,
     )
-    for room in original.rooms.all():
-        Room.objects.create(
-            cl=new_cl,
-            room_type=room.room_type,
-            meals=room.meals,
-            quantity=room.quantity,
-            price=room.price,
-        )
+    # bulk_create melewati signal Room; resync sekali sesudahnya.
+    Room.objects.bulk_create([
+        Room(cl=new_cl, room_type=room.room_type, meals=room.meals, quantity=room.quantity, price=room.price)
+        for room in original.rooms.all()
+    ])
+    signals.cl_rooms_changed(new_cl)
     messages.success(request, f"CL duplicated as {new_num} (from {original.confirmation_number}).")
     return redirect("cl_edit", pk=new_cl.pk)
 
@@ -564,18 +582,22 @@ def invoice_from_cls(request):
             total_sar=round_half_up(cl.total_price) if cl.total_price else 0,
         )
         cl.invoice = invoice
-        cl.save(update_fields=["invoice"])
+        cl.save(update_fields=["invoice", "updated_at"])
 
     messages.success(request, f"Invoice {invoice.invoice_number} created from {cls.count()} CL(s).")
     return redirect("invoice_edit", pk=invoice.pk)
 
 
-def _save_cl_rooms(cl, request):
+def _save_cl_rooms(cl, request, replace=False):
+    """Write the form's `rooms` rows for `cl` (replacing the current ones when
+    `replace`) in one bulk insert. Per-room signals are held back, so the
+    caller runs signals.cl_rooms_changed(cl) (or an equivalent resync) once."""
     try:
-        rooms = json.loads(request.POST.get("rooms", "[]") or "[]")
+        rows = json.loads(request.POST.get("rooms", "[]") or "[]")
     except (ValueError, TypeError):
-        rooms = []
-    for r in rooms:
+        rows = []
+    rooms = []
+    for r in rows:
         rt = (r.get("room_type") or "").strip()
         if not rt:
             continue
@@ -587,18 +609,24 @@ def _save_cl_rooms(cl, request):
             price = max(0, float(r.get("price") or 0))
         except (ValueError, TypeError):
             price = 0
-        Room.objects.create(cl=cl, room_type=rt, meals=(r.get("meals") or ""), quantity=qty, price=price)
+        rooms.append(Room(cl=cl, room_type=rt, meals=(r.get("meals") or ""), quantity=qty, price=price))
+    with signals.batched(Room):
+        if replace:
+            cl.rooms.all().delete()
+        Room.objects.bulk_create(rooms)
 
 
 def _sync_invoice_reservation_from_cl(cl):
-    """Update the Invoice's Reservation to match the CL's current data."""
+    """Update the Invoice's Reservation to match the CL's current data.
+    False when the invoice has no reservation for this CL."""
     from ..models import Reservation
     try:
         reservation = cl.invoice.reservations.get(reservation_number=cl.confirmation_number)
     except Reservation.DoesNotExist:
-        return
+        return False
     reservation.check_in = cl.check_in
     reservation.check_out = cl.check_out
     reservation.total_sar = round_half_up(cl.total_price) if cl.total_price else 0
     reservation.hotel = cl.hotel_name or "-"
     reservation.save()
+    return True
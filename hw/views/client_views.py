@@ -2,8 +2,6 @@
 from datetime import date, timedelta
 
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
@@ -11,23 +9,39 @@ from django.views.decorators.http import require_POST
 
 from inertia import render as inertia_render
 
-from ..models import ActivityLog, Client, ConfirmationLetter, Invoice, log_activity
+from ..models import ActivityLog, Client, ClientScorecard, ConfirmationLetter, Invoice, log_activity
+from ..pagination import KeysetPaginator
 from ..permissions import require_perm
-from .helpers import _is_mobile, _page_range_display, get_active_company
+from ..services import search
+from .conditional import conditional, row_version, rows_version
+from .helpers import _is_mobile, _pagination, get_active_company
 
 
 def _company(request):
     return get_active_company(request)
 
 
+def _scorecards(clients):
+    """pk -> ClientScorecard for `clients` (fetched with
+    select_related('scorecard')), building any card that doesn't exist yet
+    — e.g. clients that predate the table and haven't been through
+    `rebuild_client_scorecards`."""
+    cards = {c.pk: c.scorecard for c in clients if hasattr(c, 'scorecard')}
+    missing = [c.pk for c in clients if c.pk not in cards]
+    if missing:
+        ClientScorecard.refresh(missing)
+        cards.update(ClientScorecard.objects.in_bulk(missing))
+    return cards
+
+
 @require_perm('clients', 'view')
 def client_list(request):
     company = _company(request)
-    qs = Client.objects.filter(company=company)
+    qs = Client.objects.filter(company=company).select_related('scorecard')
 
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(Q(name__icontains=q) | Q(brand__icontains=q) | Q(city__icontains=q) | Q(pic__icontains=q))
+        qs = qs.filter(search.match_q('CLIENT', company, q))
 
     status = request.GET.get('status', '')
     if status == 'active':
@@ -35,9 +49,9 @@ def client_list(request):
     elif status == 'inactive':
         qs = qs.filter(is_active=False)
 
-    qs = qs.order_by('name')
-    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ['name'], 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET)
+    cards = _scorecards(page_obj.object_list)
 
     data = [{
         "id": c.pk,
@@ -49,27 +63,15 @@ def client_list(request):
         "wa": c.wa,
         "wa_group": c.wa_group,
         "reminder_target": c.reminder_target,
-        "avg_days_to_pay": c.avg_days_to_pay,
-        "days_since_last_order": c.days_since_last_order,
-        "risk_label": c.risk_label,
+        "avg_days_to_pay": cards[c.pk].avg_days_to_pay,
+        "days_since_last_order": cards[c.pk].days_since_last_order,
+        "risk_label": cards[c.pk].risk_label,
         "is_active": c.is_active,
     } for c in page_obj]
     return inertia_render(request, "Client/List", props={
         "clients": data, "q": q, "status": status,
         "total_count": paginator.count,
-        "pagination": {
-            "number": page_obj.number,
-            "num_pages": paginator.num_pages,
-            "has_previous": page_obj.has_previous(),
-            "has_next": page_obj.has_next(),
-            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
-            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
-            "has_other_pages": page_obj.has_other_pages(),
-            "range": _page_range_display(page_obj),
-            "start_index": page_obj.start_index(),
-            "end_index": page_obj.end_index(),
-            "count": paginator.count,
-        },
+        "pagination": _pagination(page_obj),
     })
 
 
@@ -151,7 +153,20 @@ def client_delete(request, pk):
     return redirect('client_list')
 
 
+def _client_version(request, pk):
+    # Scorecard.refreshed_at moves on every invoice/payment/CL write that
+    # touches this client, which covers the live score properties too.
+    client = Client.objects.filter(pk=pk, company=_company(request))
+    return row_version(
+        client,
+        Invoice.objects.filter(client__in=client),
+        ConfirmationLetter.objects.filter(client__in=client),
+        (ClientScorecard.objects.filter(client__in=client), 'refreshed_at'),
+    )
+
+
 @require_perm('clients', 'view')
+@conditional(_client_version, page=True)
 def client_detail(request, pk):
     company = _company(request)
     qs = Client.objects.filter(company=company).prefetch_related(
@@ -212,14 +227,24 @@ def client_map(request):
     return inertia_render(request, "Client/Map", props={"clients_count": qs.count()})
 
 
+def _client_map_version(request):
+    company = _company(request)
+    return rows_version(
+        Client.objects.filter(company=company, lat__isnull=False, lng__isnull=False),
+        (ClientScorecard.objects.filter(client__company=company), 'refreshed_at'),
+    )
+
+
 @require_perm('clients', 'view')
+@conditional(_client_map_version)
 def client_map_data(request):
     company = _company(request)
-    qs = (
+    qs = list(
         Client.objects
         .filter(company=company, lat__isnull=False, lng__isnull=False)
-        .prefetch_related('invoices__payments', 'invoices__reservations')
+        .select_related('scorecard')
     )
+    cards = _scorecards(qs)
 
     data = [
         {
@@ -230,10 +255,10 @@ def client_map_data(request):
             'province': c.province,
             'lat': c.lat,
             'lng': c.lng,
-            'outstanding': c.outstanding,
-            'total_billed': c.total_billed,
-            'score': c.score,
-            'risk': c.risk_label,
+            'outstanding': cards[c.pk].outstanding_sar,
+            'total_billed': cards[c.pk].billed_sar,
+            'score': cards[c.pk].score,
+            'risk': cards[c.pk].risk_label,
             'url': reverse('client_detail', args=[c.pk]),
             'wa': c.wa,
             'pic': c.pic,
@@ -0,0 +1,133 @@
+"""Conditional GET (ETag / 304 Not Modified) for detail pages, JSON endpoints
+and exports.
+
+A view declares which rows it reads with a version function. It returns
+rows_version(...) over those querysets, or row_version(...) for a detail
+page, which gives None when the object doesn't exist (the view then runs
+and 404s as usual). The version is the row count
+and the latest `updated_at` of every queryset, all in one query. Count plus
+latest timestamp catches inserts, edits and deletes. Bulk `.update()` calls
+on these tables set updated_at=Now() for the same reason.
+
+    @require_perm('hotels', 'view')
+    @conditional(_hotel_version, page=True)
+    def hotel_detail(request, pk): ...
+
+The ETag is a digest of that version and of everything else the response
+depends on: the URL, active company, language and today's date. Pages also
+include the Inertia request headers, the shared props (inertia_share) and
+the frontend asset version (INERTIA_VERSION), so after a deploy a page is
+re-sent with the new bundle URLs instead of a 304 to the old ones.
+A matching If-None-Match gets its 304 from django's `condition` before the
+view body runs, so no props are built and nothing is rendered. These ETags
+are weak: they say the data is unchanged, not that the bytes are identical.
+PDFs get a strong ETag from the content digest instead (see
+_pdf_job_response).
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Q, Subquery, Value
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from ..i18n import user_language
+from ..models import BillingLog, Client, ConfirmationLetter, Payment
+from .helpers import get_active_company
+
+
+def rows_version(*sources):
+    """Row count and latest timestamp of each source, in one query.
+
+    A source is a queryset (timestamp field `updated_at`) or a
+    (queryset, field) pair. The first source is aggregated directly and
+    the others ride along as scalar subqueries."""
+    def split(source):
+        return source if isinstance(source, tuple) else (source, 'updated_at')
+
+    first, field = split(sources[0])
+    aggregates = {'n0': Count('pk', distinct=True), 'm0': Max(field)}
+    for i, source in enumerate(sources[1:], 1):
+        qs, field = split(source)
+        # Grouping on a constant leaves the subquery without a GROUP BY, so it
+        # yields exactly one row even when no rows match.
+        rows = qs.order_by().annotate(_one=Value(1)).values('_one')
+        aggregates[f'n{i}'] = Max(Subquery(rows.annotate(n=Count('pk', distinct=True)).values('n')))
+        aggregates[f'm{i}'] = Max(Subquery(rows.annotate(m=Max(field)).values('m')))
+    row = first.order_by().aggregate(**aggregates)
+    return tuple(row[name] for name in aggregates)
+
+
+def row_version(row, *sources):
+    """rows_version for a single object and the rows hanging off it; None
+    when `row` (a queryset filtered down to the object) matches nothing."""
+    version = rows_version(row, *sources)
+    return version if version[0] else None
+
+
+def invoice_version(invoice, *sources):
+    """row_version for an invoice detail page (hotel or services): the
+    invoice, its payments, linked CLs, billing client and last billing send."""
+    return row_version(
+        invoice,
+        *sources,
+        Payment.objects.filter(invoice__in=invoice),
+        ConfirmationLetter.objects.filter(invoice__in=invoice),
+        Client.objects.filter(Q(invoices__in=invoice) | Q(cls__invoice__in=invoice)),
+        (BillingLog.objects.filter(invoice__in=invoice), 'sent_at'),
+    )
+
+
+def _digest(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def data_etag(request, version):
+    """Weak ETag for a non-page response (JSON endpoint, CSV export)."""
+    return 'W/"%s"' % _digest(
+        version, request.get_full_path(), get_active_company(request),
+        user_language(request), date.today().isoformat(),
+    )
+
+
+def page_etag(request, version):
+    """Weak ETag for an Inertia page, or None while a flash message is
+    waiting to be shown (a 304 would swallow it)."""
+    from ..inertia_share import shared_version
+
+    if len(get_messages(request)):
+        return None
+    headers = request.headers
+    return 'W/"%s"' % _digest(
+        data_etag(request, version), shared_version(request), settings.INERTIA_VERSION,
+        headers.get('X-Inertia'), headers.get('X-Inertia-Partial-Component'),
+        headers.get('X-Inertia-Partial-Data'),
+    )
+
+
+def conditional(version, page=False):
+    """Decorator: answer If-None-Match with 304 when `version(request, *args,
+    **kwargs)` (see rows_version) is unchanged, without running the view."""
+    make_etag = page_etag if page else data_etag
+
+    def etag(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        v = version(request, *args, **kwargs)
+        return None if v is None else make_etag(request, v)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                # Per-user data: browsers may keep it, but must ask every time.
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
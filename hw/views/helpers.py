@@ -1,8 +1,12 @@
 from datetime import datetime
+import csv
+import functools
 import json
+import zlib
 
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
+from .. import signals
 from ..models import ConfirmationLetter, Payment
 
 
@@ -17,13 +21,18 @@ def get_active_company(request):
     revoked while logged in, or a session carried over from before RBAC)
     falls back to their first permitted company instead of being trusted.
     """
-    from ..permissions import can_use_company, default_company
+    from ..permissions import access_for
 
     user = getattr(request, "user", None)
-    company = request.session.get("active_company")
-    if company and can_use_company(user, company):
-        return company
-    return default_company(user)
+    return access_for(user).active_company(request.session.get("active_company"))
+
+
+def lazy(fn):
+    """Wrap a zero-argument function as an Inertia prop value that runs at
+    most once. inertia-django only calls the props a response sends, so
+    several props derived from one computation can share it and a partial
+    reload that asks for none of them never pays for it."""
+    return functools.cache(fn)
 
 
 def _is_mobile(request):
@@ -34,21 +43,40 @@ def _is_mobile(request):
 def _page_range_display(page_obj):
     current = page_obj.number
     last = page_obj.paginator.num_pages
+    # Hanya halaman 1, terakhir dan ±2 dari halaman aktif; None = celah "…".
+    pages = sorted({1, last, *range(max(1, current - 2), min(last, current + 2) + 1)})
     result = []
-    for i in range(1, last + 1):
-        if i == 1 or i == last or abs(i - current) <= 2:
-            result.append(i)
-        elif result and result[-1] is not None:
+    for i in pages:
+        if result and i - result[-1] > 1:
             result.append(None)
+        result.append(i)
     return result
 
 
+def _pagination(page_obj):
+    """The `pagination` prop of the list pages. The `after` / `before`
+    cursors are only set by hw.pagination.KeysetPaginator pages."""
+    return {
+        "number": page_obj.number,
+        "num_pages": page_obj.paginator.num_pages,
+        "has_previous": page_obj.has_previous(),
+        "has_next": page_obj.has_next(),
+        "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
+        "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
+        "has_other_pages": page_obj.has_other_pages(),
+        "range": _page_range_display(page_obj),
+        "start_index": page_obj.start_index(),
+        "end_index": page_obj.end_index(),
+        "count": page_obj.paginator.count,
+        "after": getattr(page_obj, 'after', None),
+        "before": getattr(page_obj, 'before', None),
+    }
+
+
 
 def _render_list_pdf(request, qs, template, filename, extra_ctx=None):
     from datetime import datetime as _dt
-    from django.conf import settings
-    from django.template.loader import render_to_string
-    from weasyprint import HTML
+    from .pdf import _pdf_job_response
     active_company = get_active_company(request)
     q = request.GET.get('q', '').strip()
     ctx = {
@@ -58,10 +86,53 @@ def _render_list_pdf(request, qs, template, filename, extra_ctx=None):
     }
     if extra_ctx:
         ctx.update(extra_ctx)
-    html = render_to_string(template, ctx)
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return _pdf_job_response(request, template, ctx, filename)
+
+
+class _Echo:
+    """Pseudo-buffer untuk csv.writer: write() langsung mengembalikan baris
+    yang sudah diformat, jadi tidak ada buffer yang ikut membesar."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(header, rows, bom=True, batch=500):
+    """Baris CSV digabung per `batch` baris supaya tiap chunk cukup besar
+    untuk dikirim/dikompres, tapi memori tetap konstan."""
+    writer = csv.writer(_Echo())
+    chunk = ['\ufeff'] if bom else []
+    chunk.append(writer.writerow(header))
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= batch:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = container gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _stream_csv(request, filename, header, rows, bom=True):
+    """StreamingHttpResponse CSV dari iterable `rows` (sebaiknya queryset
+    .iterator()), jadi export seluruh riwayat company tidak pernah menampung
+    file utuh di memori. `?gzip=1` mengunduh file .csv.gz yang dikompres
+    sambil jalan."""
+    chunks = _csv_chunks(header, rows, bom=bom)
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(_gzip_chunks(chunks), content_type='application/gzip')
+        filename = f'{filename}.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -83,13 +154,18 @@ def _to_float(val, default=0.0):
         return default
 
 
-def _save_payments(invoice, request, ref_field, default_currency):
+def _save_payments(invoice, request, ref_field, default_currency, replace=False):
     """Create Payment objects from a JSON `payments` array (one object per row).
 
     Each row: {ref, date, method, amount, currency, exchange, note, proof_keep}.
     New proof uploads arrive as multipart files keyed `payment_proof_<index>`,
     where <index> is the row's position in the array. Sets cl FK when ref
     matches a CL number.
+
+    With `replace` the invoice's current payments are deleted first. The rows
+    go in with one bulk insert (proof files are stored as part of it), and the
+    balance, scorecard, ledger and dashboard are resynced once at the end
+    instead of per payment.
     """
     try:
         rows = json.loads(request.POST.get('payments', '[]'))
@@ -103,12 +179,13 @@ def _save_payments(invoice, request, ref_field, default_currency):
         for cl in ConfirmationLetter.objects.filter(confirmation_number__in=ref_set)
     } if ref_set else {}
 
+    payments = []
     for i, r in enumerate(rows):
         proof = request.FILES.get(f"payment_proof_{i}")
         keep  = (r.get('proof_keep') or '').strip()
         ref_clean = (r.get('ref') or '').strip()
         currency = (r.get('currency') or default_currency)
-        p = Payment.objects.create(
+        payments.append(Payment(
             invoice=invoice,
             cl=cl_by_number.get(ref_clean),
             linked_number=ref_clean,
@@ -118,21 +195,25 @@ def _save_payments(invoice, request, ref_field, default_currency):
             currency=currency.upper() if currency else default_currency,
             exchange_rate=_to_float(r.get('exchange'), 1) or 1,
             note=(r.get('note') or '').strip(),
-        )
-        if proof:
-            p.proof = proof
-            p.save()
-        elif keep:
-            p.proof = keep
-            p.save()
+            proof=proof or keep or None,
+        ))
+
+    numbers = {p.linked_number for p in payments}
+    with signals.batched(Payment):
+        if replace:
+            old = invoice.payments.all()
+            numbers.update(old.values_list('linked_number', flat=True))
+            old.delete()
+        Payment.objects.bulk_create(payments)
+    signals.payments_changed(invoice, numbers)
 
 
-def _save_hotel_payments(invoice, request):
-    _save_payments(invoice, request, 'payment_reservation_no', 'SAR')
+def _save_hotel_payments(invoice, request, replace=False):
+    _save_payments(invoice, request, 'payment_reservation_no', 'SAR', replace)
 
 
-def _save_service_payments(invoice, request):
-    _save_payments(invoice, request, 'payment_service_no', invoice.currency)
+def _save_service_payments(invoice, request, replace=False):
+    _save_payments(invoice, request, 'payment_service_no', invoice.currency, replace)
 
 
 def _billing_client(invoice):
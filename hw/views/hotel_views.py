@@ -1,7 +1,5 @@
 ﻿import json as _json
 
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
@@ -10,8 +8,11 @@ from django.views.decorators.http import require_POST
 from inertia import render as inertia_render
 
 from ..models import ActivityLog, Hotel, log_activity
+from ..pagination import KeysetPaginator
 from ..permissions import require_perm
-from .helpers import _is_mobile, _page_range_display, get_active_company
+from ..services import search
+from .conditional import conditional, row_version, rows_version
+from .helpers import _is_mobile, _pagination, get_active_company
 
 
 def _save_hotel(h, data):
@@ -52,15 +53,15 @@ def hotel_list(request):
     city_filter  = request.GET.get('city', '').strip()
     stars_filter = request.GET.get('stars', '').strip()
     if q:
-        qs = qs.filter(Q(name__icontains=q) | Q(area__icontains=q))
+        qs = qs.filter(search.match_q('HOTEL', company, q))
     if area_filter:
         qs = qs.filter(area__icontains=area_filter)
     if city_filter in ('makkah', 'madinah'):
         qs = qs.filter(city=city_filter)
     if stars_filter.isdigit():
         qs = qs.filter(stars=int(stars_filter))
-    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ['name'], 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET)
     hotels = [{
         "id": h.id,
         "name": h.name,
@@ -81,19 +82,7 @@ def hotel_list(request):
         "city_filter": city_filter,
         "stars_filter": stars_filter,
         "area_filter": area_filter,
-        "pagination": {
-            "number": page_obj.number,
-            "num_pages": paginator.num_pages,
-            "has_previous": page_obj.has_previous(),
-            "has_next": page_obj.has_next(),
-            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
-            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
-            "has_other_pages": page_obj.has_other_pages(),
-            "range": _page_range_display(page_obj),
-            "start_index": page_obj.start_index(),
-            "end_index": page_obj.end_index(),
-            "count": paginator.count,
-        },
+        "pagination": _pagination(page_obj),
     })
 
 
@@ -140,6 +129,7 @@ def hotel_delete(request, pk):
 
 
 @require_perm('hotels', 'view')
+@conditional(lambda request, pk: row_version(Hotel.objects.filter(pk=pk, company=get_active_company(request))), page=True)
 def hotel_detail(request, pk):
     h = get_object_or_404(Hotel, pk=pk, company=get_active_company(request))
     return inertia_render(request, "Hotel/Detail", props={
@@ -169,6 +159,7 @@ def hotel_map(request):
 
 
 @require_perm('hotels', 'view')
+@conditional(lambda request: rows_version(Hotel.objects.filter(company=get_active_company(request), is_active=True)))
 def hotel_map_data(request):
     company = get_active_company(request)
     hotels = []
@@ -1,50 +1,57 @@
-﻿import csv
-import json
+﻿import json
 from datetime import date, timedelta
 from django.utils import timezone
 
 from django.contrib import messages
-from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum
-from django.db.models.functions import Coalesce
-from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.db.models.functions import Now
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 
 from inertia import render as inertia_render
 
-from ..models import ActivityLog, Company, ConfirmationLetter, Invoice, Reservation, log_activity
+from ..models import (
+    ActivityLog, ClientScorecard, Company, ConfirmationLetter, Invoice, Payment, PaymentStatus, Reservation, log_activity,
+)
+from ..pagination import KeysetPaginator
 from ..permissions import require_perm
+from ..services import search
 from ..utils import convert_to_sar
+from .conditional import conditional, invoice_version, rows_version
 from .context import _build_reservation_context
 from .helpers import (
     _billing_props,
     _is_mobile,
-    _page_range_display,
+    _pagination,
     _parse_date,
     _render_list_pdf,
+    _stream_csv,
     _save_hotel_payments,
     _to_float,
     get_active_company,
 )
-from .pdf import _logo_file_url, _render_invoice_pdf
+from .pdf import PDF_BUNDLE_MAX_DOCS, _invoice_pdf_source, _logo_file_url, _pdf_bundle_response, _pdf_job_response
 
+# Belum jatuh tempo paling dekat di atas; tanpa due date di paling bawah.
+INVOICE_LIST_ORDER = (F('due_date').asc(nulls_last=True), '-created_at')
+
+STATUS_FILTERS = {
+    'lunas': (PaymentStatus.PAID, PaymentStatus.OVERPAID),
+    'partial': (PaymentStatus.PARTIAL,),
+    'belum': (PaymentStatus.UNPAID,),
+}
 
-@require_perm('invoice', 'view')
-def invoice_list(request):
-    active_company = get_active_company(request)
-    base_qs = Invoice.objects.filter(
-        invoice_type="hotel", company=active_company
-    ).prefetch_related('reservations', 'payments')
 
+def _filter_invoice_qs(qs, request):
+    """Filters shared by the hotel invoice list and its bulk PDF export."""
     q = request.GET.get('q', '').strip()
     status = request.GET.get('status', '')
     due_soon = request.GET.get('due_soon')
     date_from = request.GET.get('date_from', '').strip()
     date_to = request.GET.get('date_to', '').strip()
 
-    qs = base_qs
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
+        qs = qs.filter(search.match_q('INV', get_active_company(request), q))
     if due_soon:
         threshold = date.today() + timedelta(days=7)
         qs = qs.filter(due_date__lte=threshold, due_date__gte=date.today())
@@ -52,27 +59,28 @@ def invoice_list(request):
         qs = qs.filter(due_date__gte=date_from)
     if date_to:
         qs = qs.filter(due_date__lte=date_to)
-    if status in ('lunas', 'belum', 'partial'):
-        qs = qs.annotate(
-            _res=Coalesce(Sum('reservations__total_sar'), 0),
-        )
-        # We'll filter in Python since we need convert_to_sar for multi-currency payments
-        invoices_list = list(qs)
-        filtered_ids = []
-        for inv in invoices_list:
-            paid = inv.total_paid_sar
-            if status == 'lunas' and paid >= inv.total_sar:
-                filtered_ids.append(inv.pk)
-            elif status == 'belum' and paid < 1:
-                filtered_ids.append(inv.pk)
-            elif status == 'partial' and paid >= 1 and paid < inv.total_sar:
-                filtered_ids.append(inv.pk)
-        qs = qs.filter(pk__in=filtered_ids)
-
-    qs = qs.order_by(F('due_date').asc(nulls_last=True), '-created_at')
-
-    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    if status in STATUS_FILTERS:
+        # The stored payment_status the rows display (kept by
+        # Invoice.refresh_balance), so the filter can't disagree with the
+        # badge and stays on hw_invoice_company_status_idx.
+        qs = qs.filter(payment_status__in=STATUS_FILTERS[status])
+    return qs.order_by(*INVOICE_LIST_ORDER)
+
+
+@require_perm('invoice', 'view')
+def invoice_list(request):
+    active_company = get_active_company(request)
+    base_qs = Invoice.objects.filter(invoice_type="hotel", company=active_company)
+
+    q = request.GET.get('q', '').strip()
+    status = request.GET.get('status', '')
+    date_from = request.GET.get('date_from', '').strip()
+    date_to = request.GET.get('date_to', '').strip()
+
+    qs = _filter_invoice_qs(base_qs, request)
+
+    paginator = KeysetPaginator(qs, INVOICE_LIST_ORDER, 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET)
 
     invoices = [{
         "id": inv.id,
@@ -81,14 +89,9 @@ def invoice_list(request):
         "issued_date": inv.issued_date.strftime("%d/%m/%Y") if inv.issued_date else None,
         "due_date": inv.due_date.strftime("%d/%m/%Y") if inv.due_date else None,
         "created_at": inv.created_at.strftime("%d/%m/%Y"),
-        "total_sar": inv.total_sar,
-        "remaining_sar": inv.remaining_sar,
-        "status": (
-            "overpaid" if inv.remaining_sar < 0
-            else "paid" if inv.remaining_sar == 0
-            else "partial" if inv.remaining_sar < inv.total_sar
-            else "unpaid"
-        ),
+        "total_sar": inv.billed_sar,
+        "remaining_sar": inv.balance_sar,
+        "status": inv.payment_status,
     } for inv in page_obj]
 
     props = {
@@ -98,22 +101,11 @@ def invoice_list(request):
         "status_filter": status,
         "date_from": date_from,
         "date_to": date_to,
-        "pagination": {
-            "number": page_obj.number,
-            "num_pages": paginator.num_pages,
-            "has_previous": page_obj.has_previous(),
-            "has_next": page_obj.has_next(),
-            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
-            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
-            "has_other_pages": page_obj.has_other_pages(),
-            "range": _page_range_display(page_obj),
-            "start_index": page_obj.start_index(),
-            "end_index": page_obj.end_index(),
-            "count": paginator.count,
-        },
+        "pagination": _pagination(page_obj),
     }
     if active_company == 'konoz':
-        props["remit_stats"] = _invoice_stats(base_qs, active_company)
+        # Callable: pagination reloads only the list props and skip this.
+        props["remit_stats"] = lambda: _invoice_stats(base_qs, active_company)
 
     return inertia_render(request, "Invoice/List", props=props)
 
@@ -155,7 +147,7 @@ def _invoice_stats(invoice_qs, company):
 
 @require_perm('invoice', 'create')
 def invoice_new(request):
-    suggested_number = Invoice.generate_number("hotel")
+    suggested_number = Invoice.suggest_number("hotel")
     active_company = get_active_company(request)
 
     if request.method == "POST":
@@ -190,7 +182,8 @@ def invoice_new(request):
 
         cl_ids = _parse_cl_ids(request)
         if cl_ids:
-            ConfirmationLetter.objects.filter(pk__in=cl_ids).update(invoice=invoice)
+            ConfirmationLetter.objects.filter(pk__in=cl_ids).update(invoice=invoice, updated_at=Now())
+            ClientScorecard.refresh(ClientScorecard.client_ids_for_invoice(invoice.pk))
 
         log_activity(request.user, ActivityLog.ACTION_CREATE, 'Invoice Hotel', invoice.invoice_number, invoice.company)
         messages.success(request, f"Invoice {invoice.invoice_number} created successfully.")
@@ -204,7 +197,13 @@ def invoice_new(request):
     })
 
 
+def _invoice_version(request, pk):
+    invoice = Invoice.objects.filter(pk=pk, invoice_type='hotel', company=get_active_company(request))
+    return invoice_version(invoice, Reservation.objects.filter(invoice__in=invoice))
+
+
 @require_perm('invoice', 'view')
+@conditional(_invoice_version, page=True)
 def invoice_detail(request, pk):
     filters = {'pk': pk, 'invoice_type': 'hotel', 'company': get_active_company(request)}
     invoice = get_object_or_404(Invoice, **filters)
@@ -301,13 +300,15 @@ def invoice_edit(request, pk):
         invoice.save()
 
         invoice.reservations.all().delete()
-        invoice.payments.all().delete()
         _save_reservations(invoice, request)
-        _save_hotel_payments(invoice, request)
+        _save_hotel_payments(invoice, request, replace=True)
         cl_ids = _parse_cl_ids(request)
-        ConfirmationLetter.objects.filter(invoice=invoice).update(invoice=None)
+        # CL links move via .update(), which skips the scorecard signals.
+        relinked_clients = ClientScorecard.client_ids_for_invoice(invoice.pk)
+        ConfirmationLetter.objects.filter(invoice=invoice).update(invoice=None, updated_at=Now())
         if cl_ids:
-            ConfirmationLetter.objects.filter(pk__in=cl_ids).update(invoice=invoice)
+            ConfirmationLetter.objects.filter(pk__in=cl_ids).update(invoice=invoice, updated_at=Now())
+        ClientScorecard.refresh(relinked_clients | ClientScorecard.client_ids_for_invoice(invoice.pk))
         _after = {
             'Customer Name':    invoice.customer_name,
             'Invoice No.':      invoice.invoice_number,
@@ -346,7 +347,7 @@ def invoice_delete(request, pk):
 def invoice_pdf(request, pk):
     filters = {'pk': pk, 'invoice_type': 'hotel', 'company': get_active_company(request)}
     invoice = get_object_or_404(Invoice, **filters)
-    return _render_invoice_pdf(invoice)
+    return _pdf_job_response(request, *_invoice_pdf_source(invoice))
 
 
 @require_perm('invoice', 'export')
@@ -357,15 +358,15 @@ def invoice_list_pdf(request):
     date_from = request.GET.get('date_from', '').strip()
     date_to = request.GET.get('date_to', '').strip()
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
+        qs = qs.filter(search.match_q('INV', get_active_company(request), q))
     if date_from:
         qs = qs.filter(due_date__gte=date_from)
     if date_to:
         qs = qs.filter(due_date__lte=date_to)
-    qs = qs.order_by(F('due_date').asc(nulls_last=True), '-created_at')
-    inv_list = list(qs)
-    total_sar = sum(i.total_sar for i in inv_list)
-    total_remaining = sum(i.remaining_sar for i in inv_list)
+    qs = qs.order_by(*INVOICE_LIST_ORDER)
+    inv_list = list(qs.prefetch_related('reservations'))
+    total_sar = sum(i.billed_sar for i in inv_list)
+    total_remaining = sum(i.balance_sar for i in inv_list)
     return _render_list_pdf(
         request, qs,
         template="hw/invoice/invoice_list_pdf.html",
@@ -382,29 +383,51 @@ def invoice_list_pdf(request):
 
 
 @require_perm('invoice', 'export')
-def invoice_export_csv(request):
+def invoice_export_zip(request):
+    """Every hotel invoice matching the list filters as individual PDFs in one zip."""
+    base_qs = Invoice.objects.filter(invoice_type="hotel", company=get_active_company(request))
+    ids = _filter_invoice_qs(base_qs, request).values_list('pk', flat=True)[:PDF_BUNDLE_MAX_DOCS + 1]
+    back = f"{reverse('invoice_list')}?{request.GET.urlencode()}"
+    return _pdf_bundle_response(request, 'invoice', ids, 'invoices_hotel.zip', back)
+
+
+def _invoice_export_qs(request):
     qs = Invoice.objects.filter(invoice_type="hotel", company=get_active_company(request))
     q = request.GET.get('q', '').strip()
     date_from = request.GET.get('date_from', '').strip()
     date_to = request.GET.get('date_to', '').strip()
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
+        qs = qs.filter(search.match_q('INV', get_active_company(request), q))
     if date_from:
         qs = qs.filter(due_date__gte=date_from)
     if date_to:
         qs = qs.filter(due_date__lte=date_to)
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="invoices_hotel.csv"'
-    response.write('﻿')
-    writer = csv.writer(response)
-    writer.writerow(['Invoice #', 'Company', 'Customer', 'Issued Date', 'Due Date', 'Total SAR', 'Paid SAR', 'Sisa SAR'])
-    for inv in qs:
-        writer.writerow([
+    return qs
+
+
+def _invoice_export_version(request):
+    # The balance columns move with Payment/Reservation writes, not updated_at.
+    qs = _invoice_export_qs(request)
+    return rows_version(qs, Payment.objects.filter(invoice__in=qs), Reservation.objects.filter(invoice__in=qs))
+
+
+@require_perm('invoice', 'export')
+@conditional(_invoice_export_version)
+def invoice_export_csv(request):
+    qs = _invoice_export_qs(request)
+    rows = (
+        [
             inv.invoice_number, inv.company, inv.customer_name,
             inv.issued_date or '', inv.due_date or '',
-            inv.total_sar, inv.total_sar - inv.remaining_sar, inv.remaining_sar,
-        ])
-    return response
+            inv.billed_sar, inv.paid_sar, inv.balance_sar,
+        ]
+        for inv in qs.iterator(chunk_size=2000)
+    )
+    return _stream_csv(
+        request, 'invoices_hotel.csv',
+        ['Invoice #', 'Company', 'Customer', 'Issued Date', 'Due Date', 'Total SAR', 'Paid SAR', 'Sisa SAR'],
+        rows,
+    )
 
 
 @require_perm('invoice', 'create')
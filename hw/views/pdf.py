@@ -1,14 +1,21 @@
-﻿import base64
+﻿import hashlib
 import math
-from datetime import datetime
-from pathlib import Path
+import uuid
+from datetime import datetime, timedelta
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.contrib import messages
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import redirect
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.translation import override as translation_override
+from django_q.tasks import async_task
 from weasyprint import HTML
 
+from ..models import PdfJob
+from ..services import pdf_assets, pdf_bundle, pdf_store
 from ..utils import format_currency
 from .context import (
     _build_reservation_context,
@@ -18,23 +25,159 @@ from .context import (
 
 
 def _logo_file_url(company):
-    filename = "ijabahlogo.png" if company == "ijabah" else "LOGOKONOZ-02.png"
-    mime = "image/png"
-    path = Path(__file__).resolve().parent.parent / "static" / "hw" / "img" / filename
-    with open(path, "rb") as f:
-        data = base64.b64encode(f.read()).decode()
-    return f"data:{mime};base64,{data}"
+    return pdf_assets.logo_data_uri(company)
+
+
+# Batas waktu render di worker; Q_CLUSTER['retry'] harus lebih besar.
+PDF_JOB_TIMEOUT = 120
+PDF_BUNDLE_TIMEOUT = 600
+# Satu zip bulk export paling banyak sekian dokumen.
+PDF_BUNDLE_MAX_DOCS = 300
+# Job pending/running yang lebih tua dari ini dianggap hilang (worker mati,
+# task terbuang) dan boleh diantrikan ulang.
+PDF_JOB_STALE_AFTER = timedelta(seconds=PDF_JOB_TIMEOUT * 2)
+
+
+def _write_pdf(html):
+    html, stylesheets = pdf_assets.split_stylesheets(html)
+    return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(
+        stylesheets=stylesheets,
+        font_config=pdf_assets.font_config(),
+        cache=pdf_assets.image_cache(),
+    )
+
+
+def _pdf_response(pdf, filename):
+    response = HttpResponse(pdf, content_type="application/pdf")
+    response["Content-Disposition"] = f'inline; filename="{filename}"'
+    return response
+
+
+def _pdf_file_response(path, filename):
+    response = FileResponse(open(path, "rb"), content_type="application/pdf", filename=filename)
+    # Nama file di store adalah hash isinya, jadi langsung jadi ETag yang kuat
+    # (dipakai CompressionMiddleware untuk cache body terkompresi).
+    response["ETag"] = f'"{path.stem}"'
+    return response
+
+
+def _artifact_response(path, filename):
+    if path.suffix == pdf_store.ZIP_SUFFIX:
+        return FileResponse(open(path, "rb"), content_type="application/zip",
+                            as_attachment=True, filename=filename)
+    return _pdf_file_response(path, filename)
+
+
+def _render_html(template, context, language=None):
+    if language is None:
+        return render_to_string(template, context)
+    with translation_override(language):
+        return render_to_string(template, context)
+
+
+def _pdf_key(template, context, language=None):
+    """Store key for a document, plus its HTML when that had to be rendered
+    to get the key (contexts that aren't plain data, see context_key)."""
+    key = pdf_store.context_key(template, context, language)
+    if key is not None:
+        return key, None
+    html = _render_html(template, context, language)
+    return pdf_store.content_key(html), html
+
+
+def _pdf_bytes(template, context, language=None):
+    """Lay out a PDF in-process, going through the artifact store. For callers
+    that need the bytes themselves (the WhatsApp billing task)."""
+    key, html = _pdf_key(template, context, language)
+    pdf = pdf_store.get(key)
+    pdf_store.record(hit=pdf is not None)
+    if pdf is None:
+        pdf = _write_pdf(html or _render_html(template, context, language))
+        pdf_store.put(key, pdf)
+    return pdf
+
+
+def _enqueue_pdf_job(key, filename, stage, task="hw.tasks.render_pdf_task", timeout=PDF_JOB_TIMEOUT):
+    """Queue `task` for `key` unless a live job already has it. `stage()`
+    writes the worker's input (HTML source, bundle manifest) first."""
+    now = timezone.now()
+    job, created = PdfJob.objects.get_or_create(
+        key=key, defaults={"filename": filename, "requested_at": now},
+    )
+    in_flight = job.status in (PdfJob.STATUS_PENDING, PdfJob.STATUS_RUNNING) \
+        and job.requested_at > now - PDF_JOB_STALE_AFTER
+    if in_flight and not created:
+        return
+    # Selain job baru: job gagal, job basi, atau job selesai yang artifaknya
+    # sudah kena TTL — semuanya dirender ulang dari source yang sama.
+    stage()
+    PdfJob.objects.filter(pk=job.pk).update(
+        status=PdfJob.STATUS_PENDING, error="", filename=filename,
+        requested_at=now, finished_at=None,
+    )
+    async_task(task, key, timeout=timeout)
+
+
+def _pdf_job_response(request, template, context, filename, language=None):
+    """Serve a PDF without laying it out in the web worker.
+
+    The render context is digested here. A browser that already holds the
+    PDF for that digest (If-None-Match) gets a 304; an artifact with that
+    key is served straight from the store. Otherwise the HTML (cheap) is rendered and the
+    WeasyPrint layout is queued on the qcluster, and the browser is sent to
+    /pdf/jobs/<key>/, which polls until the file is ready. With a sync
+    cluster (tests, DEBUG) the task has already run by the time async_task
+    returns, so the PDF is served directly.
+    """
+    key, html = _pdf_key(template, context, language)
+    # Key yang sama = isi PDF yang sama; browser yang sudah punya ETag-nya
+    # cukup dijawab 304 tanpa membuka file atau antre render.
+    not_modified = get_conditional_response(request, etag=f'"{key}"')
+    if not_modified is not None:
+        return not_modified
+    path = pdf_store.artifact_path(key)
+    pdf_store.record(hit=path is not None)
+    if path is None:
+        _enqueue_pdf_job(key, filename, lambda: pdf_store.put_source(
+            key, html or _render_html(template, context, language),
+        ))
+        path = pdf_store.artifact_path(key)
+        if path is None:
+            return redirect("pdf_job", key=key)
+    return _pdf_file_response(path, filename)
+
+
+def _pdf_bundle_response(request, kind, ids, filename, back):
+    """Queue a zip of the CL/invoice PDFs for `ids` (see hw/services/pdf_bundle.py)
+    and send the browser to its job page. `back` is where to return on error."""
+    ids = list(ids)
+    if not ids:
+        messages.error(request, "Nothing matches the current filters.")
+        return redirect(back)
+    if len(ids) > PDF_BUNDLE_MAX_DOCS:
+        messages.error(request, f"More than {PDF_BUNDLE_MAX_DOCS} documents match; narrow the filters.")
+        return redirect(back)
+    spec = pdf_bundle.manifest(kind, ids)
+    # Satu job per klik: isi bundle baru diketahui di worker, jadi key-nya
+    # tidak bisa content-addressed. PDF anggotanya tetap di-cache per dokumen.
+    key = hashlib.sha256(f"{spec}|{uuid.uuid4().hex}".encode()).hexdigest()
+    _enqueue_pdf_job(
+        key, filename,
+        lambda: pdf_store.put_source(key, spec, pdf_store.MANIFEST_SUFFIX),
+        task="hw.tasks.render_pdf_bundle_task", timeout=PDF_BUNDLE_TIMEOUT,
+    )
+    path = pdf_store.artifact_path(key, pdf_store.ZIP_SUFFIX)
+    if path is None:
+        return redirect("pdf_job", key=key)
+    return _artifact_response(path, filename)
 
 
 def _render_cl_pdf(cl):
-    from django.core.cache import cache
-    cache_key = f"pdf:cl:{cl.pk}:{cl.updated_at.isoformat()}"
-    cached_pdf = cache.get(cache_key)
-    if cached_pdf is not None:
-        response = HttpResponse(cached_pdf, content_type="application/pdf")
-        response["Content-Disposition"] = f'inline; filename="{cl.confirmation_number}.pdf"'
-        return response
+    template, context, filename = _cl_pdf_source(cl)
+    return _pdf_response(_pdf_bytes(template, context), filename)
+
 
+def _cl_pdf_source(cl):
     nights = cl.num_nights
     nights_factor = nights if nights > 0 else 1
 
@@ -67,24 +210,15 @@ def _render_cl_pdf(cl):
     }
 
     template = "hw/cl/cl_pdf_ijabah.html" if cl.company == "ijabah" else "hw/cl/cl_pdf_konoz.html"
-    html = render_to_string(template, context)
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    cache.set(cache_key, pdf, 3600)
-    filename = f"{cl.confirmation_number}.pdf"
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return template, context, f"{cl.confirmation_number}.pdf"
 
 
 def _render_invoice_pdf(invoice):
-    from django.core.cache import cache
-    cache_key = f"pdf:invoice:{invoice.pk}:{invoice.updated_at.isoformat()}"
-    cached_pdf = cache.get(cache_key)
-    if cached_pdf is not None:
-        response = HttpResponse(cached_pdf, content_type="application/pdf")
-        response["Content-Disposition"] = f'inline; filename="{invoice.invoice_number}.pdf"'
-        return response
+    template, context, filename = _invoice_pdf_source(invoice)
+    return _pdf_response(_pdf_bytes(template, context), filename)
+
 
+def _invoice_pdf_source(invoice):
     reservations = _build_reservation_context(invoice)
     payments = invoice.payments.all()
 
@@ -133,16 +267,15 @@ def _render_invoice_pdf(invoice):
     }
 
     template = "hw/invoice/invoice_pdf_ijabah_v2.html" if invoice.company == "ijabah" else "hw/invoice/invoice_pdf_v2.html"
-    html = render_to_string(template, context)
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    cache.set(cache_key, pdf, 3600)
-    filename = f"{invoice.invoice_number}.pdf"
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return template, context, f"{invoice.invoice_number}.pdf"
 
 
 def _render_services_pdf(invoice):
+    template, context, filename = _services_pdf_source(invoice)
+    return _pdf_response(_pdf_bytes(template, context), filename)
+
+
+def _services_pdf_source(invoice):
     visa_services = _build_visa_services_context(invoice)
     payments_history = _build_visa_payments_context(invoice)
     main_currency = invoice.currency
@@ -169,12 +302,7 @@ def _render_services_pdf(invoice):
         "logo_rel_path": _logo_file_url(invoice.company),
     }
 
-    html = render_to_string("hw/services/invoice_pdf_visa.html", context)
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    filename = f"VISA_{invoice.invoice_number}.pdf"
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+    return "hw/services/invoice_pdf_visa.html", context, f"VISA_{invoice.invoice_number}.pdf"
 
 
 _DAYS_EN = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -232,6 +360,12 @@ def _build_checkin_groups(qs):
 
 def _render_checkin_pdf(cls, title, company='konoz', filename='checkin-rekap.pdf',
                         date_start=None, date_end=None):
+    template, context = _checkin_pdf_source(cls, title, company, date_start, date_end)
+    return _pdf_response(_pdf_bytes(template, context, language='en'), filename)
+
+
+def _checkin_pdf_source(cls, title, company='konoz', date_start=None, date_end=None):
+    """Template + context for the check-in recap; render it with language='en'."""
     groups = _build_checkin_groups(cls)
     hotel_names = {hotel['name'] for group in groups for hotel in group['hotels']}
     context = {
@@ -241,11 +375,8 @@ def _render_checkin_pdf(cls, title, company='konoz', filename='checkin-rekap.pdf
         'total_guests': sum(g['total'] for g in groups),
         'total_hotels': len(hotel_names),
         'logo_rel_path': _logo_file_url(company),
-        'now': datetime.now(),
+        # Template hanya menampilkan sampai menit; detik dibuang supaya rekap
+        # yang sama dalam menit yang sama memakai PDF yang sudah ada.
+        'now': datetime.now().replace(second=0, microsecond=0),
     }
-    with translation_override('en'):
-        html = render_to_string('hw/calendar/checkin_recap_pdf.html', context)
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    return response
+    return 'hw/calendar/checkin_recap_pdf.html', context
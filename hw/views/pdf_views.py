@@ -0,0 +1,34 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response
+
+from ..models import PdfJob
+from ..services import pdf_store
+from .pdf import _artifact_response
+
+
+@login_required
+def pdf_job(request, key):
+    """Landing page for a queued PDF render or bulk zip (see _pdf_job_response
+    and _pdf_bundle_response).
+
+    Serves the file once the worker has stored it; until then answers 202
+    with a page that refreshes itself, so a plain browser tab just waits.
+    Keys are sha256 digests (of a document's render inputs, or salted with a
+    random token for bundles), so they can't be guessed.
+    """
+    job = get_object_or_404(PdfJob, key=key)
+    not_modified = get_conditional_response(request, etag=f'"{key}"')
+    if not_modified is not None:
+        return not_modified
+    suffix = pdf_store.ZIP_SUFFIX if job.filename.endswith(pdf_store.ZIP_SUFFIX) else pdf_store.PDF_SUFFIX
+    path = pdf_store.artifact_path(key, suffix)
+    if path is not None:
+        return _artifact_response(path, job.filename)
+    if job.status == PdfJob.STATUS_FAILED:
+        status = 500
+    elif job.status == PdfJob.STATUS_DONE:
+        status = 410  # artifak sudah lewat TTL; buka lagi dari halaman asalnya
+    else:
+        status = 202
+    return render(request, 'hw/pdf/job_status.html', {'job': job}, status=status)
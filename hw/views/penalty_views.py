@@ -1,16 +1,14 @@
 from datetime import date, datetime
 
 from django.contrib import messages
-from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.template.loader import render_to_string
 
 from inertia import render as inertia_render
 
 from ..models import CancellationPenalty, ConfirmationLetter
 from ..permissions import require_perm
 from .helpers import _parse_date, _to_float, get_active_company
-from .pdf import _logo_file_url
+from .pdf import _logo_file_url, _pdf_job_response
 
 
 def _get_cl(request, cl_pk):
@@ -50,12 +48,12 @@ def penalty_new(request, cl_pk):
     if hasattr(cl, 'penalty'):
         return redirect('penalty_detail', pk=cl.penalty.pk)
 
-    suggested_number = CancellationPenalty.generate_number()
+    suggested_number = CancellationPenalty.suggest_number()
 
     if request.method == 'POST':
         penalty = CancellationPenalty.objects.create(
             cl=cl,
-            penalty_number=request.POST.get('penalty_number', suggested_number),
+            penalty_number=request.POST.get('penalty_number') or CancellationPenalty.generate_number(),
             cancellation_date=_parse_date(request.POST.get('cancellation_date')),
             reason=request.POST.get('reason', ''),
             penalty_amount=_to_float(request.POST.get('penalty_amount')),
@@ -151,11 +149,4 @@ def penalty_pdf(request, pk):
         'logo_rel_path': _logo_file_url(cl.company),
         'now': datetime.now(),
     }
-    html = render_to_string('hw/penalty/penalty_pdf.html', ctx)
-
-    from django.conf import settings
-    from weasyprint import HTML
-    pdf = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="penalty-{penalty.penalty_number}.pdf"'
-    return response
+    return _pdf_job_response(request, 'hw/penalty/penalty_pdf.html', ctx, f"penalty-{penalty.penalty_number}.pdf")
@@ -1,22 +1,25 @@
-import csv
 import json
 
-from collections import defaultdict
-from datetime import date
+from datetime import date, timedelta
 
-from django.db.models import Min, Q, Sum
-from django.http import HttpResponse
+from django.core.paginator import Paginator
+from django.db.models import Count, Min, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce, Now
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.views.decorators.http import require_POST
 
 from inertia import render as inertia_render
 
-from ..models import Invoice, Payment, Remittance, RemittanceLine
+from ..models import Invoice, Payment, Remittance, RemittanceLedgerEntry, RemittanceLine, Reservation
 from ..permissions import require_perm
-from ..utils import convert_to_sar
+from .conditional import conditional, row_version, rows_version
+from .helpers import _is_mobile, _page_range_display, _stream_csv
 
-SURABAYA_METHODS = {'cash', 'bank transfer', 'deposit'}
 KONOZ = 'konoz'
+# Form / edit remittance tanpa ?from= / ?to= hanya memuat check-in sejak
+# sekian hari lalu (plus yang belum bertanggal); sisanya lewat filter rentang.
+FORM_WINDOW_DAYS = 90
 
 
 def _prev_sent_map(rem, linked_numbers):
@@ -63,29 +66,21 @@ def _sort_lines_by_payment_date(lines):
 
 
 def _compute_stats():
-    """Hitung 5 stats remittance global untuk company Konoz."""
-    from django.db.models import Sum as _Sum
+    """Hitung stats remittance global untuk company Konoz.
 
+    Dibaca dari kolom yang sudah tersimpan (Invoice.billed_sar dan
+    RemittanceLedgerEntry), jadi dua agregat saja berapa pun riwayatnya.
+    """
     total_tagihan = int(Invoice.objects.filter(company=KONOZ).aggregate(
-        t=_Sum('reservations__total_sar')
+        t=Sum('billed_sar')
     )['t'] or 0)
 
-    payments = Payment.objects.filter(
-        invoice__company=KONOZ,
-    ).values('method', 'amount', 'currency', 'exchange_rate')
-
-    terbayar_surabaya = 0
-    terbayar_pusat = 0
-    for p in payments:
-        sar = int(round(convert_to_sar(float(p['amount']), p['currency'], float(p['exchange_rate']))))
-        if (p['method'] or '').lower() == 'direct':
-            terbayar_pusat += sar
-        elif (p['method'] or '').lower() in SURABAYA_METHODS:
-            terbayar_surabaya += sar
-
-    sudah_dikirim = int(RemittanceLine.objects.filter(
-        remittance__company=KONOZ
-    ).aggregate(total=_Sum('amount_sar'))['total'] or 0)
+    ledger = RemittanceLedgerEntry.objects.aggregate(
+        sby=Sum('paid_sby'), direct=Sum('direct'), remitted=Sum('remitted'),
+    )
+    terbayar_surabaya = ledger['sby'] or 0
+    terbayar_pusat = ledger['direct'] or 0
+    sudah_dikirim = ledger['remitted'] or 0
 
     mengendap = max(0, terbayar_surabaya - sudah_dikirim)
     terkirim_ke_pusat = sudah_dikirim + terbayar_pusat
@@ -97,101 +92,50 @@ def _compute_stats():
     }
 
 
-def _build_reservasi_mengendap():
-    """Semua reservasi Konoz, termasuk yang belum ada pembayaran sama sekali.
+def _mengendap_row(entry):
+    res = entry.reservation
+    inv = entry.invoice
+    return {
+        'linked_number': entry.linked_number,
+        'invoice_id': entry.invoice_id,
+        'invoice_number': inv.invoice_number if inv else '',
+        'customer_name': inv.customer_name if inv else '',
+        # Tanggal buku besar (reservasi, atau CL kalau reservasi tidak
+        # bertanggal): sama dengan yang dipakai filter dan urutan.
+        'check_in': entry.check_in,
+        'check_out': entry.check_out,
+        'total_sar': res.total_sar if res else 0,
+        'terbayar_sby': entry.paid_sby,
+        'terbayar_direct': entry.direct,
+        'terbayar_total': entry.paid_sby + entry.direct,
+        'sudah_dikirim': entry.remitted + entry.direct,
+        'mengendap': entry.mengendap,
+    }
 
-    Reservasi Cancelled disembunyikan kecuali uangnya terlanjur bergerak
-    (sudah dibayar client dan/atau sudah dikirim), sama seperti aturan di
-    `_build_ledger_rows`.
-    """
-    from ..models import ConfirmationLetter, Reservation
-
-    # Semua payments untuk Konoz
-    all_payments = Payment.objects.filter(
-        invoice__company=KONOZ,
-    ).select_related('invoice').values(
-        'linked_number', 'method', 'amount', 'currency', 'exchange_rate',
-        'invoice_id', 'invoice__invoice_number', 'invoice__customer_name',
-    )
 
-    # Pool semua linked_number dengan info invoice
-    pool = defaultdict(lambda: {
-        'sar_sby': 0, 'sar_direct': 0,
-        'invoice_id': None, 'invoice_number': '', 'customer_name': '',
-    })
-    for p in all_payments:
-        key = p['linked_number']
-        sar = int(round(convert_to_sar(float(p['amount']), p['currency'], float(p['exchange_rate']))))
-        m = (p['method'] or '').lower()
-        if m == 'direct':
-            pool[key]['sar_direct'] += sar
-        elif m in ('cash', 'bank transfer', 'deposit'):
-            pool[key]['sar_sby'] += sar
-        pool[key]['invoice_id'] = p['invoice_id']
-        pool[key]['invoice_number'] = p['invoice__invoice_number']
-        pool[key]['customer_name'] = p['invoice__customer_name']
-
-    # Semua reservasi Konoz ikut, bukan hanya yang sudah ada uangnya
-    res_data = Reservation.objects.filter(invoice__company=KONOZ).values(
-        'reservation_number', 'check_in', 'check_out', 'total_sar',
-        'invoice_id', 'invoice__invoice_number', 'invoice__customer_name',
-    )
-    res_details = {}
-    for r in res_data:
-        key = r['reservation_number']
-        res_details[key] = r
-        entry = pool[key]  # daftarkan reservasi tanpa payment supaya tetap muncul
-        if not entry['invoice_id']:
-            entry['invoice_id'] = r['invoice_id']
-            entry['invoice_number'] = r['invoice__invoice_number']
-            entry['customer_name'] = r['invoice__customer_name']
-
-    cancelled_numbers = set(
-        ConfirmationLetter.objects.filter(
-            company=KONOZ, reservation_status__iexact='CANCELLED',
-        ).values_list('confirmation_number', flat=True)
+def _mengendap_queryset(date_from=None, date_to=None):
+    return (
+        RemittanceLedgerEntry.objects.in_pool().visible()
+        .check_in_between(date_from, date_to)
+        .select_related('reservation', 'invoice')
+        .by_check_in()
     )
 
-    # Sudah dikirim via RemittanceLine
-    lines = RemittanceLine.objects.filter(
-        remittance__company=KONOZ
-    ).values('linked_number').annotate(total=Sum('amount_sar'))
-    remit_by_res = {l['linked_number']: int(l['total'] or 0) for l in lines}
-
-    result = []
-    for linked_number, data in sorted(pool.items(), key=lambda x: (res_details.get(x[0], {}).get('check_in') or date.max)):
-        terbayar_sby = data['sar_sby']
-        terbayar_direct = data['sar_direct']
-        remit_amount = remit_by_res.get(linked_number, 0)
-        if (
-            linked_number in cancelled_numbers
-            and not terbayar_sby and not terbayar_direct and not remit_amount
-        ):
-            continue
-        sudah_dikirim = remit_amount + terbayar_direct
-        mengendap = max(0, terbayar_sby - remit_amount)
-        rd = res_details.get(linked_number, {})
-        result.append({
-            'linked_number': linked_number,
-            'invoice_id': data['invoice_id'],
-            'invoice_number': data['invoice_number'],
-            'customer_name': data['customer_name'],
-            'check_in': rd.get('check_in'),
-            'check_out': rd.get('check_out'),
-            'total_sar': rd.get('total_sar', 0),
-            'terbayar_sby': terbayar_sby,
-            'terbayar_direct': terbayar_direct,
-            'terbayar_total': terbayar_sby + terbayar_direct,
-            'sudah_dikirim': sudah_dikirim,
-            'mengendap': mengendap,
-        })
 
-    return result
+def _build_reservasi_mengendap(date_from=None, date_to=None):
+    """Semua reservasi Konoz, termasuk yang belum ada pembayaran sama sekali.
+
+    Reservasi Cancelled disembunyikan kecuali uangnya terlanjur bergerak
+    (sudah dibayar client dan/atau sudah dikirim), sama seperti aturan di
+    `_build_ledger_rows`. Dibaca dari RemittanceLedgerEntry; `date_from` /
+    `date_to` membatasi rentang check-in.
+    """
+    return [_mengendap_row(e) for e in _mengendap_queryset(date_from, date_to)]
 
 
-def _serialize_reservasi():
+def _serialize_reservasi(date_from=None, date_to=None):
     """Reservasi mengendap dengan tanggal yang sudah diformat untuk props Inertia."""
-    rows = _build_reservasi_mengendap()
+    rows = _build_reservasi_mengendap(date_from, date_to)
     for r in rows:
         ci = r.get('check_in')
         co = r.get('check_out')
@@ -200,6 +144,37 @@ def _serialize_reservasi():
     return rows
 
 
+def _check_in_range(request):
+    """(from, to) check-in dari query string. Tanpa keduanya: FORM_WINDOW_DAYS
+    terakhir; parameter kosong (?from=&to=) berarti semua tanggal."""
+    from .helpers import _parse_date
+    if 'from' not in request.GET and 'to' not in request.GET:
+        return date.today() - timedelta(days=FORM_WINDOW_DAYS), None
+    return _parse_date(request.GET.get('from', '')), _parse_date(request.GET.get('to', ''))
+
+
+def _outside_range(date_from, date_to, rem=None):
+    """Reservasi dengan uang mengendap yang tersaring keluar oleh rentang,
+    supaya form bisa menawarkan "tampilkan semua" alih-alih diam-diam
+    menyembunyikannya."""
+    pool = RemittanceLedgerEntry.objects.in_pool().visible().filter(mengendap__gt=0)
+    if rem is not None:
+        pool = pool.exclude(linked_number__in=rem.lines.values('linked_number'))
+    if not (date_from or date_to):
+        return {'count': 0, 'mengendap': 0}
+    inside = pool.check_in_between(date_from, date_to).values('pk')
+    row = pool.exclude(pk__in=inside).aggregate(count=Count('pk'), mengendap=Coalesce(Sum('mengendap'), 0))
+    return {'count': row['count'], 'mengendap': row['mengendap']}
+
+
+def _range_props(date_from, date_to, rem=None):
+    return {
+        'date_from': date_from.isoformat() if date_from else '',
+        'date_to': date_to.isoformat() if date_to else '',
+        'outside_range': _outside_range(date_from, date_to, rem),
+    }
+
+
 @require_perm('remittance', 'view')
 def remittance_list(request):
     from django.db.models import Q
@@ -214,7 +189,8 @@ def remittance_list(request):
             Q(receipt_reference__icontains=q) |
             Q(note__icontains=q)
         )
-    stats = _compute_stats()
+    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET.get('page'))
     remittances = [{
         "id": rem.id,
         "remittance_number": rem.remittance_number,
@@ -222,13 +198,27 @@ def remittance_list(request):
         "total_sar": rem.total_sar,
         "status": rem.status,
         "proof_url": rem.proof.url if rem.proof else None,
-    } for rem in qs]
+    } for rem in page_obj]
     return inertia_render(request, "Remittance/List", props={
         "remittances": remittances,
-        "stats": stats,
+        # Callables: pagination reloads only the list props and skip these.
+        "stats": _compute_stats,
         "status_filter": status_filter,
         "q": q,
-        "total_count": Remittance.objects.filter(company=KONOZ).count(),
+        "total_count": lambda: Remittance.objects.filter(company=KONOZ).count(),
+        "pagination": {
+            "number": page_obj.number,
+            "num_pages": paginator.num_pages,
+            "has_previous": page_obj.has_previous(),
+            "has_next": page_obj.has_next(),
+            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
+            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
+            "has_other_pages": page_obj.has_other_pages(),
+            "range": _page_range_display(page_obj),
+            "start_index": page_obj.start_index(),
+            "end_index": page_obj.end_index(),
+            "count": paginator.count,
+        },
     })
 
 
@@ -259,10 +249,12 @@ def remittance_new(request):
                 })
 
         if not lines_data:
+            date_from, date_to = _check_in_range(request)
             return inertia_render(request, "Remittance/Form", props={
-                'reservasi': _serialize_reservasi(),
+                'reservasi': _serialize_reservasi(date_from, date_to),
                 'error': 'Enter at least one amount to send.',
                 'today': str(date.today()),
+                **_range_props(date_from, date_to),
             })
 
         rem = Remittance.objects.create(
@@ -286,15 +278,47 @@ def remittance_new(request):
 
         return redirect('remittance_detail', pk=rem.pk)
 
+    date_from, date_to = _check_in_range(request)
     return inertia_render(request, "Remittance/Form", props={
-        'reservasi': _serialize_reservasi(),
+        'reservasi': _serialize_reservasi(date_from, date_to),
         'today': str(date.today()),
+        **_range_props(date_from, date_to),
     })
 
 
 @require_perm('remittance', 'view')
+def remittance_reservasi(request):
+    """Baris reservasi form remittance (atau, dengan ?rem=<pk>, baris yang
+    bisa ditambahkan ke remittance itu) untuk rentang check-in lain. JSON,
+    karena form juga dibuka sebagai modal tanpa kunjungan Inertia."""
+    date_from, date_to = _check_in_range(request)
+    rem_pk = request.GET.get('rem')
+    if rem_pk:
+        rem = get_object_or_404(Remittance, pk=rem_pk, company=KONOZ)
+        rows = _addable_reservasi(rem, date_from, date_to)
+    else:
+        rem, rows = None, _serialize_reservasi(date_from, date_to)
+    return JsonResponse({'reservasi': rows, **_range_props(date_from, date_to, rem)})
+
+
+def _remittance_version(request, pk):
+    rem = Remittance.objects.filter(pk=pk, company=KONOZ)
+    numbers = RemittanceLine.objects.filter(remittance__in=rem).values('linked_number')
+    # Lines of other remittances for the same reservations feed prev_sent;
+    # payments order the lines (_sort_lines_by_payment_date).
+    return row_version(
+        rem,
+        RemittanceLine.objects.filter(linked_number__in=numbers),
+        Payment.objects.filter(linked_number__in=numbers),
+        Remittance.objects.filter(lines__linked_number__in=numbers),
+        Reservation.objects.filter(reservation_number__in=numbers),
+        Invoice.objects.filter(remittance_lines__remittance__in=rem),
+    )
+
+
+@require_perm('remittance', 'view')
+@conditional(_remittance_version, page=True)
 def remittance_detail(request, pk):
-    from ..models import Reservation
     rem = get_object_or_404(Remittance, pk=pk, company=KONOZ)
     lines = _sort_lines_by_payment_date(list(rem.lines.select_related('invoice')))
 
@@ -341,28 +365,44 @@ def remittance_detail(request, pk):
     })
 
 
+def _remittance_export_version(request):
+    return rows_version(
+        Remittance.objects.filter(company=KONOZ),
+        RemittanceLine.objects.filter(remittance__company=KONOZ),
+        Invoice.objects.filter(remittance_lines__remittance__company=KONOZ),
+    )
+
+
 @require_perm('remittance', 'export')
+@conditional(_remittance_export_version)
 def remittance_export_csv(request):
-    remittances = Remittance.objects.filter(company=KONOZ).prefetch_related('lines__invoice')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="remittance.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Tanggal', 'Total SAR', 'Note', 'Res#', 'Invoice', 'Amount SAR'])
-    for rem in remittances:
-        lines = list(rem.lines.all())
-        if lines:
+    # total per remittance dihitung SQL sekali jalan, bukan rem.total_sar per baris
+    remittances = (
+        Remittance.objects.filter(company=KONOZ)
+        .annotate(lines_total=Coalesce(Sum('lines__amount_sar'), 0))
+        .prefetch_related(Prefetch('lines', queryset=RemittanceLine.objects.select_related('invoice')))
+    )
+
+    def rows():
+        for rem in remittances.iterator(chunk_size=500):
+            lines = rem.lines.all()
+            if not lines:
+                yield [rem.date.strftime('%d/%m/%Y'), rem.lines_total, rem.note, '', '', '']
             for i, line in enumerate(lines):
-                writer.writerow([
+                yield [
                     rem.date.strftime('%d/%m/%Y') if i == 0 else '',
-                    rem.total_sar if i == 0 else '',
+                    rem.lines_total if i == 0 else '',
                     rem.note if i == 0 else '',
                     line.linked_number,
                     line.invoice.invoice_number if line.invoice else '',
                     line.amount_sar,
-                ])
-        else:
-            writer.writerow([rem.date.strftime('%d/%m/%Y'), rem.total_sar, rem.note, '', '', ''])
-    return response
+                ]
+
+    return _stream_csv(
+        request, 'remittance.csv',
+        ['Tanggal', 'Total SAR', 'Note', 'Res#', 'Invoice', 'Amount SAR'],
+        rows(), bom=False,
+    )
 
 
 @require_perm('remittance', 'edit')
@@ -371,17 +411,16 @@ def remittance_mark_received(request, pk):
     rem = get_object_or_404(Remittance, pk=pk, company=KONOZ)
     if rem.status != Remittance.STATUS_RECEIVED:
         rem.status = Remittance.STATUS_RECEIVED
-        rem.save(update_fields=['status'])
+        rem.save(update_fields=['status', 'updated_at'])
     return redirect('remittance_list')
 
 
-def _addable_reservasi(rem):
+def _addable_reservasi(rem, date_from=None, date_to=None):
     """Reservasi yang masih punya uang mengendap dan belum ada di remittance ini."""
-    existing = set(rem.lines.values_list('linked_number', flat=True))
+    existing = rem.lines.values('linked_number')
     rows = []
-    for r in _build_reservasi_mengendap():
-        if r['linked_number'] in existing or r['mengendap'] <= 0:
-            continue
+    for e in _mengendap_queryset(date_from, date_to).filter(mengendap__gt=0).exclude(linked_number__in=existing):
+        r = _mengendap_row(e)
         ci, co = r.get('check_in'), r.get('check_out')
         rows.append({
             'linked_number': r['linked_number'],
@@ -402,6 +441,7 @@ def _sync_remittance_lines(rem, raw_lines):
     ada di payload atau nominalnya nol akan dihapus.
     """
     keep_ids = set()
+    updated_ids = set()
     for ld in raw_lines:
         try:
             amount = int(round(float(ld.get('amount_sar') or 0)))
@@ -409,8 +449,9 @@ def _sync_remittance_lines(rem, raw_lines):
             amount = 0
         line_id = ld.get('line_id')
         if line_id:
-            if amount > 0 and RemittanceLine.objects.filter(pk=line_id, remittance=rem).update(amount_sar=amount):
+            if amount > 0 and RemittanceLine.objects.filter(pk=line_id, remittance=rem).update(amount_sar=amount, updated_at=Now()):
                 keep_ids.add(int(line_id))
+                updated_ids.add(int(line_id))
         elif amount > 0 and ld.get('linked_number'):
             line = RemittanceLine.objects.create(
                 remittance=rem,
@@ -420,6 +461,12 @@ def _sync_remittance_lines(rem, raw_lines):
             )
             keep_ids.add(line.pk)
     rem.lines.exclude(pk__in=keep_ids).delete()
+    # .update() di atas melewati signal RemittanceLine, jadi buku besar
+    # untuk baris yang nominalnya berubah disegarkan manual di sini
+    if updated_ids:
+        RemittanceLedgerEntry.refresh(
+            rem.lines.filter(pk__in=updated_ids).values_list('linked_number', flat=True)
+        )
 
 
 @require_perm('remittance', 'edit')
@@ -432,7 +479,7 @@ def remittance_edit(request, pk):
         rem.status = request.POST.get('status', rem.status)
         rem.receipt_reference = request.POST.get('receipt_reference', '').strip()
         rem.note = request.POST.get('note', '').strip()
-        update_fields = ['date', 'status', 'receipt_reference', 'note']
+        update_fields = ['date', 'status', 'receipt_reference', 'note', 'updated_at']
         if request.POST.get('remove_proof'):
             rem.proof = None
             update_fields.append('proof')
@@ -452,6 +499,7 @@ def remittance_edit(request, pk):
         return redirect('remittance_detail', pk=rem.pk)
 
     lines = _sort_lines_by_payment_date(list(rem.lines.select_related('invoice')))
+    date_from, date_to = _check_in_range(request)
     return inertia_render(request, "Remittance/Edit", props={
         "rem": {
             "id": rem.id,
@@ -472,7 +520,8 @@ def remittance_edit(request, pk):
                 "customer_name": l.invoice.customer_name,
             } if l.invoice_id else None,
         } for l in lines],
-        "reservasi": _addable_reservasi(rem),
+        "reservasi": _addable_reservasi(rem, date_from, date_to),
+        **_range_props(date_from, date_to, rem),
     })
 
 
@@ -510,7 +559,7 @@ def remittance_upload_proof(request, pk):
     proof = request.FILES.get('proof')
     if proof:
         rem.proof = proof
-        rem.save(update_fields=['proof'])
+        rem.save(update_fields=['proof', 'updated_at'])
     return redirect('remittance_detail', pk=rem.pk)
 
 
@@ -577,81 +626,40 @@ def _build_ledger_rows(date_from=None, date_to=None):
     Semua reservasi Definite dan Tentative ikut ditampilkan walau belum ada
     uang masuk atau kiriman, supaya bisa dipakai untuk pelacakan. Reservasi
     Cancelled hanya muncul kalau uangnya terlanjur bergerak.
+
+    Angka per baris sudah tersimpan di RemittanceLedgerEntry; di sini hanya
+    rentang check-in yang diminta yang dibaca, sudah terurut dari database.
     """
-    from ..models import ConfirmationLetter, Reservation
-
-    pool = defaultdict(lambda: {'debit': 0, 'credit': 0})
-    direct_total = 0
-
-    for p in Payment.objects.filter(invoice__company=KONOZ).values(
-        'linked_number', 'method', 'amount', 'currency', 'exchange_rate',
-    ):
-        method = (p['method'] or '').lower()
-        sar = int(round(convert_to_sar(float(p['amount']), p['currency'], float(p['exchange_rate']))))
-        if method == 'direct':
-            # client bayar langsung ke Pusat: uangnya masuk sekaligus dianggap sudah terkirim
-            direct_total += sar
-            pool[p['linked_number']]['debit'] += sar
-            pool[p['linked_number']]['credit'] += sar
-        elif method in SURABAYA_METHODS:
-            pool[p['linked_number']]['debit'] += sar
-
-    for l in RemittanceLine.objects.filter(remittance__company=KONOZ).values(
-        'linked_number',
-    ).annotate(total=Sum('amount_sar')):
-        pool[l['linked_number']]['credit'] += int(l['total'] or 0)
-
-    # semua reservasi Konoz ikut dilacak, bukan hanya yang sudah ada uangnya
-    res_map = {
-        r['reservation_number']: r
-        for r in Reservation.objects.filter(invoice__company=KONOZ).values(
-            'reservation_number', 'hotel', 'check_in', 'check_out', 'total_sar',
-            'invoice__customer_name',
-        )
-    }
-    # CL ikut jadi basis baris supaya reservasi yang belum punya invoice tetap terlacak
-    cl_map = {
-        c.confirmation_number: c
-        for c in ConfirmationLetter.objects.filter(company=KONOZ).prefetch_related('rooms')
-    }
+    entries = (
+        RemittanceLedgerEntry.objects.visible()
+        .check_in_between(date_from, date_to)
+        .by_check_in()
+        .select_related('reservation__invoice', 'cl')
+    )
 
     rows = []
-    for linked_number in sorted(set(res_map) | set(cl_map) | set(pool)):
-        data = pool.get(linked_number, {'debit': 0, 'credit': 0})
-        res = res_map.get(linked_number, {})
-        cl = cl_map.get(linked_number)
-        status = (cl.reservation_status or '').upper() if cl else ''
-        # Cancelled hanya relevan kalau uangnya terlanjur bergerak
-        if status == 'CANCELLED' and not data['debit'] and not data['credit']:
-            continue
-        check_in = res.get('check_in') or (cl.check_in if cl else None)
-        check_out = res.get('check_out') or (cl.check_out if cl else None)
-        if date_from and check_in and check_in < date_from:
-            continue
-        if date_to and check_in and check_in > date_to:
-            continue
-        total_sar = int(res.get('total_sar') or (cl.total_price if cl else 0) or 0)
+    total_debit = total_credit = total_tagihan = 0
+    for i, e in enumerate(entries.iterator(chunk_size=500), start=1):
+        res, cl = e.reservation, e.cl
         rows.append({
-            'linked_number': linked_number or '—',
-            'status': status,
-            'hotel': res.get('hotel') or (cl.hotel_name if cl else '') or '—',
-            'guest': res.get('invoice__customer_name') or (cl.guest_name if cl else '') or '—',
-            'check_in': check_in,
-            'check_out': check_out,
-            'total_sar': total_sar,
-            'debit': data['debit'],
-            'credit': data['credit'],
-            'balance': total_sar - data['credit'],
+            'no': i,
+            'linked_number': e.linked_number or '—',
+            'status': e.status,
+            'hotel': (res.hotel if res else '') or (cl.hotel_name if cl else '') or '—',
+            'guest': (res.invoice.customer_name if res else '') or (cl.guest_name if cl else '') or '—',
+            'check_in': e.check_in,
+            'check_out': e.check_out,
+            'total_sar': e.total_sar,
+            'debit': e.debit,
+            'credit': e.credit,
+            'balance': e.balance,
         })
+        total_debit += e.debit
+        total_credit += e.credit
+        total_tagihan += e.total_sar
 
-    # urut check-in terdekat lebih dulu, baris tanpa check-in ditaruh paling bawah
-    rows.sort(key=lambda r: (r['check_in'] is None, r['check_in'] or date.max, r['linked_number']))
-    for i, row in enumerate(rows, start=1):
-        row['no'] = i
-
-    total_debit = sum(r['debit'] for r in rows)
-    total_credit = sum(r['credit'] for r in rows)
-    total_tagihan = sum(r['total_sar'] for r in rows)
+    # direct_total sengaja tidak ikut rentang tanggal, sama seperti sebelumnya
+    direct_total = RemittanceLedgerEntry.objects.aggregate(t=Sum('direct'))['t'] or 0
     return {
         'rows': rows,
         'total_tagihan': total_tagihan,
@@ -1,9 +1,8 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from django.http import JsonResponse
-from django.urls import reverse
 
-from ..models import ConfirmationLetter, Invoice
+from ..permissions import can
+from ..services import search
 from .helpers import get_active_company
 
 
@@ -13,53 +12,8 @@ def global_search(request):
     if not q or len(q) < 2:
         return JsonResponse({"results": [], "q": q})
 
-    active_company = get_active_company(request)
-
-    def _co(qs):
-        return qs.filter(company=active_company)
-
-    cl_qs = _co(ConfirmationLetter.objects.filter(
-        Q(confirmation_number__icontains=q) |
-        Q(guest_name__icontains=q) |
-        Q(hotel_name__icontains=q)
-    ))[:8]
-
-    inv_qs = _co(
-        Invoice.objects.filter(invoice_type="hotel")
-        .filter(Q(invoice_number__icontains=q) | Q(customer_name__icontains=q))
-        .prefetch_related('reservations', 'payments')
-    )[:8]
-
-    svc_qs = _co(
-        Invoice.objects.filter(invoice_type="visa")
-        .filter(Q(invoice_number__icontains=q) | Q(customer_name__icontains=q))
-        .prefetch_related('service_items', 'payments')
-    )[:8]
-
-    results = []
-    for cl in cl_qs:
-        results.append({
-            "type": "CL",
-            "label": cl.confirmation_number,
-            "sub": cl.guest_name,
-            "meta": cl.hotel_name or "",
-            "url": reverse("cl_detail", args=[cl.pk]),
-        })
-    for inv in inv_qs:
-        results.append({
-            "type": "INV",
-            "label": inv.invoice_number,
-            "sub": inv.customer_name,
-            "meta": "Lunas" if inv.remaining_sar == 0 else f"Sisa {inv.remaining_sar:,} SAR",
-            "url": reverse("invoice_detail", args=[inv.pk]),
-        })
-    for svc in svc_qs:
-        results.append({
-            "type": "SVC",
-            "label": svc.invoice_number,
-            "sub": svc.customer_name,
-            "meta": "Lunas" if svc.remaining_sar == 0 else f"Sisa {svc.remaining_sar:,} SAR",
-            "url": reverse("services_detail", args=[svc.pk]),
-        })
-
+    # Hanya tipe yang modulnya boleh dilihat user; halaman detailnya toh
+    # akan menolak kalau tidak.
+    kinds = [kind for kind, source in search.SOURCES.items() if can(request.user, source.module, 'view')]
+    results = search.search(get_active_company(request), q[:100], kinds=kinds)
     return JsonResponse({"results": results, "q": q})
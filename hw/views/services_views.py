@@ -1,30 +1,30 @@
-﻿import csv
-import json
+﻿import json
 from datetime import date, timedelta
 from django.utils import timezone
 
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 
 from inertia import render as inertia_render
 
 from ..models import ActivityLog, Invoice, ServiceItem, log_activity
+from ..pagination import KeysetPaginator
 from ..permissions import require_perm
+from ..services import search
+from .conditional import conditional, invoice_version, rows_version
 from .context import _build_visa_payments_context, _build_visa_services_context
 from .helpers import (
     _billing_props,
     _is_mobile,
-    _page_range_display,
+    _pagination,
     _parse_date,
     _render_list_pdf,
+    _stream_csv,
     _save_service_payments,
     _to_float,
     get_active_company,
 )
-from .pdf import _render_services_pdf
+from .pdf import _pdf_job_response, _services_pdf_source
 
 
 def _get_service_invoice(request, pk):
@@ -39,10 +39,10 @@ def services_list(request):
     qs = Invoice.objects.filter(invoice_type="visa", company=get_active_company(request))
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
+        qs = qs.filter(search.match_q('SVC', get_active_company(request), q))
 
-    paginator = Paginator(qs, 10 if _is_mobile(request) else 15)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ['-created_at'], 10 if _is_mobile(request) else 15)
+    page_obj = paginator.get_page(request.GET)
     invoices = [{
         "id": inv.id,
         "invoice_number": inv.invoice_number,
@@ -55,25 +55,13 @@ def services_list(request):
         "invoices": invoices,
         "total_count": paginator.count,
         "q": q,
-        "pagination": {
-            "number": page_obj.number,
-            "num_pages": paginator.num_pages,
-            "has_previous": page_obj.has_previous(),
-            "has_next": page_obj.has_next(),
-            "previous_page_number": page_obj.previous_page_number() if page_obj.has_previous() else None,
-            "next_page_number": page_obj.next_page_number() if page_obj.has_next() else None,
-            "has_other_pages": page_obj.has_other_pages(),
-            "range": _page_range_display(page_obj),
-            "start_index": page_obj.start_index(),
-            "end_index": page_obj.end_index(),
-            "count": paginator.count,
-        },
+        "pagination": _pagination(page_obj),
     })
 
 
 @require_perm('services', 'create')
 def services_new(request):
-    suggested_number = Invoice.generate_number("visa")
+    suggested_number = Invoice.suggest_number("visa")
     active_company = get_active_company(request)
     if request.method == "POST":
         invoice_number = request.POST.get("invoice_number", "")
@@ -113,7 +101,13 @@ def services_new(request):
     })
 
 
+def _services_version(request, pk):
+    invoice = Invoice.objects.filter(pk=pk, invoice_type='visa', company=get_active_company(request))
+    return invoice_version(invoice, ServiceItem.objects.filter(invoice__in=invoice))
+
+
 @require_perm('services', 'view')
+@conditional(_services_version, page=True)
 def services_detail(request, pk):
     invoice = _get_service_invoice(request, pk)
     visa_services = _build_visa_services_context(invoice)
@@ -199,9 +193,8 @@ def services_edit(request, pk):
         invoice.save()
 
         invoice.service_items.all().delete()
-        invoice.payments.all().delete()
         _save_service_items(invoice, request)
-        _save_service_payments(invoice, request)
+        _save_service_payments(invoice, request, replace=True)
         _after = {
             'Customer Name': invoice.customer_name,
             'Invoice No.':   invoice.invoice_number,
@@ -237,7 +230,7 @@ def services_delete(request, pk):
 @require_perm('services', 'export')
 def services_pdf(request, pk):
     invoice = _get_service_invoice(request, pk)
-    return _render_services_pdf(invoice)
+    return _pdf_job_response(request, *_services_pdf_source(invoice))
 
 
 @require_perm('services', 'export')
@@ -245,7 +238,7 @@ def services_list_pdf(request):
     qs = Invoice.objects.filter(invoice_type="visa", company=get_active_company(request))
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
+        qs = qs.filter(search.match_q('SVC', get_active_company(request), q))
     return _render_list_pdf(
         request, qs,
         template="hw/services/services_list_pdf.html",
@@ -254,23 +247,30 @@ def services_list_pdf(request):
     )
 
 
-@require_perm('services', 'export')
-def services_export_csv(request):
+def _services_export_qs(request):
     qs = Invoice.objects.filter(invoice_type="visa", company=get_active_company(request))
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(Q(customer_name__icontains=q) | Q(invoice_number__icontains=q))
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="invoices_services.csv"'
-    response.write('﻿')
-    writer = csv.writer(response)
-    writer.writerow(['Invoice #', 'Company', 'Customer', 'Currency', 'Issued Date', 'Due Date'])
-    for inv in qs:
-        writer.writerow([
+        qs = qs.filter(search.match_q('SVC', get_active_company(request), q))
+    return qs
+
+
+@require_perm('services', 'export')
+@conditional(lambda request: rows_version(_services_export_qs(request)))
+def services_export_csv(request):
+    qs = _services_export_qs(request)
+    rows = (
+        [
             inv.invoice_number, inv.company, inv.customer_name,
             inv.currency, inv.issued_date or '', inv.due_date or '',
-        ])
-    return response
+        ]
+        for inv in qs.iterator(chunk_size=2000)
+    )
+    return _stream_csv(
+        request, 'invoices_services.csv',
+        ['Invoice #', 'Company', 'Customer', 'Currency', 'Issued Date', 'Due Date'],
+        rows,
+    )
 
 
 @require_perm('services', 'create')